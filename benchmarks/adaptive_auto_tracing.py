@@ -0,0 +1,83 @@
+"""Measure auto-tracing with `min_duration` for a hot function whose first call is a slow outlier.
+
+Without adaptive options, the outlier promotes the function to being traced forever,
+so every later call creates a span. With `AdaptiveAutoTracingOptions`, one slow call isn't enough to promote it.
+A second function is always slow, to show that it's still traced, within `max_spans_per_second`.
+
+Both the number of spans created and the average time per call are reported.
+
+Run with `python benchmarks/adaptive_auto_tracing.py`.
+"""
+
+from __future__ import annotations
+
+import ast
+import time
+from collections.abc import Sequence
+from typing import Any
+
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor, SpanExporter, SpanExportResult
+
+import logfire
+from logfire._internal.auto_trace.rewrite_ast import compile_source
+
+NUM_CALLS = 100_000
+MIN_DURATION = 0.001
+
+SOURCE = """
+import time
+
+def hot(outlier=False):
+    if outlier:
+        time.sleep(0.002)
+    return 1
+
+def slow():
+    time.sleep(0.002)
+"""
+
+
+class CountingExporter(SpanExporter):
+    def __init__(self) -> None:
+        self.count = 0
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        self.count += len(spans)
+        return SpanExportResult.SUCCESS
+
+
+def run(exporter: CountingExporter, adaptive: logfire.AdaptiveAutoTracingOptions | None) -> None:
+    exporter.count = 0
+    logfire_instance = logfire.DEFAULT_LOGFIRE_INSTANCE.with_settings(custom_scope_suffix='auto_tracing')
+    min_duration = int(MIN_DURATION * 1_000_000_000)
+    _, execute = compile_source(ast.parse(SOURCE), 'bench.py', 'bench', logfire_instance, min_duration, adaptive)
+    namespace: dict[str, Any] = {}
+    execute(namespace)
+    hot, slow = namespace['hot'], namespace['slow']
+
+    hot(outlier=True)
+    start = time.perf_counter()
+    for _ in range(NUM_CALLS):
+        hot()
+    elapsed = time.perf_counter() - start
+    for _ in range(200):
+        slow()
+
+    name = 'adaptive' if adaptive else 'default'
+    print(f'{name:>8}: {elapsed / NUM_CALLS * 1e9:6.0f}ns per hot call, {exporter.count:6} spans')
+
+
+def main() -> None:
+    exporter = CountingExporter()
+    logfire.configure(
+        send_to_logfire=False,
+        console=False,
+        additional_span_processors=[SimpleSpanProcessor(exporter)],
+    )
+    run(exporter, None)
+    run(exporter, logfire.AdaptiveAutoTracingOptions())
+
+
+if __name__ == '__main__':
+    main()
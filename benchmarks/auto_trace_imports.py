@@ -0,0 +1,97 @@
+"""Measure the time to import many auto-traced modules, with and without the on-disk code cache.
+
+Generates a package of modules with a few dozen functions each in a temporary directory,
+then imports them in fresh subprocesses:
+
+- without auto-tracing, using the normal `.pyc` files,
+- with auto-tracing and an empty cache, which parses, rewrites and compiles every module and fills the cache,
+- with auto-tracing and a warm cache, which only needs to hash the source and create the span factories,
+- with auto-tracing, a warm cache and `lazy=True`, which only creates the span factories of functions that are called.
+
+It also times `logfire precompile-auto-tracing`, which fills the cache ahead of time in a process pool.
+
+Run with `python benchmarks/auto_trace_imports.py`.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+from pathlib import Path
+
+NUM_MODULES = 300
+FUNCTIONS_PER_MODULE = 30
+
+IMPORT_SCRIPT = """
+import sys
+import time
+
+import logfire
+
+logfire.configure(send_to_logfire=False, console=False)
+if sys.argv[1] != 'plain':
+    logfire.install_auto_tracing(['bench_pkg'], min_duration=0.01, lazy=sys.argv[1] == 'lazy')
+
+start = time.perf_counter()
+for i in range({num_modules}):
+    __import__(f'bench_pkg.module_{{i}}')
+print(time.perf_counter() - start)
+"""
+
+
+def module_source(index: int) -> str:
+    functions = [
+        textwrap.dedent(f'''
+            def function_{index}_{i}(items, factor={i}):
+                """Scale and filter some items."""
+                result = []
+                for item in items:
+                    if item % {i + 2}:
+                        result.append(item * factor)
+                return sum(result)
+            ''')
+        for i in range(FUNCTIONS_PER_MODULE)
+    ]
+    return ''.join(functions)
+
+
+def import_time(directory: Path, mode: str) -> float:
+    env = {**os.environ, 'PYTHONPATH': str(directory)}
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    script = IMPORT_SCRIPT.format(num_modules=NUM_MODULES)
+    output = subprocess.check_output([sys.executable, '-c', script, mode], env=env, text=True)
+    return float(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        package = directory / 'bench_pkg'
+        package.mkdir()
+        (package / '__init__.py').write_text('')
+        for i in range(NUM_MODULES):
+            (package / f'module_{i}.py').write_text(module_source(i))
+
+        # The first run writes the normal .pyc files.
+        import_time(directory, 'plain')
+        print(f'{NUM_MODULES} modules without auto-tracing: {import_time(directory, "plain"):.3f}s')
+
+        for path in (package / '__pycache__').glob('*.opt-logfire.pyc'):
+            path.unlink()
+        print(f'{NUM_MODULES} modules, auto-tracing, cold cache: {import_time(directory, "auto_trace"):.3f}s')
+        print(f'{NUM_MODULES} modules, auto-tracing, warm cache: {import_time(directory, "auto_trace"):.3f}s')
+        print(f'{NUM_MODULES} modules, auto-tracing, warm cache, lazy: {import_time(directory, "lazy"):.3f}s')
+
+        for path in (package / '__pycache__').glob('*.opt-logfire.pyc'):
+            path.unlink()
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, '-m', 'logfire', 'precompile-auto-tracing', str(package)])
+        print(f'Precompiling {NUM_MODULES} modules in a process pool: {time.perf_counter() - start:.3f}s')
+
+
+if __name__ == '__main__':
+    main()
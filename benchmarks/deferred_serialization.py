@@ -0,0 +1,44 @@
+"""Measure the cost in the calling thread of logging structured values with and without deferred serialization.
+
+Logfire is configured to not send or print anything, so this only measures the work done when logging,
+which with `AdvancedOptions(defer_attribute_serialization=True)` excludes serializing to JSON
+and generating the JSON schema, since that happens in the export thread.
+
+Run with `python benchmarks/deferred_serialization.py`.
+"""
+
+from __future__ import annotations
+
+import timeit
+
+import logfire
+
+NUMBER = 2_000
+
+ORDER = {
+    'id': 123,
+    'customer': {'name': 'Alice', 'email': 'alice@example.com'},
+    'items': [{'sku': f'SKU-{i}', 'quantity': i, 'price': i * 1.5} for i in range(20)],
+}
+
+
+def main() -> None:
+    cases = {
+        'scalars': lambda: logfire.info('Order {order_id} total {total}', order_id=123, total=45.6),
+        'small dict': lambda: logfire.info('User {user}', user={'id': 1, 'name': 'Alice'}),
+        'nested order': lambda: logfire.info('Order {order_id}', order_id=123, order=ORDER),
+    }
+    for defer in [False, True]:
+        logfire.configure(
+            send_to_logfire=False,
+            console=False,
+            inspect_arguments=False,
+            advanced=logfire.AdvancedOptions(defer_attribute_serialization=defer),
+        )
+        for label, func in cases.items():
+            best = min(timeit.repeat(func, repeat=5, number=NUMBER)) / NUMBER
+            print(f'{label}, defer_attribute_serialization={defer}: {best * 1e6:.1f} µs per log')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Measure the cost of converting structured attributes to JSON.
+
+Uses attributes like lists of pydantic models and dataclasses with nested values,
+which are common in spans and logs, converted with `to_json_value` alone and with `prepare_otlp_attributes`,
+which also generates the JSON schema.
+
+Run with `python benchmarks/json_encoder.py`.
+"""
+
+from __future__ import annotations
+
+import timeit
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from logfire._internal.json_encoder import to_json_value
+from logfire._internal.main import prepare_otlp_attributes
+
+
+class Address(BaseModel):
+    street: str
+    city: str
+
+
+class User(BaseModel):
+    id: int
+    name: str
+    created_at: datetime
+    addresses: list[Address]
+
+
+@dataclass
+class Item:
+    sku: UUID
+    price: float
+    tags: list[str] = field(default_factory=list[str])
+    attributes: dict[str, Any] = field(default_factory=dict[str, Any])
+
+
+def make_attributes() -> dict[str, Any]:
+    users = [
+        User(
+            id=i,
+            name=f'user {i}',
+            created_at=datetime(2024, 1, 1),
+            addresses=[Address(street=f'{i} Main St', city='Springfield')],
+        )
+        for i in range(50)
+    ]
+    items = [
+        Item(sku=UUID(int=i), price=i * 1.5, tags=['a', 'b'], attributes={'color': 'red', 'size': i}) for i in range(50)
+    ]
+    return {'users': users, 'items': items}
+
+
+def main() -> None:
+    attributes = make_attributes()
+    for label, func in [
+        ('to_json_value', lambda: to_json_value(attributes, set())),
+        ('prepare_otlp_attributes', lambda: prepare_otlp_attributes(attributes)),
+    ]:
+        timer = timeit.Timer(func)
+        best = min(timer.repeat(repeat=5, number=200)) / 200
+        print(f'{label}: {best * 1e6:.1f} µs per call')
+
+
+if __name__ == '__main__':
+    main()
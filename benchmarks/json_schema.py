@@ -0,0 +1,55 @@
+"""Measure the cost of generating the `logfire.json_schema` attribute of a log.
+
+Uses attributes like those of typical logs: only scalars, scalars with an enum, datetime and UUID
+(which have schemas that only depend on their types), and a list of dataclasses.
+
+Run with `python benchmarks/json_schema.py`.
+"""
+
+from __future__ import annotations
+
+import timeit
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any
+from uuid import uuid4
+
+from logfire._internal.json_schema import (
+    attributes_json_schema,
+    attributes_json_schema_properties,
+    attributes_json_schema_with_properties,
+)
+
+
+class Status(Enum):
+    ACTIVE = 'active'
+    INACTIVE = 'inactive'
+
+
+@dataclass
+class Item:
+    id: int
+    name: str
+    status: Status
+
+
+def uncached(attributes: dict[str, Any]) -> str | None:
+    properties = attributes_json_schema_properties(attributes)
+    return attributes_json_schema(properties) if properties else None
+
+
+def main() -> None:
+    scalars = {'user_id': 123, 'name': 'alice', 'score': 1.5, 'admin': False}
+    typed = {**scalars, 'status': Status.ACTIVE, 'created_at': datetime.now(timezone.utc), 'request_id': uuid4()}
+    items = {'items': [Item(i, f'item {i}', Status.ACTIVE) for i in range(20)]}
+
+    for label, attributes in [('scalars', scalars), ('enum, datetime and UUID', typed), ('dataclasses', items)]:
+        for name, func in [('uncached', uncached), ('cached', attributes_json_schema_with_properties)]:
+            timer = timeit.Timer(lambda: func(attributes))
+            best = min(timer.repeat(repeat=5, number=5_000)) / 5_000
+            print(f'{label}, {name}: {best * 1e6:.1f} µs per log')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Measure how many logs per second `logfire.info` can create, compared to creating them as regular spans.
+
+Logfire is configured to not send or print anything, so this measures the work done in the calling thread.
+The comparison replaces `_ProxyTracer.start_log_span` with the general `start_span` that was used before.
+
+Run with `python benchmarks/log_throughput.py`.
+"""
+
+from __future__ import annotations
+
+import timeit
+from typing import Any
+
+import logfire
+from logfire._internal.tracer import _ProxyTracer  # type: ignore
+
+NUMBER = 5_000
+
+
+def logs_per_second() -> dict[str, float]:
+    cases = {
+        'no attributes': lambda: logfire.info('Cache refreshed'),
+        'three attributes': lambda: logfire.info(
+            'User {user_id} bought {quantity} x {product}', user_id=123, quantity=2, product='widget'
+        ),
+        'debug (below min_level)': lambda: logfire.debug('Detailed state {state}', state='ok'),
+    }
+    results: dict[str, float] = {}
+    for label, func in cases.items():
+        best = min(timeit.repeat(func, repeat=5, number=NUMBER)) / NUMBER
+        results[label] = 1 / best
+    return results
+
+
+def main() -> None:
+    logfire.configure(send_to_logfire=False, console=False, inspect_arguments=False, min_level='info')
+
+    fast = logs_per_second()
+
+    def start_log_span(self: _ProxyTracer, name: str, attributes: dict[str, Any], start_time: int):
+        return self.start_span(name, attributes=attributes, start_time=start_time)
+
+    original = _ProxyTracer.start_log_span
+    _ProxyTracer.start_log_span = start_log_span
+    try:
+        general = logs_per_second()
+    finally:
+        _ProxyTracer.start_log_span = original
+
+    for label in fast:
+        print(f'{label}: {fast[label]:,.0f} logs/s with start_log_span, {general[label]:,.0f} logs/s with start_span')
+
+
+if __name__ == '__main__':
+    main()
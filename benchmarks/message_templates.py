@@ -0,0 +1,57 @@
+"""Measure how many `logfire.info` calls per second can be made with and without the parsed template cache.
+
+Logfire is configured to not send or print anything, so this mostly measures creating the log,
+including formatting the message from the template. Formatting the message alone is also measured,
+since it's a small part of the total.
+
+Run with `python benchmarks/message_templates.py`.
+"""
+
+from __future__ import annotations
+
+import timeit
+from typing import Any
+
+import logfire
+from logfire._internal import formatter
+from logfire._internal.scrubbing import Scrubber
+
+TEMPLATE = 'User {user_id} ({name}) bought {quantity} x {product} for {price:.2f}'
+
+
+KWARGS: dict[str, Any] = {'user_id': 123, 'name': 'alice', 'quantity': 2, 'product': 'widget', 'price': 9.99}
+
+
+def calls_per_second() -> tuple[float, float]:
+    scrubber = Scrubber(None)
+    results: list[float] = []
+    for func in [
+        lambda: logfire.info(TEMPLATE, **KWARGS),
+        lambda: formatter.logfire_format(TEMPLATE, KWARGS, scrubber),
+    ]:
+        timer = timeit.Timer(func)
+        best = min(timer.repeat(repeat=5, number=5_000)) / 5_000
+        results.append(1 / best)
+    return results[0], results[1]
+
+
+def report(label: str) -> None:
+    log_calls, format_calls = calls_per_second()
+    print(f'{label}: logfire.info {log_calls:,.0f} calls/s, formatting alone {format_calls:,.0f} calls/s')
+
+
+def main() -> None:
+    logfire.configure(send_to_logfire=False, console=False, inspect_arguments=False)
+
+    report('with cache')
+
+    cached_parse_template = formatter.parse_template
+    formatter.parse_template = cached_parse_template.__wrapped__
+    try:
+        report('without cache')
+    finally:
+        formatter.parse_template = cached_parse_template
+
+
+if __name__ == '__main__':
+    main()
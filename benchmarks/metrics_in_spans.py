@@ -0,0 +1,57 @@
+"""Measure the cost of `counter.add` inside spans with `MetricsOptions(collect_in_spans=True)`.
+
+Each add is recorded by the OpenTelemetry SDK and also accumulated in the current span and its ancestors,
+which are written to the `logfire.metrics` attribute when each span ends.
+
+Adds with attributes passed on each call are compared to adds through a handle from `logfire.bind_metric`,
+which prepares the attributes once, both directly inside one span and inside several nested spans.
+
+Run with `python benchmarks/metrics_in_spans.py`.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Iterator
+from contextlib import ExitStack, contextmanager
+from typing import Callable
+
+import logfire
+
+NUM_ADDS = 200_000
+ATTRIBUTES = {'model': 'gpt-4o', 'operation': 'chat', 'token_type': 'input'}
+
+
+@contextmanager
+def nested_spans(depth: int) -> Iterator[None]:
+    with ExitStack() as stack:
+        for i in range(depth):
+            stack.enter_context(logfire.span('span {i}', i=i))
+        yield
+
+
+def measure(name: str, add: Callable[[], None], depth: int) -> None:
+    with nested_spans(depth):
+        start = time.perf_counter()
+        for _ in range(NUM_ADDS):
+            add()
+        elapsed = time.perf_counter() - start
+    print(f'{name:>9}, {depth} span(s): {elapsed / NUM_ADDS * 1e9:6.0f}ns per add')
+
+
+def main() -> None:
+    logfire.configure(
+        send_to_logfire=False,
+        console=False,
+        metrics=logfire.MetricsOptions(collect_in_spans=True),
+    )
+    counter = logfire.metric_counter('tokens')
+    bound = logfire.bind_metric(counter, ATTRIBUTES)
+
+    for depth in [1, 5]:
+        measure('unbound', lambda: counter.add(1, ATTRIBUTES), depth)
+        measure('bound', lambda: bound.add(1), depth)
+
+
+if __name__ == '__main__':
+    main()
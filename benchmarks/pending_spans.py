@@ -0,0 +1,77 @@
+"""Measure the cost of pending spans for spans exported in batches, built eagerly or lazily.
+
+Eagerly, a pending span is built and processed for every span as soon as it starts.
+Lazily, the queue only gets a `LazyPendingSpan` marker, and the pending span is only built
+if the span is still open when the batch is exported, which is never the case for these short spans.
+
+Both the time spent creating spans in the calling thread and the time to then export everything are reported.
+
+Run with `python benchmarks/pending_spans.py`.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Sequence
+
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+
+from logfire._internal.exporters.processor_wrapper import MainSpanProcessorWrapper
+from logfire._internal.exporters.remove_pending import RemovePendingSpansExporter
+from logfire._internal.scrubbing import Scrubber
+from logfire._internal.tracer import PendingSpanProcessor
+from logfire._internal.utils import SeededRandomIdGenerator
+
+NUM_SPANS = 20_000
+
+ATTRIBUTES = {
+    'logfire.msg_template': 'Handling request {request_id}',
+    'logfire.msg': 'Handling request 123',
+    'logfire.span_type': 'span',
+    'code.filepath': 'app.py',
+    'code.lineno': 42,
+    'code.function': 'handle',
+    'request_id': 123,
+}
+
+
+class NullExporter(SpanExporter):
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        return SpanExportResult.SUCCESS
+
+
+def measure(lazy: bool) -> tuple[float, float]:
+    batch_processor = BatchSpanProcessor(
+        RemovePendingSpansExporter(NullExporter()), max_queue_size=NUM_SPANS * 2, schedule_delay_millis=60_000
+    )
+    wrapper = MainSpanProcessorWrapper(batch_processor, Scrubber(None))
+    id_generator = SeededRandomIdGenerator(None)
+    pending_processor = (
+        PendingSpanProcessor(id_generator, None, wrapper) if lazy else PendingSpanProcessor(id_generator, wrapper)
+    )
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(wrapper)
+    tracer_provider.add_span_processor(pending_processor)
+    tracer = tracer_provider.get_tracer(__name__)
+
+    start = time.perf_counter()
+    for _ in range(NUM_SPANS):
+        with tracer.start_as_current_span('Handling request {request_id}', attributes=ATTRIBUTES):
+            pass
+    created = time.perf_counter()
+    batch_processor.force_flush()
+    exported = time.perf_counter()
+    tracer_provider.shutdown()
+    return (created - start) / NUM_SPANS, (exported - created) / NUM_SPANS
+
+
+def main() -> None:
+    for lazy in [False, True, False, True]:
+        create, export = measure(lazy)
+        label = 'lazy' if lazy else 'eager'
+        print(f'{label:>5}: {create * 1e6:.1f} µs per span in the calling thread, {export * 1e6:.1f} µs to export')
+
+
+if __name__ == '__main__':
+    main()
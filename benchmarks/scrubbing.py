@@ -0,0 +1,88 @@
+"""Measure the cost of scrubbing span attributes.
+
+Uses attributes like those of a span with a large JSON attribute that contains nothing sensitive,
+which is the common case, the same with a harmless match of the patterns (the word 'session' in a value),
+and the same with one sensitive key.
+
+Then compares scrubbing when spans are exported with scrubbing at source (`ScrubbingOptions.at_source`),
+including converting the attributes with `prepare_otlp_attributes`, for rows that contain a sensitive key.
+
+Run with `python benchmarks/scrubbing.py`.
+"""
+
+from __future__ import annotations
+
+import json
+import timeit
+from typing import Any
+
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+from logfire._internal.main import prepare_otlp_attributes
+from logfire._internal.scrubbing import Scrubber
+from logfire._internal.utils import ReadableSpanDict
+
+
+def make_attributes(note: str) -> dict[str, Any]:
+    rows = [{'id': i, 'name': f'user {i}', 'tags': ['a', 'b'], 'note': note} for i in range(50)]
+    return {
+        'logfire.msg_template': 'Loaded {rows}',
+        'logfire.msg': 'Loaded [...]',
+        'logfire.level_num': 9,
+        'logfire.span_type': 'log',
+        'code.filepath': 'app.py',
+        'code.lineno': 123,
+        'code.function': 'load',
+        'rows': json.dumps(rows),
+        'logfire.json_schema': json.dumps({'type': 'object', 'properties': {'rows': {'type': 'array'}}}),
+    }
+
+
+def make_span(attributes: dict[str, Any]) -> ReadableSpanDict:
+    return ReadableSpanDict(
+        name='Loaded {rows}',
+        context=None,
+        parent=None,
+        resource=None,
+        attributes=attributes,
+        events=[],
+        links=[],
+        kind=SpanKind.INTERNAL,
+        status=Status(StatusCode.UNSET),
+        start_time=0,
+        end_time=0,
+        instrumentation_scope=None,
+    )
+
+
+def main() -> None:
+    scrubber = Scrubber(None)
+    clean = make_attributes('started')
+    harmless = make_attributes('session started')
+    sensitive = {**harmless, 'password': 'hunter2'}
+
+    for label, attributes in [
+        ('nothing to scrub', clean),
+        ('harmless match', harmless),
+        ('one sensitive key', sensitive),
+    ]:
+        timer = timeit.Timer(lambda: scrubber.scrub_span(make_span(attributes)))
+        best = min(timer.repeat(repeat=5, number=2_000)) / 2_000
+        print(f'{label}: {best * 1e6:.1f} µs per span')
+
+    rows = [{'id': i, 'name': f'user {i}', 'tags': ['a', 'b'], 'api_key': 'abc'} for i in range(50)]
+    raw_attributes = {'logfire.msg_template': 'Loaded {rows}', 'logfire.msg': 'Loaded [...]', 'rows': rows}
+    for at_source in [False, True]:
+        mode_scrubber = Scrubber(None, at_source=at_source)
+
+        def create_and_export() -> None:
+            attributes = prepare_otlp_attributes(raw_attributes, mode_scrubber)
+            mode_scrubber.scrub_span(make_span(attributes))
+
+        timer = timeit.Timer(create_and_export)
+        best = min(timer.repeat(repeat=5, number=500)) / 500
+        print(f'sensitive rows, at_source={at_source}: {best * 1e6:.1f} µs per span')
+
+
+if __name__ == '__main__':
+    main()
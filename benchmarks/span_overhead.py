@@ -0,0 +1,69 @@
+"""Measure the throughput and memory of short spans like those created by auto-tracing and `logfire.span`.
+
+Logfire is configured to not send or print anything, so this measures the work done in the calling thread.
+The memory is measured with `tracemalloc` while many spans are open at once, e.g. in suspended generators,
+and includes the OpenTelemetry SDK span that each Logfire span wraps.
+
+Run with `python benchmarks/span_overhead.py`.
+"""
+
+from __future__ import annotations
+
+import timeit
+import tracemalloc
+from typing import Any, Callable
+
+import logfire
+from logfire._internal.main import FastLogfireSpan
+
+NUMBER = 5_000
+NUM_OPEN_SPANS = 2_000
+
+ATTRIBUTES = {
+    'code.filepath': 'app.py',
+    'code.lineno': 42,
+    'code.function': 'handle',
+    'logfire.msg_template': 'Calling app.handle',
+    'logfire.span_type': 'span',
+}
+
+
+def fast_span() -> FastLogfireSpan:
+    return logfire.DEFAULT_LOGFIRE_INSTANCE._fast_span('Calling app.handle', ATTRIBUTES)  # type: ignore
+
+
+def logfire_span() -> Any:
+    return logfire.span('Handling {request_id}', request_id=123)
+
+
+def bytes_per_open_span(make_span: Callable[[], Any]) -> float:
+    spans: list[Any] = []
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(NUM_OPEN_SPANS):
+        span = make_span()
+        span.__enter__()
+        spans.append(span)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    for span in reversed(spans):
+        span.__exit__(None, None, None)
+    return (after - before) / NUM_OPEN_SPANS
+
+
+def main() -> None:
+    logfire.configure(send_to_logfire=False, console=False, inspect_arguments=False)
+
+    for label, make_span in [('auto-tracing span', fast_span), ('logfire.span', logfire_span)]:
+
+        def run() -> None:
+            with make_span():
+                pass
+
+        best = min(timeit.repeat(run, repeat=5, number=NUMBER)) / NUMBER
+        memory = bytes_per_open_span(make_span)
+        print(f'{label}: {1 / best:,.0f} spans/s, {memory:,.0f} bytes per open span')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Measure the per-span overhead of `MainSpanProcessorWrapper.on_end`.
+
+Compares the current implementation with the previous one, which applied every transform
+and rebuilt the `ReadableSpan` for every span, for a typical span created by `logfire.info`.
+
+Run with `python benchmarks/span_processor_on_end.py`.
+"""
+
+from __future__ import annotations
+
+import timeit
+
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+
+import logfire
+from logfire._internal.exporters import processor_wrapper as pw
+from logfire._internal.scrubbing import NOOP_SCRUBBER, BaseScrubber, Scrubber
+from logfire._internal.utils import span_to_dict
+from logfire.testing import TestExporter
+
+
+class Sink(SpanProcessor):
+    def on_end(self, span: ReadableSpan) -> None:
+        pass
+
+
+class CapturingProcessor(SimpleSpanProcessor):
+    def __init__(self) -> None:
+        super().__init__(TestExporter())
+        self.spans: list[ReadableSpan] = []
+
+    def on_end(self, span: ReadableSpan) -> None:
+        self.spans.append(span)
+
+
+def previous_on_end(span: ReadableSpan, scrubber: BaseScrubber, processor: SpanProcessor) -> None:
+    span_dict = span_to_dict(span)
+    pw._tweak_asgi_send_receive_spans(span_dict)  # type: ignore[reportPrivateUsage]
+    pw._tweak_sqlalchemy_connect_spans(span_dict)  # type: ignore[reportPrivateUsage]
+    pw._tweak_http_spans(span_dict)  # type: ignore[reportPrivateUsage]
+    pw._summarize_db_statement(span_dict)  # type: ignore[reportPrivateUsage]
+    pw._set_error_level_and_status(span_dict)  # type: ignore[reportPrivateUsage]
+    pw._transform_langchain_span(span_dict)  # type: ignore[reportPrivateUsage]
+    pw._transform_google_genai_span(span_dict)  # type: ignore[reportPrivateUsage]
+    pw._transform_litellm_span(span_dict)  # type: ignore[reportPrivateUsage]
+    pw._default_gen_ai_response_model(span_dict)  # type: ignore[reportPrivateUsage]
+    scrubber.scrub_span(span_dict)
+    processor.on_end(ReadableSpan(**span_dict))
+
+
+def main() -> None:
+    capturing = CapturingProcessor()
+    logfire.configure(send_to_logfire=False, console=False, additional_span_processors=[capturing])
+    logfire.info('Processed {count} items for {user}', count=3, user='alice', tags_seen=['a', 'b'])
+    span = capturing.spans[-1]
+
+    number = 50_000
+    for name, scrubber in [('default scrubbing', Scrubber(None)), ('scrubbing disabled', NOOP_SCRUBBER)]:
+        sink = Sink()
+        wrapper = pw.MainSpanProcessorWrapper(sink, scrubber)
+        before = min(timeit.repeat(lambda: previous_on_end(span, scrubber, sink), number=number, repeat=5))
+        after = min(timeit.repeat(lambda: wrapper.on_end(span), number=number, repeat=5))
+        print(
+            f'{name:>20}: {before / number * 1e6:.2f}us -> {after / number * 1e6:.2f}us per span '
+            f'({(1 - after / before) * 100:.0f}% less)'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Measure the throughput of `TailSamplingProcessor` with different numbers of threads and shards.
+
+Each thread creates traces of a root span with a few children, one trace in ten containing an error,
+using `SamplingOptions.level_or_duration` as the tail sampling callback.
+With one shard, all threads share a single lock like the previous implementation.
+
+Run with `python benchmarks/tail_sampling_threads.py`.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
+
+from logfire._internal.constants import LEVEL_NUMBERS
+from logfire.sampling import SamplingOptions
+from logfire.sampling._tail_sampling import TailSamplingProcessor
+
+TRACES_PER_THREAD = 2_000
+CHILDREN_PER_TRACE = 4
+
+
+class Sink(SpanProcessor):
+    def on_end(self, span: ReadableSpan) -> None:
+        pass
+
+
+def spans_per_second(num_threads: int, num_shards: int) -> float:
+    get_tail_sample_rate = SamplingOptions.level_or_duration().tail
+    assert get_tail_sample_rate
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(TailSamplingProcessor(Sink(), get_tail_sample_rate, num_shards=num_shards))
+    tracer = tracer_provider.get_tracer(__name__)
+    barrier = threading.Barrier(num_threads + 1)
+    info = {'logfire.level_num': LEVEL_NUMBERS['info']}
+    error = {'logfire.level_num': LEVEL_NUMBERS['error']}
+
+    def make_traces() -> None:
+        barrier.wait()
+        for i in range(TRACES_PER_THREAD):
+            with tracer.start_as_current_span('root'):
+                for j in range(CHILDREN_PER_TRACE):
+                    attributes = error if i % 10 == 0 and j == 0 else info
+                    with tracer.start_as_current_span('child', attributes=attributes):
+                        pass
+
+    threads = [threading.Thread(target=make_traces) for _ in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return num_threads * TRACES_PER_THREAD * (CHILDREN_PER_TRACE + 1) / elapsed
+
+
+def main() -> None:
+    for num_threads in [1, 2, 4, 8, 16, 32]:
+        results = [
+            f'{num_shards} shard(s): {spans_per_second(num_threads, num_shards):9,.0f}' for num_shards in [1, 16]
+        ]
+        print(f'{num_threads:2} thread(s): ' + ', '.join(results) + ' spans/s')
+
+
+if __name__ == '__main__':
+    main()
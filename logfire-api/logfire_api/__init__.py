@@ -115,6 +115,9 @@ except ImportError:
 
             def fatal(self, *args, **kwargs) -> None: ...
 
+            def metric_histogram(self, *args, **kwargs) -> Any:
+                return MagicMock(spec=['record'])
+
             def suppress_scopes(self, *args, **kwargs) -> None: ...
 
             def with_tags(self, *args, **kwargs) -> Logfire:
@@ -282,6 +285,15 @@ except ImportError:
         class AutoTraceModule:
             def __init__(self, *args, **kwargs) -> None: ...
 
+        class AdaptiveAutoTracingOptions:
+            def __init__(self, *args, **kwargs) -> None: ...
+
+        class AutoTracedFunction:
+            def __init__(self, *args, **kwargs) -> None: ...
+
+        def auto_traced_functions() -> list[AutoTracedFunction]:
+            return []
+
         class StructlogProcessor:
             def __init__(self, *args, **kwargs) -> None: ...
 
@@ -296,3 +308,40 @@ except ImportError:
 
         def set_baggage(*args, **kwargs) -> ContextManager[None]:
             return nullcontext()
+
+        class ExportStats:
+            spans_queued = spans_exported = spans_export_failed = spans_dropped_queue_full = 0
+            exports_dropped_retry_limit = scrubbed_bytes = 0
+
+            def __init__(self, *args, **kwargs) -> None: ...
+
+        def export_stats() -> ExportStats:
+            return ExportStats()
+
+        def enable_overhead_profiling() -> None: ...
+
+        class FunctionOverhead:
+            def __init__(self, *args, **kwargs) -> None: ...
+
+        class OverheadProfile:
+            functions: list[FunctionOverhead] = []
+
+            def __init__(self, *args, **kwargs) -> None: ...
+
+        def overhead_profile() -> OverheadProfile:
+            return OverheadProfile()
+
+        class BoundCounter:
+            def __init__(self, *args, **kwargs) -> None: ...
+
+            def add(self, *args, **kwargs) -> None: ...
+
+        class BoundHistogram:
+            def __init__(self, *args, **kwargs) -> None: ...
+
+            def record(self, *args, **kwargs) -> None: ...
+
+        def bind_metric(instrument, *args, **kwargs) -> BoundCounter | BoundHistogram:
+            if hasattr(instrument, 'add'):
+                return BoundCounter()
+            return BoundHistogram()
@@ -24,6 +24,7 @@ class BaseTransformer(ast.NodeTransformer):
     filename: str
     module_name: str
     qualname_stack: list[str] = ...
+    filepath_attribute = ...
     def __post_init__(self) -> None: ...
     def visit_ClassDef(self, node: ast.ClassDef): ...
     def visit_FunctionDef(self, node: ast.FunctionDef | ast.AsyncFunctionDef): ...
@@ -1,11 +1,12 @@
 from ..constants import ONE_SECOND_IN_NANOSECONDS as ONE_SECOND_IN_NANOSECONDS
 from ..main import Logfire as Logfire
+from .adaptive import AdaptiveAutoTracingOptions as AdaptiveAutoTracingOptions
 from .import_hook import LogfireFinder as LogfireFinder
 from .types import AutoTraceModule as AutoTraceModule
 from collections.abc import Sequence
 from typing import Callable, Literal
 
-def install_auto_tracing(logfire: Logfire, modules: Sequence[str] | Callable[[AutoTraceModule], bool], *, min_duration: float, check_imported_modules: Literal['error', 'warn', 'ignore'] = 'error') -> None:
+def install_auto_tracing(logfire: Logfire, modules: Sequence[str] | Callable[[AutoTraceModule], bool], *, min_duration: float, check_imported_modules: Literal['error', 'warn', 'ignore'] = 'error', adaptive: AdaptiveAutoTracingOptions | None = None, lazy: bool = False) -> None:
     """Install automatic tracing.
 
     See `Logfire.install_auto_tracing` for more information.
@@ -0,0 +1,85 @@
+from ..constants import ONE_SECOND_IN_NANOSECONDS as ONE_SECOND_IN_NANOSECONDS
+from _typeshed import Incomplete
+from contextlib import AbstractContextManager as AbstractContextManager
+from dataclasses import dataclass
+from typing import Any, Callable
+
+@dataclass
+class AdaptiveAutoTracingOptions:
+    """Options for deciding which auto-traced functions are traced based on statistics of their recent durations.
+
+    Pass this as the `adaptive` argument of [`logfire.install_auto_tracing`][logfire.Logfire.install_auto_tracing]
+    along with `min_duration`.
+
+    Without these options, a function starts being traced the first time a single call takes at least `min_duration`,
+    and is then traced forever. So one slow outlier (e.g. a garbage collection pause) in a function that's called
+    very often can create a lot of spans. With these options, the durations of each function are counted
+    in windows of `window` calls:
+
+    - A function which isn't traced starts being traced as soon as the `percentile`th percentile of the durations
+        in the current window is known to be at least `min_duration`.
+    - A traced function stops being traced at the end of a window if that percentile was below `min_duration`.
+    - A traced function also stops being traced when it creates `max_spans_per_second` spans within one second,
+        and can't start being traced again until that second is over.
+
+    Use [`logfire.auto_traced_functions()`][logfire.auto_traced_functions] to see which functions are currently traced.
+    """
+    window: int = ...
+    percentile: float = ...
+    max_spans_per_second: int | None = ...
+    def __post_init__(self) -> None: ...
+    @property
+    def slow_calls_threshold(self) -> int:
+        """The number of calls in a window that must take at least `min_duration` for the percentile to reach it."""
+
+@dataclass
+class AutoTracedFunction:
+    """The current state of a function instrumented by `install_auto_tracing`.
+
+    Use [`logfire.auto_traced_functions()`][logfire.auto_traced_functions] to get a snapshot of all of them.
+    """
+    module: str
+    qualname: str
+    lineno: int
+    traced: bool
+    promotions: int = ...
+    demotions: int = ...
+
+class AutoTracedFunctionState:
+    """Mutable counters for one auto-traced function, updated by its context factories without a lock.
+
+    When a function is called in several threads at once, the counts may be slightly off,
+    which only affects exactly when a decision to promote or demote it is made.
+    """
+    info: Incomplete
+    calls: int
+    slow_calls: int
+    interval_start: int
+    interval_spans: int
+    cooldown_until: int
+    def __init__(self, module: str, qualname: str, lineno: int, traced: bool) -> None: ...
+    def promote(self) -> None: ...
+    def demote(self) -> None: ...
+    def reset_window(self) -> None: ...
+
+AUTO_TRACED_FUNCTIONS: dict[tuple[str, str, int], AutoTracedFunctionState]
+
+def auto_traced_functions() -> list[AutoTracedFunction]:
+    """Get a snapshot of the state of all functions instrumented by `install_auto_tracing` in this process.
+
+    This shows which functions currently create spans, e.g. to tune `min_duration` or `AdaptiveAutoTracingOptions`:
+
+    ```py
+    import logfire
+
+    for function in logfire.auto_traced_functions():
+        if function.traced:
+            print(f'{function.module}.{function.qualname}')
+    ```
+    """
+def adaptive_context_factory(state: AutoTracedFunctionState, context_factories: list[Callable[[], AbstractContextManager[Any]]], index: int, span_factory: Callable[[], AbstractContextManager[Any]], timer: Callable[[], int], min_duration: int, options: AdaptiveAutoTracingOptions) -> Callable[[], AbstractContextManager[Any]]:
+    """Returns the initial context factory for an auto-traced function using `AdaptiveAutoTracingOptions`.
+
+    Like `MeasureTime` in `rewrite_ast.py`, `context_factories[index]` is replaced to switch between
+    only measuring durations (`Measure`) and creating spans (`Traced`), and both need to be as fast as possible.
+    """
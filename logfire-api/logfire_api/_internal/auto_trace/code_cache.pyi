@@ -0,0 +1,18 @@
+from ...version import VERSION as VERSION
+from .rewrite_ast import RewrittenCode as RewrittenCode
+from importlib.machinery import ModuleSpec
+
+HEADER: bytes
+
+def cache_path(spec: ModuleSpec) -> str | None:
+    """Returns the path of the cache file for the module, or `None` if it doesn't have a normal `.pyc` file."""
+def cache_path_for_source(filename: str) -> str | None:
+    """Returns the path of the cache file for the source file, or `None` if it can't be determined."""
+def cache_key(source: str, filename: str) -> bytes:
+    """Returns the prefix that a cache file must have to be valid for the given source code and filename."""
+def load(path: str, key: bytes) -> RewrittenCode | None:
+    """Returns the cached code at `path` if it exists and was stored with the same `key`."""
+def store(path: str, key: bytes, rewritten: RewrittenCode) -> None:
+    """Writes the code to `path` atomically unless `sys.dont_write_bytecode` is set, ignoring errors."""
+def write(path: str, key: bytes, rewritten: RewrittenCode) -> bool:
+    """Writes the code to `path` atomically, returning `False` for errors like a read-only filesystem."""
@@ -1,6 +1,8 @@
+from . import code_cache as code_cache
 from ..main import Logfire as Logfire
 from ..utils import log_internal_error as log_internal_error
-from .rewrite_ast import compile_source as compile_source
+from .adaptive import AdaptiveAutoTracingOptions as AdaptiveAutoTracingOptions
+from .rewrite_ast import compile_source as compile_source, make_execute as make_execute
 from .types import AutoTraceModule as AutoTraceModule
 from collections.abc import Sequence
 from dataclasses import dataclass
@@ -15,6 +17,8 @@ class LogfireFinder(MetaPathFinder):
     logfire: Logfire
     modules_filter: Callable[[AutoTraceModule], bool]
     min_duration: int
+    adaptive: AdaptiveAutoTracingOptions | None = ...
+    lazy: bool = ...
     def find_spec(self, fullname: str, path: Sequence[str] | None, target: ModuleType | None = None) -> ModuleSpec | None:
         """This is the method that is called by the import system.
 
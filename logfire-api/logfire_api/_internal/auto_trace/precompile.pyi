@@ -0,0 +1,22 @@
+from . import code_cache as code_cache
+from .rewrite_ast import compile_source as compile_source
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+def precompile_auto_tracing(paths: Iterable[str | Path], max_workers: int | None = None) -> int:
+    """Rewrite and compile all the Python files in `paths` for auto-tracing and store the results in the cache.
+
+    Directories are searched recursively. The files are processed in a pool of `max_workers` processes,
+    defaulting to the number of CPUs, or in the current process if `max_workers` is 1.
+    A cached file is only used if the module is later imported from the same absolute path.
+
+    Returns the number of files that were compiled and stored, i.e. excluding files with syntax errors
+    or that couldn't be written.
+    """
+def source_files(paths: Iterable[str | Path]) -> Iterator[str]: ...
+def precompile_file(filename: str) -> bool:
+    """Compile one file and store it in the cache, returning whether that succeeded.
+
+    The module name, `Logfire` instance and `min_duration` don't affect the compiled code,
+    so placeholders are used, with `lazy=True` so that no context factories are actually created.
+    """
@@ -1,14 +1,29 @@
 import ast
+from .. import overhead as overhead
 from ..ast_utils import BaseTransformer as BaseTransformer, LogfireArgs as LogfireArgs
 from ..main import Logfire as Logfire
+from ..overhead import call_context_factory as call_context_factory, profiled as profiled
+from .adaptive import AdaptiveAutoTracingOptions as AdaptiveAutoTracingOptions, AutoTracedFunctionState as AutoTracedFunctionState, adaptive_context_factory as adaptive_context_factory
 from contextlib import AbstractContextManager as AbstractContextManager
 from dataclasses import dataclass
+from types import CodeType
 from typing import Any, Callable, TypeVar
 
-def compile_source(tree: ast.AST, filename: str, module_name: str, logfire_instance: Logfire, min_duration: int) -> Callable[[dict[str, Any]], None]:
+@dataclass
+class RewrittenCode:
+    """A module's code compiled from its rewritten AST, independent of the `Logfire` instance and `min_duration`.
+
+    This is what's stored in the on-disk cache, see `code_cache.py`.
+    """
+    code: CodeType
+    logfire_name: str
+    function_locations: list[tuple[str, int]]
+
+def compile_source(tree: ast.AST, filename: str, module_name: str, logfire_instance: Logfire, min_duration: int, adaptive: AdaptiveAutoTracingOptions | None = None, lazy: bool = False) -> tuple[RewrittenCode, Callable[[dict[str, Any]], None]]:
     """Compile a modified AST of the module's source code in the module's namespace.
 
-    Returns a function which accepts module globals and executes the compiled code.
+    Returns the compiled code, which can be cached and passed to `make_execute` in a later process,
+    and a function which accepts module globals and executes the compiled code.
 
     The modified AST wraps the body of every function definition in `with context_factories[index]():`.
     `context_factories` is added to the module's namespace as `logfire_<uuid>`.
@@ -21,8 +36,18 @@ def compile_source(tree: ast.AST, filename: str, module_name: str, logfire_insta
             then `context_factories[index]` is replaced with the `partial` above.
     If `min_duration` is greater than 0, then `context_factories[index]` is initially `MeasureTime`.
     Otherwise, it's initially the `partial` above.
+    If `adaptive` is set, `MeasureTime` is replaced by the classes in `adaptive_context_factory`,
+    which can also switch back from the `partial` to measuring.
+    If `lazy` is set, `context_factories[index]` is initially a cheap placeholder which creates
+    one of the above and replaces itself with it the first time the function is called.
     """
-def rewrite_ast(tree: ast.AST, filename: str, logfire_name: str, module_name: str, logfire_instance: Logfire, context_factories: list[Callable[[], AbstractContextManager[Any]]], min_duration: int) -> ast.AST: ...
+def make_execute(rewritten: RewrittenCode, filename: str, module_name: str, logfire_instance: Logfire, min_duration: int, adaptive: AdaptiveAutoTracingOptions | None = None, lazy: bool = False) -> Callable[[dict[str, Any]], None]:
+    """Like `compile_source`, but for code that has already been rewritten and compiled, e.g. loaded from the cache.
+
+    Only the context factories need to be created again.
+    """
+def rewrite_ast(tree: ast.AST, filename: str, logfire_name: str, module_name: str, logfire_instance: Logfire, context_factories: list[Callable[[], AbstractContextManager[Any]]], min_duration: int, adaptive: AdaptiveAutoTracingOptions | None = None, lazy: bool = False) -> ast.AST: ...
+def make_transformer(filename: str, logfire_name: str, module_name: str, logfire_instance: Logfire, context_factories: list[Callable[[], AbstractContextManager[Any]]], min_duration: int, adaptive: AdaptiveAutoTracingOptions | None = None, lazy: bool = False) -> AutoTraceTransformer: ...
 
 @dataclass
 class AutoTraceTransformer(BaseTransformer):
@@ -30,12 +55,25 @@ class AutoTraceTransformer(BaseTransformer):
     logfire_instance: Logfire
     context_factories: list[Callable[[], AbstractContextManager[Any]]]
     min_duration: int
+    adaptive: AdaptiveAutoTracingOptions | None = ...
+    lazy: bool = ...
+    function_locations: list[tuple[str, int]] = ...
+    def __post_init__(self) -> None: ...
     def check_no_auto_trace(self, node: ast.FunctionDef | ast.AsyncFunctionDef | ast.ClassDef) -> bool:
         """Return true if the node has a `@no_auto_trace` or `@logfire.no_auto_trace` decorator."""
     def visit_ClassDef(self, node: ast.ClassDef): ...
     def visit_FunctionDef(self, node: ast.FunctionDef | ast.AsyncFunctionDef): ...
     def rewrite_function(self, node: ast.FunctionDef | ast.AsyncFunctionDef, qualname: str) -> ast.AST: ...
     def logfire_method_call_node(self, node: ast.FunctionDef | ast.AsyncFunctionDef, qualname: str) -> ast.Call: ...
+    def add_context_factory(self, qualname: str, lineno: int) -> int:
+        """Append the context factory for the function with the given location and return its index."""
+    def build_context_factory_and_call(self, index: int, qualname: str, lineno: int) -> AbstractContextManager[Any]:
+        """The placeholder context factory in lazy mode, called on the first call of the function.
+
+        If the function is first called in several threads at once, the factory may be built more than once,
+        but only the last one is kept.
+        """
+    def build_context_factory(self, index: int, qualname: str, lineno: int) -> Callable[[], AbstractContextManager[Any]]: ...
 T = TypeVar('T')
 
 def no_auto_trace(x: T) -> T:
@@ -17,6 +17,7 @@ class InstrumentationContext:
     recommendations: set[tuple[str, str]]
 
 def parse_run(args: argparse.Namespace) -> None: ...
+def run_script_or_module(args: argparse.Namespace) -> None: ...
 @contextmanager
 def alter_sys_argv(argv: list[str], cmd: str) -> Generator[None, None, None]: ...
 def is_uv_installed() -> bool:
@@ -0,0 +1,56 @@
+from .metrics import register_internal_callback_metric as register_internal_callback_metric
+from _typeshed import Incomplete
+from dataclasses import dataclass
+from functools import cache
+
+class LockFreeCount:
+    """A count that can be incremented by one from any thread without taking a lock.
+
+    Calling `next()` on an `itertools.count` is atomic, unlike `+= 1` on an attribute.
+    Reading the value also advances the `itertools.count`, so the number of reads is subtracted.
+    """
+    def __init__(self) -> None: ...
+    def increment(self) -> None: ...
+    @property
+    def value(self) -> int: ...
+
+@dataclass
+class ExportStats:
+    """Counts of what happened to data on its way to Logfire since the process started.
+
+    Use [`logfire.export_stats()`][logfire.export_stats] to get a snapshot.
+    The same counts are also reported as `logfire.span_export.*`, `logfire.export_retry.dropped`
+    and `logfire.scrubbing.scrubbed_bytes` metrics so that you can alert on data being lost.
+
+    Spans that are queued are eventually counted as exported, export failed, or dropped,
+    so the difference is the number of spans currently waiting in the queue.
+    """
+    spans_queued: int = ...
+    spans_exported: int = ...
+    spans_export_failed: int = ...
+    spans_dropped_queue_full: int = ...
+    exports_dropped_retry_limit: int = ...
+    scrubbed_bytes: int = ...
+    def count_queued_span(self) -> None:
+        """Add one to `spans_queued` without taking the lock, since this happens for every span."""
+    def add(self, *, spans_queued: int = 0, spans_exported: int = 0, spans_export_failed: int = 0, spans_dropped_queue_full: int = 0, exports_dropped_retry_limit: int = 0, scrubbed_bytes: int = 0) -> None: ...
+    def snapshot(self) -> ExportStats: ...
+
+EXPORT_STATS: Incomplete
+
+def export_stats() -> ExportStats:
+    """Get a snapshot of the counts of spans queued, exported and dropped by Logfire in this process.
+
+    This can be used to check whether telemetry is being lost, e.g. in a health check:
+
+    ```py
+    import logfire
+
+    stats = logfire.export_stats()
+    if stats.spans_dropped_queue_full or stats.exports_dropped_retry_limit:
+        print('Some telemetry was not sent to Logfire')
+    ```
+    """
+@cache
+def register_export_stats_metrics() -> None:
+    """Report `EXPORT_STATS` as metrics. This only needs to happen once, when sending data to Logfire."""
@@ -0,0 +1,28 @@
+from ..json_encoder import DeferredJson as DeferredJson
+from ..scrubbing import BaseScrubber as BaseScrubber
+from ..utils import handle_internal_errors as handle_internal_errors, span_to_dict as span_to_dict
+from .wrapper import WrapperSpanExporter as WrapperSpanExporter, WrapperSpanProcessor as WrapperSpanProcessor
+from _typeshed import Incomplete
+from collections.abc import Sequence
+from dataclasses import dataclass
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExportResult, SpanExporter
+
+class SerializeDeferredAttributesExporter(WrapperSpanExporter):
+    """Serializes attribute values deferred by `AdvancedOptions.defer_attribute_serialization` in the export thread."""
+    scrubber: Incomplete
+    def __init__(self, exporter: SpanExporter, scrubber: BaseScrubber) -> None: ...
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult: ...
+
+@dataclass
+class SerializeDeferredAttributesProcessorWrapper(WrapperSpanProcessor):
+    """Serializes deferred attribute values when spans end, for processors that don't export in a background thread."""
+    scrubber: BaseScrubber
+    def on_end(self, span: ReadableSpan) -> None: ...
+
+def serialize_deferred_attributes(span: ReadableSpan, scrubber: BaseScrubber) -> ReadableSpan:
+    """Returns a copy of `span` with `DeferredJson` attribute values serialized and scrubbed, or `span` if there are none.
+
+    If serializing fails, e.g. because a value was modified in another thread at the same time,
+    the error is logged and the span is returned unchanged, so the placeholders are exported instead.
+    """
@@ -1,7 +1,16 @@
 from _typeshed import Incomplete
-from logfire._internal.exporters.wrapper import WrapperSpanProcessor as WrapperSpanProcessor
+from collections import deque
+from collections.abc import Sequence
+from logfire._internal.constants import ATTRIBUTES_LOG_LEVEL_NUM_KEY as ATTRIBUTES_LOG_LEVEL_NUM_KEY, LEVEL_NUMBERS as LEVEL_NUMBERS
+from logfire._internal.export_stats import EXPORT_STATS as EXPORT_STATS, register_export_stats_metrics as register_export_stats_metrics
+from logfire._internal.exporters.otlp import BodySizeCheckingOTLPSpanExporter as BodySizeCheckingOTLPSpanExporter
+from logfire._internal.exporters.wrapper import WrapperSpanExporter as WrapperSpanExporter, WrapperSpanProcessor as WrapperSpanProcessor
+from logfire._internal.metrics import register_internal_callback_metric as register_internal_callback_metric
+from logfire._internal.tracer import LazyPendingSpan as LazyPendingSpan
 from opentelemetry.sdk.trace import ReadableSpan
-from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExportResult, SpanExporter
+
+QueueFullPolicy: Incomplete
 
 class DynamicBatchSpanProcessor(WrapperSpanProcessor):
     """A wrapper around a BatchSpanProcessor that dynamically adjusts the schedule delay.
@@ -9,13 +18,23 @@ class DynamicBatchSpanProcessor(WrapperSpanProcessor):
     The initial schedule delay is set to 100ms, and after processing 10 spans, it is set to the value of
     the `OTEL_BSP_SCHEDULE_DELAY` environment variable (default: 500ms).
     This makes the initial experience of the SDK more responsive.
+
+    If `adaptive` is true, after that the schedule delay and max export batch size keep being tuned
+    by an `AdaptiveBatchTuner` based on the observed rate of spans, export latency and request body size.
+
+    Spans that are queued, exported and dropped are counted in `EXPORT_STATS`, apart from lazy pending spans.
+    `queue_full_policy` decides which span is dropped when the queue is full, see `AdvancedOptions.span_queue_full_policy`.
     """
     processor: BatchSpanProcessor
     final_delay: Incomplete
+    tuner: AdaptiveBatchTuner | None
     num_processed: int
-    def __init__(self, exporter: SpanExporter) -> None: ...
+    queue_full_policy: QueueFullPolicy
+    block_timeout: Incomplete
+    def __init__(self, exporter: SpanExporter, adaptive: bool = False, body_size_exporter: BodySizeCheckingOTLPSpanExporter | None = None, queue_full_policy: QueueFullPolicy = 'drop_oldest', block_timeout: float = 0.1) -> None: ...
     schedule_delay_millis: Incomplete
     def on_end(self, span: ReadableSpan) -> None: ...
+    def shutdown(self) -> None: ...
     @property
     def batch_processor(self): ...
     @property
@@ -25,6 +44,14 @@ class DynamicBatchSpanProcessor(WrapperSpanProcessor):
     @schedule_delay_millis.setter
     def schedule_delay_millis(self, value: float): ...
     @property
+    def max_export_batch_size(self) -> int: ...
+    @max_export_batch_size.setter
+    def max_export_batch_size(self, value: int): ...
+    @property
+    def max_queue_size(self) -> int: ...
+    @property
+    def queue(self) -> deque[ReadableSpan]: ...
+    @property
     def batch_processor(self): ...
     @property
     def span_exporter(self) -> SpanExporter: ...
@@ -32,3 +59,46 @@ class DynamicBatchSpanProcessor(WrapperSpanProcessor):
     def schedule_delay_millis(self) -> float: ...
     @schedule_delay_millis.setter
     def schedule_delay_millis(self, value: float): ...
+    @property
+    def max_export_batch_size(self) -> int: ...
+    @max_export_batch_size.setter
+    def max_export_batch_size(self, value: int): ...
+    @property
+    def max_queue_size(self) -> int: ...
+    @property
+    def queue(self) -> deque[ReadableSpan]: ...
+
+class AdaptiveBatchTuner:
+    """Tunes the schedule delay and max export batch size of a `DynamicBatchSpanProcessor` after each export.
+
+    - The batch size aims to fit all the spans that arrive during one schedule delay plus one export,
+      so that the queue doesn't build up during bursts.
+      It's capped so that requests stay well under the OTLP body size limit, and so that a full batch
+      triggers an export well before the queue is full and starts dropping spans.
+    - The schedule delay is lengthened (up to `MAX_SCHEDULE_DELAY_MILLIS`) when spans arrive slowly,
+      so that each request contains at least `MIN_SPANS_PER_REQUEST` spans rather than just a few.
+      It never goes below the configured `OTEL_BSP_SCHEDULE_DELAY`.
+      When spans arrive quickly, exports are triggered by the batch filling up anyway.
+    """
+    MIN_BATCH_SIZE: int
+    MIN_SPANS_PER_REQUEST: int
+    MAX_SCHEDULE_DELAY_MILLIS: int
+    BODY_SIZE_HEADROOM: float
+    SMOOTHING: float
+    processor: Incomplete
+    body_size_exporter: Incomplete
+    span_rate: float | None
+    export_latency: float | None
+    bytes_per_span: float | None
+    last_time: Incomplete
+    last_num_processed: int
+    def __init__(self, processor: DynamicBatchSpanProcessor, body_size_exporter: BodySizeCheckingOTLPSpanExporter | None = None) -> None: ...
+    def record_export(self, num_spans: int, duration: float, num_body_bytes: int | None) -> None:
+        """Update the measurements after an export and retune the processor."""
+    def tune(self) -> None: ...
+
+class MeasuringSpanExporter(WrapperSpanExporter):
+    """Counts exported spans in `EXPORT_STATS` and reports the duration and body size of each export to a tuner."""
+    tuner: Incomplete
+    def __init__(self, exporter: SpanExporter, tuner: AdaptiveBatchTuner | None) -> None: ...
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult: ...
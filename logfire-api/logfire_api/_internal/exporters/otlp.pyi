@@ -1,9 +1,12 @@
 import requests
+from ..export_stats import EXPORT_STATS as EXPORT_STATS
+from ..metrics import register_internal_callback_metric as register_internal_callback_metric
 from ..utils import logger as logger, platform_is_emscripten as platform_is_emscripten
+from .spool import ExportSpool as ExportSpool, SpooledExport as SpooledExport
 from .wrapper import WrapperLogExporter as WrapperLogExporter, WrapperSpanExporter as WrapperSpanExporter
 from _typeshed import Incomplete
-from collections import deque
 from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
 from functools import cached_property
 from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
 from opentelemetry.sdk._logs import LogData as LogData
@@ -16,11 +19,14 @@ from typing import Any
 
 class BodySizeCheckingOTLPSpanExporter(OTLPSpanExporter):
     max_body_size: Incomplete
+    total_body_bytes: int
     def __init__(self, *args: Any, **kwargs: Any) -> None: ...
     def export(self, spans: Sequence[ReadableSpan]): ...
 
 class OTLPExporterHttpSession(Session):
     """A requests.Session subclass that defers failed requests to a DiskRetryer."""
+    spool_dir: Incomplete
+    def __init__(self, spool_dir: Path | None = None) -> None: ...
     def post(self, url: str, data: bytes, **kwargs: Any): ...
     @cached_property
     def retryer(self) -> DiskRetryer: ...
@@ -30,16 +36,38 @@ def raise_for_retryable_status(response: requests.Response): ...
 class DiskRetryer:
     """Retries requests failed by OTLPExporterHttpSession, saving the request body to disk to save memory."""
     MAX_DELAY: int
-    MAX_TASKS: int
+    MAX_BYTES: Incomplete
+    SEGMENT_BYTES: Incomplete
+    MAX_MEMORY_BYTES: Incomplete
     LOG_INTERVAL: int
+    MAX_CONCURRENCY: int
+    MAX_BATCH_BODY_SIZE: Incomplete
     lock: Incomplete
-    thread: Thread | None
-    tasks: deque[tuple[Path, dict[str, Any]]]
+    threads: set[Thread]
+    concurrency: int
+    delay: float
     session: Incomplete
     dir: Incomplete
+    spool: Incomplete
+    num_succeeded: int
+    num_failed: int
     last_log_time: Incomplete
-    def __init__(self, headers: Mapping[str, str | bytes]) -> None: ...
+    attempts_counter: Incomplete
+    drained_counter: Incomplete
+    def __init__(self, headers: Mapping[str, str | bytes], directory: Path | None = None) -> None: ...
     def add_task(self, data: bytes, kwargs: dict[str, Any]): ...
+    def drain_spool(self) -> None:
+        """Start retrying exports left in the spool directory by processes that are no longer running."""
+
+OTLP_PATHS: Incomplete
+
+@dataclass
+class _RetryBatch:
+    """One or more spooled exports to the same endpoint, retried as a single request."""
+    exports: list[SpooledExport]
+    kwargs: dict[str, Any]
+    bodies: list[bytes] = field(default_factory=list[bytes])
+    data: bytes = ...
 
 class RetryFewerSpansSpanExporter(WrapperSpanExporter):
     """A SpanExporter that retries exporting spans in smaller batches if BodyTooLargeError is raised.
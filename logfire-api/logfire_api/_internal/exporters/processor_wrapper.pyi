@@ -7,6 +7,7 @@ from .wrapper import WrapperSpanProcessor as WrapperSpanProcessor
 from dataclasses import dataclass
 from opentelemetry import context
 from opentelemetry.sdk.trace import Event as Event, ReadableSpan, Span
+from typing import Callable
 
 class CheckSuppressInstrumentationProcessorWrapper(WrapperSpanProcessor):
     """Checks if instrumentation is suppressed, then suppresses instrumentation itself.
@@ -26,5 +27,8 @@ class MainSpanProcessorWrapper(WrapperSpanProcessor):
     scrubber: BaseScrubber
     def on_start(self, span: Span, parent_context: context.Context | None = None) -> None: ...
     def on_end(self, span: ReadableSpan) -> None: ...
+    def process(self, span: ReadableSpan) -> ReadableSpan:
+        """Apply the transforms and scrubbing to `span`, returning a new span only if something changed."""
 
-def guess_system(model: str): ...
+def guess_system(model: str, default: str = ''): ...
+SpanTransform = Callable[[ReadableSpanDict], None]
@@ -0,0 +1,98 @@
+from ..utils import logger as logger
+from _typeshed import Incomplete
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Any, IO
+
+RECORD_HEADER: Incomplete
+SEGMENT_SUFFIX: str
+
+@dataclass
+class SpooledExport:
+    """A failed export waiting to be retried."""
+    data: bytes
+    kwargs: dict[str, Any]
+    segment: Segment | None = ...
+    mergeable: bool = ...
+    @property
+    def size(self) -> int: ...
+
+@dataclass(eq=False)
+class Segment:
+    """An append-only file containing a sequence of length-prefixed records.
+
+    The file stays open (and locked, where supported) for as long as the segment belongs to a spool,
+    so that other processes sharing the directory know not to touch it.
+    """
+    path: Path
+    file: IO[bytes]
+    size: int = ...
+    writable: bool = ...
+    num_unread: int = ...
+    num_unacked: int = ...
+    read_offset: int = ...
+    @property
+    def done(self) -> bool: ...
+
+@dataclass
+class ExportSpool:
+    """Stores failed exports in order, bounded by the total number of bytes.
+
+    Exports are kept in memory until `max_memory_bytes` is reached, after which they're appended to segment files
+    in `directory`, each up to roughly `segment_bytes` in size.
+    Once a segment has been completely read and acknowledged, its file is deleted.
+    If the segments on disk would exceed `max_bytes`, the oldest segments are deleted to make room,
+    and the exports they contain are lost. This means that retry storage costs sequential I/O
+    rather than creating lots of small files.
+
+    Several processes can share the same directory: each one only writes to its own segments,
+    and segments left behind by processes that have exited can be taken over with `adopt_orphaned_segments`.
+    This relies on `fcntl.flock`, so on platforms without it (i.e. Windows) other processes' segments are ignored.
+
+    All methods are thread safe.
+    """
+    directory: Path
+    max_bytes: int
+    segment_bytes: int
+    max_memory_bytes: int = ...
+    num_dropped: int = ...
+    lock: Lock = field(default_factory=Lock, repr=False)
+    memory: deque[SpooledExport] = field(default_factory=deque[SpooledExport], repr=False)
+    memory_bytes: int = ...
+    memory_unacked: int = ...
+    requeued: deque[SpooledExport] = field(default_factory=deque[SpooledExport], repr=False)
+    segments: deque[Segment] = field(default_factory=deque[Segment], repr=False)
+    next_segment_number: int = ...
+    owner: str = field(default_factory=Incomplete)
+    def __len__(self) -> int:
+        """The number of exports that haven't been acknowledged yet, including those currently being retried."""
+    @property
+    def disk_bytes(self) -> int: ...
+    @property
+    def num_unread(self) -> int:
+        """The number of exports that can currently be returned by `pop`."""
+    def append(self, data: bytes, kwargs: dict[str, Any]) -> bool:
+        """Add an export to the end of the spool.
+
+        Returns `False` if the export was too large to store at all.
+        """
+    def pop(self) -> SpooledExport | None:
+        """Remove and return the oldest export that hasn't been popped yet.
+
+        The export must be passed to `ack` once it has been sent successfully
+        so that the segment containing it can be deleted.
+        """
+    def requeue(self, export: SpooledExport) -> None:
+        """Put an export returned by `pop` back at the front of the spool so that it's popped again next."""
+    def ack(self, export: SpooledExport) -> None:
+        """Mark an export returned by `pop` as no longer needed."""
+    def adopt_orphaned_segments(self) -> int:
+        """Take over segments in the directory left behind by processes that are no longer running.
+
+        Adopted segments are placed before this spool's own segments since they're older.
+        Returns the number of exports adopted.
+        """
+    def close(self) -> None:
+        """Release this spool's segments without deleting them, so that another process can adopt them."""
@@ -2,14 +2,16 @@ import ast
 import executing
 import types
 from .constants import ATTRIBUTES_SCRUBBED_KEY as ATTRIBUTES_SCRUBBED_KEY, MESSAGE_FORMATTED_VALUE_LENGTH_LIMIT as MESSAGE_FORMATTED_VALUE_LENGTH_LIMIT
+from .metrics import register_internal_callback_metric as register_internal_callback_metric
 from .scrubbing import BaseScrubber as BaseScrubber, NOOP_SCRUBBER as NOOP_SCRUBBER, ScrubbedNote as ScrubbedNote
 from .stack_info import warn_at_user_stacklevel as warn_at_user_stacklevel
 from .utils import log_internal_error as log_internal_error, truncate_string as truncate_string
 from _typeshed import Incomplete
-from functools import lru_cache
+from dataclasses import dataclass
+from functools import cache, lru_cache
 from string import Formatter
-from types import CodeType as CodeType
-from typing import Any, Literal
+from types import CodeType
+from typing import Any, Literal, NamedTuple
 from typing_extensions import NotRequired, TypedDict
 
 class LiteralChunk(TypedDict):
@@ -26,6 +28,40 @@ class ChunksFormatter(Formatter):
 
 chunks_formatter: Incomplete
 
+class FStringPlan(NamedTuple):
+    """How to format an f-string passed as a message template at a particular call site."""
+    parts: tuple[str | tuple[str, CodeType, CodeType], ...]
+    template: str
+
+MAX_CACHED_FSTRING_PLANS: int
+
+@dataclass
+class FStringPlanCacheStats:
+    """Number of calls with `inspect_arguments` that found or didn't find a cached `FStringPlan` for the call site."""
+    hits: int = ...
+    misses: int = ...
+
+FSTRING_PLAN_CACHE_STATS: Incomplete
+
+@cache
+def register_fstring_plan_metrics() -> None:
+    """Report `FSTRING_PLAN_CACHE_STATS` as a metric. This only needs to happen once, when sending data to Logfire."""
+
+class TemplatePart(NamedTuple):
+    """A part of a parsed template, as returned by `string.Formatter.parse`, plus `is_name`."""
+    literal_text: str
+    field_name: str | None
+    format_spec: str | None
+    conversion: str | None
+    is_name: bool
+
+MAX_CACHED_TEMPLATES: int
+
+def parse_template(format_string: str) -> tuple[TemplatePart, ...]:
+    """Parse a template with `string.Formatter.parse`, cached since the same templates are usually used repeatedly.
+
+    The cache is bounded in case templates are generated dynamically, e.g. by passing preformatted strings.
+    """
 def logfire_format(format_string: str, kwargs: dict[str, Any], scrubber: BaseScrubber) -> str: ...
 def logfire_format_with_magic(format_string: str, kwargs: dict[str, Any], scrubber: BaseScrubber, fstring_frame: types.FrameType | None = None) -> tuple[str, dict[str, Any], str]: ...
 @lru_cache
@@ -47,6 +83,8 @@ def get_node_source_text(node: ast.AST, ex_source: executing.Source):
 def get_stacklevel(frame: types.FrameType): ...
 
 class InspectArgumentsFailedWarning(Warning): ...
+class InspectArgumentsFailed(Exception):
+    """Raised by `ChunksFormatter._fstring_plan` with the message for `warn_inspect_arguments`."""
 
 def warn_inspect_arguments(msg: str, stacklevel: int): ...
 
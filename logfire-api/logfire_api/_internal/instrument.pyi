@@ -1,5 +1,7 @@
+from . import overhead as overhead
 from .constants import ATTRIBUTES_MESSAGE_TEMPLATE_KEY as ATTRIBUTES_MESSAGE_TEMPLATE_KEY, ATTRIBUTES_TAGS_KEY as ATTRIBUTES_TAGS_KEY
 from .main import Logfire as Logfire
+from .overhead import profiled as profiled
 from .stack_info import get_filepath_attribute as get_filepath_attribute
 from .utils import safe_repr as safe_repr, uniquify_sequence as uniquify_sequence
 from _typeshed import Incomplete
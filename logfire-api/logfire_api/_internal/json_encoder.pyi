@@ -1,15 +1,40 @@
 from .utils import JsonValue as JsonValue, safe_repr as safe_repr
 from _typeshed import Incomplete
 from functools import cache, lru_cache
-from typing import Any
+from typing import Any, Callable
 
 NUMPY_DIMENSION_MAX_SIZE: int
 EncoderFunction: Incomplete
 
 @cache
 def encoder_by_type() -> dict[type[Any], EncoderFunction]: ...
-def to_json_value(o: Any, seen: set[int]) -> JsonValue: ...
+def to_json_value(o: Any, seen: set[int]) -> JsonValue:
+    """Convert `o` to a value that can be serialized to JSON.
+
+    `seen` contains the IDs of the objects currently being converted, i.e. the ancestors of `o`,
+    so that circular references can be detected. It's modified while converting but restored before returning.
+    """
+def encoder_for_class(cls) -> EncoderFunction:
+    """Get the function that `to_json_value` uses for instances of `cls`, other than lists and tuples.
+
+    The result is cached per class, and the cache is cleared if `encoder_by_type()` changes.
+    """
 def logfire_json_dumps(obj: Any) -> str: ...
+
+class DeferredJson(str):
+    """A placeholder attribute value for an object that will only be serialized when the span is exported.
+
+    See `AdvancedOptions.defer_attribute_serialization`.
+    The object is referenced rather than copied, so changes made to it before the span is exported are included.
+    Being a `str` lets the placeholder pass through OpenTelemetry's attribute validation unchanged.
+    """
+    value: Any
+    serialize: Callable[[Any], str]
+    def __new__(cls, value: Any, serialize: Callable[[Any], str] = ...) -> DeferredJson: ...
+    def dumps(self) -> str: ...
+    def prepare(self, value: Any) -> str:
+        """Serialize `value` in place of the original, leaving strings (e.g. redacted values) as they are."""
+
 def is_sqlalchemy(obj: Any) -> bool: ...
 @lru_cache
 def is_attrs(cls) -> bool: ...
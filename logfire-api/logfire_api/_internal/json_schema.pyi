@@ -1,22 +1,39 @@
+import dataclasses
 from .utils import JsonDict
 from _typeshed import Incomplete
 from functools import lru_cache
 from typing import Any
 
-__all__ = ['create_json_schema', 'attributes_json_schema_properties', 'attributes_json_schema', 'JsonSchemaProperties']
+__all__ = ['create_json_schema', 'attributes_json_schema_properties', 'attributes_json_schema', 'attributes_json_schema_with_properties', 'JsonSchemaProperties']
 
 def create_json_schema(obj: Any, seen: set[int]) -> JsonDict:
     """Create a JSON Schema from the given object.
 
     Args:
         obj: The object to create the JSON Schema from.
-        seen: A set of object IDs that have already been processed.
+        seen: A set of object IDs that are currently being processed, i.e. the ancestors of `obj`.
+            It's modified while processing but restored before returning.
 
     Returns:
         The JSON Schema.
     """
 
+@dataclasses.dataclass
+class _ClassSchema:
+    """How `create_json_schema` creates the schema of instances of a class, see `_class_schema`."""
+    schema: _SchemaFunction
+    value_independent: bool
+
 JsonSchemaProperties: Incomplete
 
 def attributes_json_schema(properties: JsonSchemaProperties) -> str: ...
 def attributes_json_schema_properties(attributes: dict[str, Any]) -> JsonSchemaProperties: ...
+def attributes_json_schema_with_properties(attributes: dict[str, Any]) -> tuple[JsonSchemaProperties, str | None]:
+    """Get `attributes_json_schema_properties(attributes)` and the result of `attributes_json_schema` for it.
+
+    The JSON schema is None if there are no properties, in which case it shouldn't be set.
+
+    When the schema of every value only depends on its type, the result is cached by attribute names and value types,
+    so that logs and spans created repeatedly by the same code don't need to generate or dump the schema again.
+    The returned properties are a new dict that can be modified.
+    """
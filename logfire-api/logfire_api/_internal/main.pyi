@@ -13,7 +13,7 @@ from ..integrations.redis import RequestHook as RedisRequestHook, ResponseHook a
 from ..integrations.sqlalchemy import CommenterOptions as SQLAlchemyCommenterOptions
 from ..integrations.wsgi import RequestHook as WSGIRequestHook, ResponseHook as WSGIResponseHook
 from ..version import VERSION as VERSION
-from .auto_trace import AutoTraceModule as AutoTraceModule, install_auto_tracing as install_auto_tracing
+from .auto_trace import AdaptiveAutoTracingOptions as AdaptiveAutoTracingOptions, AutoTraceModule as AutoTraceModule, install_auto_tracing as install_auto_tracing
 from .config import GLOBAL_CONFIG as GLOBAL_CONFIG, LogfireConfig as LogfireConfig
 from .config_params import PydanticPluginRecordValues as PydanticPluginRecordValues
 from .constants import ATTRIBUTES_JSON_SCHEMA_KEY as ATTRIBUTES_JSON_SCHEMA_KEY, ATTRIBUTES_LOG_LEVEL_NUM_KEY as ATTRIBUTES_LOG_LEVEL_NUM_KEY, ATTRIBUTES_MESSAGE_KEY as ATTRIBUTES_MESSAGE_KEY, ATTRIBUTES_MESSAGE_TEMPLATE_KEY as ATTRIBUTES_MESSAGE_TEMPLATE_KEY, ATTRIBUTES_SAMPLE_RATE_KEY as ATTRIBUTES_SAMPLE_RATE_KEY, ATTRIBUTES_SPAN_TYPE_KEY as ATTRIBUTES_SPAN_TYPE_KEY, ATTRIBUTES_TAGS_KEY as ATTRIBUTES_TAGS_KEY, DISABLE_CONSOLE_KEY as DISABLE_CONSOLE_KEY, LEVEL_NUMBERS as LEVEL_NUMBERS, LevelName as LevelName, OTLP_MAX_INT_SIZE as OTLP_MAX_INT_SIZE, log_level_attributes as log_level_attributes
@@ -25,9 +25,10 @@ from .integrations.mysql import MySQLConnection as MySQLConnection
 from .integrations.psycopg import Psycopg2Connection as Psycopg2Connection, PsycopgConnection as PsycopgConnection
 from .integrations.sqlite3 import SQLite3Connection as SQLite3Connection
 from .integrations.system_metrics import Base as SystemMetricsBase, Config as SystemMetricsConfig
-from .json_encoder import logfire_json_dumps as logfire_json_dumps
-from .json_schema import JsonSchemaProperties as JsonSchemaProperties, attributes_json_schema as attributes_json_schema, attributes_json_schema_properties as attributes_json_schema_properties, create_json_schema as create_json_schema
+from .json_encoder import DeferredJson as DeferredJson, logfire_json_dumps as logfire_json_dumps
+from .json_schema import EXCLUDE_KEYS as EXCLUDE_KEYS, JsonSchemaProperties as JsonSchemaProperties, attributes_json_schema as attributes_json_schema, attributes_json_schema_properties as attributes_json_schema_properties, attributes_json_schema_with_properties as attributes_json_schema_with_properties, create_json_schema as create_json_schema
 from .metrics import ProxyMeterProvider as ProxyMeterProvider
+from .scrubbing import BaseScrubber as BaseScrubber, NOOP_SCRUBBER as NOOP_SCRUBBER
 from .stack_info import get_user_stack_info as get_user_stack_info
 from .tracer import ProxyTracerProvider as ProxyTracerProvider, record_exception as record_exception, set_exception_status as set_exception_status
 from .utils import SysExcInfo as SysExcInfo, get_version as get_version, handle_internal_errors as handle_internal_errors, log_internal_error as log_internal_error, uniquify_sequence as uniquify_sequence
@@ -38,7 +39,7 @@ from fastapi import FastAPI
 from flask.app import Flask
 from opentelemetry.context import Context as Context
 from opentelemetry.instrumentation.asgi.types import ClientRequestHook, ClientResponseHook, ServerRequestHook
-from opentelemetry.metrics import CallbackT as CallbackT, Counter, Histogram, UpDownCounter, _Gauge as Gauge
+from opentelemetry.metrics import CallbackT as CallbackT, Counter, Histogram, ObservableCounter, ObservableGauge, ObservableUpDownCounter, UpDownCounter, _Gauge as Gauge
 from opentelemetry.sdk.trace import ReadableSpan, Span
 from opentelemetry.trace import SpanContext, Tracer
 from opentelemetry.util import types as otel_types
@@ -371,7 +372,7 @@ class Logfire:
                 without waiting for the context manager to be opened,
                 i.e. it's not necessary to use this as a context manager.
         """
-    def install_auto_tracing(self, modules: Sequence[str] | Callable[[AutoTraceModule], bool], *, min_duration: float, check_imported_modules: Literal['error', 'warn', 'ignore'] = 'error') -> None:
+    def install_auto_tracing(self, modules: Sequence[str] | Callable[[AutoTraceModule], bool], *, min_duration: float, check_imported_modules: Literal['error', 'warn', 'ignore'] = 'error', adaptive: AdaptiveAutoTracingOptions | None = None, lazy: bool = False) -> None:
         """Install automatic tracing.
 
         See the [Auto-Tracing guide](https://logfire.pydantic.dev/docs/guides/onboarding_checklist/add_auto_tracing/)
@@ -402,6 +403,17 @@ class Logfire:
             check_imported_modules: If this is `'error'` (the default), then an exception will be raised if any of the
                 modules in `sys.modules` (i.e. modules that have already been imported) match the modules to trace.
                 Set to `'warn'` to issue a warning instead, or `'ignore'` to skip the check.
+            adaptive: Options for starting and stopping tracing each function based on statistics of its recent
+                durations and a budget of spans per second, instead of tracing it forever after one slow call.
+                Requires `min_duration` to be greater than 0. See
+                [`AdaptiveAutoTracingOptions`][logfire.AdaptiveAutoTracingOptions] for details.
+            lazy: Set to `True` to only prepare tracing each function the first time it's called,
+                instead of for every function when its module is imported.
+                This reduces the import time of large codebases where most functions are never called in a process,
+                e.g. CLI tools or workers that only run one kind of task.
+                Functions that haven't been called yet aren't included in
+                [`logfire.auto_traced_functions()`][logfire.auto_traced_functions].
+                To also avoid rewriting modules on the first import, see `logfire precompile-auto-tracing`.
         """
     def instrument_mcp(self, *, propagate_otel_context: bool = True) -> None:
         """Instrument [MCP](https://modelcontextprotocol.io/) requests such as tool calls.
@@ -940,7 +952,7 @@ class Logfire:
         Returns:
             The up-down counter metric.
         """
-    def metric_counter_callback(self, name: str, *, callbacks: Sequence[CallbackT], unit: str = '', description: str = '') -> None:
+    def metric_counter_callback(self, name: str, *, callbacks: Sequence[CallbackT], unit: str = '', description: str = '') -> ObservableCounter:
         """Create a counter metric that uses a callback to collect observations.
 
         The callback is called every 60 seconds in a background thread.
@@ -979,8 +991,12 @@ class Logfire:
                 [Observation](https://opentelemetry-python.readthedocs.io/en/latest/api/metrics.html#opentelemetry.metrics.Observation).
             unit: The unit of the metric.
             description: The description of the metric.
+
+        Returns:
+            The counter metric. Keep a reference to it if `logfire.configure()` may be called afterwards,
+            otherwise the callbacks may stop being called.
         """
-    def metric_gauge_callback(self, name: str, callbacks: Sequence[CallbackT], *, unit: str = '', description: str = '') -> None:
+    def metric_gauge_callback(self, name: str, callbacks: Sequence[CallbackT], *, unit: str = '', description: str = '') -> ObservableGauge:
         """Create a gauge metric that uses a callback to collect observations.
 
         The callback is called every 60 seconds in a background thread.
@@ -1017,8 +1033,12 @@ class Logfire:
                 [Observation](https://opentelemetry-python.readthedocs.io/en/latest/api/metrics.html#opentelemetry.metrics.Observation).
             unit: The unit of the metric.
             description: The description of the metric.
+
+        Returns:
+            The gauge metric. Keep a reference to it if `logfire.configure()` may be called afterwards,
+            otherwise the callbacks may stop being called.
         """
-    def metric_up_down_counter_callback(self, name: str, callbacks: Sequence[CallbackT], *, unit: str = '', description: str = '') -> None:
+    def metric_up_down_counter_callback(self, name: str, callbacks: Sequence[CallbackT], *, unit: str = '', description: str = '') -> ObservableUpDownCounter:
         """Create an up-down counter metric that uses a callback to collect observations.
 
         The callback is called every 60 seconds in a background thread.
@@ -1055,6 +1075,10 @@ class Logfire:
                 [Observation](https://opentelemetry-python.readthedocs.io/en/latest/api/metrics.html#opentelemetry.metrics.Observation).
             unit: The unit of the metric.
             description: The description of the metric.
+
+        Returns:
+            The up-down counter metric. Keep a reference to it if `logfire.configure()` may be called afterwards,
+            otherwise the callbacks may stop being called.
         """
     def suppress_scopes(self, *scopes: str) -> None:
         """Prevent spans and metrics from being created for the given OpenTelemetry scope names.
@@ -1152,13 +1176,18 @@ class NoopSpan:
     def is_recording(self) -> bool: ...
 AttributesValueType = TypeVar('AttributesValueType', bound=Any | otel_types.AttributeValue)
 
-def prepare_otlp_attributes(attributes: dict[str, Any]) -> dict[str, otel_types.AttributeValue]:
+def prepare_otlp_attributes(attributes: dict[str, Any], scrubber: BaseScrubber = ..., defer: bool = False) -> dict[str, otel_types.AttributeValue]:
     """Prepare attributes for sending to OpenTelemetry.
 
     This will convert any non-OpenTelemetry compatible types to JSON.
+    If the scrubber is configured to scrub at source, the attributes are also scrubbed.
+    If `defer` is true, values that would be converted to JSON are instead wrapped in `DeferredJson`,
+    to be serialized and scrubbed when the span is exported, see `AdvancedOptions.defer_attribute_serialization`.
     """
 def prepare_otlp_attribute(value: Any) -> otel_types.AttributeValue:
     """Convert a user attribute to an OpenTelemetry compatible type."""
+def prepare_deferred_otlp_attribute(value: Any) -> otel_types.AttributeValue:
+    """Like `prepare_otlp_attribute`, but returns a `DeferredJson` placeholder instead of serializing to JSON."""
 def set_user_attributes_on_raw_span(span: Span, attributes: dict[str, Any]) -> None: ...
 P = ParamSpec('P')
 R = TypeVar('R')
@@ -1,12 +1,13 @@
 import dataclasses
-from .utils import handle_internal_errors as handle_internal_errors
+from .tracer import span_metric_series as span_metric_series
+from .utils import handle_internal_errors as handle_internal_errors, log_internal_error as log_internal_error
 from _typeshed import Incomplete
 from abc import ABC
 from collections.abc import Sequence
-from opentelemetry.metrics import CallbackT as CallbackT, Counter, Histogram, Instrument, Meter, MeterProvider, ObservableCounter, ObservableGauge, ObservableUpDownCounter, UpDownCounter, _Gauge
+from opentelemetry.metrics import CallbackT, Counter, Histogram, Instrument, Meter, MeterProvider, ObservableCounter, ObservableGauge, ObservableUpDownCounter, UpDownCounter, _Gauge
 from opentelemetry.util.types import Attributes
 from threading import Lock
-from typing import Any, Generic, TypeVar
+from typing import Any, Generic, Literal, TypeVar, overload
 from weakref import WeakSet
 
 Gauge: Incomplete
@@ -58,5 +59,32 @@ class _ProxyObservableUpDownCounter(_ProxyInstrument[ObservableUpDownCounter], O
 class _ProxyUpDownCounter(_ProxyInstrument[UpDownCounter], UpDownCounter):
     def add(self, amount: int | float, attributes: Attributes | None = None, *args: Any, **kwargs: Any) -> None: ...
 
+class _BoundInstrument:
+    def __init__(self, instrument: Counter | UpDownCounter | Histogram, attributes: Attributes | None) -> None: ...
+
+class BoundCounter(_BoundInstrument):
+    """A counter or up-down counter with fixed attributes, returned by [`logfire.bind_metric`][logfire.bind_metric]."""
+    def add(self, amount: int | float, *args: Any, **kwargs: Any) -> None:
+        """Add `amount` to the counter with the bound attributes, like `counter.add(amount, attributes)`."""
+
+class BoundHistogram(_BoundInstrument):
+    """A histogram with fixed attributes, returned by [`logfire.bind_metric`][logfire.bind_metric]."""
+    def record(self, amount: int | float, *args: Any, **kwargs: Any) -> None:
+        """Record `amount` in the histogram with the bound attributes, like `histogram.record(amount, attributes)`."""
+
+@overload
+def bind_metric(instrument: Histogram, attributes: Attributes | None = None) -> BoundHistogram: ...
+@overload
+def bind_metric(instrument: Counter | UpDownCounter, attributes: Attributes | None = None) -> BoundCounter: ...
+
 class _ProxyGauge(_ProxyInstrument[Gauge], Gauge):
     def set(self, amount: int | float, attributes: Attributes | None = None, *args: Any, **kwargs: Any) -> None: ...
+
+def register_internal_callback_metric(kind: Literal['counter', 'gauge'], name: str, callback: CallbackT, *, unit: str, description: str) -> None:
+    """Report a metric about the SDK itself, measured by `callback`, with the default Logfire instance.
+
+    `_ProxyMeter` only holds weak references to its instruments, and nothing else refers to these,
+    which are usually created before `logfire.configure()` sets the real meter provider.
+    So references are kept here to keep reporting the metric for the rest of the process.
+    Callers should only register each metric once, e.g. in a function decorated with `functools.cache`.
+    """
@@ -0,0 +1,89 @@
+from .constants import ONE_SECOND_IN_NANOSECONDS as ONE_SECOND_IN_NANOSECONDS
+from _typeshed import Incomplete
+from dataclasses import dataclass
+from typing import Any, Callable, Literal
+
+ENABLED: bool
+
+@dataclass
+class FunctionOverhead:
+    """How much time Logfire spent on spans around one function, see `logfire.overhead_profile()`."""
+    function: str
+    instrumented_by: Literal['auto_tracing', 'instrument']
+    calls: int = ...
+    spans: int = ...
+    function_time: float = ...
+    overhead_time: float = ...
+    @property
+    def overhead_per_call(self) -> float:
+        """The average overhead in seconds per call."""
+    @property
+    def overhead_fraction(self) -> float:
+        """The overhead as a fraction of the total time of calls including the overhead."""
+
+@dataclass
+class OverheadProfile:
+    """A snapshot of the overhead of all profiled functions, returned by `logfire.overhead_profile()`.
+
+    Convert it to a string to get a table sorted by total overhead, e.g. `print(logfire.overhead_profile())`.
+    """
+    functions: list[FunctionOverhead]
+
+class FunctionOverheadState:
+    """Mutable counters for one profiled function, in nanoseconds, updated without a lock."""
+    function: Incomplete
+    instrumented_by: Literal['auto_tracing', 'instrument']
+    calls: int
+    spans: int
+    function_ns: int
+    overhead_ns: int
+    def __init__(self, function: str, instrumented_by: Literal['auto_tracing', 'instrument']) -> None: ...
+    def snapshot(self) -> FunctionOverhead: ...
+
+FUNCTION_OVERHEADS: dict[tuple[str, str, int], FunctionOverheadState]
+
+def enable_overhead_profiling() -> None:
+    """Start measuring how much time Logfire spends on spans around each auto-traced and `@logfire.instrument`ed function.
+
+    This only applies to functions instrumented after this is called, so call it before
+    [`logfire.install_auto_tracing`][logfire.Logfire.install_auto_tracing] and before importing modules
+    that use [`@logfire.instrument`][logfire.Logfire.instrument].
+    Use [`logfire.overhead_profile()`][logfire.overhead_profile] to get the results.
+
+    Profiling adds some overhead of its own, which isn't included in the results,
+    so only enable it while deciding what to instrument, not permanently.
+
+    This can also be enabled with `logfire run --profile-overhead`, which prints the results when the program ends.
+    """
+def overhead_profile() -> OverheadProfile:
+    """Get a snapshot of the overhead of each function profiled since `logfire.enable_overhead_profiling()` was called.
+
+    For example, this prints the functions where Logfire's overhead is the largest fraction of the time spent:
+
+    ```py
+    import logfire
+
+    profile = logfire.overhead_profile()
+    for function in sorted(profile.functions, key=lambda f: f.overhead_fraction, reverse=True)[:10]:
+        print(f'{function.function}: {function.overhead_fraction:.0%}')
+    ```
+    """
+def profiled(factory: Callable[..., Any], module: str, qualname: str, lineno: int, instrumented_by: Literal['auto_tracing', 'instrument']) -> Callable[..., ProfiledContextManager]:
+    """Wrap a function returning a span context manager to record its overhead for `overhead_profile()`."""
+def call_context_factory(context_factories: list[Callable[[], Any]], index: int) -> Any:
+    """Call the current context factory of an auto-traced function, which changes when it's promoted or demoted."""
+
+class ProfiledContextManager:
+    """Times the span context manager returned by `factory` separately from the code inside it.
+
+    Comparing the current span before and after entering shows whether a span was actually created.
+    That comparison happens outside the timed sections, so profiling doesn't count its own cost.
+    """
+    state: Incomplete
+    parent: Incomplete
+    start: Incomplete
+    cm: Incomplete
+    def __init__(self, state: FunctionOverheadState, factory: Callable[..., Any], *args: Any, **kwargs: Any) -> None: ...
+    entered: Incomplete
+    def __enter__(self) -> Any: ...
+    def __exit__(self, *exc_info: Any) -> Any: ...
@@ -1,17 +1,21 @@
 import re
 import typing_extensions
 from .constants import ATTRIBUTES_JSON_SCHEMA_KEY as ATTRIBUTES_JSON_SCHEMA_KEY, ATTRIBUTES_LOGGING_NAME as ATTRIBUTES_LOGGING_NAME, ATTRIBUTES_LOG_LEVEL_NAME_KEY as ATTRIBUTES_LOG_LEVEL_NAME_KEY, ATTRIBUTES_LOG_LEVEL_NUM_KEY as ATTRIBUTES_LOG_LEVEL_NUM_KEY, ATTRIBUTES_MESSAGE_KEY as ATTRIBUTES_MESSAGE_KEY, ATTRIBUTES_MESSAGE_TEMPLATE_KEY as ATTRIBUTES_MESSAGE_TEMPLATE_KEY, ATTRIBUTES_PENDING_SPAN_REAL_PARENT_KEY as ATTRIBUTES_PENDING_SPAN_REAL_PARENT_KEY, ATTRIBUTES_SAMPLE_RATE_KEY as ATTRIBUTES_SAMPLE_RATE_KEY, ATTRIBUTES_SCRUBBED_KEY as ATTRIBUTES_SCRUBBED_KEY, ATTRIBUTES_SPAN_TYPE_KEY as ATTRIBUTES_SPAN_TYPE_KEY, ATTRIBUTES_TAGS_KEY as ATTRIBUTES_TAGS_KEY, RESOURCE_ATTRIBUTES_PACKAGE_VERSIONS as RESOURCE_ATTRIBUTES_PACKAGE_VERSIONS
+from .export_stats import EXPORT_STATS as EXPORT_STATS
+from .json_encoder import DeferredJson as DeferredJson, logfire_json_dumps as logfire_json_dumps, to_json_value as to_json_value
 from .stack_info import STACK_INFO_KEYS as STACK_INFO_KEYS
-from .utils import ReadableSpanDict as ReadableSpanDict
+from .utils import ReadableSpanDict as ReadableSpanDict, safe_repr as safe_repr
 from _typeshed import Incomplete
 from abc import ABC, abstractmethod
-from collections.abc import Sequence
+from collections.abc import Mapping, Sequence
 from dataclasses import dataclass
 from opentelemetry.sdk._logs import LogRecord
 from opentelemetry.sdk.trace import Event
+from opentelemetry.util.types import AttributeValue
 from typing import Any, Callable, TypedDict
 
 DEFAULT_PATTERNS: Incomplete
+DEFAULT_PATTERN_LITERALS: Incomplete
 JsonPath: typing_extensions.TypeAlias
 
 @dataclass
@@ -31,6 +35,14 @@ class ScrubbingOptions:
     """Options for redacting sensitive data."""
     callback: ScrubCallback | None = ...
     extra_patterns: Sequence[str] | None = ...
+    at_source: bool = ...
+
+class SourceScrubbedStr(str):
+    """An attribute value which was already scrubbed when the span was created, so doesn't need to be scrubbed again.
+
+    If anything replaces the value, e.g. by truncating it or setting the attribute again,
+    the result is a plain `str` which will be scrubbed when the span is exported.
+    """
 
 class BaseScrubber(ABC):
     SAFE_KEYS: Incomplete
@@ -40,6 +52,11 @@ class BaseScrubber(ABC):
     def scrub_log(self, log: LogRecord) -> LogRecord: ...
     @abstractmethod
     def scrub_value(self, path: JsonPath, value: Any) -> tuple[Any, list[ScrubbedNote]]: ...
+    at_source: bool
+    def prepare_attributes(self, attributes: Mapping[str, Any], prepare: Callable[[Any], AttributeValue]) -> dict[str, AttributeValue]:
+        """Convert attributes to OTEL attribute values with `prepare`, scrubbing them if `at_source` is true."""
+    def serialize_deferred_attributes(self, attributes: Mapping[str, Any]) -> dict[str, Any]:
+        """Replace `DeferredJson` placeholders in `attributes` with their serialized values, scrubbing them."""
 
 class NoopScrubber(BaseScrubber):
     def scrub_span(self, span: ReadableSpanDict): ...
@@ -50,10 +67,14 @@ NOOP_SCRUBBER: Incomplete
 
 class Scrubber(BaseScrubber):
     """Redacts potentially sensitive data."""
-    def __init__(self, patterns: Sequence[str] | None, callback: ScrubCallback | None = None) -> None: ...
+    at_source: Incomplete
+    def __init__(self, patterns: Sequence[str] | None, callback: ScrubCallback | None = None, at_source: bool = False) -> None: ...
+    MAX_CACHED_KEY_DECISIONS: int
     def scrub_log(self, log: LogRecord) -> LogRecord: ...
     def scrub_span(self, span: ReadableSpanDict): ...
     def scrub_value(self, path: JsonPath, value: Any) -> tuple[Any, list[ScrubbedNote]]: ...
+    def prepare_attributes(self, attributes: Mapping[str, Any], prepare: Callable[[Any], AttributeValue]) -> dict[str, AttributeValue]: ...
+    def serialize_deferred_attributes(self, attributes: Mapping[str, Any]) -> dict[str, Any]: ...
 
 class SpanScrubber:
     """Does the actual scrubbing work.
@@ -63,13 +84,22 @@ class SpanScrubber:
     """
     scrubbed: list[ScrubbedNote]
     did_scrub: bool
-    def __init__(self, parent: Scrubber) -> None: ...
+    def __init__(self, parent: Scrubber, encode_objects: bool = False) -> None: ...
     def scrub_span(self, span: ReadableSpanDict): ...
     def scrub_log(self, log: LogRecord) -> LogRecord: ...
+    def scrub_attribute_at_source(self, key: str, value: Any, prepare: Callable[[Any], AttributeValue]) -> AttributeValue:
+        """Scrub a single attribute of a span being created and convert it to an OTEL value with `prepare`.
+
+        If `value` gets serialized to JSON, then the original objects are scrubbed and only serialized again
+        if something was redacted, instead of parsing the JSON as `scrub` would.
+        """
     def scrub_event_attributes(self, event: Event, index: int): ...
     def scrub(self, path: JsonPath, value: Any) -> Any:
         """Redacts sensitive data from `value`, recursing into nested sequences and mappings.
 
         `path` is a list of keys and indices leading to `value` in the span.
         Similar to the truncation code, it should use the field names in the frontend, e.g. `otel_events`.
+
+        Returns `value` itself if nothing within it was redacted, so that callers can cheaply check
+        whether anything changed and avoid allocating new containers.
         """
@@ -31,6 +31,8 @@ def get_user_stack_info() -> StackInfo:
 
     See is_user_code for details.
     Returns an empty dict if no such frame is found.
+
+    The result is cached for each calling instruction in user code, so it must not be modified.
     """
 def get_user_frame_and_stacklevel() -> tuple[FrameType | None, int]:
     """Get the first calling frame in user code and a corresponding stacklevel that can be passed to `warnings.warn`.
@@ -38,6 +40,11 @@ def get_user_frame_and_stacklevel() -> tuple[FrameType | None, int]:
     See is_user_code for details.
     Returns `(None, 0)` if no such frame is found.
     """
+
+MAX_CACHED_CODE_OBJECTS: int
+
+def is_user_frame(frame: FrameType) -> bool:
+    """Like `is_user_code(frame.f_code)`, but faster."""
 def is_user_code(code: CodeType) -> bool:
     """Check if the code object is from user code.
 
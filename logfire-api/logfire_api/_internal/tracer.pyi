@@ -1,6 +1,7 @@
 import opentelemetry.trace as trace_api
 from .config import LogfireConfig as LogfireConfig
 from .constants import ATTRIBUTES_EXCEPTION_FINGERPRINT_KEY as ATTRIBUTES_EXCEPTION_FINGERPRINT_KEY, ATTRIBUTES_MESSAGE_KEY as ATTRIBUTES_MESSAGE_KEY, ATTRIBUTES_PENDING_SPAN_REAL_PARENT_KEY as ATTRIBUTES_PENDING_SPAN_REAL_PARENT_KEY, ATTRIBUTES_SAMPLE_RATE_KEY as ATTRIBUTES_SAMPLE_RATE_KEY, ATTRIBUTES_SPAN_TYPE_KEY as ATTRIBUTES_SPAN_TYPE_KEY, ATTRIBUTES_VALIDATION_ERROR_KEY as ATTRIBUTES_VALIDATION_ERROR_KEY, log_level_attributes as log_level_attributes
+from .exporters.processor_wrapper import MainSpanProcessorWrapper as MainSpanProcessorWrapper
 from .utils import canonicalize_exception_traceback as canonicalize_exception_traceback, handle_internal_errors as handle_internal_errors, sha256_string as sha256_string
 from _typeshed import Incomplete
 from collections.abc import Mapping, Sequence
@@ -15,9 +16,26 @@ from opentelemetry.trace.status import Status, StatusCode
 from opentelemetry.util import types as otel_types
 from threading import Lock
 from typing import Any, Callable
-from weakref import WeakKeyDictionary, WeakValueDictionary
+from weakref import WeakKeyDictionary
 
-OPEN_SPANS: WeakValueDictionary[tuple[int, int], _LogfireWrappedSpan]
+class _OpenSpans:
+    """Weakly references the spans that haven't ended yet, by trace and span ID.
+
+    Used to close open spans when the program exits and to find the parent span when collecting metrics.
+
+    This is a plain dict of weak references without callbacks, which is several times cheaper
+    than a `WeakValueDictionary` for spans that only live for a moment.
+    The cost is that spans garbage collected without ending (e.g. in abandoned generators) leave dead references,
+    so those are pruned whenever the dict has grown to twice its size after the previous pruning.
+    """
+    MIN_PRUNE_SIZE: int
+    def __init__(self) -> None: ...
+    def add(self, key: tuple[int, int], span: _LogfireWrappedSpan) -> None: ...
+    def discard(self, key: tuple[int, int]) -> None: ...
+    def get(self, key: tuple[int, int]) -> _LogfireWrappedSpan | None: ...
+    def values(self) -> list[_LogfireWrappedSpan]: ...
+
+OPEN_SPANS: Incomplete
 
 @dataclass
 class ProxyTracerProvider(TracerProvider):
@@ -36,13 +54,27 @@ class ProxyTracerProvider(TracerProvider):
     def resource(self) -> Resource: ...
     def force_flush(self, timeout_millis: int = 30000) -> bool: ...
 
-@dataclass
-class SpanMetric:
-    details: dict[tuple[tuple[str, otel_types.AttributeValue], ...], float] = field(default_factory=Incomplete)
-    def dump(self): ...
-    def increment(self, attributes: Mapping[str, otel_types.AttributeValue], value: float): ...
+class SpanMetricSeries:
+    """A metric name and set of attributes whose values are summed in spans with `collect_in_spans`.
+
+    Instances are interned by `span_metric_series` and hashed by identity,
+    so adding to a span's totals is a single cheap dict operation.
+    Handles from `logfire.bind_metric` look up their series once instead of on every call.
+    """
+    name: Incomplete
+    key: Incomplete
+    attributes: Incomplete
+    def __init__(self, name: str, key: tuple[tuple[str, otel_types.AttributeValue], ...]) -> None: ...
+
+def span_metric_series(name: str, attributes: Mapping[str, otel_types.AttributeValue]) -> SpanMetricSeries:
+    """Returns the interned series for the metric name and attributes.
+
+    The cache is cleared when it's full so that metrics with high cardinality attributes don't leak memory.
+    Spans may then hold two series objects for the same name and attributes, which `dump_span_metrics` merges.
+    """
+def dump_span_metrics(totals: dict[SpanMetricSeries, float]) -> str:
+    """Returns the JSON for the `logfire.metrics` attribute, grouping the totals by metric name."""
 
-@dataclass(eq=False)
 class _LogfireWrappedSpan(trace_api.Span, ReadableSpan):
     """A span that wraps another span and overrides some behaviors in a logfire-specific way.
 
@@ -51,11 +83,11 @@ class _LogfireWrappedSpan(trace_api.Span, ReadableSpan):
     * Adds some logfire-specific tweaks to the exception recording behavior
     * Overrides end() to use a timestamp generator if one was provided
     """
-    span: Span
-    ns_timestamp_generator: Callable[[], int]
-    record_metrics: bool
-    metrics: dict[str, SpanMetric] = field(default_factory=Incomplete)
-    def __post_init__(self) -> None: ...
+    span: Incomplete
+    ns_timestamp_generator: Incomplete
+    record_metrics: Incomplete
+    metrics: dict[SpanMetricSeries, float] | None
+    def __init__(self, span: Span, ns_timestamp_generator: Callable[[], int], record_metrics: bool) -> None: ...
     def end(self, end_time: int | None = None) -> None: ...
     def get_span_context(self) -> SpanContext: ...
     def set_attributes(self, attributes: Mapping[str, otel_types.AttributeValue]) -> None: ...
@@ -67,6 +99,7 @@ class _LogfireWrappedSpan(trace_api.Span, ReadableSpan):
     def set_status(self, status: Status | StatusCode, description: str | None = None) -> None: ...
     def record_exception(self, exception: BaseException, attributes: otel_types.Attributes = None, timestamp: int | None = None, escaped: bool = False) -> None: ...
     def increment_metric(self, name: str, attributes: Mapping[str, otel_types.AttributeValue], value: float) -> None: ...
+    def increment_metric_series(self, series: SpanMetricSeries, value: float) -> None: ...
     def __exit__(self, exc_type: type[BaseException] | None, exc_value: BaseException | None, traceback: Any) -> None: ...
     def __getattr__(self, name: str) -> Any: ...
 
@@ -82,6 +115,13 @@ class _ProxyTracer(Tracer):
     def set_tracer(self, tracer: Tracer) -> None: ...
     def start_span(self, name: str, context: Context | None = None, kind: SpanKind = ..., attributes: otel_types.Attributes = None, links: Sequence[Link] | None = None, start_time: int | None = None, record_exception: bool = True, set_status_on_exception: bool = True) -> Span: ...
     start_as_current_span = ...
+    def start_log_span(self, name: str, attributes: dict[str, otel_types.AttributeValue], start_time: int) -> Span:
+        """A faster version of `start_span` for logs created by `Logfire.log`, which end as soon as they start.
+
+        `attributes` must already contain the message and span type, and is used without copying.
+        The span isn't wrapped in a `_LogfireWrappedSpan` since it's never open long enough to need it:
+        it can't have children, collect metrics, or be left open when the program exits.
+        """
 
 class SuppressedTracer(Tracer):
     def start_span(self, name: str, context: Context | None = None, *args: Any, **kwargs: Any) -> Span: ...
@@ -97,8 +137,29 @@ class PendingSpanProcessor(SpanProcessor):
     elsewhere in the pipeline where `on_end` and `shutdown` are called normally.
     """
     id_generator: IdGenerator
-    processor: SpanProcessor
+    processor: SpanProcessor | None
+    lazy_processor: MainSpanProcessorWrapper | None = ...
     def on_start(self, span: Span, parent_context: context_api.Context | None = None) -> None: ...
+    def pending_span(self, span: ReadableSpan) -> ReadableSpan:
+        """Build the pending span for `span` from its current state."""
+
+class LazyPendingSpan(ReadableSpan):
+    """Placeholder for the pending span of `span` in the queue of a batch processor.
+
+    Only the name, context and attributes of the real span are available, e.g. for `_make_room` in
+    `DynamicBatchSpanProcessor`, and the exporter must call `materialize` to get the actual pending span.
+    """
+    span: Incomplete
+    pending_span_processor: Incomplete
+    def __init__(self, span: ReadableSpan, pending_span_processor: PendingSpanProcessor) -> None: ...
+    def materialize(self) -> ReadableSpan | None:
+        """Build and process the pending span, or return `None` if the span has ended by now.
+
+        Spans that have ended are skipped because their final span will be exported instead.
+        The SDK sets `end_time` just before calling `on_end`, so the final span is in the same batch or a later one.
+        If the queue is full, a policy like `drop_oldest` may drop the final span, and then neither is exported.
+        Attributes set on the span since it started are included.
+        """
 
 def should_sample(span_context: SpanContext, attributes: Mapping[str, otel_types.AttributeValue]) -> bool:
     """Determine if a span should be sampled.
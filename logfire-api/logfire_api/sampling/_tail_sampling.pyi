@@ -1,11 +1,14 @@
+import time
 from _typeshed import Incomplete
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from functools import cached_property
 from logfire._internal.constants import ATTRIBUTES_LOG_LEVEL_NUM_KEY as ATTRIBUTES_LOG_LEVEL_NUM_KEY, LEVEL_NUMBERS as LEVEL_NUMBERS, LevelName as LevelName, NUMBER_TO_LEVEL as NUMBER_TO_LEVEL, ONE_SECOND_IN_NANOSECONDS as ONE_SECOND_IN_NANOSECONDS
 from logfire._internal.exporters.wrapper import WrapperSpanProcessor as WrapperSpanProcessor
+from logfire._internal.metrics import register_internal_callback_metric as register_internal_callback_metric
 from opentelemetry import context
 from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
 from opentelemetry.sdk.trace.sampling import Sampler
+from threading import Lock
 from typing import Callable, Literal
 from typing_extensions import Self
 
@@ -37,6 +40,8 @@ class TraceBuffer:
     """
     started: list[tuple[Span, context.Context | None]]
     ended: list[ReadableSpan]
+    finished: bool = ...
+    created_at: float = field(default_factory=time.monotonic)
     @cached_property
     def first_span(self) -> Span: ...
     @cached_property
@@ -64,8 +69,12 @@ class SamplingOptions:
     """
     head: float | Sampler = ...
     tail: Callable[[TailSamplingSpanInfo], float] | None = ...
+    max_buffered_traces: int | None = ...
+    max_buffered_spans_per_trace: int | None = ...
+    max_buffer_age: float | None = ...
+    buffer_eviction: Literal['drop', 'include'] = ...
     @classmethod
-    def level_or_duration(cls, *, head: float | Sampler = 1.0, level_threshold: LevelName | None = 'notice', duration_threshold: float | None = 5.0, background_rate: float = 0.0) -> Self:
+    def level_or_duration(cls, *, head: float | Sampler = 1.0, level_threshold: LevelName | None = 'notice', duration_threshold: float | None = 5.0, background_rate: float = 0.0, max_buffered_traces: int | None = None, max_buffered_spans_per_trace: int | None = None, max_buffer_age: float | None = None, buffer_eviction: Literal['drop', 'include'] = 'drop') -> Self:
         """Returns a `SamplingOptions` instance that tail samples traces based on their log level and duration.
 
         If a trace has at least one span/log that has a log level greater than or equal to `level_threshold`,
@@ -73,20 +82,58 @@ class SamplingOptions:
         then the whole trace will be included.
         Otherwise, the probability is `background_rate`.
 
-        The `head` parameter is the same as in the `SamplingOptions` constructor.
+        The `head` parameter and the `max_buffered_*`, `max_buffer_age` and `buffer_eviction` parameters
+        are the same as in the `SamplingOptions` constructor.
         """
 
 def check_trace_id_ratio(trace_id: int, rate: float) -> bool: ...
 
+@dataclass(eq=False)
+class TraceShard:
+    """Buffers for the subset of traces whose IDs map to this shard, see `TailSamplingProcessor`."""
+    traces: dict[int, TraceBuffer] = field(default_factory=dict[int, TraceBuffer])
+    pushing: dict[int, TraceBuffer] = field(default_factory=dict[int, TraceBuffer])
+    dropped_trace_ids: dict[int, None] = field(default_factory=dict[int, None])
+    lock: Lock = field(default_factory=Lock)
+
 class TailSamplingProcessor(WrapperSpanProcessor):
     """Passes spans to the wrapped processor if any span in a trace meets the sampling criteria."""
+    MAX_DROPPED_TRACE_IDS_PER_SHARD: int
     get_tail_sample_rate: Incomplete
-    traces: dict[int, TraceBuffer]
-    lock: Incomplete
-    def __init__(self, processor: SpanProcessor, get_tail_sample_rate: Callable[[TailSamplingSpanInfo], float]) -> None: ...
+    shards: Incomplete
+    max_traces_per_shard: Incomplete
+    max_spans_per_trace: Incomplete
+    max_age: Incomplete
+    eviction: Incomplete
+    def __init__(self, processor: SpanProcessor, get_tail_sample_rate: Callable[[TailSamplingSpanInfo], float], num_shards: int = 16, max_traces: int | None = None, max_spans_per_trace: int | None = None, max_age: float | None = None, eviction: Literal['drop', 'include'] = 'drop') -> None: ...
+    def shard(self, trace_id: int) -> TraceShard: ...
     def on_start(self, span: Span, parent_context: context.Context | None = None) -> None: ...
     def on_end(self, span: ReadableSpan) -> None: ...
     def check_span(self, span_info: TailSamplingSpanInfo) -> bool:
-        """If the span meets the sampling criteria, drop the buffer and return True. Otherwise, return False."""
-    def drop_buffer(self, buffer: TraceBuffer) -> None: ...
-    def push_buffer(self, buffer: TraceBuffer) -> None: ...
+        """If the span meets the sampling criteria, drop the buffer and return True. Otherwise, return False.
+
+        This is called without holding any lock, so several threads may check spans in the same trace concurrently.
+        Only one of them gets True, and is then responsible for pushing the buffer.
+        """
+    def drop_buffer(self, buffer: TraceBuffer) -> bool:
+        """Stop buffering spans for this trace, returning False if another thread has already done so."""
+    def evict_old_buffers(self, shard: TraceShard) -> list[TraceBuffer]:
+        """Evict the oldest buffers in the shard that are too old or would exceed the limit on the number of traces.
+
+        Must be called with the shard's lock held, before adding a new buffer.
+        """
+    def evict_buffer(self, shard: TraceShard, buffer: TraceBuffer) -> None:
+        """Remove a buffer because of a limit. Must be called with the shard's lock held.
+
+        If `eviction` is `'include'`, the buffer must then be pushed with `push_evicted_buffers` outside the lock.
+        """
+    def push_evicted_buffers(self, buffers: list[TraceBuffer]) -> None: ...
+    def push_buffer(self, buffer: TraceBuffer) -> None:
+        """Pass the spans of an included trace to the wrapped processor, without holding the shard's lock.
+
+        The buffer must have been registered in `TraceShard.pushing` by `drop_buffer` or `evict_buffer`.
+        Spans of the trace that start or end on other threads in the meantime are appended to the buffer,
+        and passed on by this thread as well before the buffer is unregistered.
+        So the wrapped processor never sees the end of a span before its start, as it would if those spans
+        were passed through directly.
+        """
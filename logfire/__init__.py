@@ -7,12 +7,16 @@ from typing import Any
 from logfire.sampling import SamplingOptions
 
 from ._internal.auto_trace import AutoTraceModule
+from ._internal.auto_trace.adaptive import AdaptiveAutoTracingOptions, AutoTracedFunction, auto_traced_functions
 from ._internal.auto_trace.rewrite_ast import no_auto_trace
 from ._internal.baggage import get_baggage, set_baggage
 from ._internal.cli import logfire_info
 from ._internal.config import AdvancedOptions, CodeSource, ConsoleOptions, MetricsOptions, PydanticPlugin, configure
 from ._internal.constants import LevelName
+from ._internal.export_stats import ExportStats, export_stats
 from ._internal.main import Logfire, LogfireSpan
+from ._internal.metrics import BoundCounter, BoundHistogram, bind_metric
+from ._internal.overhead import FunctionOverhead, OverheadProfile, enable_overhead_profiling, overhead_profile
 from ._internal.scrubbing import ScrubbingOptions, ScrubMatch
 from ._internal.stack_info import add_non_user_code_prefix
 from ._internal.utils import suppress_instrumentation
@@ -148,6 +152,9 @@ __all__ = (
     'instrument_system_metrics',
     'instrument_mcp',
     'AutoTraceModule',
+    'AdaptiveAutoTracingOptions',
+    'AutoTracedFunction',
+    'auto_traced_functions',
     'with_tags',
     'with_settings',
     # 'with_trace_sample_rate',
@@ -167,4 +174,13 @@ __all__ = (
     'logfire_info',
     'get_baggage',
     'set_baggage',
+    'export_stats',
+    'ExportStats',
+    'enable_overhead_profiling',
+    'overhead_profile',
+    'OverheadProfile',
+    'FunctionOverhead',
+    'bind_metric',
+    'BoundCounter',
+    'BoundHistogram',
 )
@@ -41,6 +41,8 @@ class BaseTransformer(ast.NodeTransformer):
         # Names of functions and classes that we're currently inside,
         # so we can construct the qualified name of the current function.
         self.qualname_stack: list[str] = []
+        # The same for every function in the file, and relatively slow to compute.
+        self.filepath_attribute = get_filepath_attribute(self.filename)
 
     def visit_ClassDef(self, node: ast.ClassDef):
         self.qualname_stack.append(node.name)
@@ -114,7 +116,7 @@ class BaseTransformer(ast.NodeTransformer):
 
     def logfire_method_arg_values(self, qualname: str, lineno: int) -> tuple[str, dict[str, otel_types.AttributeValue]]:
         stack_info: StackInfo = {
-            **get_filepath_attribute(self.filename),
+            **self.filepath_attribute,
             'code.lineno': lineno,
             'code.function': qualname,
         }
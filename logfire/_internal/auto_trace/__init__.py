@@ -6,6 +6,7 @@ from collections.abc import Sequence
 from typing import TYPE_CHECKING, Callable, Literal
 
 from ..constants import ONE_SECOND_IN_NANOSECONDS
+from .adaptive import AdaptiveAutoTracingOptions
 from .import_hook import LogfireFinder
 from .types import AutoTraceModule
 
@@ -19,6 +20,8 @@ def install_auto_tracing(
     *,
     min_duration: float,
     check_imported_modules: Literal['error', 'warn', 'ignore'] = 'error',
+    adaptive: AdaptiveAutoTracingOptions | None = None,
+    lazy: bool = False,
 ) -> None:
     """Install automatic tracing.
 
@@ -33,6 +36,9 @@ def install_auto_tracing(
     if check_imported_modules not in ('error', 'warn', 'ignore'):
         raise ValueError('check_imported_modules must be one of "error", "warn", or "ignore"')
 
+    if adaptive and min_duration <= 0:
+        raise ValueError('adaptive requires min_duration to be greater than 0')
+
     if check_imported_modules != 'ignore':
         for module in list(sys.modules.values()):
             try:
@@ -58,7 +64,7 @@ def install_auto_tracing(
 
     min_duration = int(min_duration * ONE_SECOND_IN_NANOSECONDS)
     logfire = logfire.with_settings(custom_scope_suffix='auto_tracing')
-    finder = LogfireFinder(logfire, modules, min_duration)
+    finder = LogfireFinder(logfire, modules, min_duration, adaptive, lazy)
     sys.meta_path.insert(0, finder)
 
 
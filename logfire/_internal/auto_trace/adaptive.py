@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import dataclasses
+import math
+from contextlib import AbstractContextManager
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from ..constants import ONE_SECOND_IN_NANOSECONDS
+
+
+@dataclass
+class AdaptiveAutoTracingOptions:
+    """Options for deciding which auto-traced functions are traced based on statistics of their recent durations.
+
+    Pass this as the `adaptive` argument of [`logfire.install_auto_tracing`][logfire.Logfire.install_auto_tracing]
+    along with `min_duration`.
+
+    Without these options, a function starts being traced the first time a single call takes at least `min_duration`,
+    and is then traced forever. So one slow outlier (e.g. a garbage collection pause) in a function that's called
+    very often can create a lot of spans. With these options, the durations of each function are counted
+    in windows of `window` calls:
+
+    - A function which isn't traced starts being traced as soon as the `percentile`th percentile of the durations
+        in the current window is known to be at least `min_duration`.
+    - A traced function stops being traced at the end of a window if that percentile was below `min_duration`.
+    - A traced function also stops being traced when it creates `max_spans_per_second` spans within one second,
+        and can't start being traced again until that second is over.
+
+    Use [`logfire.auto_traced_functions()`][logfire.auto_traced_functions] to see which functions are currently traced.
+    """
+
+    window: int = 20
+    """The number of calls of each function to count durations for before deciding whether to trace it."""
+
+    percentile: float = 90
+    """The percentile of durations within a window that must be at least `min_duration` for a function to be traced.
+
+    With the defaults, a function is traced once 3 out of 20 calls take at least `min_duration`.
+    Setting this to 100 means that one slow call in a window is enough.
+    """
+
+    max_spans_per_second: int | None = 100
+    """The maximum number of spans created by each function per second, or `None` for no limit."""
+
+    def __post_init__(self):
+        if self.window < 1:
+            raise ValueError('window must be at least 1')
+        if not 0 < self.percentile <= 100:
+            raise ValueError('percentile must be greater than 0 and at most 100')
+        if self.max_spans_per_second is not None and self.max_spans_per_second < 1:
+            raise ValueError('max_spans_per_second must be at least 1 or None')
+
+    @property
+    def slow_calls_threshold(self) -> int:
+        """The number of calls in a window that must take at least `min_duration` for the percentile to reach it."""
+        return self.window - math.ceil(self.percentile * self.window / 100) + 1
+
+
+@dataclass
+class AutoTracedFunction:
+    """The current state of a function instrumented by `install_auto_tracing`.
+
+    Use [`logfire.auto_traced_functions()`][logfire.auto_traced_functions] to get a snapshot of all of them.
+    """
+
+    module: str
+    """The name of the module containing the function."""
+
+    qualname: str
+    """The qualified name of the function within the module."""
+
+    lineno: int
+    """The line number where the function is defined."""
+
+    traced: bool
+    """Whether calls of the function currently create spans, rather than only being timed."""
+
+    promotions: int = 0
+    """The number of times the function started being traced after a call took at least `min_duration`."""
+
+    demotions: int = 0
+    """The number of times the function stopped being traced, which only happens with `AdaptiveAutoTracingOptions`."""
+
+
+class AutoTracedFunctionState:
+    """Mutable counters for one auto-traced function, updated by its context factories without a lock.
+
+    When a function is called in several threads at once, the counts may be slightly off,
+    which only affects exactly when a decision to promote or demote it is made.
+    """
+
+    __slots__ = (
+        'info',
+        'calls',
+        'slow_calls',
+        'interval_start',
+        'interval_spans',
+        'cooldown_until',
+    )
+
+    def __init__(self, module: str, qualname: str, lineno: int, traced: bool) -> None:
+        self.info = AutoTracedFunction(module, qualname, lineno, traced)
+        # Counts of calls and calls taking at least `min_duration` in the current window.
+        self.calls = 0
+        self.slow_calls = 0
+        # Start of the current one-second interval for `max_spans_per_second`, and spans created in it.
+        self.interval_start = 0
+        self.interval_spans = 0
+        # Timestamp before which the function can't be promoted after exceeding `max_spans_per_second`.
+        self.cooldown_until = 0
+        AUTO_TRACED_FUNCTIONS[(module, qualname, lineno)] = self
+
+    def promote(self) -> None:
+        self.info.traced = True
+        self.info.promotions += 1
+        self.reset_window()
+
+    def demote(self) -> None:
+        self.info.traced = False
+        self.info.demotions += 1
+        self.reset_window()
+
+    def reset_window(self) -> None:
+        self.calls = self.slow_calls = 0
+
+
+AUTO_TRACED_FUNCTIONS: dict[tuple[str, str, int], AutoTracedFunctionState] = {}
+"""The state of every auto-traced function in this process by module, qualified name, and line number.
+
+Keyed rather than a list so that reimporting a module (e.g. in tests) replaces its functions rather than duplicating them.
+"""
+
+
+def auto_traced_functions() -> list[AutoTracedFunction]:
+    """Get a snapshot of the state of all functions instrumented by `install_auto_tracing` in this process.
+
+    This shows which functions currently create spans, e.g. to tune `min_duration` or `AdaptiveAutoTracingOptions`:
+
+    ```py
+    import logfire
+
+    for function in logfire.auto_traced_functions():
+        if function.traced:
+            print(f'{function.module}.{function.qualname}')
+    ```
+    """
+    return [dataclasses.replace(state.info) for state in list(AUTO_TRACED_FUNCTIONS.values())]
+
+
+def adaptive_context_factory(
+    state: AutoTracedFunctionState,
+    context_factories: list[Callable[[], AbstractContextManager[Any]]],
+    index: int,
+    span_factory: Callable[[], AbstractContextManager[Any]],
+    timer: Callable[[], int],
+    min_duration: int,
+    options: AdaptiveAutoTracingOptions,
+) -> Callable[[], AbstractContextManager[Any]]:
+    """Returns the initial context factory for an auto-traced function using `AdaptiveAutoTracingOptions`.
+
+    Like `MeasureTime` in `rewrite_ast.py`, `context_factories[index]` is replaced to switch between
+    only measuring durations (`Measure`) and creating spans (`Traced`), and both need to be as fast as possible.
+    """
+    window = options.window
+    slow_calls_threshold = options.slow_calls_threshold
+    max_spans_per_second = options.max_spans_per_second or float('inf')
+
+    class Measure:
+        __slots__ = 'start'
+
+        def __enter__(_self):
+            _self.start = timer()
+
+        def __exit__(_self, *_):
+            end = timer()
+            state.calls += 1
+            if end - _self.start >= min_duration:
+                state.slow_calls += 1
+                if state.slow_calls >= slow_calls_threshold:
+                    if end >= state.cooldown_until:
+                        context_factories[index] = Traced
+                        state.promote()
+                    else:
+                        state.reset_window()
+                    return
+            if state.calls >= window:
+                state.reset_window()
+
+    class Traced:
+        __slots__ = 'span', 'start'
+
+        def __enter__(_self):
+            span = _self.span = span_factory()
+            span.__enter__()
+            _self.start = timer()
+
+        def __exit__(_self, *exc_info: Any):
+            end = timer()
+            state.calls += 1
+            if end - _self.start >= min_duration:
+                state.slow_calls += 1
+
+            if end - state.interval_start >= ONE_SECOND_IN_NANOSECONDS:
+                state.interval_start = end
+                state.interval_spans = 0
+            state.interval_spans += 1
+
+            if state.interval_spans >= max_spans_per_second:
+                state.cooldown_until = state.interval_start + ONE_SECOND_IN_NANOSECONDS
+                context_factories[index] = Measure
+                state.demote()
+            elif state.calls >= window:
+                if state.slow_calls < slow_calls_threshold:
+                    context_factories[index] = Measure
+                    state.demote()
+                else:
+                    state.reset_window()
+
+            return _self.span.__exit__(*exc_info)
+
+    return Measure
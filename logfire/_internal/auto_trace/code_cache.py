@@ -0,0 +1,95 @@
+"""On-disk cache of the code of auto-traced modules.
+
+Rewriting and compiling the AST of every traced module on every process start can add seconds to startup
+for large applications, since it bypasses the usual `.pyc` files.
+So the rewritten code is cached next to them, e.g. in `__pycache__/module.cpython-311.opt-logfire.pyc`.
+
+Each file starts with a hash of the source code, the Python bytecode version, the logfire version, and the filename,
+so a stale file is simply ignored and overwritten.
+The `Logfire` instance and `min_duration` don't affect the compiled code, only the context factories,
+which are created again for each import (see `rewrite_ast.make_execute`).
+
+Like `.pyc` files, the cache respects `sys.pycache_prefix` and isn't written if `sys.dont_write_bytecode` is set.
+It can also be filled ahead of time, e.g. in a build step, see `precompile.py`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import marshal
+import os
+import sys
+from importlib.machinery import ModuleSpec
+from importlib.util import MAGIC_NUMBER, cache_from_source
+
+from ...version import VERSION
+from .rewrite_ast import RewrittenCode
+
+HEADER = b'logfire-auto-trace-1\n'
+
+
+def cache_path(spec: ModuleSpec) -> str | None:
+    """Returns the path of the cache file for the module, or `None` if it doesn't have a normal `.pyc` file."""
+    if not (spec.has_location and spec.origin and spec.cached):
+        return None
+    return cache_path_for_source(spec.origin)
+
+
+def cache_path_for_source(filename: str) -> str | None:
+    """Returns the path of the cache file for the source file, or `None` if it can't be determined."""
+    try:
+        return cache_from_source(filename, optimization='logfire')
+    except (NotImplementedError, ValueError):  # pragma: no cover
+        return None
+
+
+def cache_key(source: str, filename: str) -> bytes:
+    """Returns the prefix that a cache file must have to be valid for the given source code and filename."""
+    digest = hashlib.sha256()
+    for part in [MAGIC_NUMBER, VERSION.encode(), os.fsencode(filename), source.encode('utf-8', 'surrogatepass')]:
+        digest.update(len(part).to_bytes(8, 'little'))
+        digest.update(part)
+    return HEADER + digest.digest()
+
+
+def load(path: str, key: bytes) -> RewrittenCode | None:
+    """Returns the cached code at `path` if it exists and was stored with the same `key`."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if not data.startswith(key):
+        return None
+    try:
+        logfire_name, function_locations, code = marshal.loads(data[len(key) :])
+        return RewrittenCode(code, logfire_name, [(qualname, lineno) for qualname, lineno in function_locations])
+    except Exception:  # pragma: no cover
+        # A corrupt or truncated file, treat it like a cache miss.
+        return None
+
+
+def store(path: str, key: bytes, rewritten: RewrittenCode) -> None:
+    """Writes the code to `path` atomically unless `sys.dont_write_bytecode` is set, ignoring errors."""
+    if not sys.dont_write_bytecode:
+        write(path, key, rewritten)
+
+
+def write(path: str, key: bytes, rewritten: RewrittenCode) -> bool:
+    """Writes the code to `path` atomically, returning `False` for errors like a read-only filesystem."""
+    data = key + marshal.dumps((rewritten.logfire_name, rewritten.function_locations, rewritten.code))
+    # Write to a temporary file first so that other processes importing the same module
+    # never see a partially written file.
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:  # pragma: no cover
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        return False
+    return True
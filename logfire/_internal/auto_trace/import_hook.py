@@ -11,7 +11,9 @@ from types import ModuleType
 from typing import TYPE_CHECKING, Any, Callable, cast
 
 from ..utils import log_internal_error
-from .rewrite_ast import compile_source
+from . import code_cache
+from .adaptive import AdaptiveAutoTracingOptions
+from .rewrite_ast import compile_source, make_execute
 from .types import AutoTraceModule
 
 if TYPE_CHECKING:
@@ -25,6 +27,8 @@ class LogfireFinder(MetaPathFinder):
     logfire: Logfire
     modules_filter: Callable[[AutoTraceModule], bool]
     min_duration: int
+    adaptive: AdaptiveAutoTracingOptions | None = None
+    lazy: bool = False
 
     def find_spec(
         self, fullname: str, path: Sequence[str] | None, target: ModuleType | None = None
@@ -63,19 +67,33 @@ class LogfireFinder(MetaPathFinder):
             if not self.modules_filter(AutoTraceModule(fullname, filename)):
                 return None  # tell the import system to try the next meta path finder
 
-            try:
-                tree = ast.parse(source)
-            except Exception:  # pragma: no cover
-                # The plain finder gave us invalid source code. Try another one.
-                # A very likely case is that the source code really is invalid,
-                # in which case we'll eventually return None and the normal system will raise the error,
-                # giving the user a normal traceback instead of a confusing and ugly one mentioning logfire.
-                continue
-
             filename = filename or f'<{fullname}>'
 
+            # Reuse the code rewritten by a previous process if the source hasn't changed, see `code_cache.py`.
+            cache_path = code_cache.cache_path(plain_spec)
+            cache_key = code_cache.cache_key(source, filename) if cache_path else b''
+            rewritten = code_cache.load(cache_path, cache_key) if cache_path else None
+
             try:
-                execute = compile_source(tree, filename, fullname, self.logfire, self.min_duration)
+                if rewritten:
+                    execute = make_execute(
+                        rewritten, filename, fullname, self.logfire, self.min_duration, self.adaptive, self.lazy
+                    )
+                else:
+                    try:
+                        tree = ast.parse(source)
+                    except Exception:  # pragma: no cover
+                        # The plain finder gave us invalid source code. Try another one.
+                        # A very likely case is that the source code really is invalid,
+                        # in which case we'll eventually return None and the normal system will raise the error,
+                        # giving the user a normal traceback instead of a confusing and ugly one mentioning logfire.
+                        continue
+
+                    rewritten, execute = compile_source(
+                        tree, filename, fullname, self.logfire, self.min_duration, self.adaptive, self.lazy
+                    )
+                    if cache_path:
+                        code_cache.store(cache_path, cache_key, rewritten)
             except Exception:  # pragma: no cover
                 # Auto-tracing failed with an unexpected error. Ensure that this doesn't crash the whole application.
                 # This error handling is why we compile in the finder. Once we return a loader, we've committed to it.
@@ -0,0 +1,67 @@
+"""Fill the on-disk cache of rewritten auto-traced modules ahead of time, see `code_cache.py`.
+
+Without this, the first process to import each traced module after a deployment pays for parsing,
+rewriting and compiling it, and in environments with a read-only filesystem or `PYTHONDONTWRITEBYTECODE`,
+every process does. Running `logfire precompile-auto-tracing` in a build step does that work once,
+in parallel across modules, like `python -m compileall` does for normal `.pyc` files.
+"""
+
+from __future__ import annotations
+
+import ast
+import os
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import decode_source
+from pathlib import Path
+
+import logfire
+
+from . import code_cache
+from .rewrite_ast import compile_source
+
+
+def precompile_auto_tracing(paths: Iterable[str | Path], max_workers: int | None = None) -> int:
+    """Rewrite and compile all the Python files in `paths` for auto-tracing and store the results in the cache.
+
+    Directories are searched recursively. The files are processed in a pool of `max_workers` processes,
+    defaulting to the number of CPUs, or in the current process if `max_workers` is 1.
+    A cached file is only used if the module is later imported from the same absolute path.
+
+    Returns the number of files that were compiled and stored, i.e. excluding files with syntax errors
+    or that couldn't be written.
+    """
+    filenames = sorted(set(source_files(paths)))
+    if max_workers == 1 or len(filenames) <= 1:
+        return sum(map(precompile_file, filenames))
+    with ProcessPoolExecutor(max_workers) as executor:
+        return sum(executor.map(precompile_file, filenames, chunksize=8))
+
+
+def source_files(paths: Iterable[str | Path]) -> Iterator[str]:
+    for path in map(Path, paths):
+        if path.is_dir():
+            for file in path.rglob('*.py'):
+                yield os.path.abspath(file)
+        elif path.suffix == '.py':
+            yield os.path.abspath(path)
+
+
+def precompile_file(filename: str) -> bool:
+    """Compile one file and store it in the cache, returning whether that succeeded.
+
+    The module name, `Logfire` instance and `min_duration` don't affect the compiled code,
+    so placeholders are used, with `lazy=True` so that no context factories are actually created.
+    """
+    path = code_cache.cache_path_for_source(filename)
+    if not path:  # pragma: no cover
+        return False
+    try:
+        with open(filename, 'rb') as f:
+            # This decodes the source the same way as `SourceFileLoader.get_source` in the import hook,
+            # which is necessary for the cache key to match.
+            source = decode_source(f.read())
+        rewritten, _ = compile_source(ast.parse(source), filename, '', logfire.DEFAULT_LOGFIRE_INSTANCE, 0, lazy=True)
+    except (OSError, SyntaxError, UnicodeDecodeError, ValueError):
+        return False
+    return code_cache.write(path, code_cache.cache_key(source, filename), rewritten)
@@ -6,22 +6,48 @@ from collections import deque
 from contextlib import AbstractContextManager
 from dataclasses import dataclass
 from functools import partial
+from types import CodeType
 from typing import TYPE_CHECKING, Any, Callable, TypeVar
 
 import logfire
 
+from .. import overhead
 from ..ast_utils import BaseTransformer, LogfireArgs
+from ..overhead import call_context_factory, profiled
+from .adaptive import AdaptiveAutoTracingOptions, AutoTracedFunctionState, adaptive_context_factory
 
 if TYPE_CHECKING:
     from ..main import Logfire
 
 
+@dataclass
+class RewrittenCode:
+    """A module's code compiled from its rewritten AST, independent of the `Logfire` instance and `min_duration`.
+
+    This is what's stored in the on-disk cache, see `code_cache.py`.
+    """
+
+    code: CodeType
+    logfire_name: str
+    """The name of the global variable holding the context factories, i.e. `logfire_<uuid>`."""
+
+    function_locations: list[tuple[str, int]]
+    """The qualified name and line number of the function using each index of the context factories."""
+
+
 def compile_source(
-    tree: ast.AST, filename: str, module_name: str, logfire_instance: Logfire, min_duration: int
-) -> Callable[[dict[str, Any]], None]:
+    tree: ast.AST,
+    filename: str,
+    module_name: str,
+    logfire_instance: Logfire,
+    min_duration: int,
+    adaptive: AdaptiveAutoTracingOptions | None = None,
+    lazy: bool = False,
+) -> tuple[RewrittenCode, Callable[[dict[str, Any]], None]]:
     """Compile a modified AST of the module's source code in the module's namespace.
 
-    Returns a function which accepts module globals and executes the compiled code.
+    Returns the compiled code, which can be cached and passed to `make_execute` in a later process,
+    and a function which accepts module globals and executes the compiled code.
 
     The modified AST wraps the body of every function definition in `with context_factories[index]():`.
     `context_factories` is added to the module's namespace as `logfire_<uuid>`.
@@ -34,13 +60,58 @@ def compile_source(
             then `context_factories[index]` is replaced with the `partial` above.
     If `min_duration` is greater than 0, then `context_factories[index]` is initially `MeasureTime`.
     Otherwise, it's initially the `partial` above.
+    If `adaptive` is set, `MeasureTime` is replaced by the classes in `adaptive_context_factory`,
+    which can also switch back from the `partial` to measuring.
+    If `lazy` is set, `context_factories[index]` is initially a cheap placeholder which creates
+    one of the above and replaces itself with it the first time the function is called.
     """
     logfire_name = f'logfire_{uuid.uuid4().hex}'
-    context_factories: list[Callable[[], AbstractContextManager[Any]]] = []
-    tree = rewrite_ast(tree, filename, logfire_name, module_name, logfire_instance, context_factories, min_duration)
+    transformer = make_transformer(
+        filename, logfire_name, module_name, logfire_instance, [], min_duration, adaptive, lazy
+    )
+    tree = transformer.visit(tree)
     assert isinstance(tree, ast.Module)  # for type checking
     # dont_inherit=True is necessary to prevent the module from inheriting the __future__ import from this module.
     code = compile(tree, filename, 'exec', dont_inherit=True)
+    rewritten = RewrittenCode(code, logfire_name, transformer.function_locations)
+    return rewritten, _make_execute(rewritten, transformer.context_factories, module_name)
+
+
+def make_execute(
+    rewritten: RewrittenCode,
+    filename: str,
+    module_name: str,
+    logfire_instance: Logfire,
+    min_duration: int,
+    adaptive: AdaptiveAutoTracingOptions | None = None,
+    lazy: bool = False,
+) -> Callable[[dict[str, Any]], None]:
+    """Like `compile_source`, but for code that has already been rewritten and compiled, e.g. loaded from the cache.
+
+    Only the context factories need to be created again.
+    """
+    transformer = make_transformer(
+        filename, rewritten.logfire_name, module_name, logfire_instance, [], min_duration, adaptive, lazy
+    )
+    for qualname, lineno in rewritten.function_locations:
+        transformer.add_context_factory(qualname, lineno)
+    return _make_execute(rewritten, transformer.context_factories, module_name)
+
+
+def _make_execute(
+    rewritten: RewrittenCode, context_factories: list[Callable[[], AbstractContextManager[Any]]], module_name: str
+) -> Callable[[dict[str, Any]], None]:
+    code = rewritten.code
+    logfire_name = rewritten.logfire_name
+    if overhead.ENABLED:
+        # The rewritten code looks up the profiled factories instead,
+        # which look up the current context factory on each call so that promotion and demotion still work.
+        context_factories = [
+            profiled(
+                partial(call_context_factory, context_factories, index), module_name, qualname, lineno, 'auto_tracing'
+            )
+            for index, (qualname, lineno) in enumerate(rewritten.function_locations)
+        ]
 
     def execute(globs: dict[str, Any]):
         globs[logfire_name] = context_factories
@@ -57,14 +128,39 @@ def rewrite_ast(
     logfire_instance: Logfire,
     context_factories: list[Callable[[], AbstractContextManager[Any]]],
     min_duration: int,
+    adaptive: AdaptiveAutoTracingOptions | None = None,
+    lazy: bool = False,
 ) -> ast.AST:
-    logfire_args = LogfireArgs(logfire_instance._tags, logfire_instance._sample_rate)  # type: ignore
-    transformer = AutoTraceTransformer(
-        logfire_args, logfire_name, filename, module_name, logfire_instance, context_factories, min_duration
+    transformer = make_transformer(
+        filename, logfire_name, module_name, logfire_instance, context_factories, min_duration, adaptive, lazy
     )
     return transformer.visit(tree)
 
 
+def make_transformer(
+    filename: str,
+    logfire_name: str,
+    module_name: str,
+    logfire_instance: Logfire,
+    context_factories: list[Callable[[], AbstractContextManager[Any]]],
+    min_duration: int,
+    adaptive: AdaptiveAutoTracingOptions | None = None,
+    lazy: bool = False,
+) -> AutoTraceTransformer:
+    logfire_args = LogfireArgs(logfire_instance._tags, logfire_instance._sample_rate)  # type: ignore
+    return AutoTraceTransformer(
+        logfire_args,
+        logfire_name,
+        filename,
+        module_name,
+        logfire_instance,
+        context_factories,
+        min_duration,
+        adaptive,
+        lazy,
+    )
+
+
 @dataclass
 class AutoTraceTransformer(BaseTransformer):
     """Trace all encountered functions except those explicitly marked with `@no_auto_trace`."""
@@ -72,6 +168,12 @@ class AutoTraceTransformer(BaseTransformer):
     logfire_instance: Logfire
     context_factories: list[Callable[[], AbstractContextManager[Any]]]
     min_duration: int
+    adaptive: AdaptiveAutoTracingOptions | None = None
+    lazy: bool = False
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.function_locations: list[tuple[str, int]] = []
 
     def check_no_auto_trace(self, node: ast.FunctionDef | ast.AsyncFunctionDef | ast.ClassDef) -> bool:
         """Return true if the node has a `@no_auto_trace` or `@logfire.no_auto_trace` decorator."""
@@ -108,19 +210,62 @@ class AutoTraceTransformer(BaseTransformer):
         return super().rewrite_function(node, qualname)
 
     def logfire_method_call_node(self, node: ast.FunctionDef | ast.AsyncFunctionDef, qualname: str) -> ast.Call:
-        # See the exec_source docstring
+        # See the compile_source docstring
+        index = self.add_context_factory(qualname, node.lineno)
+
+        # This node means:
+        #   context_factories[index]()
+        # where `context_factories` is a global variable with the name `self.logfire_method_name`
+        # pointing to the `self.context_factories` list.
+        return ast.Call(
+            func=ast.Subscript(
+                value=ast.Name(id=self.logfire_method_name, ctx=ast.Load()),
+                slice=ast.Index(value=ast.Constant(value=index)),  # type: ignore
+                ctx=ast.Load(),
+            ),
+            args=[],
+            keywords=[],
+        )
+
+    def add_context_factory(self, qualname: str, lineno: int) -> int:
+        """Append the context factory for the function with the given location and return its index."""
         index = len(self.context_factories)
+        self.function_locations.append((qualname, lineno))
+        if self.lazy:
+            self.context_factories.append(partial(self.build_context_factory_and_call, index, qualname, lineno))
+        else:
+            self.context_factories.append(self.build_context_factory(index, qualname, lineno))
+        return index
+
+    def build_context_factory_and_call(self, index: int, qualname: str, lineno: int) -> AbstractContextManager[Any]:
+        """The placeholder context factory in lazy mode, called on the first call of the function.
+
+        If the function is first called in several threads at once, the factory may be built more than once,
+        but only the last one is kept.
+        """
+        factory = self.context_factories[index] = self.build_context_factory(index, qualname, lineno)
+        return factory()
+
+    def build_context_factory(
+        self, index: int, qualname: str, lineno: int
+    ) -> Callable[[], AbstractContextManager[Any]]:
         span_factory = partial(
             self.logfire_instance._fast_span,  # type: ignore
-            *self.logfire_method_arg_values(qualname, node.lineno),
+            *self.logfire_method_arg_values(qualname, lineno),
         )
         if self.min_duration > 0:
+            state = AutoTracedFunctionState(self.module_name, qualname, lineno, traced=False)
             config = self.logfire_instance._config  # type: ignore
 
             # Local vars for fast access
             timer = config.advanced.ns_timestamp_generator
             min_duration = self.min_duration
 
+            if self.adaptive:
+                return adaptive_context_factory(
+                    state, self.context_factories, index, span_factory, timer, min_duration, self.adaptive
+                )
+
             # This needs to be as fast as possible since it's the cost of auto-tracing a function
             # that never actually gets instrumented because its calls are all faster than `min_duration`.
             class MeasureTime:
@@ -132,24 +277,12 @@ class AutoTraceTransformer(BaseTransformer):
                 def __exit__(_self, *_):
                     if timer() - _self.start >= min_duration:
                         self.context_factories[index] = span_factory
+                        state.promote()
 
-            self.context_factories.append(MeasureTime)
+            return MeasureTime
         else:
-            self.context_factories.append(span_factory)
-
-        # This node means:
-        #   context_factories[index]()
-        # where `context_factories` is a global variable with the name `self.logfire_method_name`
-        # pointing to the `self.context_factories` list.
-        return ast.Call(
-            func=ast.Subscript(
-                value=ast.Name(id=self.logfire_method_name, ctx=ast.Load()),
-                slice=ast.Index(value=ast.Constant(value=index)),  # type: ignore
-                ctx=ast.Load(),
-            ),
-            args=[],
-            keywords=[],
-        )
+            AutoTracedFunctionState(self.module_name, qualname, lineno, traced=True)
+            return span_factory
 
 
 T = TypeVar('T')
@@ -116,6 +116,14 @@ def parse_inspect(args: argparse.Namespace) -> None:
         console.print('No recommended packages found. You are all set!', style='green')  # pragma: no cover
 
 
+def parse_precompile_auto_tracing(args: argparse.Namespace) -> None:
+    """Rewrite and compile Python files for `logfire.install_auto_tracing` ahead of time, e.g. in a build step."""
+    from ..auto_trace.precompile import precompile_auto_tracing
+
+    count = precompile_auto_tracing(args.paths, max_workers=args.workers)
+    sys.stderr.write(f'Precompiled {count} files for auto-tracing.\n')
+
+
 def parse_auth(args: argparse.Namespace) -> None:
     """Authenticate with Logfire.
 
@@ -386,6 +394,13 @@ def _main(args: list[str] | None = None) -> None:
     cmd_inspect.set_defaults(func=parse_inspect)
     cmd_inspect.add_argument('--ignore', action=SplitArgs, default=(), help='ignore a package')
 
+    cmd_precompile = subparsers.add_parser('precompile-auto-tracing', help=parse_precompile_auto_tracing.__doc__)
+    cmd_precompile.set_defaults(func=parse_precompile_auto_tracing)
+    cmd_precompile.add_argument('paths', nargs='+', help='Python files or directories to search recursively')
+    cmd_precompile.add_argument(
+        '-j', '--workers', type=int, default=None, help='number of worker processes, defaults to the number of CPUs'
+    )
+
     cmd_whoami = subparsers.add_parser('whoami', help=parse_whoami.__doc__)
     cmd_whoami.set_defaults(func=parse_whoami)
     cmd_whoami.add_argument('--data-dir', default='.logfire')
@@ -433,6 +448,12 @@ def _main(args: list[str] | None = None) -> None:
     cmd_run = subparsers.add_parser('run', help='Run Python scripts/modules with Logfire instrumentation')
     cmd_run.add_argument('--summary', action=argparse.BooleanOptionalAction, default=True, help='hide the summary box')
     cmd_run.add_argument('--exclude', action=SplitArgs, default=(), help='exclude a package from instrumentation')
+    cmd_run.add_argument(
+        '--profile-overhead',
+        action='store_true',
+        default=False,
+        help='print how much time Logfire spent on spans around each instrumented function when the program ends',
+    )
     cmd_run.add_argument('-m', '--module', help='Run module as script')
     cmd_run.add_argument(
         'script_and_args', nargs=argparse.REMAINDER, help='Script path and arguments, or module arguments when using -m'
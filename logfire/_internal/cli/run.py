@@ -97,6 +97,17 @@ def parse_run(args: argparse.Namespace) -> None:
             console=console, instrumented_packages_text=instrumentation_text, recommendations=ctx.recommendations
         )
 
+    if profile_overhead := cast(bool, args.profile_overhead):
+        logfire.enable_overhead_profiling()
+
+    try:
+        run_script_or_module(args)
+    finally:
+        if profile_overhead:
+            print(f'\nLogfire overhead per instrumented function:\n{logfire.overhead_profile()}', file=sys.stderr)
+
+
+def run_script_or_module(args: argparse.Namespace) -> None:
     # Get arguments from the script_and_args parameter
     script_and_args = args.script_and_args
 
@@ -51,7 +51,7 @@ from opentelemetry.sdk.metrics.export import AggregationTemporality, MetricReade
 from opentelemetry.sdk.metrics.view import ExponentialBucketHistogramAggregation, View
 from opentelemetry.sdk.resources import Resource
 from opentelemetry.sdk.trace import SpanProcessor, SynchronousMultiSpanProcessor, TracerProvider as SDKTracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor, SpanExporter
 from opentelemetry.sdk.trace.id_generator import IdGenerator
 from opentelemetry.sdk.trace.sampling import ParentBasedTraceIdRatio, Sampler
 from rich.console import Console
@@ -84,7 +84,8 @@ from .exporters.console import (
     ShowParentsConsoleSpanExporter,
     SimpleConsoleSpanExporter,
 )
-from .exporters.dynamic_batch import DynamicBatchSpanProcessor
+from .exporters.deferred import SerializeDeferredAttributesExporter, SerializeDeferredAttributesProcessorWrapper
+from .exporters.dynamic_batch import DynamicBatchSpanProcessor, QueueFullPolicy
 from .exporters.logs import CheckSuppressInstrumentationLogProcessorWrapper, MainLogProcessorWrapper
 from .exporters.otlp import (
     BodySizeCheckingOTLPSpanExporter,
@@ -97,6 +98,7 @@ from .exporters.processor_wrapper import CheckSuppressInstrumentationProcessorWr
 from .exporters.quiet_metrics import QuietMetricExporter
 from .exporters.remove_pending import RemovePendingSpansExporter
 from .exporters.test import TestExporter
+from .formatter import register_fstring_plan_metrics
 from .integrations.executors import instrument_executors
 from .logs import ProxyLoggerProvider
 from .metrics import ProxyMeterProvider
@@ -182,6 +184,67 @@ class AdvancedOptions:
     log_record_processors: Sequence[LogRecordProcessor] = ()
     """Configuration for OpenTelemetry logging. This is experimental and may be removed."""
 
+    adaptive_batching: bool = False
+    """Whether to continuously tune how spans are batched before being sent to Logfire.
+
+    By default spans are exported at least every `OTEL_BSP_SCHEDULE_DELAY` milliseconds in batches of up to
+    `OTEL_BSP_MAX_EXPORT_BATCH_SIZE` spans. If this is set, the delay and batch size are instead adjusted
+    based on the measured rate of spans, export latency and request size. This helps with bursty workloads
+    by sending fewer tiny requests when quiet and bigger requests during bursts so that the queue doesn't fill up.
+    """
+
+    span_queue_full_policy: QueueFullPolicy = 'drop_oldest'
+    """What to do when spans are created faster than they can be sent to Logfire and the queue of spans is full.
+
+    - `'drop_oldest'`: drop the oldest span in the queue to make room for the new one. This is the default.
+    - `'drop_lowest_level'`: drop the oldest span with the lowest level (e.g. `debug` before `info` before `error`),
+        or the new span if everything in the queue has a higher level, so that errors are the last to be lost.
+    - `'block'`: make the code ending the span wait up to `span_queue_block_timeout` seconds for room in the queue,
+        then drop the oldest span.
+
+    Dropped spans are counted in [`logfire.export_stats()`][logfire.export_stats]
+    and the `logfire.span_export.dropped` metric.
+    The size of the queue is set by the `OTEL_BSP_MAX_QUEUE_SIZE` environment variable (default: 2048).
+    """
+
+    span_queue_block_timeout: float = 0.1
+    """The maximum number of seconds to wait for room in the queue when `span_queue_full_policy` is `'block'`."""
+
+    retry_spool_dir: Path | str | None = None
+    """Directory where exports that failed to send are stored until they can be retried.
+
+    By default, failed exports are stored in a temporary directory and are lost when the process exits.
+    If this is set, exports left in the directory by previous processes are retried in the background on startup,
+    so data isn't lost when a process is restarted during an outage.
+    Several processes can safely share the same directory (on platforms with `fcntl`),
+    but it should only be used for a single project since the token isn't stored with the exports.
+    """
+
+    defer_attribute_serialization: bool = False
+    """Whether to serialize structured attribute values to JSON in the background instead of when logging.
+
+    By default, attribute values that aren't strings, numbers or booleans (e.g. dicts, lists, dataclasses,
+    Pydantic models) are serialized to JSON, and logs get a JSON schema of their attributes,
+    in the thread that creates the span or log. If this is set, Logfire instead keeps a reference to each such value
+    and serializes and scrubs it in the thread that exports spans to Logfire, which makes logging large
+    structured values cheaper for the calling code.
+
+    Because values are referenced rather than copied, **don't modify an object after logging it**:
+    changes made before the span is exported (which can be a few seconds later, or whenever the span ends
+    for spans) will be included, and modifying an object while it's being serialized can cause the value
+    to be lost. Log a copy of anything that will keep changing.
+
+    Only exports to Logfire (and to `OTEL_EXPORTER_OTLP_ENDPOINT`) happen in the background.
+    Other processors, including the console and `additional_span_processors`, receive spans whose values
+    are serialized in the thread that ends the span. Attributes set after a span is created with `set_attribute`
+    are unaffected.
+
+    Tail sampling callbacks (see [`SamplingOptions.tail`][logfire.sampling.SamplingOptions.tail]) run before
+    any serialization, so in the attributes of `TailSamplingSpanInfo.span`, deferred values are the placeholder
+    string `'[Not serialized yet]'`. Other attributes, such as the level, message and primitive values,
+    are available as usual.
+    """
+
     def generate_base_url(self, token: str) -> str:
         if self.base_url is not None:
             return self.base_url
@@ -592,7 +655,7 @@ class _LogfireConfigData:
             scrubbing = ScrubbingOptions()
         self.scrubbing: ScrubbingOptions | Literal[False] = scrubbing
         self.scrubber: BaseScrubber = (
-            Scrubber(scrubbing.extra_patterns, scrubbing.callback) if scrubbing else NOOP_SCRUBBER
+            Scrubber(scrubbing.extra_patterns, scrubbing.callback, scrubbing.at_source) if scrubbing else NOOP_SCRUBBER
         )
 
         if isinstance(console, dict):
@@ -845,26 +908,43 @@ class LogfireConfig(_LogfireConfigData):
             self._tracer_provider.set_provider(tracer_provider)  # do we need to shut down the existing one???
 
             processors_with_pending_spans: list[SpanProcessor] = []
+            processors_with_lazy_pending_spans: list[SpanProcessor] = []
             root_processor = main_multiprocessor = SynchronousMultiSpanProcessor()
             if self.sampling.tail:
-                root_processor = TailSamplingProcessor(root_processor, self.sampling.tail)
+                root_processor = TailSamplingProcessor(
+                    root_processor,
+                    self.sampling.tail,
+                    max_traces=self.sampling.max_buffered_traces,
+                    max_spans_per_trace=self.sampling.max_buffered_spans_per_trace,
+                    max_age=self.sampling.max_buffer_age,
+                    eviction=self.sampling.buffer_eviction,
+                )
             tracer_provider.add_span_processor(
                 CheckSuppressInstrumentationProcessorWrapper(
                     MainSpanProcessorWrapper(root_processor, self.scrubber),
                 )
             )
 
-            def add_span_processor(span_processor: SpanProcessor) -> None:
+            defer_attribute_serialization = self.advanced.defer_attribute_serialization
+
+            def add_span_processor(span_processor: SpanProcessor, serialize_deferred: bool = True) -> None:
+                processor_exporter = getattr(span_processor, 'span_exporter', None)
+                has_pending = isinstance(processor_exporter, (TestExporter, SimpleConsoleSpanExporter))
+                # This exporter materializes pending spans, only for spans that are still open when exported.
+                has_lazy_pending = isinstance(processor_exporter, RemovePendingSpansExporter)
+                if defer_attribute_serialization and serialize_deferred:
+                    # Processors that don't serialize deferred attribute values in their export thread
+                    # need them serialized before they see the span.
+                    span_processor = SerializeDeferredAttributesProcessorWrapper(span_processor, self.scrubber)
                 main_multiprocessor.add_span_processor(span_processor)
-                has_pending = isinstance(
-                    getattr(span_processor, 'span_exporter', None),
-                    (TestExporter, RemovePendingSpansExporter, SimpleConsoleSpanExporter),
-                )
                 if has_pending:
                     processors_with_pending_spans.append(span_processor)
+                elif has_lazy_pending:
+                    processors_with_lazy_pending_spans.append(span_processor)
 
             if self.add_baggage_to_attributes:
-                add_span_processor(DirectBaggageAttributesSpanProcessor())
+                # This only sets attributes when spans start.
+                add_span_processor(DirectBaggageAttributesSpanProcessor(), serialize_deferred=False)
 
             if self.additional_span_processors is not None:
                 for processor in self.additional_span_processors:
@@ -930,22 +1010,31 @@ class LogfireConfig(_LogfireConfigData):
 
                     base_url = self.advanced.generate_base_url(self.token)
                     headers = {'User-Agent': f'logfire/{VERSION}', 'Authorization': self.token}
-                    session = OTLPExporterHttpSession()
+                    retry_spool_dir = self.advanced.retry_spool_dir
+                    session = OTLPExporterHttpSession(spool_dir=Path(retry_spool_dir) if retry_spool_dir else None)
                     session.headers.update(headers)
-                    span_exporter = BodySizeCheckingOTLPSpanExporter(
+                    otlp_span_exporter = BodySizeCheckingOTLPSpanExporter(
                         endpoint=urljoin(base_url, '/v1/traces'),
                         session=session,
                         compression=Compression.Gzip,
                     )
-                    span_exporter = QuietSpanExporter(span_exporter)
+                    span_exporter = QuietSpanExporter(otlp_span_exporter)
                     span_exporter = RetryFewerSpansSpanExporter(span_exporter)
+                    if defer_attribute_serialization:
+                        span_exporter = SerializeDeferredAttributesExporter(span_exporter, self.scrubber)
                     span_exporter = RemovePendingSpansExporter(span_exporter)
                     if emscripten:  # pragma: no cover
                         # BatchSpanProcessor uses threads which fail in Pyodide / Emscripten
                         logfire_processor = SimpleSpanProcessor(span_exporter)
                     else:
-                        logfire_processor = DynamicBatchSpanProcessor(span_exporter)
-                    add_span_processor(logfire_processor)
+                        logfire_processor = DynamicBatchSpanProcessor(
+                            span_exporter,
+                            adaptive=self.advanced.adaptive_batching,
+                            body_size_exporter=otlp_span_exporter,
+                            queue_full_policy=self.advanced.span_queue_full_policy,
+                            block_timeout=self.advanced.span_queue_block_timeout,
+                        )
+                    add_span_processor(logfire_processor, serialize_deferred=False)
 
                     # TODO should we warn here if we have metrics but we're in emscripten?
                     # I guess we could do some hack to use InMemoryMetricReader and call it after user code has run?
@@ -967,6 +1056,8 @@ class LogfireConfig(_LogfireConfigData):
                                 )
                             )
                         )
+                        # Like the export stats, this is about the SDK itself, so only report it to Logfire.
+                        register_fstring_plan_metrics()
 
                     log_exporter = OTLPLogExporter(
                         endpoint=urljoin(base_url, '/v1/logs'),
@@ -982,14 +1073,25 @@ class LogfireConfig(_LogfireConfigData):
                         logfire_log_processor = BatchLogRecordProcessor(log_exporter)
                     log_record_processors.append(logfire_log_processor)
 
-            if processors_with_pending_spans:
-                pending_multiprocessor = SynchronousMultiSpanProcessor()
-                for processor in processors_with_pending_spans:
-                    pending_multiprocessor.add_span_processor(processor)
+                    if retry_spool_dir and not emscripten:
+                        # Only now are all the headers set on the session, so the retryer can be created.
+                        session.retryer.drain_spool()
+
+            if processors_with_pending_spans or processors_with_lazy_pending_spans:
+
+                def pending_processor(processors: list[SpanProcessor]) -> MainSpanProcessorWrapper | None:
+                    if not processors:
+                        return None
+                    multiprocessor = SynchronousMultiSpanProcessor()
+                    for processor in processors:
+                        multiprocessor.add_span_processor(processor)
+                    return MainSpanProcessorWrapper(multiprocessor, self.scrubber)
 
                 main_multiprocessor.add_span_processor(
                     PendingSpanProcessor(
-                        self.advanced.id_generator, MainSpanProcessorWrapper(pending_multiprocessor, self.scrubber)
+                        self.advanced.id_generator,
+                        pending_processor(processors_with_pending_spans),
+                        pending_processor(processors_with_lazy_pending_spans),
                     )
                 )
 
@@ -1002,7 +1104,10 @@ class LogfireConfig(_LogfireConfigData):
             otlp_logs_exporter = os.getenv(OTEL_LOGS_EXPORTER, '').lower()
 
             if (otlp_endpoint or otlp_traces_endpoint) and otlp_traces_exporter in ('otlp', ''):
-                add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+                otlp_exporter: SpanExporter = OTLPSpanExporter()
+                if defer_attribute_serialization:
+                    otlp_exporter = SerializeDeferredAttributesExporter(otlp_exporter, self.scrubber)
+                add_span_processor(BatchSpanProcessor(otlp_exporter), serialize_deferred=False)
 
             if (
                 (otlp_endpoint or otlp_metrics_endpoint)
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import dataclasses
+import itertools
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from functools import cache
+from threading import Lock
+
+from opentelemetry.metrics import CallbackOptions, Observation
+
+from .metrics import register_internal_callback_metric
+
+
+class LockFreeCount:
+    """A count that can be incremented by one from any thread without taking a lock.
+
+    Calling `next()` on an `itertools.count` is atomic, unlike `+= 1` on an attribute.
+    Reading the value also advances the `itertools.count`, so the number of reads is subtracted.
+    """
+
+    __slots__ = ('_count', '_reads', '_read_lock')
+
+    def __init__(self) -> None:
+        self._count = itertools.count()
+        self._reads = 0
+        self._read_lock = Lock()
+
+    def increment(self) -> None:
+        next(self._count)
+
+    @property
+    def value(self) -> int:
+        with self._read_lock:
+            value = next(self._count) - self._reads
+            self._reads += 1
+            return value
+
+
+@dataclass
+class ExportStats:
+    """Counts of what happened to data on its way to Logfire since the process started.
+
+    Use [`logfire.export_stats()`][logfire.export_stats] to get a snapshot.
+    The same counts are also reported as `logfire.span_export.*`, `logfire.export_retry.dropped`
+    and `logfire.scrubbing.scrubbed_bytes` metrics so that you can alert on data being lost.
+
+    Spans that are queued are eventually counted as exported, export failed, or dropped,
+    so the difference is the number of spans currently waiting in the queue.
+    """
+
+    spans_queued: int = 0
+    """Number of spans added to the queue of spans waiting to be sent to Logfire."""
+
+    spans_exported: int = 0
+    """Number of spans sent to Logfire successfully on the first attempt."""
+
+    spans_export_failed: int = 0
+    """Number of spans in exports that failed.
+
+    Most failed exports are retried in the background, in which case the spans aren't lost
+    unless `exports_dropped_retry_limit` also increases.
+    """
+
+    spans_dropped_queue_full: int = 0
+    """Number of spans dropped because the queue was full, see `AdvancedOptions.span_queue_full_policy`."""
+
+    exports_dropped_retry_limit: int = 0
+    """Number of failed exports (i.e. requests, not spans) dropped because too many were waiting to be retried."""
+
+    scrubbed_bytes: int = 0
+    """Total size of the values redacted by scrubbing."""
+
+    _lock: Lock = field(default_factory=Lock, init=False, repr=False, compare=False)
+    _queued_count: LockFreeCount = field(default_factory=LockFreeCount, init=False, repr=False, compare=False)
+
+    def count_queued_span(self) -> None:
+        """Add one to `spans_queued` without taking the lock, since this happens for every span."""
+        self._queued_count.increment()
+
+    def add(
+        self,
+        *,
+        spans_queued: int = 0,
+        spans_exported: int = 0,
+        spans_export_failed: int = 0,
+        spans_dropped_queue_full: int = 0,
+        exports_dropped_retry_limit: int = 0,
+        scrubbed_bytes: int = 0,
+    ) -> None:
+        with self._lock:
+            self.spans_queued += spans_queued
+            self.spans_exported += spans_exported
+            self.spans_export_failed += spans_export_failed
+            self.spans_dropped_queue_full += spans_dropped_queue_full
+            self.exports_dropped_retry_limit += exports_dropped_retry_limit
+            self.scrubbed_bytes += scrubbed_bytes
+
+    def snapshot(self) -> ExportStats:
+        with self._lock:
+            result = dataclasses.replace(self)
+        result.spans_queued += self._queued_count.value
+        return result
+
+
+EXPORT_STATS = ExportStats()
+"""The counts for this process, updated by the span processors, exporters and scrubber."""
+
+
+def export_stats() -> ExportStats:
+    """Get a snapshot of the counts of spans queued, exported and dropped by Logfire in this process.
+
+    This can be used to check whether telemetry is being lost, e.g. in a health check:
+
+    ```py
+    import logfire
+
+    stats = logfire.export_stats()
+    if stats.spans_dropped_queue_full or stats.exports_dropped_retry_limit:
+        print('Some telemetry was not sent to Logfire')
+    ```
+    """
+    return EXPORT_STATS.snapshot()
+
+
+@cache
+def register_export_stats_metrics() -> None:
+    """Report `EXPORT_STATS` as metrics. This only needs to happen once, when sending data to Logfire."""
+
+    def counter(name: str, attr: str, unit: str, description: str) -> None:
+        def callback(_options: CallbackOptions) -> Iterable[Observation]:
+            # Only report counts once they're non-zero, to avoid exporting zeros from processes where nothing happens.
+            if value := getattr(EXPORT_STATS.snapshot(), attr):
+                yield Observation(value)
+
+        register_internal_callback_metric('counter', name, callback, unit=unit, description=description)
+
+    counter(
+        'logfire.span_export.queued',
+        'spans_queued',
+        '{span}',
+        'Number of spans added to the queue of spans waiting to be sent to Logfire.',
+    )
+    counter(
+        'logfire.span_export.exported',
+        'spans_exported',
+        '{span}',
+        'Number of spans sent to Logfire successfully on the first attempt.',
+    )
+    counter(
+        'logfire.span_export.failed',
+        'spans_export_failed',
+        '{span}',
+        'Number of spans in failed exports. These are usually retried in the background.',
+    )
+    counter(
+        'logfire.span_export.dropped',
+        'spans_dropped_queue_full',
+        '{span}',
+        'Number of spans dropped because the queue of spans waiting to be sent was full.',
+    )
+    counter(
+        'logfire.export_retry.dropped',
+        'exports_dropped_retry_limit',
+        '{export}',
+        'Number of failed exports dropped because too many were waiting to be retried.',
+    )
+    counter(
+        'logfire.scrubbing.scrubbed_bytes',
+        'scrubbed_bytes',
+        'By',
+        'Total size of values redacted by scrubbing.',
+    )
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+from ..json_encoder import DeferredJson
+from ..scrubbing import BaseScrubber
+from ..utils import handle_internal_errors, span_to_dict
+from .wrapper import WrapperSpanExporter, WrapperSpanProcessor
+
+
+class SerializeDeferredAttributesExporter(WrapperSpanExporter):
+    """Serializes attribute values deferred by `AdvancedOptions.defer_attribute_serialization` in the export thread."""
+
+    def __init__(self, exporter: SpanExporter, scrubber: BaseScrubber) -> None:
+        super().__init__(exporter)
+        self.scrubber = scrubber
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        return super().export([serialize_deferred_attributes(span, self.scrubber) for span in spans])
+
+
+@dataclass
+class SerializeDeferredAttributesProcessorWrapper(WrapperSpanProcessor):
+    """Serializes deferred attribute values when spans end, for processors that don't export in a background thread."""
+
+    scrubber: BaseScrubber
+
+    def on_end(self, span: ReadableSpan) -> None:
+        super().on_end(serialize_deferred_attributes(span, self.scrubber))
+
+
+def serialize_deferred_attributes(span: ReadableSpan, scrubber: BaseScrubber) -> ReadableSpan:
+    """Returns a copy of `span` with `DeferredJson` attribute values serialized and scrubbed, or `span` if there are none.
+
+    If serializing fails, e.g. because a value was modified in another thread at the same time,
+    the error is logged and the span is returned unchanged, so the placeholders are exported instead.
+    """
+    attributes = span.attributes
+    if not attributes or not any(value.__class__ is DeferredJson for value in attributes.values()):
+        return span
+    with handle_internal_errors:
+        span_dict = span_to_dict(span)
+        span_dict['attributes'] = scrubber.serialize_deferred_attributes(attributes)
+        return ReadableSpan(**span_dict)
+    return span
@@ -1,18 +1,32 @@
 from __future__ import annotations
 
 import os
+import time
+from collections import deque
+from collections.abc import Iterable, Sequence
+from functools import cache
+from typing import Literal
+from weakref import WeakSet
 
+from opentelemetry.metrics import CallbackOptions, Observation
 from opentelemetry.sdk.environment_variables import OTEL_BSP_SCHEDULE_DELAY
 from opentelemetry.sdk.trace import ReadableSpan
-from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
 
-from logfire._internal.exporters.wrapper import WrapperSpanProcessor
+from logfire._internal.constants import ATTRIBUTES_LOG_LEVEL_NUM_KEY, LEVEL_NUMBERS
+from logfire._internal.export_stats import EXPORT_STATS, register_export_stats_metrics
+from logfire._internal.exporters.otlp import BodySizeCheckingOTLPSpanExporter
+from logfire._internal.exporters.wrapper import WrapperSpanExporter, WrapperSpanProcessor
+from logfire._internal.metrics import register_internal_callback_metric
+from logfire._internal.tracer import LazyPendingSpan
 
 try:
     from opentelemetry.sdk._shared_internal import BatchProcessor
 except ImportError:
     BatchProcessor = None
 
+QueueFullPolicy = Literal['drop_oldest', 'drop_lowest_level', 'block']
+
 
 class DynamicBatchSpanProcessor(WrapperSpanProcessor):
     """A wrapper around a BatchSpanProcessor that dynamically adjusts the schedule delay.
@@ -20,23 +34,99 @@ class DynamicBatchSpanProcessor(WrapperSpanProcessor):
     The initial schedule delay is set to 100ms, and after processing 10 spans, it is set to the value of
     the `OTEL_BSP_SCHEDULE_DELAY` environment variable (default: 500ms).
     This makes the initial experience of the SDK more responsive.
+
+    If `adaptive` is true, after that the schedule delay and max export batch size keep being tuned
+    by an `AdaptiveBatchTuner` based on the observed rate of spans, export latency and request body size.
+
+    Spans that are queued, exported and dropped are counted in `EXPORT_STATS`, apart from lazy pending spans.
+    `queue_full_policy` decides which span is dropped when the queue is full, see `AdvancedOptions.span_queue_full_policy`.
     """
 
     processor: BatchSpanProcessor  # type: ignore
 
-    def __init__(self, exporter: SpanExporter) -> None:
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        adaptive: bool = False,
+        body_size_exporter: BodySizeCheckingOTLPSpanExporter | None = None,
+        queue_full_policy: QueueFullPolicy = 'drop_oldest',
+        block_timeout: float = 0.1,
+    ) -> None:
         self.final_delay = float(os.environ.get(OTEL_BSP_SCHEDULE_DELAY) or 500)
         # Start with the configured value immediately if it's less than 100ms.
         initial_delay = min(self.final_delay, 100)
+        self.tuner: AdaptiveBatchTuner | None = None
+        if adaptive:
+            self.tuner = AdaptiveBatchTuner(self, body_size_exporter)
+        exporter = MeasuringSpanExporter(exporter, self.tuner)
         super().__init__(BatchSpanProcessor(exporter, schedule_delay_millis=initial_delay))
         self.num_processed = 0
+        self.queue_full_policy: QueueFullPolicy = queue_full_policy
+        self.block_timeout = block_timeout
+        register_export_stats_metrics()
 
     def on_end(self, span: ReadableSpan) -> None:
         self.num_processed += 1
         if self.num_processed == 10:
             self.schedule_delay_millis = self.final_delay
+        if span.context and span.context.trace_flags.sampled:
+            # Otherwise the BatchSpanProcessor ignores the span.
+            if len(self.queue) >= self.max_queue_size and not self._make_room(span):
+                if _is_counted(span):
+                    EXPORT_STATS.add(spans_dropped_queue_full=1)
+                return
+            if _is_counted(span):
+                EXPORT_STATS.count_queued_span()
         super().on_end(span)
 
+    def shutdown(self) -> None:
+        if self.tuner:
+            # Stop reporting the settings of this processor in metrics.
+            _TUNERS.discard(self.tuner)
+        super().shutdown()
+
+    def _make_room(self, span: ReadableSpan) -> bool:
+        """Apply the `queue_full_policy` when the queue is full.
+
+        Returns `False` if the new span should be dropped instead of being added to the queue.
+        """
+        queue = self.queue
+        if self.queue_full_policy == 'block':
+            deadline = time.monotonic() + self.block_timeout
+            # The batch processor has already been woken up to export since the queue is bigger than a batch.
+            while len(queue) >= self.max_queue_size and (remaining := deadline - time.monotonic()) > 0:
+                time.sleep(min(remaining, 0.001))
+            if len(queue) < self.max_queue_size:
+                return True
+        elif self.queue_full_policy == 'drop_lowest_level':
+            # The oldest spans are at the right, so reverse to drop the oldest of the lowest level spans.
+            # This is O(queue size), but only happens when spans are being dropped anyway.
+            # Copy the queue first since the export thread may be popping from it.
+            victim = min(reversed(list(queue)), key=_span_level, default=None)
+            if victim is None:  # pragma: no cover
+                return True
+            if _span_level(victim) > _span_level(span):
+                # Everything in the queue is more important than the new span.
+                return False
+            try:
+                queue.remove(victim)
+            except ValueError:  # pragma: no cover
+                # The span was exported in the meantime, so there's room now.
+                return True
+            if _is_counted(victim):
+                EXPORT_STATS.add(spans_dropped_queue_full=1)
+            return True
+
+        # The oldest span is about to be dropped since the queue is a deque with a max length.
+        try:
+            oldest = queue[-1]
+        except IndexError:  # pragma: no cover
+            # The queue was exported in the meantime, so there's room now.
+            return True
+        if _is_counted(oldest):
+            EXPORT_STATS.add(spans_dropped_queue_full=1)
+        return True
+
     if BatchProcessor:
 
         @property
@@ -45,7 +135,7 @@ class DynamicBatchSpanProcessor(WrapperSpanProcessor):
 
         @property
         def span_exporter(self) -> SpanExporter:  # type: ignore
-            return self.batch_processor._exporter  # type: ignore
+            return _unwrap_measuring(self.batch_processor._exporter)  # type: ignore
 
         @property
         def schedule_delay_millis(self) -> float:  # type: ignore
@@ -54,6 +144,22 @@ class DynamicBatchSpanProcessor(WrapperSpanProcessor):
         @schedule_delay_millis.setter
         def schedule_delay_millis(self, value: float):  # type: ignore
             self.batch_processor._schedule_delay = value / 1000  # type: ignore
+
+        @property
+        def max_export_batch_size(self) -> int:  # type: ignore
+            return self.batch_processor._max_export_batch_size  # type: ignore
+
+        @max_export_batch_size.setter
+        def max_export_batch_size(self, value: int):  # type: ignore
+            self.batch_processor._max_export_batch_size = value  # type: ignore
+
+        @property
+        def max_queue_size(self) -> int:  # type: ignore
+            return self.batch_processor._max_queue_size  # type: ignore
+
+        @property
+        def queue(self) -> deque[ReadableSpan]:  # type: ignore
+            return self.batch_processor._queue  # type: ignore
     else:
 
         @property
@@ -62,7 +168,7 @@ class DynamicBatchSpanProcessor(WrapperSpanProcessor):
 
         @property
         def span_exporter(self) -> SpanExporter:
-            return self.processor.span_exporter  # type: ignore
+            return _unwrap_measuring(self.processor.span_exporter)  # type: ignore
 
         @property
         def schedule_delay_millis(self) -> float:
@@ -71,3 +177,193 @@ class DynamicBatchSpanProcessor(WrapperSpanProcessor):
         @schedule_delay_millis.setter
         def schedule_delay_millis(self, value: float):
             self.processor.schedule_delay_millis = value  # type: ignore
+
+        @property
+        def max_export_batch_size(self) -> int:
+            return self.processor.max_export_batch_size  # type: ignore
+
+        @max_export_batch_size.setter
+        def max_export_batch_size(self, value: int):
+            self.processor.max_export_batch_size = value  # type: ignore
+
+        @property
+        def max_queue_size(self) -> int:
+            return self.processor.max_queue_size  # type: ignore
+
+        @property
+        def queue(self) -> deque[ReadableSpan]:
+            return self.processor.queue  # type: ignore
+
+
+def _span_level(span: ReadableSpan) -> int:
+    level = (span.attributes or {}).get(ATTRIBUTES_LOG_LEVEL_NUM_KEY)
+    return level if isinstance(level, int) else LEVEL_NUMBERS['info']
+
+
+class AdaptiveBatchTuner:
+    """Tunes the schedule delay and max export batch size of a `DynamicBatchSpanProcessor` after each export.
+
+    - The batch size aims to fit all the spans that arrive during one schedule delay plus one export,
+      so that the queue doesn't build up during bursts.
+      It's capped so that requests stay well under the OTLP body size limit, and so that a full batch
+      triggers an export well before the queue is full and starts dropping spans.
+    - The schedule delay is lengthened (up to `MAX_SCHEDULE_DELAY_MILLIS`) when spans arrive slowly,
+      so that each request contains at least `MIN_SPANS_PER_REQUEST` spans rather than just a few.
+      It never goes below the configured `OTEL_BSP_SCHEDULE_DELAY`.
+      When spans arrive quickly, exports are triggered by the batch filling up anyway.
+    """
+
+    MIN_BATCH_SIZE = 64
+    MIN_SPANS_PER_REQUEST = 50
+    MAX_SCHEDULE_DELAY_MILLIS = 5000
+
+    # Only use this fraction of the maximum body size since span sizes vary within a batch.
+    BODY_SIZE_HEADROOM = 0.5
+
+    # Weight of the newest measurement in the exponentially weighted moving averages.
+    SMOOTHING = 0.3
+
+    def __init__(
+        self,
+        processor: DynamicBatchSpanProcessor,
+        body_size_exporter: BodySizeCheckingOTLPSpanExporter | None = None,
+    ) -> None:
+        self.processor = processor
+        self.body_size_exporter = body_size_exporter
+        self.span_rate: float | None = None
+        """Spans ending per second."""
+        self.export_latency: float | None = None
+        """Seconds per export call."""
+        self.bytes_per_span: float | None = None
+        """Average uncompressed OTLP body size per span."""
+
+        self.last_time = time.monotonic()
+        self.last_num_processed = 0
+        _TUNERS.add(self)
+        _register_tuner_metrics()
+
+    def record_export(self, num_spans: int, duration: float, num_body_bytes: int | None) -> None:
+        """Update the measurements after an export and retune the processor."""
+        now = time.monotonic()
+        elapsed = now - self.last_time
+        num_processed = self.processor.num_processed
+        if elapsed > 0:
+            self.span_rate = self._smooth(self.span_rate, (num_processed - self.last_num_processed) / elapsed)
+        self.last_time = now
+        self.last_num_processed = num_processed
+
+        self.export_latency = self._smooth(self.export_latency, duration)
+        if num_body_bytes and num_spans:
+            self.bytes_per_span = self._smooth(self.bytes_per_span, num_body_bytes / num_spans)
+
+        if num_processed >= 10:
+            # Leave the initial responsive period of DynamicBatchSpanProcessor alone.
+            self.tune()
+
+    def tune(self) -> None:
+        processor = self.processor
+        rate = self.span_rate or 0
+        min_delay = processor.final_delay
+        max_delay = max(min_delay, self.MAX_SCHEDULE_DELAY_MILLIS)
+        if rate > 0:
+            delay = min(max(self.MIN_SPANS_PER_REQUEST / rate * 1000, min_delay), max_delay)
+        else:
+            delay = max_delay
+
+        max_batch_size = processor.max_queue_size // 2
+        if self.bytes_per_span and self.body_size_exporter:
+            body_size_limit = self.body_size_exporter.max_body_size * self.BODY_SIZE_HEADROOM
+            max_batch_size = min(max_batch_size, int(body_size_limit / self.bytes_per_span))
+        max_batch_size = max(max_batch_size, 1)
+        min_batch_size = min(self.MIN_BATCH_SIZE, max_batch_size)
+        expected_spans = rate * (delay / 1000 + (self.export_latency or 0))
+        batch_size = int(min(max(expected_spans, min_batch_size), max_batch_size))
+
+        processor.schedule_delay_millis = delay
+        processor.max_export_batch_size = batch_size
+
+    def _smooth(self, average: float | None, value: float) -> float:
+        if average is None:
+            return value
+        return average + self.SMOOTHING * (value - average)
+
+
+class MeasuringSpanExporter(WrapperSpanExporter):
+    """Counts exported spans in `EXPORT_STATS` and reports the duration and body size of each export to a tuner."""
+
+    def __init__(self, exporter: SpanExporter, tuner: AdaptiveBatchTuner | None) -> None:
+        super().__init__(exporter)
+        self.tuner = tuner
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        result = SpanExportResult.FAILURE
+        tuner = self.tuner
+        body_size_exporter = tuner and tuner.body_size_exporter
+        body_bytes_before = body_size_exporter.total_body_bytes if body_size_exporter else 0
+        start = time.monotonic()
+        try:
+            result = super().export(spans)
+            return result
+        finally:
+            if result is SpanExportResult.SUCCESS:
+                EXPORT_STATS.add(spans_exported=sum(map(_is_counted, spans)))
+            else:
+                EXPORT_STATS.add(spans_export_failed=sum(map(_is_counted, spans)))
+            if tuner:
+                body_bytes = body_size_exporter.total_body_bytes - body_bytes_before if body_size_exporter else None
+                tuner.record_export(len(spans), time.monotonic() - start, body_bytes)
+
+
+def _is_counted(span: ReadableSpan) -> bool:
+    """Whether the span is counted in `EXPORT_STATS`.
+
+    Lazy pending spans are only markers, and most of them are skipped by `RemovePendingSpansExporter`.
+    """
+    return span.__class__ is not LazyPendingSpan
+
+
+def _unwrap_measuring(exporter: SpanExporter) -> SpanExporter:
+    if isinstance(exporter, MeasuringSpanExporter):
+        return exporter.wrapped_exporter
+    return exporter
+
+
+_TUNERS: WeakSet[AdaptiveBatchTuner] = WeakSet()
+
+
+@cache
+def _register_tuner_metrics() -> None:
+    def schedule_delay_callback(_options: CallbackOptions) -> Iterable[Observation]:
+        for tuner in list(_TUNERS):
+            yield Observation(tuner.processor.schedule_delay_millis)
+
+    def batch_size_callback(_options: CallbackOptions) -> Iterable[Observation]:
+        for tuner in list(_TUNERS):
+            yield Observation(tuner.processor.max_export_batch_size)
+
+    def span_rate_callback(_options: CallbackOptions) -> Iterable[Observation]:
+        for tuner in list(_TUNERS):
+            if tuner.span_rate is not None:
+                yield Observation(tuner.span_rate)
+
+    register_internal_callback_metric(
+        'gauge',
+        'logfire.batch_span_processor.schedule_delay',
+        schedule_delay_callback,
+        description='Current schedule delay chosen by adaptive batching.',
+        unit='ms',
+    )
+    register_internal_callback_metric(
+        'gauge',
+        'logfire.batch_span_processor.max_export_batch_size',
+        batch_size_callback,
+        description='Current maximum number of spans per export chosen by adaptive batching.',
+        unit='{span}',
+    )
+    register_internal_callback_metric(
+        'gauge',
+        'logfire.batch_span_processor.span_rate',
+        span_rate_callback,
+        description='Rate of spans arriving at the batch span processor, as measured by adaptive batching.',
+        unit='{span}/s',
+    )
@@ -1,18 +1,21 @@
 from __future__ import annotations
 
+import gzip
 import random
 import time
-import uuid
-from collections import deque
-from collections.abc import Mapping, Sequence
-from functools import cached_property
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass
+from functools import cache, cached_property
 from pathlib import Path
 from tempfile import mkdtemp
-from threading import Lock, Thread
+from threading import Lock, Thread, current_thread
 from typing import Any
+from urllib.parse import urlparse
+from weakref import WeakSet
 
 import requests.exceptions
 from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+from opentelemetry.metrics import CallbackOptions, Counter, Observation
 from opentelemetry.sdk._logs import LogData
 from opentelemetry.sdk._logs._internal.export import LogExportResult
 from opentelemetry.sdk.trace import ReadableSpan
@@ -21,7 +24,10 @@ from requests import Session
 
 import logfire
 
+from ..export_stats import EXPORT_STATS
+from ..metrics import register_internal_callback_metric
 from ..utils import logger, platform_is_emscripten
+from .spool import ExportSpool, SpooledExport
 from .wrapper import WrapperLogExporter, WrapperSpanExporter
 
 
@@ -36,6 +42,8 @@ class BodySizeCheckingOTLPSpanExporter(OTLPSpanExporter):
     def __init__(self, *args: Any, **kwargs: Any):
         super().__init__(*args, **kwargs)
         self._current_num_spans = 0
+        # Total size of the uncompressed bodies of all export requests, used to measure the size of spans.
+        self.total_body_bytes = 0
 
     def export(self, spans: Sequence[ReadableSpan]):
         self._current_num_spans = len(spans)
@@ -47,12 +55,18 @@ class BodySizeCheckingOTLPSpanExporter(OTLPSpanExporter):
             # Tell outer RetryFewerSpansSpanExporter to split in half
             raise BodyTooLargeError(len(serialized_data), self.max_body_size)
 
+        self.total_body_bytes += len(serialized_data)
         return super()._export(serialized_data, *args, **kwargs)
 
 
 class OTLPExporterHttpSession(Session):
     """A requests.Session subclass that defers failed requests to a DiskRetryer."""
 
+    def __init__(self, spool_dir: Path | None = None):
+        super().__init__()
+        # Directory where the DiskRetryer persists failed exports, see `AdvancedOptions.retry_spool_dir`.
+        self.spool_dir = spool_dir
+
     def post(self, url: str, data: bytes, **kwargs: Any):  # type: ignore
         try:
             response = super().post(url, data=data, **kwargs)
@@ -64,7 +78,8 @@ class OTLPExporterHttpSession(Session):
             #   In particular this would help with very transient errors (as opposed to logfire being down)
             #   that happen when the process is shutting down.
             #   DiskRetryer uses a daemon thread so it will shut down when the main thread does,
-            #   meaning that kind of failed export would be lost.
+            #   meaning that kind of failed export would be lost
+            #   (unless `AdvancedOptions.retry_spool_dir` is set, in which case the next process retries it).
             #   BatchSpanProcessor on the other hand stays alive for a bit with a deadline.
             #   If we do this we must measure and limit the amount of time spent requesting and retrying.
             # TODO consider increasing the BatchSpanProcessor export delay here
@@ -80,7 +95,7 @@ class OTLPExporterHttpSession(Session):
     def retryer(self) -> DiskRetryer:
         # Only create this when needed to save resources,
         # and because the full set of headers are only set some time after this session is created.
-        return DiskRetryer(self.headers)
+        return DiskRetryer(self.headers, self.spool_dir)
 
 
 def raise_for_retryable_status(response: requests.Response):
@@ -96,60 +111,118 @@ class DiskRetryer:
     # The maximum delay between retries, in seconds
     MAX_DELAY = 128
 
-    # The maximum number of exports to retry. Each export is a file on disk.
+    # The maximum number of bytes of failed exports to store on disk.
     # This amount should allow comfortably handling a few minutes of backend downtime
     # while the BatchSpanProcessor produces a batch every half a second.
-    # If the number of failed exports exceeds this limit, new exports will be dropped.
-    # TODO ideally we should be measuring the total size of exports instead of the number of files,
-    #   and compare it to a limit based on disk space.
-    MAX_TASKS = 1000
+    # If the failed exports exceed this limit, the oldest exports will be dropped to make room.
+    MAX_BYTES = 256 * 1024 * 1024
+
+    # Exports on disk are appended to segment files of roughly this size
+    # to avoid creating a new file for each export.
+    SEGMENT_BYTES = 8 * 1024 * 1024
+
+    # The first few failed exports are kept in memory to avoid disk I/O for brief failures.
+    MAX_MEMORY_BYTES = 4 * 1024 * 1024
 
     # Log about problems at most once a minute.
     LOG_INTERVAL = 60
 
-    def __init__(self, headers: Mapping[str, str | bytes]):
-        # Reading/writing `thread` and `tasks` should generally be protected by `lock`.
+    # The maximum number of exports to retry at the same time once the backend is accepting requests again.
+    # Concurrency starts at 1 and increases by 1 with each successful request,
+    # and drops back to 1 as soon as a request fails so that only a single request probes a backend that's down.
+    MAX_CONCURRENCY = 4
+
+    # Consecutive failed exports to the same OTLP endpoint are merged into a single request
+    # with an uncompressed body up to this size, to reduce the number of requests needed to recover.
+    MAX_BATCH_BODY_SIZE = BodySizeCheckingOTLPSpanExporter.max_body_size
+
+    def __init__(self, headers: Mapping[str, str | bytes], directory: Path | None = None):
+        # Reading/writing `threads`, `concurrency` and `delay` should generally be protected by `lock`.
         self.lock = Lock()
-        self.thread: Thread | None = None
-        self.tasks: deque[tuple[Path, dict[str, Any]]] = deque()
+        self.threads: set[Thread] = set()
+        self.concurrency = 1
+        # Seconds to wait (plus jitter) before the next attempt. This is 0 while requests are succeeding.
+        self.delay: float = 1
 
-        # Make a new session rather than using the OTLPExporterHttpSession directly
-        # because thread safety of Session is questionable.
+        # Make a new plain session rather than using the OTLPExporterHttpSession directly,
+        # which would defer its own failures back to this retryer.
         # This assumes that the only important state is the headers.
+        # The worker threads share this session: they only read the headers, which never change after this,
+        # and use its connection pool, which is thread safe and larger than MAX_CONCURRENCY.
+        # Cookies and other per-request state of `Session` aren't used by OTLP exports.
         self.session = Session()
         self.session.headers.update(headers)
 
         # The directory where the export files are stored.
-        self.dir = Path(mkdtemp(prefix='logfire-retryer-'))
-
+        # If a directory is configured, exports are persisted there so that they can be retried
+        # by the next process to start, so nothing is kept only in memory.
+        if directory is None:
+            self.dir = Path(mkdtemp(prefix='logfire-retryer-'))
+            max_memory_bytes = self.MAX_MEMORY_BYTES
+        else:
+            self.dir = directory
+            max_memory_bytes = 0
+        self.spool = ExportSpool(
+            self.dir,
+            max_bytes=self.MAX_BYTES,
+            segment_bytes=self.SEGMENT_BYTES,
+            max_memory_bytes=max_memory_bytes,
+        )
+
+        # Number of exports successfully sent, and number of failed requests. Only updated while holding `lock`.
+        self.num_succeeded = 0
+        self.num_failed = 0
         self.last_log_time = -float('inf')
 
+        _RETRYERS.add(self)
+        self.attempts_counter = _retryer_attempts_counter()
+        self.drained_counter = _retryer_drained_counter()
+
     def add_task(self, data: bytes, kwargs: dict[str, Any]):
         try:
-            if len(self.tasks) >= self.MAX_TASKS:  # pragma: no cover
-                if self._should_log():
-                    logger.error('Already retrying %s failed exports, dropping an export', len(self.tasks))
-                return
-
-            # TODO consider keeping the first few tasks in memory to avoid disk I/O and possible errors.
-            path = self.dir / uuid.uuid4().hex
-            path.write_bytes(data)
-
-            with self.lock:
-                self.tasks.append((path, kwargs))
-                if not (self.thread and self.thread.is_alive()):
-                    # daemon=True to avoid hanging the program on exit, since this might never finish.
-                    # See caveat about this where add_task is called.
-                    self.thread = Thread(target=self._run, daemon=True)
-                    self.thread.start()
-                num_tasks = len(self.tasks)
+            num_dropped = self.spool.num_dropped
+            self.spool.append(data, kwargs)
+            num_dropped = self.spool.num_dropped - num_dropped
+            if num_dropped:
+                EXPORT_STATS.add(exports_dropped_retry_limit=num_dropped)
+                if self._should_log():  # pragma: no branch
+                    logger.error(
+                        'Failed exports exceeded the limit of %s bytes, dropped %s export(s)',
+                        self.MAX_BYTES,
+                        num_dropped,
+                    )
+
+            self._start_threads()
 
             if self._should_log():
-                logger.warning('Currently retrying %s failed export(s)', num_tasks)
+                logger.warning('Currently retrying %s failed export(s)', len(self.spool))
         except Exception as e:  # pragma: no cover
             if self._should_log():
                 logger.error('Export and retry failed: %s', e)
 
+    def drain_spool(self):
+        """Start retrying exports left in the spool directory by processes that are no longer running."""
+        try:
+            num_adopted = self.spool.adopt_orphaned_segments()
+            if num_adopted:
+                logger.info('Retrying %s export(s) left over by a previous process', num_adopted)
+                self._start_threads()
+        except Exception as e:  # pragma: no cover
+            logger.error('Failed to resume retrying exports from %s: %s', self.dir, e)
+
+    def _start_threads(self):
+        with self.lock:
+            if not self.threads:
+                # An export has just failed, so wait a bit before retrying.
+                self.delay = max(self.delay, 1)
+            num_new_threads = min(self.concurrency - len(self.threads), self.spool.num_unread)
+            for _ in range(num_new_threads):
+                # daemon=True to avoid hanging the program on exit, since this might never finish.
+                # See caveat about this where add_task is called.
+                thread = Thread(target=self._run, name='logfire_retryer', daemon=True)
+                self.threads.add(thread)
+                thread.start()
+
     def _should_log(self) -> bool:
         result = time.monotonic() - self.last_log_time >= self.LOG_INTERVAL
         if result:
@@ -157,44 +230,223 @@ class DiskRetryer:
         return result
 
     def _run(self):
-        delay = 1
+        this_thread = current_thread()
         while True:
             with self.lock:
-                if not self.tasks:
-                    # All done, end the thread.
-                    self.thread = None
-                    break
-
                 # Keep this outside the try block below so that if somehow this part fails
-                # the queue still gets smaller, and we don't get stuck in a hot infinite loop.
-                task = self.tasks.popleft()
+                # the spool still gets smaller, and we don't get stuck in a hot infinite loop.
+                task = self._next_batch() if len(self.threads) <= self.concurrency else None
+                if task is None:
+                    # All done, or there are more threads than needed, end this thread.
+                    self.threads.discard(this_thread)
+                    break
 
             try:
-                path, kwargs = task
-                data = path.read_bytes()
-                while True:
-                    # Exponential backoff with jitter.
-                    # The jitter is proportional to the delay, in particular so that if we go down for a while
-                    # and then come back up then retry requests will be spread out over a time of MAX_DELAY.
-                    time.sleep(delay * (1 + random.random()))
-                    try:
-                        with logfire.suppress_instrumentation():
-                            response = self.session.post(**kwargs, data=data)
-                        raise_for_retryable_status(response)
-                    except requests.exceptions.RequestException:
-                        # Failed, increase delay exponentially up to MAX_DELAY.
-                        delay = min(delay * 2, self.MAX_DELAY)
-                    else:
-                        # Success, reset the delay (so that remaining tasks can be done quickly),
-                        # remove the file, and move on to the next task.
-                        delay = 1
-                        path.unlink()
-                        break
-
+                # Merging may decompress several MB, so it's done without holding the lock,
+                # which `add_task` needs on the export thread.
+                self._merge(task)
+                if not self._retry(task):
+                    break
             except Exception:  # pragma: no cover
                 if self._should_log():
                     logger.exception('Error retrying export')
 
+    def _next_batch(self) -> _RetryBatch | None:
+        """Pop the next export from the spool, along with any following exports that can be sent in the same request.
+
+        This is called while holding `lock`, so the bodies are only decompressed later by `_merge`.
+        """
+        first = self.spool.pop()
+        if first is None:
+            return None
+        batch = _RetryBatch([first], first.kwargs)
+        if not self._can_merge(first):
+            return batch
+
+        size = self._body_size(first)
+        while (export := self.spool.pop()) is not None:
+            if export.kwargs != first.kwargs or not export.mergeable:
+                self.spool.requeue(export)
+                break
+            body_size = self._body_size(export)
+            if size + body_size > self.MAX_BATCH_BODY_SIZE:
+                self.spool.requeue(export)
+                break
+            batch.exports.append(export)
+            size += body_size
+        return batch
+
+    def _can_merge(self, export: SpooledExport) -> bool:
+        # Every OTLP Export*ServiceRequest message consists of a single repeated field,
+        # and concatenating serialized protobuf messages merges them by appending repeated fields.
+        # So requests to the same endpoint can be merged by simply concatenating their uncompressed bodies.
+        if not export.mergeable:
+            return False
+        url: str = export.kwargs.get('url', '')
+        encoding = self.session.headers.get('Content-Encoding', 'identity')
+        return urlparse(url).path.endswith(OTLP_PATHS) and encoding in ('gzip', 'identity')
+
+    def _body_size(self, export: SpooledExport) -> int:
+        if self.session.headers.get('Content-Encoding') == 'gzip':
+            # A gzip file ends with the size of the uncompressed data (modulo 2**32), so it's not decompressed here.
+            return int.from_bytes(export.data[-4:], 'little')
+        return export.size
+
+    def _merge(self, batch: _RetryBatch) -> None:
+        if len(batch.exports) > 1:
+            try:
+                body = b''.join([self._decompress(export.data) for export in batch.exports])
+            except Exception:  # pragma: no cover
+                # Send the exports separately so that a corrupt export doesn't affect the others.
+                for export in reversed(batch.exports[1:]):
+                    export.mergeable = False
+                    self.spool.requeue(export)
+                del batch.exports[1:]
+            else:
+                batch.data = gzip.compress(body) if self.session.headers.get('Content-Encoding') == 'gzip' else body
+                return
+        # Send the original body as is to avoid recompressing it.
+        batch.data = batch.exports[0].data
+
+    def _decompress(self, data: bytes) -> bytes:
+        if self.session.headers.get('Content-Encoding') == 'gzip':
+            return gzip.decompress(data)
+        return data
+
+    def _retry(self, task: _RetryBatch) -> bool:
+        """Retry sending the exports until it succeeds.
+
+        Returns `False` if this thread should stop because another thread is taking care of probing the backend.
+        """
+        while True:
+            delay = self.delay
+            if delay:
+                # Exponential backoff with jitter.
+                # The jitter is proportional to the delay, in particular so that if we go down for a while
+                # and then come back up then retry requests will be spread out over a time of MAX_DELAY.
+                time.sleep(delay * (1 + random.random()))
+            try:
+                with logfire.suppress_instrumentation():
+                    response = self.session.post(**task.kwargs, data=task.data)
+                raise_for_retryable_status(response)
+            except requests.exceptions.RequestException:
+                self.attempts_counter.add(1, {'success': False})
+                with self.lock:
+                    self.num_failed += 1
+                    # Failed, increase delay exponentially up to MAX_DELAY, and go back to a single thread.
+                    self.delay = min(max(delay * 2, 1), self.MAX_DELAY)
+                    self.concurrency = 1
+                    if len(self.threads) > 1:
+                        # Leave the exports for the remaining thread(s) to retry.
+                        for export in reversed(task.exports):
+                            self.spool.requeue(export)
+                        self.threads.discard(current_thread())
+                        return False
+            else:
+                if len(task.exports) > 1 and not response.ok:
+                    # The backend rejected the merged request, e.g. because one of the exports is invalid.
+                    # Send the exports separately instead, so that only the invalid ones are lost.
+                    self.attempts_counter.add(1, {'success': False})
+                    with self.lock:
+                        self.num_failed += 1
+                    for export in reversed(task.exports):
+                        export.mergeable = False
+                        self.spool.requeue(export)
+                    return True
+
+                # Success, remove the delay (so that remaining tasks can be done quickly),
+                # release the stored export, and move on to the next task with more threads.
+                # Exports rejected by the backend for a reason that retrying won't fix are also released here.
+                self.attempts_counter.add(1, {'success': True})
+                self.drained_counter.add(len(task.exports))
+                for export in task.exports:
+                    self.spool.ack(export)
+                with self.lock:
+                    self.num_succeeded += len(task.exports)
+                    self.delay = 0
+                    self.concurrency = min(self.concurrency + 1, self.MAX_CONCURRENCY)
+                self._start_threads()
+                return True
+
+
+OTLP_PATHS = ('/v1/traces', '/v1/metrics', '/v1/logs')
+
+
+@dataclass
+class _RetryBatch:
+    """One or more spooled exports to the same endpoint, retried as a single request."""
+
+    exports: list[SpooledExport]
+    kwargs: dict[str, Any]
+
+    data: bytes = b''
+    """The body of the request, set by `DiskRetryer._merge`."""
+
+
+_RETRYERS: WeakSet[DiskRetryer] = WeakSet()
+
+
+def _active_retryers() -> list[DiskRetryer]:
+    # Only report on retryers that have something to do, to avoid exporting a stream of zeros from healthy processes.
+    return [retryer for retryer in list(_RETRYERS) if retryer.threads or retryer.spool]
+
+
+@cache
+def _retryer_attempts_counter() -> Counter:
+    # Registered lazily and only once since there's generally only one DiskRetryer per process.
+    _register_retryer_gauges()
+    return logfire.metric_counter(
+        'logfire.export_retry.attempts',
+        description='Number of requests made to retry failed exports. Each request may contain several exports.',
+        unit='{attempt}',
+    )
+
+
+@cache
+def _retryer_drained_counter() -> Counter:
+    return logfire.metric_counter(
+        'logfire.export_retry.drained',
+        description='Number of failed exports removed from the backlog after being retried. This is the drain rate.',
+        unit='{export}',
+    )
+
+
+@cache
+def _register_retryer_gauges() -> None:
+    def backlog_callback(_options: CallbackOptions) -> Iterable[Observation]:
+        for retryer in _active_retryers():
+            yield Observation(len(retryer.spool))
+
+    def backlog_bytes_callback(_options: CallbackOptions) -> Iterable[Observation]:
+        for retryer in _active_retryers():
+            yield Observation(retryer.spool.memory_bytes + retryer.spool.disk_bytes)
+
+    def concurrency_callback(_options: CallbackOptions) -> Iterable[Observation]:
+        for retryer in _active_retryers():
+            yield Observation(len(retryer.threads))
+
+    register_internal_callback_metric(
+        'gauge',
+        'logfire.export_retry.backlog',
+        backlog_callback,
+        description='Number of failed exports waiting to be retried.',
+        unit='{export}',
+    )
+    register_internal_callback_metric(
+        'gauge',
+        'logfire.export_retry.backlog_size',
+        backlog_bytes_callback,
+        description='Total size of failed exports waiting to be retried.',
+        unit='By',
+    )
+    register_internal_callback_metric(
+        'gauge',
+        'logfire.export_retry.concurrency',
+        concurrency_callback,
+        description='Number of threads currently retrying failed exports.',
+        unit='{thread}',
+    )
+
 
 class RetryFewerSpansSpanExporter(WrapperSpanExporter):
     """A SpanExporter that retries exporting spans in smaller batches if BodyTooLargeError is raised.
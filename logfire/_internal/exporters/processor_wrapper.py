@@ -3,7 +3,8 @@ from __future__ import annotations
 import json
 from contextlib import suppress
 from dataclasses import dataclass
-from typing import Any, cast
+from functools import cache
+from typing import Any, Callable, cast
 from urllib.parse import parse_qs, urlparse
 
 from opentelemetry import context
@@ -74,20 +75,31 @@ class MainSpanProcessorWrapper(WrapperSpanProcessor):
         super().on_start(span, parent_context)
 
     def on_end(self, span: ReadableSpan) -> None:
+        super().on_end(self.process(span))
+
+    def process(self, span: ReadableSpan) -> ReadableSpan:
+        """Apply the transforms and scrubbing to `span`, returning a new span only if something changed."""
         with handle_internal_errors:
             span_dict = span_to_dict(span)
-            _tweak_asgi_send_receive_spans(span_dict)
-            _tweak_sqlalchemy_connect_spans(span_dict)
-            _tweak_http_spans(span_dict)
-            _summarize_db_statement(span_dict)
-            _set_error_level_and_status(span_dict)
-            _transform_langchain_span(span_dict)
-            _transform_google_genai_span(span_dict)
-            _transform_litellm_span(span_dict)
-            _default_gen_ai_response_model(span_dict)
+            original = _mutable_fields(span_dict)
+            scope = span_dict['instrumentation_scope']
+            attributes = span_dict['attributes']
+            present_keys = _TRANSFORM_KEYS.intersection(attributes)
+            for transform, keys in _transforms_for_scope(scope and scope.name):
+                if keys is not None:
+                    if span_dict['attributes'] is not attributes:
+                        # An earlier transform changed the attributes.
+                        attributes = span_dict['attributes']
+                        present_keys = _TRANSFORM_KEYS.intersection(attributes)
+                    if keys.isdisjoint(present_keys):
+                        continue
+                transform(span_dict)
             self.scrubber.scrub_span(span_dict)
-            span = ReadableSpan(**span_dict)
-        super().on_end(span)
+            # Transforms and scrubbing replace rather than mutate fields that they change,
+            # so if nothing has been replaced the original span can be passed on without copying it.
+            if any(new is not old for new, old in zip(_mutable_fields(span_dict), original)):
+                return ReadableSpan(**span_dict)
+        return span
 
 
 def _set_error_level_and_status(span: ReadableSpanDict) -> None:
@@ -521,3 +533,45 @@ def guess_system(model: str, default: str = ''):
         return 'anthropic'
     else:
         return default
+
+
+SpanTransform = Callable[[ReadableSpanDict], None]
+
+# All the transforms applied to spans by `MainSpanProcessorWrapper.on_end`, in order, along with:
+# - The names of the instrumentation scopes that the transform applies to, or `None` for all scopes.
+# - The attribute keys of which at least one must be present for the transform to do anything, or `None` to always run.
+# This allows skipping transforms cheaply, particularly for spans created by logfire itself.
+_SPAN_TRANSFORMS: list[tuple[SpanTransform, frozenset[str] | None, frozenset[str] | None]] = [
+    (
+        _tweak_asgi_send_receive_spans,
+        frozenset(
+            {
+                'opentelemetry.instrumentation.asgi',
+                'opentelemetry.instrumentation.starlette',
+                'opentelemetry.instrumentation.fastapi',
+            }
+        ),
+        None,
+    ),
+    (_tweak_sqlalchemy_connect_spans, frozenset({'opentelemetry.instrumentation.sqlalchemy'}), None),
+    (_tweak_http_spans, None, frozenset({'http.method', 'http.route', 'http.target', 'http.url'})),
+    (_summarize_db_statement, None, frozenset({'db.statement'})),
+    (_set_error_level_and_status, None, None),
+    (_transform_langchain_span, frozenset({'openinference.instrumentation.langchain', 'langsmith'}), None),
+    (_transform_google_genai_span, frozenset({'opentelemetry.instrumentation.google_genai'}), None),
+    (_transform_litellm_span, frozenset({'openinference.instrumentation.litellm'}), None),
+    (_default_gen_ai_response_model, None, frozenset({'gen_ai.request.model'})),
+]
+
+_TRANSFORM_KEYS: frozenset[str] = frozenset[str]().union(*[keys for _, _, keys in _SPAN_TRANSFORMS if keys])
+
+
+@cache
+def _transforms_for_scope(scope_name: str | None) -> tuple[tuple[SpanTransform, frozenset[str] | None], ...]:
+    return tuple(
+        (transform, keys) for transform, scopes, keys in _SPAN_TRANSFORMS if scopes is None or scope_name in scopes
+    )
+
+
+def _mutable_fields(span: ReadableSpanDict) -> tuple[Any, ...]:
+    return span['name'], span['attributes'], span['events'], span['links'], span['status']
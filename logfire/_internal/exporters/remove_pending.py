@@ -6,11 +6,15 @@ from opentelemetry.sdk.trace import ReadableSpan
 from opentelemetry.sdk.trace.export import SpanExportResult
 
 from ..constants import ATTRIBUTES_SPAN_TYPE_KEY
+from ..tracer import LazyPendingSpan
 from .wrapper import WrapperSpanExporter
 
 
 class RemovePendingSpansExporter(WrapperSpanExporter):
-    """An exporter that filters out pending spans if the corresponding final span is already in the same batch."""
+    """An exporter that filters out pending spans if the corresponding final span is already in the same batch.
+
+    It also materializes `LazyPendingSpan`s, skipping those whose span has already ended.
+    """
 
     def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
         result: list[ReadableSpan] = []
@@ -21,6 +25,13 @@ class RemovePendingSpansExporter(WrapperSpanExporter):
         spans_by_id: dict[tuple[int, int], ReadableSpan] = {}
 
         for span in spans:
+            if isinstance(span, LazyPendingSpan):
+                materialized = span.materialize()
+                if materialized is None:
+                    # The span has already ended, so its final span is exported instead.
+                    continue
+                span = materialized
+
             attributes = span.attributes or {}
             span_type = attributes.get(ATTRIBUTES_SPAN_TYPE_KEY)
 
@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import json
+import os
+import struct
+import uuid
+import zlib
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import IO, Any
+
+from ..utils import logger
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+# Each record on disk is a header followed by the JSON encoded request kwargs and then the request body.
+# The header contains a CRC32 of everything after it so that a partially written record
+# (e.g. because the disk filled up or the process was killed) is detected rather than sent as garbage.
+RECORD_HEADER = struct.Struct('>III')  # crc32, kwargs length, data length
+
+SEGMENT_SUFFIX = '.seg'
+
+
+@dataclass
+class SpooledExport:
+    """A failed export waiting to be retried."""
+
+    data: bytes
+    kwargs: dict[str, Any]
+
+    segment: Segment | None = None
+    """The segment file that this export was read from, or `None` if it was only ever stored in memory."""
+
+    mergeable: bool = True
+    """Whether this export may be sent in the same request as other exports. This isn't stored on disk."""
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+
+@dataclass(eq=False)
+class Segment:
+    """An append-only file containing a sequence of length-prefixed records.
+
+    The file stays open (and locked, where supported) for as long as the segment belongs to a spool,
+    so that other processes sharing the directory know not to touch it.
+    """
+
+    path: Path
+    file: IO[bytes]
+    size: int = 0
+
+    writable: bool = True
+    """Whether new records may be appended. This becomes `False` once the segment is full."""
+
+    num_unread: int = 0
+    """Number of records written to this segment that haven't been returned by `ExportSpool.pop` yet."""
+
+    num_unacked: int = 0
+    """Number of records that have been popped but not yet acknowledged."""
+
+    read_offset: int = 0
+
+    @property
+    def done(self) -> bool:
+        return self.num_unread == 0 and self.num_unacked == 0
+
+
+@dataclass
+class ExportSpool:
+    """Stores failed exports in order, bounded by the total number of bytes.
+
+    Exports are kept in memory until `max_memory_bytes` is reached, after which they're appended to segment files
+    in `directory`, each up to roughly `segment_bytes` in size.
+    Once a segment has been completely read and acknowledged, its file is deleted.
+    If the segments on disk would exceed `max_bytes`, the oldest segments are deleted to make room,
+    and the exports they contain are lost. This means that retry storage costs sequential I/O
+    rather than creating lots of small files.
+
+    Several processes can share the same directory: each one only writes to its own segments,
+    and segments left behind by processes that have exited can be taken over with `adopt_orphaned_segments`.
+    This relies on `fcntl.flock`, so on platforms without it (i.e. Windows) other processes' segments are ignored.
+
+    All methods are thread safe.
+    """
+
+    directory: Path
+    max_bytes: int
+    segment_bytes: int
+    max_memory_bytes: int = 0
+
+    num_dropped: int = 0
+    """Total number of exports that were dropped because the spool was full or a segment was corrupt."""
+
+    lock: Lock = field(default_factory=Lock, repr=False)
+    memory: deque[SpooledExport] = field(default_factory=deque[SpooledExport], repr=False)
+    memory_bytes: int = 0
+    # Number of exports popped from `memory` that haven't been acknowledged or requeued yet.
+    memory_unacked: int = 0
+    # Exports read from segments that were put back by `requeue`.
+    # These still count towards `Segment.num_unacked`, so they're not included in `len()` or `memory_bytes`.
+    requeued: deque[SpooledExport] = field(default_factory=deque[SpooledExport], repr=False)
+    segments: deque[Segment] = field(default_factory=deque[Segment], repr=False)
+    next_segment_number: int = 0
+
+    # Prefix for the names of segments created by this spool, unique to avoid conflicts with other processes.
+    owner: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+    def __len__(self) -> int:
+        """The number of exports that haven't been acknowledged yet, including those currently being retried."""
+        with self.lock:
+            return len(self.memory) + self.memory_unacked + sum(s.num_unread + s.num_unacked for s in self.segments)
+
+    @property
+    def disk_bytes(self) -> int:
+        return sum(s.size for s in self.segments)
+
+    @property
+    def num_unread(self) -> int:
+        """The number of exports that can currently be returned by `pop`."""
+        return len(self.requeued) + len(self.memory) + sum(s.num_unread for s in self.segments)
+
+    def append(self, data: bytes, kwargs: dict[str, Any]) -> bool:
+        """Add an export to the end of the spool.
+
+        Returns `False` if the export was too large to store at all.
+        """
+        with self.lock:
+            # Only use memory while nothing is on disk, so that exports stay in order.
+            if not self.segments and self.memory_bytes + len(data) <= self.max_memory_bytes:
+                self.memory.append(SpooledExport(data, kwargs))
+                self.memory_bytes += len(data)
+                return True
+
+            kwargs_bytes = json.dumps(kwargs).encode()
+            record_size = RECORD_HEADER.size + len(kwargs_bytes) + len(data)
+            if record_size > self.max_bytes:
+                self.num_dropped += 1
+                return False
+
+            self._evict(self.max_bytes - record_size)
+            segment = self._writable_segment()
+            crc = zlib.crc32(data, zlib.crc32(kwargs_bytes))
+            segment.file.write(b''.join([RECORD_HEADER.pack(crc, len(kwargs_bytes), len(data)), kwargs_bytes, data]))
+            segment.file.flush()
+            segment.size += record_size
+            segment.num_unread += 1
+            if segment.size >= self.segment_bytes:
+                segment.writable = False
+            return True
+
+    def pop(self) -> SpooledExport | None:
+        """Remove and return the oldest export that hasn't been popped yet.
+
+        The export must be passed to `ack` once it has been sent successfully
+        so that the segment containing it can be deleted.
+        """
+        with self.lock:
+            # Exports only stay in memory while nothing is on disk, so they're older than any requeued export.
+            if self.memory:
+                export = self.memory.popleft()
+                self.memory_bytes -= export.size
+                self.memory_unacked += 1
+                return export
+
+            if self.requeued:
+                return self.requeued.popleft()
+
+            for segment in list(self.segments):
+                if not segment.num_unread:
+                    continue
+                export = self._read_record(segment)
+                if export is not None:
+                    return export
+            return None
+
+    def requeue(self, export: SpooledExport) -> None:
+        """Put an export returned by `pop` back at the front of the spool so that it's popped again next."""
+        with self.lock:
+            if export.segment is not None:
+                self.requeued.appendleft(export)
+                return
+            self.memory.appendleft(export)
+            self.memory_bytes += export.size
+            self.memory_unacked -= 1
+
+    def ack(self, export: SpooledExport) -> None:
+        """Mark an export returned by `pop` as no longer needed."""
+        segment = export.segment
+        with self.lock:
+            if segment is None:
+                self.memory_unacked -= 1
+                return
+            if segment not in self.segments:
+                # The segment was evicted while the export was being retried.
+                return
+            segment.num_unacked -= 1
+            self._cleanup()
+
+    def adopt_orphaned_segments(self) -> int:
+        """Take over segments in the directory left behind by processes that are no longer running.
+
+        Adopted segments are placed before this spool's own segments since they're older.
+        Returns the number of exports adopted.
+        """
+        if fcntl is None:  # pragma: no cover
+            return 0
+
+        with self.lock:
+            own_paths = {s.path for s in self.segments}
+            adopted: list[tuple[float, Segment]] = []
+            for path in self.directory.glob(f'*{SEGMENT_SUFFIX}'):
+                if path in own_paths:
+                    continue
+                try:
+                    segment = self._open_orphaned_segment(path)
+                except OSError:  # pragma: no cover
+                    continue
+                if segment is not None:
+                    adopted.append((path.stat().st_mtime, segment))
+
+            adopted.sort(key=lambda pair: pair[0])
+            for _, segment in reversed(adopted):
+                self.segments.appendleft(segment)
+            self._evict(self.max_bytes)
+            self._cleanup()
+            return sum(segment.num_unread for _, segment in adopted)
+
+    def close(self) -> None:
+        """Release this spool's segments without deleting them, so that another process can adopt them."""
+        with self.lock:
+            for segment in self.segments:
+                segment.file.close()
+            self.segments.clear()
+
+    def _writable_segment(self) -> Segment:
+        if self.segments and self.segments[-1].writable:
+            return self.segments[-1]
+        self.directory.mkdir(parents=True, exist_ok=True)
+        while True:
+            path = self.directory / f'{self.owner}-{self.next_segment_number:010d}{SEGMENT_SUFFIX}'
+            self.next_segment_number += 1
+            file = path.open('a+b')
+            if _try_lock(file):
+                break
+            # Another spool with the same owner, e.g. in a forked process, is using this segment.
+            file.close()
+        segment = Segment(path, file)
+        self.segments.append(segment)
+        return segment
+
+    def _open_orphaned_segment(self, path: Path) -> Segment | None:
+        file = path.open('r+b')
+        if not _try_lock(file):
+            # Another live process owns or has already adopted this segment.
+            file.close()
+            return None
+
+        try:
+            if os.fstat(file.fileno()).st_ino != path.stat().st_ino:
+                raise FileNotFoundError
+        except FileNotFoundError:
+            # The previous owner deleted the file after we opened it.
+            file.close()
+            return None
+
+        # Count the complete records. A truncated record at the end is ignored,
+        # and an invalid checksum will be detected when the record is read.
+        file.seek(0)
+        contents_size = os.fstat(file.fileno()).st_size
+        offset = num_records = 0
+        while offset + RECORD_HEADER.size <= contents_size:
+            _, kwargs_length, data_length = RECORD_HEADER.unpack(file.read(RECORD_HEADER.size))
+            record_size = RECORD_HEADER.size + kwargs_length + data_length
+            if offset + record_size > contents_size:
+                break
+            offset += record_size
+            num_records += 1
+            file.seek(offset)
+
+        return Segment(path, file, size=contents_size, writable=False, num_unread=num_records)
+
+    def _delete_segment(self, segment: Segment) -> None:
+        self.segments.remove(segment)
+        # Delete before closing so that the file is never unlocked while it still exists.
+        segment.path.unlink(missing_ok=True)
+        segment.file.close()
+
+    def _evict(self, target_bytes: int) -> None:
+        """Delete the oldest segments until at most `target_bytes` are stored on disk."""
+        while self.segments and self.disk_bytes > target_bytes:
+            segment = self.segments[0]
+            self.num_dropped += segment.num_unread
+            self._delete_segment(segment)
+
+    def _cleanup(self) -> None:
+        """Delete segments from the front of the queue whose records have all been acknowledged."""
+        while self.segments and self.segments[0].done:
+            self._delete_segment(self.segments[0])
+
+    def _read_record(self, segment: Segment) -> SpooledExport | None:
+        try:
+            f = segment.file
+            f.seek(segment.read_offset)
+            header = f.read(RECORD_HEADER.size)
+            crc, kwargs_length, data_length = RECORD_HEADER.unpack(header)
+            kwargs_bytes = f.read(kwargs_length)
+            data = f.read(data_length)
+            if len(kwargs_bytes) != kwargs_length or len(data) != data_length:
+                raise ValueError('Truncated record')
+            if zlib.crc32(data, zlib.crc32(kwargs_bytes)) != crc:
+                raise ValueError('Checksum mismatch')
+            kwargs = json.loads(kwargs_bytes)
+        except Exception as e:
+            # Nothing after a corrupt record in this segment can be trusted, so skip the rest of it.
+            logger.error(
+                'Failed to read retry spool segment %s, dropping %s export(s): %s', segment.path, segment.num_unread, e
+            )
+            self.num_dropped += segment.num_unread
+            segment.num_unread = 0
+            segment.writable = False
+            self._cleanup()
+            return None
+
+        segment.read_offset += RECORD_HEADER.size + kwargs_length + data_length
+        segment.num_unread -= 1
+        segment.num_unacked += 1
+        return SpooledExport(data, kwargs, segment)
+
+
+def _try_lock(file: IO[bytes]) -> bool:
+    """Try to get an exclusive lock on the file without blocking. Returns `True` if no locking is available."""
+    if fcntl is None:  # pragma: no cover
+        return True
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
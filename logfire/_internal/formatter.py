@@ -5,17 +5,21 @@ import inspect
 import sys
 import types
 import warnings
-from functools import lru_cache
+from collections.abc import Iterable
+from dataclasses import dataclass
+from functools import cache, lru_cache
 from string import Formatter
 from types import CodeType
-from typing import Any, Literal
+from typing import Any, Literal, NamedTuple
 
 import executing
+from opentelemetry.metrics import CallbackOptions, Observation
 from typing_extensions import NotRequired, TypedDict
 
 import logfire
 
 from .constants import ATTRIBUTES_SCRUBBED_KEY, MESSAGE_FORMATTED_VALUE_LENGTH_LIMIT
+from .metrics import register_internal_callback_metric
 from .scrubbing import NOOP_SCRUBBER, BaseScrubber, ScrubbedNote
 from .stack_info import warn_at_user_stacklevel
 from .utils import log_internal_error, truncate_string
@@ -73,6 +77,68 @@ class ChunksFormatter(Formatter):
         # Now `frame` is the frame where the user called a logfire method.
         assert frame is not None
 
+        # Finding the f-string with `executing` and compiling its parts is expensive,
+        # but the result is the same every time the same call site is reached,
+        # which is identified by the code object and the offset of the current instruction within it.
+        key = (frame.f_code, frame.f_lasti, called_code)
+        try:
+            plan = _FSTRING_PLANS[key]
+        except KeyError:
+            FSTRING_PLAN_CACHE_STATS.misses += 1
+            try:
+                plan = self._fstring_plan(called_code, frame)
+            except InspectArgumentsFailed as e:
+                # Not cached so that the warning is shown for every call, as if there was no cache.
+                warn_inspect_arguments(str(e), get_stacklevel(frame))
+                return None
+            if len(_FSTRING_PLANS) >= MAX_CACHED_FSTRING_PLANS:
+                # Unexpectedly many call sites, start over rather than growing forever.
+                _FSTRING_PLANS.clear()
+            _FSTRING_PLANS[key] = plan
+        else:
+            FSTRING_PLAN_CACHE_STATS.hits += 1
+
+        if plan is None:
+            # Not an f-string, not a problem.
+            # Just use normal formatting.
+            return None
+
+        # Now prepare the namespaces that we will use to evaluate the components.
+        global_vars = frame.f_globals
+        local_vars = {**frame.f_locals, **kwargs}
+
+        # Now for the actual formatting!
+        result: list[LiteralChunk | ArgChunk] = []
+        extra_attrs: dict[str, Any] = {}
+        scrubbed: list[ScrubbedNote] = []
+        for part in plan.parts:
+            if isinstance(part, str):
+                # These are the parts of the f-string not enclosed by `{}`, e.g. 'foo ' in f'foo {bar}'
+                result.append({'v': part, 't': 'lit'})
+            else:
+                # These are the parts of the f-string enclosed by `{}`, e.g. 'bar' in f'foo {bar}'
+                source, value_code, formatted_code = part
+
+                # The actual value of the expression.
+                value = eval(value_code, global_vars, local_vars)
+                extra_attrs[source] = value
+
+                # Format the value according to the format spec, converting to a string.
+                formatted = eval(formatted_code, global_vars, {**local_vars, '@fvalue': value})
+                formatted, value_scrubbed = self._clean_value(source, formatted, scrubber)
+                scrubbed += value_scrubbed
+                result.append({'v': formatted, 't': 'arg'})
+
+        if scrubbed:
+            extra_attrs[ATTRIBUTES_SCRUBBED_KEY] = scrubbed
+        return result, extra_attrs, plan.template
+
+    def _fstring_plan(self, called_code: CodeType, frame: types.FrameType) -> FStringPlan | None:
+        """Find the f-string passed as the message template by the call in `frame`, see `_fstring_chunks`.
+
+        Returns None if the template isn't an f-string.
+        Raises `InspectArgumentsFailed` if it can't tell.
+        """
         # This is where the magic happens. It has caching.
         ex = executing.Source.executing(frame)
 
@@ -84,13 +150,11 @@ class ChunksFormatter(Formatter):
                 # This is a very likely cause.
                 # There's nothing we could possibly do to make magic work here,
                 # and it's a clear case where the user should turn the magic off.
-                warn_inspect_arguments(
+                raise InspectArgumentsFailed(
                     'No source code available. '
                     'This happens when running in an interactive shell, '
-                    'using exec(), or running .pyc files without the source .py files.',
-                    get_stacklevel(frame),
+                    'using exec(), or running .pyc files without the source .py files.'
                 )
-                return None
 
             msg = '`executing` failed to find a node.'
             if sys.version_info[:2] < (3, 11):  # pragma: no cover
@@ -116,18 +180,13 @@ class ChunksFormatter(Formatter):
                 if node.args or node.keywords
             ]
             if len(call_nodes) != 1:
-                warn_inspect_arguments(msg, get_stacklevel(frame))
-                return None
+                raise InspectArgumentsFailed(msg)
 
             [call_node] = call_nodes
 
         if not isinstance(call_node, ast.Call):  # pragma: no cover
             # Very unlikely.
-            warn_inspect_arguments(
-                '`executing` unexpectedly identified a non-Call node.',
-                get_stacklevel(frame),
-            )
-            return None
+            raise InspectArgumentsFailed('`executing` unexpectedly identified a non-Call node.')
 
         if called_code == logfire.Logfire.log.__code__:
             # The `log` method is a bit different from the others:
@@ -141,53 +200,35 @@ class ChunksFormatter(Formatter):
                         arg_node = keyword.value
                         break
                 else:
-                    warn_inspect_arguments(
-                        "Couldn't identify the `msg_template` argument in the call.",
-                        get_stacklevel(frame),
-                    )
-                    return None
+                    raise InspectArgumentsFailed("Couldn't identify the `msg_template` argument in the call.")
         elif call_node.args:
             arg_node = call_node.args[0]
         else:
             # Very unlikely.
-            warn_inspect_arguments(
-                "Couldn't identify the `msg_template` argument in the call.",
-                get_stacklevel(frame),
-            )
-            return None
+            raise InspectArgumentsFailed("Couldn't identify the `msg_template` argument in the call.")
 
         if not isinstance(arg_node, ast.JoinedStr):
-            # Not an f-string, not a problem.
-            # Just use normal formatting.
             return None
 
         # We have an f-string AST node.
-        # Now prepare the namespaces that we will use to evaluate the components.
-        global_vars = frame.f_globals
-        local_vars = {**frame.f_locals, **kwargs}
-
-        # Now for the actual formatting!
-        result: list[LiteralChunk | ArgChunk] = []
+        parts: list[str | tuple[str, CodeType, CodeType]] = []
 
         # We construct the message template (i.e. the span name) from the AST.
         # We don't use the source code of the f-string because that gets messy
         # if there's escaped quotes or implicit joining of adjacent strings.
         new_template = ''
 
-        extra_attrs: dict[str, Any] = {}
-        scrubbed: list[ScrubbedNote] = []
         for node_value in arg_node.values:
             if isinstance(node_value, ast.Constant):
-                # These are the parts of the f-string not enclosed by `{}`, e.g. 'foo ' in f'foo {bar}'
                 value: str = node_value.value  # type: ignore
-                result.append({'v': value, 't': 'lit'})
+                parts.append(value)
                 new_template += value
             else:
-                # These are the parts of the f-string enclosed by `{}`, e.g. 'bar' in f'foo {bar}'
                 assert isinstance(node_value, ast.FormattedValue)
 
                 # This is cached.
                 source, value_code, formatted_code = compile_formatted_value(node_value, ex.source)
+                parts.append((source, value_code, formatted_code))
 
                 # Note that this doesn't include:
                 # - The format spec, e.g. `:0.2f`
@@ -196,19 +237,7 @@ class ChunksFormatter(Formatter):
                 #     The AST represents f'{bar = }' as f'bar = {bar}' which is how the template will look.
                 new_template += '{' + source + '}'
 
-                # The actual value of the expression.
-                value = eval(value_code, global_vars, local_vars)
-                extra_attrs[source] = value
-
-                # Format the value according to the format spec, converting to a string.
-                formatted = eval(formatted_code, global_vars, {**local_vars, '@fvalue': value})
-                formatted, value_scrubbed = self._clean_value(source, formatted, scrubber)
-                scrubbed += value_scrubbed
-                result.append({'v': formatted, 't': 'arg'})
-
-        if scrubbed:
-            extra_attrs[ATTRIBUTES_SCRUBBED_KEY] = scrubbed
-        return result, extra_attrs, new_template
+        return FStringPlan(tuple(parts), new_template)
 
     def _vformat_chunks(
         self,
@@ -225,7 +254,7 @@ class ChunksFormatter(Formatter):
         # We currently don't use positional arguments
         args = ()
         scrubbed: list[ScrubbedNote] = []
-        for literal_text, field_name, format_spec, conversion in self.parse(format_string):
+        for literal_text, field_name, format_spec, conversion, is_name in parse_template(format_string):
             # output the literal text
             if literal_text:
                 result.append({'v': literal_text, 't': 'lit'})
@@ -248,7 +277,11 @@ class ChunksFormatter(Formatter):
                 # given the field_name, find the object it references
                 #  and the argument it came from
                 try:
-                    obj, _arg_used = self.get_field(field_name, args, kwargs)
+                    if is_name:
+                        # ADDED BY US: shortcut for the common case of a simple name
+                        obj = kwargs[field_name]
+                    else:
+                        obj, _arg_used = self.get_field(field_name, args, kwargs)
                 except IndexError:
                     raise KnownFormattingError('Numeric field names are not allowed.')
                 except KeyError as exc1:
@@ -274,10 +307,13 @@ class ChunksFormatter(Formatter):
                         raise KnownFormattingError(f'Error converting field {{{field_name}}}: {exc}') from exc
 
                 # expand the format spec, if needed
-                format_spec_chunks, _ = self._vformat_chunks(
-                    format_spec or '', kwargs, scrubber=NOOP_SCRUBBER, recursion_depth=recursion_depth - 1
-                )
-                format_spec = ''.join(chunk['v'] for chunk in format_spec_chunks)
+                if format_spec and '{' in format_spec:
+                    format_spec_chunks, _ = self._vformat_chunks(
+                        format_spec, kwargs, scrubber=NOOP_SCRUBBER, recursion_depth=recursion_depth - 1
+                    )
+                    format_spec = ''.join(chunk['v'] for chunk in format_spec_chunks)
+                else:
+                    format_spec = format_spec or ''
 
                 try:
                     value = self.format_field(obj, format_spec)
@@ -306,6 +342,85 @@ class ChunksFormatter(Formatter):
 chunks_formatter = ChunksFormatter()
 
 
+class FStringPlan(NamedTuple):
+    """How to format an f-string passed as a message template at a particular call site."""
+
+    parts: tuple[str | tuple[str, CodeType, CodeType], ...]
+    """The literal parts of the f-string and the results of `compile_formatted_value` for the parts in `{}`."""
+
+    template: str
+    """The message template constructed from the f-string."""
+
+
+_FSTRING_PLANS: dict[tuple[CodeType, int, CodeType], FStringPlan | None] = {}
+"""Results of `ChunksFormatter._fstring_plan` by user code object, instruction offset, and called logfire method."""
+
+MAX_CACHED_FSTRING_PLANS = 10_000
+
+
+@dataclass
+class FStringPlanCacheStats:
+    """Number of calls with `inspect_arguments` that found or didn't find a cached `FStringPlan` for the call site."""
+
+    hits: int = 0
+    misses: int = 0
+
+
+FSTRING_PLAN_CACHE_STATS = FStringPlanCacheStats()
+
+
+@cache
+def register_fstring_plan_metrics() -> None:
+    """Report `FSTRING_PLAN_CACHE_STATS` as a metric. This only needs to happen once, when sending data to Logfire."""
+
+    def callback(_options: CallbackOptions) -> Iterable[Observation]:
+        # Only report counts once they're non-zero, to avoid exporting zeros.
+        if hits := FSTRING_PLAN_CACHE_STATS.hits:
+            yield Observation(hits, {'result': 'hit'})
+        if misses := FSTRING_PLAN_CACHE_STATS.misses:
+            yield Observation(misses, {'result': 'miss'})
+
+    register_internal_callback_metric(
+        'counter',
+        'logfire.inspect_arguments.call_site_cache',
+        callback,
+        unit='{call}',
+        description='Number of calls with inspect_arguments that found (hit) or analyzed (miss) the call site.',
+    )
+
+
+class TemplatePart(NamedTuple):
+    """A part of a parsed template, as returned by `string.Formatter.parse`, plus `is_name`."""
+
+    literal_text: str
+    field_name: str | None
+    format_spec: str | None
+    conversion: str | None
+    is_name: bool
+    """True if `field_name` is a plain identifier that can be looked up directly in the kwargs."""
+
+
+MAX_CACHED_TEMPLATES = 2048
+
+
+@lru_cache(maxsize=MAX_CACHED_TEMPLATES)
+def parse_template(format_string: str) -> tuple[TemplatePart, ...]:
+    """Parse a template with `string.Formatter.parse`, cached since the same templates are usually used repeatedly.
+
+    The cache is bounded in case templates are generated dynamically, e.g. by passing preformatted strings.
+    """
+    return tuple(
+        TemplatePart(
+            literal_text,
+            field_name,
+            format_spec,
+            conversion,
+            is_name=field_name is not None and field_name.removesuffix('=').isidentifier(),
+        )
+        for literal_text, field_name, format_spec, conversion in chunks_formatter.parse(format_string)
+    )
+
+
 def logfire_format(format_string: str, kwargs: dict[str, Any], scrubber: BaseScrubber) -> str:
     result, _extra_attrs, _new_template = logfire_format_with_magic(
         format_string,
@@ -421,6 +536,10 @@ class InspectArgumentsFailedWarning(Warning):
     pass
 
 
+class InspectArgumentsFailed(Exception):
+    """Raised by `ChunksFormatter._fstring_plan` with the message for `warn_inspect_arguments`."""
+
+
 def warn_inspect_arguments(msg: str, stacklevel: int):
     msg = (
         'Failed to introspect calling code. '
@@ -11,7 +11,9 @@ from typing import TYPE_CHECKING, Any, Callable, TypeVar
 from opentelemetry.util import types as otel_types
 from typing_extensions import LiteralString, ParamSpec
 
+from . import overhead
 from .constants import ATTRIBUTES_MESSAGE_TEMPLATE_KEY, ATTRIBUTES_TAGS_KEY
+from .overhead import profiled
 from .stack_info import get_filepath_attribute
 from .utils import safe_repr, uniquify_sequence
 
@@ -62,6 +64,14 @@ def instrument(
 
         attributes = get_attributes(func, msg_template, tags)
         open_span = get_open_span(logfire, attributes, span_name, extract_args, func)
+        if overhead.ENABLED:
+            open_span = profiled(
+                open_span,
+                getattr(func, '__module__', None) or '<unknown>',
+                str(attributes['code.function']),
+                int(attributes.get('code.lineno', 0)),  # type: ignore
+                'instrument',
+            )
 
         if inspect.isgeneratorfunction(func):
             if not allow_generator:
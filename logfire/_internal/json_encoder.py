@@ -15,6 +15,7 @@ from re import Pattern
 from types import GeneratorType
 from typing import Any, Callable
 from uuid import UUID
+from weakref import WeakKeyDictionary
 
 from .utils import JsonValue, safe_repr
 
@@ -238,60 +239,146 @@ def encoder_by_type() -> dict[type[Any], EncoderFunction]:
     return lookup
 
 
+_PRIMITIVE_TYPES = (int, float, str, bool, type(None))
+
+
 def to_json_value(o: Any, seen: set[int]) -> JsonValue:
+    """Convert `o` to a value that can be serialized to JSON.
+
+    `seen` contains the IDs of the objects currently being converted, i.e. the ancestors of `o`,
+    so that circular references can be detected. It's modified while converting but restored before returning.
+    """
     try:
-        if isinstance(o, (int, float, str, bool, type(None))):
+        if isinstance(o, _PRIMITIVE_TYPES):
             return o
 
-        if id(o) in seen:
+        obj_id = id(o)
+        if obj_id in seen:
             return '<circular reference>'
 
-        seen = seen.copy()
-        seen.add(id(o))
+        seen.add(obj_id)
+        try:
+            if isinstance(o, (list, tuple)):
+                # we do list & tuple before looking up the encoder as it's faster and just as common
+                return [to_json_value(item, seen) for item in o]  # type: ignore
+            return encoder_for_class(o.__class__)(o, seen)
+        finally:
+            seen.discard(obj_id)
+    except Exception:  # pragma: no cover
+        pass
 
-        if isinstance(o, (list, tuple)):
-            # we do list & tuple before Mapping as it's > twice as fast and just as common
-            return [to_json_value(item, seen) for item in o]  # type: ignore
-        elif isinstance(o, Mapping):
-            return {
-                key if isinstance(key, str) else safe_repr(key): to_json_value(value, seen)
-                for key, value in o.items()  # type: ignore
-            }
+    # In case we don't know how to encode, use `repr()`.
+    return safe_repr(o)
+
+
+_ENCODERS_BY_CLASS: WeakKeyDictionary[type[Any], EncoderFunction] = WeakKeyDictionary()
+"""Encoders resolved by `encoder_for_class`, valid for `_encoders_registry_state`."""
+
+_encoders_registry_state: tuple[int, int] = (0, 0)
+"""The `id` and length of the `encoder_by_type()` dict that `_ENCODERS_BY_CLASS` was resolved with."""
+
+
+def encoder_for_class(cls: type[Any]) -> EncoderFunction:
+    """Get the function that `to_json_value` uses for instances of `cls`, other than lists and tuples.
 
+    The result is cached per class, and the cache is cleared if `encoder_by_type()` changes.
+    """
+    global _encoders_registry_state
+
+    registry = encoder_by_type()
+    registry_state = (id(registry), len(registry))
+    if registry_state != _encoders_registry_state:
+        _ENCODERS_BY_CLASS.clear()
+        _encoders_registry_state = registry_state
+    try:
+        return _ENCODERS_BY_CLASS[cls]
+    except KeyError:
+        encoder = _ENCODERS_BY_CLASS[cls] = _resolve_encoder(cls, registry)
+        return encoder
+    except TypeError:  # pragma: no cover
+        # The class can't be used as a key, e.g. because its metaclass makes it unhashable.
+        return _resolve_encoder(cls, registry)
+
+
+def _resolve_encoder(cls: type[Any], registry: dict[type[Any], EncoderFunction]) -> EncoderFunction:
+    if issubclass(cls, type):
+        # The object being encoded is itself a class.
+        return _class_encoder
+
+    if issubclass(cls, Mapping):
+        return _mapping_encoder
+
+    encoder = _resolve_non_sqlalchemy_encoder(cls, registry)
+    if hasattr(cls, '__mapper__'):
+        # Whether an object is a SQLAlchemy model with data to extract can only be known for each instance.
+        return _sqlalchemy_encoder(encoder)
+    return encoder
+
+
+def _resolve_non_sqlalchemy_encoder(cls: type[Any], registry: dict[type[Any], EncoderFunction]) -> EncoderFunction:
+    if dataclasses.is_dataclass(cls):
+        return _fields_encoder([f.name for f in dataclasses.fields(cls) if f.repr])
+    elif is_attrs(cls):
+        import attrs
+
+        return _fields_encoder([f.name for f in attrs.fields(cls)])
+
+    # Check the class type and its superclasses for a matching encoder
+    for base in cls.__mro__[:-1]:
+        try:
+            return registry[base]
+        except KeyError:
+            pass
+
+    if issubclass(cls, Sequence):
+        return _sequence_encoder
+
+    return _to_dict_encoder
+
+
+def _sqlalchemy_encoder(fallback: EncoderFunction) -> EncoderFunction:
+    def encoder(o: Any, seen: set[int]) -> JsonValue:
         sa_data = _get_sqlalchemy_data(o, seen)
         if sa_data is not None:
             return sa_data
-        elif dataclasses.is_dataclass(o):
-            return {f.name: to_json_value(getattr(o, f.name), seen) for f in dataclasses.fields(o) if f.repr}
-        elif is_attrs(o.__class__):
-            return _get_attrs_data(o, seen)
-
-        # Check the class type and its superclasses for a matching encoder
-        for base in o.__class__.__mro__[:-1]:
-            try:
-                encoder = encoder_by_type()[base]
-            except KeyError:
-                pass
-            else:
-                return encoder(o, seen)
-
-        if isinstance(o, Sequence):
-            return [to_json_value(item, seen) for item in o]  # type: ignore
+        return fallback(o, seen)
 
-        try:
-            # Some VertexAI classes have this method. They have no common base class.
-            # Seems like a sensible thing to try in general.
-            to_dict = type(o).to_dict(o)  # type: ignore
-        except Exception:  # currently redundant, but future-proof
-            pass
-        else:
-            return to_json_value(to_dict, seen)
+    return encoder
 
-    except Exception:  # pragma: no cover
-        pass
 
-    # In case we don't know how to encode, use `repr()`.
-    return safe_repr(o)
+def _fields_encoder(names: list[str]) -> EncoderFunction:
+    """Make an encoder that converts dataclasses and attrs instances to dicts of the given fields."""
+
+    def encoder(o: Any, seen: set[int]) -> JsonValue:
+        return {name: to_json_value(getattr(o, name), seen) for name in names}
+
+    return encoder
+
+
+def _mapping_encoder(o: Mapping[Any, Any], seen: set[int]) -> JsonValue:
+    return {key if isinstance(key, str) else safe_repr(key): to_json_value(value, seen) for key, value in o.items()}
+
+
+def _sequence_encoder(o: Sequence[Any], seen: set[int]) -> JsonValue:
+    return [to_json_value(item, seen) for item in o]
+
+
+def _to_dict_encoder(o: Any, seen: set[int]) -> JsonValue:
+    try:
+        # Some VertexAI classes have this method. They have no common base class.
+        # Seems like a sensible thing to try in general.
+        to_dict = type(o).to_dict(o)  # type: ignore
+    except Exception:  # currently redundant, but future-proof
+        return safe_repr(o)
+    else:
+        return to_json_value(to_dict, seen)
+
+
+def _class_encoder(o: type[Any], seen: set[int]) -> JsonValue:
+    if dataclasses.is_dataclass(o):
+        # Encodes the default values of the fields, or fails and falls back to `repr()`.
+        return {f.name: to_json_value(getattr(o, f.name), seen) for f in dataclasses.fields(o) if f.repr}
+    return _to_dict_encoder(o, seen)
 
 
 def logfire_json_dumps(obj: Any) -> str:
@@ -303,6 +390,31 @@ def logfire_json_dumps(obj: Any) -> str:
         return json.dumps(to_json_value(obj, set()), separators=(',', ':'))
 
 
+class DeferredJson(str):
+    """A placeholder attribute value for an object that will only be serialized when the span is exported.
+
+    See `AdvancedOptions.defer_attribute_serialization`.
+    The object is referenced rather than copied, so changes made to it before the span is exported are included.
+    Being a `str` lets the placeholder pass through OpenTelemetry's attribute validation unchanged.
+    """
+
+    value: Any
+    serialize: Callable[[Any], str]
+
+    def __new__(cls, value: Any, serialize: Callable[[Any], str] = logfire_json_dumps) -> DeferredJson:
+        self = super().__new__(cls, '[Not serialized yet]')
+        self.value = value
+        self.serialize = serialize
+        return self
+
+    def dumps(self) -> str:
+        return self.serialize(self.value)
+
+    def prepare(self, value: Any) -> str:
+        """Serialize `value` in place of the original, leaving strings (e.g. redacted values) as they are."""
+        return value if isinstance(value, str) else self.serialize(value)
+
+
 def is_sqlalchemy(obj: Any) -> bool:
     try:
         if not hasattr(obj, '__mapper__'):
@@ -326,9 +438,3 @@ def is_attrs(cls: type) -> bool:
         return attrs.has(cls)
     except ModuleNotFoundError:  # pragma: no cover
         return False
-
-
-def _get_attrs_data(o: Any, seen: set[int]) -> JsonValue:
-    import attrs
-
-    return {f.name: to_json_value(getattr(o, f.name), seen) for f in attrs.fields(o.__class__)}
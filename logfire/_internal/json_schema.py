@@ -29,13 +29,20 @@ from ipaddress import IPv4Address, IPv4Interface, IPv4Network, IPv6Address, IPv6
 from pathlib import PosixPath
 from types import GeneratorType
 from typing import Any, Callable, NewType, cast
+from weakref import WeakKeyDictionary
 
 from .constants import ATTRIBUTES_SCRUBBED_KEY
 from .json_encoder import is_attrs, is_sqlalchemy, to_json_value
 from .stack_info import STACK_INFO_KEYS
 from .utils import JsonDict, dump_json, log_internal_error, safe_repr
 
-__all__ = 'create_json_schema', 'attributes_json_schema_properties', 'attributes_json_schema', 'JsonSchemaProperties'
+__all__ = (
+    'create_json_schema',
+    'attributes_json_schema_properties',
+    'attributes_json_schema',
+    'attributes_json_schema_with_properties',
+    'JsonSchemaProperties',
+)
 
 
 @lru_cache
@@ -92,15 +99,13 @@ def type_to_schema() -> dict[type[Any], JsonDict | Callable[[Any, set[int]], Jso
     return lookup
 
 
-_type_to_schema = None
-
-
 def create_json_schema(obj: Any, seen: set[int]) -> JsonDict:
     """Create a JSON Schema from the given object.
 
     Args:
         obj: The object to create the JSON Schema from.
-        seen: A set of object IDs that have already been processed.
+        seen: A set of object IDs that are currently being processed, i.e. the ancestors of `obj`.
+            It's modified while processing but restored before returning.
 
     Returns:
         The JSON Schema.
@@ -109,51 +114,145 @@ def create_json_schema(obj: Any, seen: set[int]) -> JsonDict:
         return {'type': 'null'}
 
     try:
-        # cover common types first before calling `type_to_schema` to avoid the overhead of imports if not necessary
+        # cover common types first before looking up the schema for the class
         obj_type = obj.__class__
-        if obj_type in {str, int, bool, float}:
+        if obj_type in _PRIMITIVE_TYPES:
             return {}
 
-        if id(obj) in seen:
+        obj_id = id(obj)
+        if obj_id in seen:
             return {}
 
-        seen = seen.copy()
-        seen.add(id(obj))
-
-        if obj_type in {list, tuple, set, frozenset, deque}:
-            return _array_schema(obj, seen)
-        elif isinstance(obj, Mapping):
-            return _mapping_schema(obj, seen)
-
-        sa_schema = _sqlalchemy_schema(obj, seen)
-        if sa_schema:
-            return sa_schema
-        elif dataclasses.is_dataclass(obj) and not isinstance(obj, type):
-            return _dataclass_schema(obj, seen)
-        elif is_attrs(obj_type):
-            return _attrs_schema(obj, seen)
-
-        global _type_to_schema
-        _type_to_schema = _type_to_schema or type_to_schema()
-        for base in obj_type.__mro__[:-1]:
-            try:
-                schema = _type_to_schema[base]
-            except KeyError:
-                continue
-            else:
-                return schema(obj, seen) if callable(schema) else schema
-
-        # cover subclasses of common types, can't come earlier due to conflicts with IntEnum and StrEnum
-        if isinstance(obj, (str, int, float)):
-            return {}
-        elif isinstance(obj, Sequence):
-            return {'type': 'array', 'title': obj_type.__name__, 'x-python-datatype': 'Sequence'}
+        seen.add(obj_id)
+        try:
+            return _class_schema(obj_type).schema(obj, seen)
+        finally:
+            seen.discard(obj_id)
     except Exception:  # pragma: no cover
         log_internal_error()
 
     return {'type': 'object', 'x-python-datatype': 'unknown'}
 
 
+_PRIMITIVE_TYPES = frozenset({str, int, bool, float})
+
+_SchemaFunction = Callable[[Any, 'set[int]'], JsonDict]
+
+
+@dataclasses.dataclass
+class _ClassSchema:
+    """How `create_json_schema` creates the schema of instances of a class, see `_class_schema`."""
+
+    schema: _SchemaFunction
+
+    value_independent: bool
+    """True if the schema only depends on the class, e.g. for datetimes, UUIDs and enums.
+
+    The schema is then computed once for the first instance and reused.
+    Schemas of containers, dataclasses, pydantic models, etc. depend on the values of their items or fields.
+    """
+
+
+_CLASS_SCHEMAS: WeakKeyDictionary[type[Any], _ClassSchema] = WeakKeyDictionary()
+
+
+def _class_schema(cls: type[Any]) -> _ClassSchema:
+    """Get the `_ClassSchema` for instances of `cls`, cached for each class."""
+    try:
+        return _CLASS_SCHEMAS[cls]
+    except KeyError:
+        result = _CLASS_SCHEMAS[cls] = _resolve_class_schema(cls)
+        return result
+    except TypeError:  # pragma: no cover
+        # The class can't be used as a key, e.g. because its metaclass makes it unhashable.
+        return _resolve_class_schema(cls)
+
+
+# Schema functions in `type_to_schema` whose result only depends on the class of the object.
+_CLASS_ONLY_SCHEMA_FUNCTIONS: set[Callable[..., JsonDict]] = set()
+
+
+def _resolve_class_schema(cls: type[Any]) -> _ClassSchema:
+    if cls in _PRIMITIVE_TYPES:
+        return _constant_schema({})
+    if cls is type(None):
+        return _constant_schema({'type': 'null'})
+    if cls in {list, tuple, set, frozenset, deque}:
+        return _ClassSchema(_array_schema, value_independent=False)
+    if issubclass(cls, Mapping):
+        return _ClassSchema(_mapping_schema, value_independent=False)
+
+    result = _resolve_non_sqlalchemy_class_schema(cls)
+    if hasattr(cls, '__mapper__'):
+        # Whether an object is a SQLAlchemy model with data to extract can only be known for each instance.
+        return _ClassSchema(_sqlalchemy_or(result.schema), value_independent=False)
+    return result
+
+
+def _resolve_non_sqlalchemy_class_schema(cls: type[Any]) -> _ClassSchema:
+    if dataclasses.is_dataclass(cls):
+        # NOTE: The `x-python-datatype` is "dataclass" for both standard dataclasses and Pydantic dataclasses.
+        # We don't need to distinguish between them on the frontend, or to reconstruct the type on the JSON formatter.
+        keys = [field.name for field in dataclasses.fields(cls) if field.repr]
+        return _ClassSchema(_fields_schema('dataclass', keys), value_independent=False)
+    elif is_attrs(cls):
+        import attrs
+
+        keys = [field.name for field in attrs.fields(cls)]
+        return _ClassSchema(_fields_schema('attrs', keys), value_independent=False)
+
+    lookup = type_to_schema()
+    for base in cls.__mro__[:-1]:
+        try:
+            schema = lookup[base]
+        except KeyError:
+            continue
+        else:
+            if not callable(schema):
+                return _constant_schema(schema)
+            elif schema in _CLASS_ONLY_SCHEMA_FUNCTIONS:
+                return _ClassSchema(_computed_once(schema), value_independent=True)
+            else:
+                return _ClassSchema(schema, value_independent=False)
+
+    # cover subclasses of common types, can't come earlier due to conflicts with IntEnum and StrEnum
+    if issubclass(cls, (str, int, float)):
+        return _constant_schema({})
+    elif issubclass(cls, Sequence):
+        return _constant_schema({'type': 'array', 'title': cls.__name__, 'x-python-datatype': 'Sequence'})
+    return _constant_schema({'type': 'object', 'x-python-datatype': 'unknown'})
+
+
+def _constant_schema(schema: JsonDict) -> _ClassSchema:
+    return _ClassSchema(lambda _obj, _seen: schema, value_independent=True)
+
+
+def _computed_once(schema_function: _SchemaFunction) -> _SchemaFunction:
+    schema: JsonDict | None = None
+
+    def get_schema(obj: Any, seen: set[int]) -> JsonDict:
+        nonlocal schema
+        if schema is None:
+            schema = schema_function(obj, seen)
+        return schema
+
+    return get_schema
+
+
+def _sqlalchemy_or(fallback: _SchemaFunction) -> _SchemaFunction:
+    def schema(obj: Any, seen: set[int]) -> JsonDict:
+        return _sqlalchemy_schema(obj, seen) or fallback(obj, seen)
+
+    return schema
+
+
+def _fields_schema(datatype_name: str, keys: list[str]) -> _SchemaFunction:
+    def schema(obj: Any, seen: set[int]) -> JsonDict:
+        return _custom_object_schema(obj, datatype_name, keys, seen)
+
+    return schema
+
+
 JsonSchemaProperties = NewType('JsonSchemaProperties', JsonDict)
 
 
@@ -170,6 +269,44 @@ def attributes_json_schema_properties(attributes: dict[str, Any]) -> JsonSchemaP
     )
 
 
+_AttributeTypes = tuple[tuple[str, type[Any]], ...]
+
+_ATTRIBUTES_JSON_SCHEMAS: dict[_AttributeTypes, tuple[JsonSchemaProperties, str | None]] = {}
+"""Results of `attributes_json_schema_with_properties` for attributes whose values all have value independent schemas.
+
+The keys are the attribute names and value types, which rarely vary for a single call site.
+"""
+
+MAX_CACHED_ATTRIBUTES_JSON_SCHEMAS = 1000
+
+
+def attributes_json_schema_with_properties(attributes: dict[str, Any]) -> tuple[JsonSchemaProperties, str | None]:
+    """Get `attributes_json_schema_properties(attributes)` and the result of `attributes_json_schema` for it.
+
+    The JSON schema is None if there are no properties, in which case it shouldn't be set.
+
+    When the schema of every value only depends on its type, the result is cached by attribute names and value types,
+    so that logs and spans created repeatedly by the same code don't need to generate or dump the schema again.
+    The returned properties are a new dict that can be modified.
+    """
+    attribute_types = tuple([(key, value.__class__) for key, value in attributes.items()])
+    try:
+        properties, json_schema = _ATTRIBUTES_JSON_SCHEMAS[attribute_types]
+    except KeyError:
+        pass
+    else:
+        return JsonSchemaProperties(properties.copy()), json_schema
+
+    properties = attributes_json_schema_properties(attributes)
+    json_schema = attributes_json_schema(properties) if properties else None
+    if all(key in EXCLUDE_KEYS or _class_schema(cls).value_independent for key, cls in attribute_types):
+        if len(_ATTRIBUTES_JSON_SCHEMAS) >= MAX_CACHED_ATTRIBUTES_JSON_SCHEMAS:
+            # Attribute names or types are unexpectedly high-cardinality, start over rather than growing forever.
+            _ATTRIBUTES_JSON_SCHEMAS.clear()
+        _ATTRIBUTES_JSON_SCHEMAS[attribute_types] = JsonSchemaProperties(properties.copy()), json_schema
+    return properties, json_schema
+
+
 # Attributes from STACK_INFO_KEYS are merged with the logfire function attributes on
 # `install_auto_tracing` and when using our stdlib logging handler. We need to remove them
 # from the JSON Schema, as we only want to have the ones that the user passes in.
@@ -177,14 +314,6 @@ def attributes_json_schema_properties(attributes: dict[str, Any]) -> JsonSchemaP
 EXCLUDE_KEYS = STACK_INFO_KEYS | {ATTRIBUTES_SCRUBBED_KEY}
 
 
-def _dataclass_schema(obj: Any, seen: set[int]) -> JsonDict:
-    # NOTE: The `x-python-datatype` is "dataclass" for both standard dataclasses and Pydantic dataclasses.
-    # We don't need to distinguish between them on the frontend, or to reconstruct the type on the JSON formatter.
-    return _custom_object_schema(
-        obj, 'dataclass', (field.name for field in dataclasses.fields(obj) if field.repr), seen
-    )
-
-
 def _bytes_schema(obj: bytes, _seen: set[int]) -> JsonDict:
     schema: JsonDict = {'type': 'string', 'x-python-datatype': 'bytes'}
     if obj.__class__.__name__ != 'bytes':
@@ -334,13 +463,6 @@ def _numpy_schema(obj: Any, seen: set[int]) -> JsonDict:
     }
 
 
-def _attrs_schema(obj: Any, seen: set[int]) -> JsonDict:
-    import attrs
-
-    obj = cast(attrs.AttrsInstance, obj)
-    return _custom_object_schema(obj, 'attrs', (key.name for key in obj.__attrs_attrs__), seen)
-
-
 def _sqlalchemy_schema(obj: Any, seen: set[int]) -> JsonDict | None:
     if not is_sqlalchemy(obj):
         return None
@@ -378,3 +500,8 @@ def _custom_object_schema(obj: Any, datatype_name: str, keys: Iterable[str], see
         'x-python-datatype': datatype_name,
         **_properties(properties, seen),
     }
+
+
+_CLASS_ONLY_SCHEMA_FUNCTIONS.update(
+    {_bytes_schema, _bytearray_schema, _enum_schema, _generator_schema, _exception_schema}
+)
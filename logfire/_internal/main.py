@@ -24,7 +24,15 @@ from typing import (
 import opentelemetry.context as context_api
 import opentelemetry.trace as trace_api
 from opentelemetry.context import Context
-from opentelemetry.metrics import CallbackT, Counter, Histogram, UpDownCounter
+from opentelemetry.metrics import (
+    CallbackT,
+    Counter,
+    Histogram,
+    ObservableCounter,
+    ObservableGauge,
+    ObservableUpDownCounter,
+    UpDownCounter,
+)
 from opentelemetry.sdk.trace import ReadableSpan, Span
 from opentelemetry.trace import SpanContext, Tracer
 from opentelemetry.util import types as otel_types
@@ -32,7 +40,7 @@ from typing_extensions import LiteralString, ParamSpec
 
 from ..version import VERSION
 from . import async_
-from .auto_trace import AutoTraceModule, install_auto_tracing
+from .auto_trace import AdaptiveAutoTracingOptions, AutoTraceModule, install_auto_tracing
 from .config import GLOBAL_CONFIG, LogfireConfig
 from .config_params import PydanticPluginRecordValues
 from .constants import (
@@ -51,16 +59,25 @@ from .constants import (
 )
 from .formatter import logfire_format, logfire_format_with_magic
 from .instrument import instrument
-from .json_encoder import logfire_json_dumps
+from .json_encoder import DeferredJson, logfire_json_dumps
 from .json_schema import (
+    EXCLUDE_KEYS,
     JsonSchemaProperties,
     attributes_json_schema,
     attributes_json_schema_properties,
+    attributes_json_schema_with_properties,
     create_json_schema,
 )
 from .metrics import ProxyMeterProvider
+from .scrubbing import NOOP_SCRUBBER, BaseScrubber
 from .stack_info import get_user_stack_info
-from .tracer import ProxyTracerProvider, _LogfireWrappedSpan, record_exception, set_exception_status  # type: ignore
+from .tracer import (
+    ProxyTracerProvider,
+    _LogfireWrappedSpan,  # type: ignore
+    _ProxyTracer,  # type: ignore
+    record_exception,
+    set_exception_status,
+)
 from .utils import get_version, handle_internal_errors, log_internal_error, uniquify_sequence
 
 if TYPE_CHECKING:
@@ -153,14 +170,14 @@ class Logfire:
         return self._meter_provider.get_meter(self._otel_scope, VERSION)
 
     @cached_property
-    def _logs_tracer(self) -> Tracer:
+    def _logs_tracer(self) -> _ProxyTracer:
         return self._get_tracer(is_span_tracer=False)
 
     @cached_property
     def _spans_tracer(self) -> Tracer:
         return self._get_tracer(is_span_tracer=True)
 
-    def _get_tracer(self, *, is_span_tracer: bool) -> Tracer:  # pragma: no cover
+    def _get_tracer(self, *, is_span_tracer: bool) -> _ProxyTracer:  # pragma: no cover
         return self._tracer_provider.get_tracer(
             self._otel_scope,
             VERSION,
@@ -206,10 +223,13 @@ class Logfire:
             merged_attributes[ATTRIBUTES_MESSAGE_TEMPLATE_KEY] = msg_template
             merged_attributes[ATTRIBUTES_MESSAGE_KEY] = log_message
 
-            otlp_attributes = prepare_otlp_attributes(merged_attributes)
+            otlp_attributes = prepare_otlp_attributes(
+                merged_attributes, self._config.scrubber, self._config.advanced.defer_attribute_serialization
+            )
 
-            if json_schema_properties := attributes_json_schema_properties(attributes):
-                otlp_attributes[ATTRIBUTES_JSON_SCHEMA_KEY] = attributes_json_schema(json_schema_properties)
+            json_schema_properties, json_schema = attributes_json_schema_with_properties(attributes)
+            if json_schema:
+                otlp_attributes[ATTRIBUTES_JSON_SCHEMA_KEY] = json_schema
 
             tags = (self._tags or ()) + tuple(_tags or ())
             if tags:
@@ -260,9 +280,14 @@ class Logfire:
         try:
             msg_template: str = attributes[ATTRIBUTES_MESSAGE_TEMPLATE_KEY]  # type: ignore
             attributes[ATTRIBUTES_MESSAGE_KEY] = logfire_format(msg_template, function_args, self._config.scrubber)
-            if json_schema_properties := attributes_json_schema_properties(function_args):  # pragma: no branch
-                attributes[ATTRIBUTES_JSON_SCHEMA_KEY] = attributes_json_schema(json_schema_properties)
-            attributes.update(prepare_otlp_attributes(function_args))
+            _, json_schema = attributes_json_schema_with_properties(function_args)
+            if json_schema:  # pragma: no branch
+                attributes[ATTRIBUTES_JSON_SCHEMA_KEY] = json_schema
+            attributes.update(
+                prepare_otlp_attributes(
+                    function_args, self._config.scrubber, self._config.advanced.defer_attribute_serialization
+                )
+            )
             return self._fast_span(name, attributes)
         except Exception:  # pragma: no cover
             log_internal_error()
@@ -716,7 +741,8 @@ class Logfire:
                 msg = merged_attributes[ATTRIBUTES_MESSAGE_KEY] = str(msg)
                 msg_template = str(msg_template)
 
-            otlp_attributes = prepare_otlp_attributes(merged_attributes)
+            defer_serialization = self._config.advanced.defer_attribute_serialization
+            otlp_attributes = prepare_otlp_attributes(merged_attributes, self._config.scrubber, defer_serialization)
             otlp_attributes = {
                 ATTRIBUTES_SPAN_TYPE_KEY: 'log',
                 **level_attributes,
@@ -724,8 +750,14 @@ class Logfire:
                 ATTRIBUTES_MESSAGE_KEY: msg,
                 **otlp_attributes,
             }
-            if json_schema_properties := attributes_json_schema_properties(attributes):
-                otlp_attributes[ATTRIBUTES_JSON_SCHEMA_KEY] = attributes_json_schema(json_schema_properties)
+            if defer_serialization:
+                # Unlike spans, logs don't need the schema properties for attributes set later.
+                if not EXCLUDE_KEYS.issuperset(attributes):
+                    otlp_attributes[ATTRIBUTES_JSON_SCHEMA_KEY] = DeferredJson(attributes, _attributes_json_schema)
+            else:
+                _, json_schema = attributes_json_schema_with_properties(attributes)
+                if json_schema:
+                    otlp_attributes[ATTRIBUTES_JSON_SCHEMA_KEY] = json_schema
 
             tags = self._tags + tuple(tags or ())
             if tags:
@@ -736,18 +768,14 @@ class Logfire:
                 if self._sample_rate is not None
                 else otlp_attributes.pop(ATTRIBUTES_SAMPLE_RATE_KEY, None)
             )
-            if sample_rate is not None and sample_rate != 1:  # pragma: no cover
+            if sample_rate is not None and sample_rate != 1:
                 otlp_attributes[ATTRIBUTES_SAMPLE_RATE_KEY] = sample_rate
 
             if not (self._console_log if console_log is None else console_log):
                 otlp_attributes[DISABLE_CONSOLE_KEY] = True
             start_time = self._config.advanced.ns_timestamp_generator()
 
-            span = self._logs_tracer.start_span(
-                msg_template,
-                attributes=otlp_attributes,
-                start_time=start_time,
-            )
+            span = self._logs_tracer.start_log_span(msg_template, otlp_attributes, start_time)
 
             if exc_info:
                 if exc_info is True:
@@ -755,7 +783,7 @@ class Logfire:
                 if isinstance(exc_info, tuple):
                     exc_info = exc_info[1]
                 if isinstance(exc_info, BaseException):
-                    record_exception(span, exc_info)
+                    record_exception(span, exc_info, timestamp=self._config.advanced.ns_timestamp_generator())
                     if otlp_attributes[ATTRIBUTES_LOG_LEVEL_NUM_KEY] >= LEVEL_NUMBERS['error']:  # type: ignore
                         # Set the status description to the exception message.
                         # OTEL only lets us set the description when the status code is ERROR,
@@ -875,6 +903,8 @@ class Logfire:
         *,
         min_duration: float,
         check_imported_modules: Literal['error', 'warn', 'ignore'] = 'error',
+        adaptive: AdaptiveAutoTracingOptions | None = None,
+        lazy: bool = False,
     ) -> None:
         """Install automatic tracing.
 
@@ -906,8 +936,26 @@ class Logfire:
             check_imported_modules: If this is `'error'` (the default), then an exception will be raised if any of the
                 modules in `sys.modules` (i.e. modules that have already been imported) match the modules to trace.
                 Set to `'warn'` to issue a warning instead, or `'ignore'` to skip the check.
+            adaptive: Options for starting and stopping tracing each function based on statistics of its recent
+                durations and a budget of spans per second, instead of tracing it forever after one slow call.
+                Requires `min_duration` to be greater than 0. See
+                [`AdaptiveAutoTracingOptions`][logfire.AdaptiveAutoTracingOptions] for details.
+            lazy: Set to `True` to only prepare tracing each function the first time it's called,
+                instead of for every function when its module is imported.
+                This reduces the import time of large codebases where most functions are never called in a process,
+                e.g. CLI tools or workers that only run one kind of task.
+                Functions that haven't been called yet aren't included in
+                [`logfire.auto_traced_functions()`][logfire.auto_traced_functions].
+                To also avoid rewriting modules on the first import, see `logfire precompile-auto-tracing`.
         """
-        install_auto_tracing(self, modules, check_imported_modules=check_imported_modules, min_duration=min_duration)
+        install_auto_tracing(
+            self,
+            modules,
+            check_imported_modules=check_imported_modules,
+            min_duration=min_duration,
+            adaptive=adaptive,
+            lazy=lazy,
+        )
 
     def _warn_if_not_initialized_for_instrumentation(self):
         self.config.warn_if_not_initialized('Instrumentation will have no effect')
@@ -2073,7 +2121,7 @@ class Logfire:
         callbacks: Sequence[CallbackT],
         unit: str = '',
         description: str = '',
-    ) -> None:
+    ) -> ObservableCounter:
         """Create a counter metric that uses a callback to collect observations.
 
         The callback is called every 60 seconds in a background thread.
@@ -2112,12 +2160,16 @@ class Logfire:
                 [Observation](https://opentelemetry-python.readthedocs.io/en/latest/api/metrics.html#opentelemetry.metrics.Observation).
             unit: The unit of the metric.
             description: The description of the metric.
+
+        Returns:
+            The counter metric. Keep a reference to it if `logfire.configure()` may be called afterwards,
+            otherwise the callbacks may stop being called.
         """
-        self._meter.create_observable_counter(name, callbacks, unit, description)
+        return self._meter.create_observable_counter(name, callbacks, unit, description)
 
     def metric_gauge_callback(
         self, name: str, callbacks: Sequence[CallbackT], *, unit: str = '', description: str = ''
-    ) -> None:
+    ) -> ObservableGauge:
         """Create a gauge metric that uses a callback to collect observations.
 
         The callback is called every 60 seconds in a background thread.
@@ -2154,12 +2206,16 @@ class Logfire:
                 [Observation](https://opentelemetry-python.readthedocs.io/en/latest/api/metrics.html#opentelemetry.metrics.Observation).
             unit: The unit of the metric.
             description: The description of the metric.
+
+        Returns:
+            The gauge metric. Keep a reference to it if `logfire.configure()` may be called afterwards,
+            otherwise the callbacks may stop being called.
         """
-        self._meter.create_observable_gauge(name, callbacks, unit, description)
+        return self._meter.create_observable_gauge(name, callbacks, unit, description)
 
     def metric_up_down_counter_callback(
         self, name: str, callbacks: Sequence[CallbackT], *, unit: str = '', description: str = ''
-    ) -> None:
+    ) -> ObservableUpDownCounter:
         """Create an up-down counter metric that uses a callback to collect observations.
 
         The callback is called every 60 seconds in a background thread.
@@ -2196,8 +2252,12 @@ class Logfire:
                 [Observation](https://opentelemetry-python.readthedocs.io/en/latest/api/metrics.html#opentelemetry.metrics.Observation).
             unit: The unit of the metric.
             description: The description of the metric.
+
+        Returns:
+            The up-down counter metric. Keep a reference to it if `logfire.configure()` may be called afterwards,
+            otherwise the callbacks may stop being called.
         """
-        self._meter.create_observable_up_down_counter(name, callbacks, unit, description)
+        return self._meter.create_observable_up_down_counter(name, callbacks, unit, description)
 
     def suppress_scopes(self, *scopes: str) -> None:
         """Prevent spans and metrics from being created for the given OpenTelemetry scope names.
@@ -2259,6 +2319,19 @@ class FastLogfireSpan:
 
 # Changes to this class may need to be reflected in `FastLogfireSpan` and `NoopSpan` as well.
 class LogfireSpan(ReadableSpan):
+    # `ReadableSpan` doesn't define `__slots__`, so instances still have a `__dict__`,
+    # but it's never populated unless something sets other attributes.
+    __slots__ = (
+        '_span_name',
+        '_otlp_attributes',
+        '_tracer',
+        '_json_schema_properties',
+        '_links',
+        '_added_attributes',
+        '_token',
+        '_span',
+    )
+
     def __init__(
         self,
         span_name: str,
@@ -2271,7 +2344,7 @@ class LogfireSpan(ReadableSpan):
         self._otlp_attributes = otlp_attributes
         self._tracer = tracer
         self._json_schema_properties = json_schema_properties
-        self._links = list(trace_api.Link(context=context, attributes=attributes) for context, attributes in links)
+        self._links = [trace_api.Link(context=context, attributes=attributes) for context, attributes in links]
 
         self._added_attributes = False
         self._token: None | Token[Context] = None
@@ -2486,11 +2559,20 @@ class NoopSpan:
 AttributesValueType = TypeVar('AttributesValueType', bound=Union[Any, otel_types.AttributeValue])
 
 
-def prepare_otlp_attributes(attributes: dict[str, Any]) -> dict[str, otel_types.AttributeValue]:
+def prepare_otlp_attributes(
+    attributes: dict[str, Any], scrubber: BaseScrubber = NOOP_SCRUBBER, defer: bool = False
+) -> dict[str, otel_types.AttributeValue]:
     """Prepare attributes for sending to OpenTelemetry.
 
     This will convert any non-OpenTelemetry compatible types to JSON.
+    If the scrubber is configured to scrub at source, the attributes are also scrubbed.
+    If `defer` is true, values that would be converted to JSON are instead wrapped in `DeferredJson`,
+    to be serialized and scrubbed when the span is exported, see `AdvancedOptions.defer_attribute_serialization`.
     """
+    if defer:
+        return {key: prepare_deferred_otlp_attribute(value) for key, value in attributes.items()}
+    if scrubber.at_source:
+        return scrubber.prepare_attributes(attributes, prepare_otlp_attribute)
     return {key: prepare_otlp_attribute(value) for key, value in attributes.items()}
 
 
@@ -2514,6 +2596,18 @@ def prepare_otlp_attribute(value: Any) -> otel_types.AttributeValue:
         return logfire_json_dumps(value)
 
 
+def prepare_deferred_otlp_attribute(value: Any) -> otel_types.AttributeValue:
+    """Like `prepare_otlp_attribute`, but returns a `DeferredJson` placeholder instead of serializing to JSON."""
+    if isinstance(value, (str, int, float)) and not isinstance(value, Enum):
+        return prepare_otlp_attribute(value)
+    return DeferredJson(value)
+
+
+def _attributes_json_schema(attributes: dict[str, Any]) -> str:
+    # Only used for attributes with a key that isn't excluded from the schema, so the schema isn't None.
+    return attributes_json_schema_with_properties(attributes)[1] or ''
+
+
 def set_user_attributes_on_raw_span(span: Span, attributes: dict[str, Any]) -> None:
     if not span.is_recording():
         return
@@ -4,7 +4,7 @@ import dataclasses
 from abc import ABC, abstractmethod
 from collections.abc import Sequence
 from threading import Lock
-from typing import Any, Generic, TypeVar
+from typing import Any, Generic, Literal, TypeVar, overload
 from weakref import WeakSet
 
 from opentelemetry.metrics import (
@@ -24,8 +24,10 @@ from opentelemetry.sdk.metrics import MeterProvider as SDKMeterProvider
 from opentelemetry.trace import get_current_span
 from opentelemetry.util.types import Attributes
 
-from .tracer import _LogfireWrappedSpan  # type: ignore
-from .utils import handle_internal_errors
+import logfire
+
+from .tracer import _LogfireWrappedSpan, span_metric_series  # type: ignore
+from .utils import handle_internal_errors, log_internal_error
 
 try:
     # This only exists in opentelemetry-sdk>=1.23.0
@@ -200,6 +202,8 @@ class _ProxyInstrument(ABC, Generic[InstrumentT]):
     def __init__(self, meter: Meter, **kwargs: Any) -> None:
         self._kwargs = kwargs
         self._instrument = self._create_real_instrument(meter)
+        # The series for measurements without attributes, the most common case, so it's only looked up once.
+        self._span_metric_series = span_metric_series(kwargs['name'], {})
 
     def on_meter_set(self, meter: Meter) -> None:
         """Called when a real meter is set on the creating _ProxyMeter."""
@@ -215,8 +219,9 @@ class _ProxyInstrument(ABC, Generic[InstrumentT]):
     @handle_internal_errors
     def _increment_span_metric(self, amount: float, attributes: Attributes | None = None):
         span = get_current_span()
-        if isinstance(span, _LogfireWrappedSpan):
-            span.increment_metric(self._kwargs['name'], attributes or {}, amount)
+        if isinstance(span, _LogfireWrappedSpan) and span.record_metrics:
+            series = span_metric_series(self._kwargs['name'], attributes) if attributes else self._span_metric_series
+            span.increment_metric_series(series, amount)
 
 
 class _ProxyCounter(_ProxyInstrument[Counter], Counter):
@@ -280,6 +285,104 @@ class _ProxyUpDownCounter(_ProxyInstrument[UpDownCounter], UpDownCounter):
         return meter.create_up_down_counter(**self._kwargs)
 
 
+class _BoundInstrument:
+    __slots__ = ('_instrument', '_proxy', '_attributes', '_span_metric_series')
+
+    def __init__(self, instrument: Counter | UpDownCounter | Histogram, attributes: Attributes | None) -> None:
+        self._instrument: Any = instrument
+        # Copied so that later changes to the caller's dict don't affect the handle.
+        # Sequences are stored as tuples since the SDK and `span_metric_series` hash the attributes.
+        self._attributes = {
+            key: tuple(value) if isinstance(value, list) else value for key, value in (attributes or {}).items()
+        }
+        # Only these proxies collect measurements in spans, see `_ProxyInstrument._increment_span_metric`.
+        # For them, the handle collects the measurement itself and then bypasses the proxy.
+        if isinstance(instrument, (_ProxyCounter, _ProxyHistogram)):
+            self._proxy: _ProxyInstrument[Any] | None = instrument
+            self._span_metric_series = span_metric_series(instrument._kwargs['name'], self._attributes)  # type: ignore
+        else:
+            self._proxy = None
+            self._span_metric_series = None
+
+    def _increment_span_metric(self, amount: float) -> None:
+        # Like `handle_internal_errors`, but try/except is free when nothing is raised.
+        try:
+            span = get_current_span()
+            if isinstance(span, _LogfireWrappedSpan):
+                span.increment_metric_series(self._span_metric_series, amount)  # type: ignore
+        except Exception:  # pragma: no cover
+            log_internal_error()
+
+
+class BoundCounter(_BoundInstrument):
+    """A counter or up-down counter with fixed attributes, returned by [`logfire.bind_metric`][logfire.bind_metric]."""
+
+    __slots__ = ()
+
+    def add(self, amount: int | float, *args: Any, **kwargs: Any) -> None:
+        """Add `amount` to the counter with the bound attributes, like `counter.add(amount, attributes)`."""
+        proxy = self._proxy
+        if proxy is None:
+            self._instrument.add(amount, self._attributes, *args, **kwargs)
+        else:
+            self._increment_span_metric(amount)
+            # Looked up on each call since the proxy replaces it when a new meter provider is set.
+            proxy._instrument.add(amount, self._attributes, *args, **kwargs)  # type: ignore
+
+
+class BoundHistogram(_BoundInstrument):
+    """A histogram with fixed attributes, returned by [`logfire.bind_metric`][logfire.bind_metric]."""
+
+    __slots__ = ()
+
+    def record(self, amount: int | float, *args: Any, **kwargs: Any) -> None:
+        """Record `amount` in the histogram with the bound attributes, like `histogram.record(amount, attributes)`."""
+        proxy = self._proxy
+        if proxy is None:
+            self._instrument.record(amount, self._attributes, *args, **kwargs)
+        else:
+            self._increment_span_metric(amount)
+            proxy._instrument.record(amount, self._attributes, *args, **kwargs)  # type: ignore
+
+
+@overload
+def bind_metric(instrument: Histogram, attributes: Attributes | None = None) -> BoundHistogram: ...
+
+
+@overload
+def bind_metric(instrument: Counter | UpDownCounter, attributes: Attributes | None = None) -> BoundCounter: ...
+
+
+def bind_metric(
+    instrument: Counter | UpDownCounter | Histogram, attributes: Attributes | None = None
+) -> BoundCounter | BoundHistogram:
+    """Bind a counter, up-down counter, or histogram to a fixed set of attributes.
+
+    The returned handle's `add` or `record` method doesn't take attributes, since they're prepared once here.
+    This makes measurements cheaper, especially inside spans with
+    [`MetricsOptions(collect_in_spans=True)`][logfire.MetricsOptions], so it's useful for metrics recorded in
+    hot code, e.g. counting tokens or database queries:
+
+    ```py
+    import logfire
+
+    tokens = logfire.metric_counter('tokens')
+    input_tokens = logfire.bind_metric(tokens, {'model': 'gpt-4o', 'token_type': 'input'})
+
+    with logfire.span('chat'):
+        input_tokens.add(100)  # equivalent to tokens.add(100, {'model': 'gpt-4o', 'token_type': 'input'})
+    ```
+
+    Args:
+        instrument: A counter, up-down counter, or histogram, e.g. from
+            [`logfire.metric_counter`][logfire.Logfire.metric_counter].
+        attributes: The attributes of every measurement made with the returned handle.
+    """
+    if isinstance(instrument, Histogram):
+        return BoundHistogram(instrument, attributes)
+    return BoundCounter(instrument, attributes)
+
+
 if Gauge is not None:  # pragma: no branch
 
     class _ProxyGauge(_ProxyInstrument[Gauge], Gauge):
@@ -296,3 +399,29 @@ if Gauge is not None:  # pragma: no branch
             return meter.create_gauge(**self._kwargs)
 else:  # pragma: no cover
     _ProxyGauge = None  # type: ignore
+
+
+_INTERNAL_CALLBACK_INSTRUMENTS: list[ObservableCounter | ObservableGauge] = []
+
+
+def register_internal_callback_metric(
+    kind: Literal['counter', 'gauge'],
+    name: str,
+    callback: CallbackT,
+    *,
+    unit: str,
+    description: str,
+) -> None:
+    """Report a metric about the SDK itself, measured by `callback`, with the default Logfire instance.
+
+    `_ProxyMeter` only holds weak references to its instruments, and nothing else refers to these,
+    which are usually created before `logfire.configure()` sets the real meter provider.
+    So references are kept here to keep reporting the metric for the rest of the process.
+    Callers should only register each metric once, e.g. in a function decorated with `functools.cache`.
+    """
+    instrument: ObservableCounter | ObservableGauge
+    if kind == 'counter':
+        instrument = logfire.metric_counter_callback(name, callbacks=[callback], unit=unit, description=description)
+    else:
+        instrument = logfire.metric_gauge_callback(name, callbacks=[callback], unit=unit, description=description)
+    _INTERNAL_CALLBACK_INSTRUMENTS.append(instrument)
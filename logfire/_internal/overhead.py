@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import partial
+from time import perf_counter_ns
+from typing import Any, Callable, Literal
+
+from opentelemetry.trace import get_current_span
+
+from .constants import ONE_SECOND_IN_NANOSECONDS
+
+ENABLED = False
+"""Whether functions instrumented from now on are profiled, set by `enable_overhead_profiling`."""
+
+
+@dataclass
+class FunctionOverhead:
+    """How much time Logfire spent on spans around one function, see `logfire.overhead_profile()`."""
+
+    function: str
+    """The module and qualified name of the function."""
+
+    instrumented_by: Literal['auto_tracing', 'instrument']
+    """Whether the function was instrumented by `install_auto_tracing` or `@logfire.instrument`."""
+
+    calls: int = 0
+    """The number of completed calls."""
+
+    spans: int = 0
+    """The number of calls that created a span, which can be less than `calls` when auto-tracing with `min_duration`."""
+
+    function_time: float = 0
+    """The total time in seconds spent inside the function itself.
+
+    This includes the time spent in other instrumented functions that it calls, along with their overhead.
+    """
+
+    overhead_time: float = 0
+    """The total time in seconds spent starting and ending spans, or measuring durations for `min_duration`."""
+
+    @property
+    def overhead_per_call(self) -> float:
+        """The average overhead in seconds per call."""
+        return self.overhead_time / self.calls if self.calls else 0
+
+    @property
+    def overhead_fraction(self) -> float:
+        """The overhead as a fraction of the total time of calls including the overhead."""
+        total = self.function_time + self.overhead_time
+        return self.overhead_time / total if total else 0
+
+
+@dataclass
+class OverheadProfile:
+    """A snapshot of the overhead of all profiled functions, returned by `logfire.overhead_profile()`.
+
+    Convert it to a string to get a table sorted by total overhead, e.g. `print(logfire.overhead_profile())`.
+    """
+
+    functions: list[FunctionOverhead]
+    """The profiled functions, sorted by total overhead, highest first."""
+
+    def __str__(self) -> str:
+        header = ['Function', 'Instrumented by', 'Calls', 'Spans', 'Function time', 'Overhead', 'Per call', '%']
+        rows = [
+            [
+                f.function,
+                f.instrumented_by,
+                str(f.calls),
+                str(f.spans),
+                f'{f.function_time * 1e3:.3f}ms',
+                f'{f.overhead_time * 1e3:.3f}ms',
+                f'{f.overhead_per_call * 1e6:.1f}µs',
+                f'{f.overhead_fraction:.1%}',
+            ]
+            for f in self.functions
+        ]
+        widths = [max(len(row[i]) for row in [header, *rows]) for i in range(len(header))]
+        lines = [
+            ' | '.join(
+                cell.ljust(width) if i < 2 else cell.rjust(width) for i, (cell, width) in enumerate(zip(row, widths))
+            )
+            for row in [header, *rows]
+        ]
+        lines.insert(1, '-+-'.join('-' * width for width in widths))
+        return '\n'.join(lines)
+
+
+class FunctionOverheadState:
+    """Mutable counters for one profiled function, in nanoseconds, updated without a lock."""
+
+    __slots__ = ('function', 'instrumented_by', 'calls', 'spans', 'function_ns', 'overhead_ns')
+
+    def __init__(self, function: str, instrumented_by: Literal['auto_tracing', 'instrument']) -> None:
+        self.function = function
+        self.instrumented_by: Literal['auto_tracing', 'instrument'] = instrumented_by
+        self.calls = 0
+        self.spans = 0
+        self.function_ns = 0
+        self.overhead_ns = 0
+
+    def snapshot(self) -> FunctionOverhead:
+        return FunctionOverhead(
+            self.function,
+            self.instrumented_by,
+            self.calls,
+            self.spans,
+            self.function_ns / ONE_SECOND_IN_NANOSECONDS,
+            self.overhead_ns / ONE_SECOND_IN_NANOSECONDS,
+        )
+
+
+FUNCTION_OVERHEADS: dict[tuple[str, str, int], FunctionOverheadState] = {}
+"""The counters of every profiled function by module, qualified name, and line number."""
+
+
+def enable_overhead_profiling() -> None:
+    """Start measuring how much time Logfire spends on spans around each auto-traced and `@logfire.instrument`ed function.
+
+    This only applies to functions instrumented after this is called, so call it before
+    [`logfire.install_auto_tracing`][logfire.Logfire.install_auto_tracing] and before importing modules
+    that use [`@logfire.instrument`][logfire.Logfire.instrument].
+    Use [`logfire.overhead_profile()`][logfire.overhead_profile] to get the results.
+
+    Profiling adds some overhead of its own, which isn't included in the results,
+    so only enable it while deciding what to instrument, not permanently.
+
+    This can also be enabled with `logfire run --profile-overhead`, which prints the results when the program ends.
+    """
+    global ENABLED
+    ENABLED = True  # pyright: ignore[reportConstantRedefinition]
+
+
+def overhead_profile() -> OverheadProfile:
+    """Get a snapshot of the overhead of each function profiled since `logfire.enable_overhead_profiling()` was called.
+
+    For example, this prints the functions where Logfire's overhead is the largest fraction of the time spent:
+
+    ```py
+    import logfire
+
+    profile = logfire.overhead_profile()
+    for function in sorted(profile.functions, key=lambda f: f.overhead_fraction, reverse=True)[:10]:
+        print(f'{function.function}: {function.overhead_fraction:.0%}')
+    ```
+    """
+    functions = [state.snapshot() for state in list(FUNCTION_OVERHEADS.values())]
+    functions.sort(key=lambda f: f.overhead_time, reverse=True)
+    return OverheadProfile(functions)
+
+
+def profiled(
+    factory: Callable[..., Any],
+    module: str,
+    qualname: str,
+    lineno: int,
+    instrumented_by: Literal['auto_tracing', 'instrument'],
+) -> Callable[..., ProfiledContextManager]:
+    """Wrap a function returning a span context manager to record its overhead for `overhead_profile()`."""
+    state = FUNCTION_OVERHEADS[(module, qualname, lineno)] = FunctionOverheadState(
+        f'{module}.{qualname}', instrumented_by
+    )
+    return partial(ProfiledContextManager, state, factory)
+
+
+def call_context_factory(context_factories: list[Callable[[], Any]], index: int) -> Any:
+    """Call the current context factory of an auto-traced function, which changes when it's promoted or demoted."""
+    return context_factories[index]()
+
+
+class ProfiledContextManager:
+    """Times the span context manager returned by `factory` separately from the code inside it.
+
+    Comparing the current span before and after entering shows whether a span was actually created.
+    That comparison happens outside the timed sections, so profiling doesn't count its own cost.
+    """
+
+    __slots__ = ('state', 'cm', 'parent', 'start', 'entered')
+
+    def __init__(self, state: FunctionOverheadState, factory: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        self.state = state
+        self.parent = get_current_span()
+        self.start = perf_counter_ns()
+        self.cm = factory(*args, **kwargs)
+
+    def __enter__(self) -> Any:
+        result = self.cm.__enter__()
+        self.entered = perf_counter_ns()
+        self.state.overhead_ns += self.entered - self.start
+        if get_current_span() is not self.parent:
+            self.state.spans += 1
+        return result
+
+    def __exit__(self, *exc_info: Any) -> Any:
+        exited = perf_counter_ns()
+        result = self.cm.__exit__(*exc_info)
+        end = perf_counter_ns()
+        state = self.state
+        state.function_ns += exited - self.entered
+        state.overhead_ns += end - exited
+        state.calls += 1
+        return result
@@ -13,6 +13,7 @@ from opentelemetry.attributes import BoundedAttributes
 from opentelemetry.sdk._logs import LogRecord
 from opentelemetry.sdk.trace import Event
 from opentelemetry.trace import Link
+from opentelemetry.util.types import AttributeValue
 
 from .constants import (
     ATTRIBUTES_JSON_SCHEMA_KEY,
@@ -28,8 +29,10 @@ from .constants import (
     ATTRIBUTES_TAGS_KEY,
     RESOURCE_ATTRIBUTES_PACKAGE_VERSIONS,
 )
+from .export_stats import EXPORT_STATS
+from .json_encoder import DeferredJson, logfire_json_dumps, to_json_value
 from .stack_info import STACK_INFO_KEYS
-from .utils import ReadableSpanDict
+from .utils import ReadableSpanDict, safe_repr
 
 DEFAULT_PATTERNS = [
     'password',
@@ -57,6 +60,30 @@ DEFAULT_PATTERNS = [
     ],
 ]
 
+# Any match of DEFAULT_PATTERNS contains one of these substrings, ignoring case.
+# Checking for them is much faster than searching for the combined pattern, which is slow for long strings.
+DEFAULT_PATTERN_LITERALS = (
+    'passw',
+    'mysql_pwd',
+    'secret',
+    'auth',
+    'credential',
+    'private',
+    'api',
+    'session',
+    'cookie',
+    'social',
+    'credit',
+    'csrf',
+    'xsrf',
+    'jwt',
+    'ssn',
+)
+
+_DEFAULT_PATTERN_LITERALS_REGEX = re.compile('|'.join(DEFAULT_PATTERN_LITERALS))
+
+_JSON_TYPES = {str, int, float, bool, type(None), list, tuple, dict}
+
 JsonPath: typing_extensions.TypeAlias = 'tuple[str | int, ...]'
 
 
@@ -104,6 +131,29 @@ class ScrubbingOptions:
     The specified patterns are combined with the default patterns.
     """
 
+    at_source: bool = False
+    """
+    Whether to scrub attributes of spans and logs created by Logfire as they are created,
+    rather than when they are exported.
+
+    This scrubs the original Python objects instead of decoding and walking the JSON that they were serialized to,
+    which is cheaper for spans with large structured attributes.
+    Spans from other OpenTelemetry instrumentation and attributes set later (e.g. with `span.set_attribute`)
+    are still scrubbed when they are exported.
+
+    The callback is called in the thread that creates the span instead of the export thread.
+    """
+
+
+class SourceScrubbedStr(str):
+    """An attribute value which was already scrubbed when the span was created, so doesn't need to be scrubbed again.
+
+    If anything replaces the value, e.g. by truncating it or setting the attribute again,
+    the result is a plain `str` which will be scrubbed when the span is exported.
+    """
+
+    __slots__ = ()
+
 
 class BaseScrubber(ABC):
     # These keys and everything within are safe to keep in spans, even if they match the scrubbing pattern.
@@ -152,6 +202,19 @@ class BaseScrubber(ABC):
     @abstractmethod
     def scrub_value(self, path: JsonPath, value: Any) -> tuple[Any, list[ScrubbedNote]]: ...  # pragma: no cover
 
+    at_source: bool = False
+    """Whether `prepare_attributes` should be used to scrub attributes when spans are created."""
+
+    def prepare_attributes(
+        self, attributes: Mapping[str, Any], prepare: Callable[[Any], AttributeValue]
+    ) -> dict[str, AttributeValue]:
+        """Convert attributes to OTEL attribute values with `prepare`, scrubbing them if `at_source` is true."""
+        return {key: prepare(value) for key, value in attributes.items()}
+
+    def serialize_deferred_attributes(self, attributes: Mapping[str, Any]) -> dict[str, Any]:
+        """Replace `DeferredJson` placeholders in `attributes` with their serialized values, scrubbing them."""
+        return {key: value.dumps() if value.__class__ is DeferredJson else value for key, value in attributes.items()}
+
 
 class NoopScrubber(BaseScrubber):
     def scrub_span(self, span: ReadableSpanDict):
@@ -170,11 +233,42 @@ NOOP_SCRUBBER = NoopScrubber()
 class Scrubber(BaseScrubber):
     """Redacts potentially sensitive data."""
 
-    def __init__(self, patterns: Sequence[str] | None, callback: ScrubCallback | None = None):
+    def __init__(self, patterns: Sequence[str] | None, callback: ScrubCallback | None = None, at_source: bool = False):
         # See ScrubbingOptions for more info on these parameters.
-        patterns = [*DEFAULT_PATTERNS, *(patterns or [])]
-        self._pattern = re.compile('|'.join(patterns), re.IGNORECASE | re.DOTALL)
+        self._pattern = re.compile('|'.join([*DEFAULT_PATTERNS, *(patterns or [])]), re.IGNORECASE | re.DOTALL)
+        self._extra_pattern = re.compile('|'.join(patterns), re.IGNORECASE | re.DOTALL) if patterns else None
         self._callback = callback
+        self.at_source = at_source
+        # Attribute keys are low-cardinality, so remember what to do with each key
+        # instead of checking SAFE_KEYS and searching the pattern every time.
+        self._key_decisions: dict[str, re.Match[str] | bool] = {}
+
+    MAX_CACHED_KEY_DECISIONS = 10_000
+
+    def _search(self, text: str) -> re.Match[str] | None:
+        """Equivalent to `self._pattern.search(text)`, but faster when none of the default patterns can match."""
+        if text.isascii():
+            # For ASCII text, lowercasing is enough to compare case-insensitively.
+            if not _DEFAULT_PATTERN_LITERALS_REGEX.search(text.lower()):
+                return self._extra_pattern and self._extra_pattern.search(text)
+        return self._pattern.search(text)
+
+    def _key_decision(self, key: str) -> re.Match[str] | bool:
+        """Returns the match if the value of `key` should be redacted, `True` if it's safe, or `False` to scrub it."""
+        try:
+            return self._key_decisions[key]
+        except KeyError:
+            pass
+        decision: re.Match[str] | bool
+        if key in BaseScrubber.SAFE_KEYS:
+            decision = True
+        else:
+            decision = self._search(key) or False
+        if len(self._key_decisions) >= self.MAX_CACHED_KEY_DECISIONS:
+            # Keys are unexpectedly high-cardinality, start over rather than growing forever.
+            self._key_decisions.clear()
+        self._key_decisions[key] = decision
+        return decision
 
     def scrub_log(self, log: LogRecord) -> LogRecord:
         span_scrubber = SpanScrubber(self)
@@ -204,6 +298,46 @@ class Scrubber(BaseScrubber):
         result = span_scrubber.scrub(path, value)
         return result, span_scrubber.scrubbed
 
+    def prepare_attributes(
+        self, attributes: Mapping[str, Any], prepare: Callable[[Any], AttributeValue]
+    ) -> dict[str, AttributeValue]:
+        if not self.at_source:
+            return super().prepare_attributes(attributes, prepare)
+
+        span_scrubber = SpanScrubber(self, encode_objects=True)
+        result: dict[str, AttributeValue] = {}
+        for key, value in attributes.items():
+            if key == ATTRIBUTES_SCRUBBED_KEY:
+                continue
+            otlp_value = span_scrubber.scrub_attribute_at_source(key, value, prepare)
+            if isinstance(otlp_value, str):
+                otlp_value = SourceScrubbedStr(otlp_value)
+            result[key] = otlp_value
+
+        # Notes from scrubbing the formatted message are passed in the attributes.
+        scrubbed: list[ScrubbedNote] = [*attributes.get(ATTRIBUTES_SCRUBBED_KEY, ()), *span_scrubber.scrubbed]
+        if scrubbed:
+            result[ATTRIBUTES_SCRUBBED_KEY] = json.dumps(scrubbed)
+        return result
+
+    def serialize_deferred_attributes(self, attributes: Mapping[str, Any]) -> dict[str, Any]:
+        # The placeholders were skipped when the span was scrubbed,
+        # so scrub the original objects in the same way as `prepare_attributes` does at source.
+        span_scrubber = SpanScrubber(self, encode_objects=True)
+        result = dict(attributes)
+        for key, value in attributes.items():
+            if value.__class__ is DeferredJson:
+                value = cast(DeferredJson, value)
+                result[key] = span_scrubber.scrub_attribute_at_source(key, value.value, value.prepare)
+        if span_scrubber.scrubbed:
+            already_scrubbed = cast('str', result.get(ATTRIBUTES_SCRUBBED_KEY, '[]'))
+            try:
+                already_scrubbed = cast('list[ScrubbedNote]', json.loads(already_scrubbed))
+            except json.JSONDecodeError:  # pragma: no cover
+                already_scrubbed = []
+            result[ATTRIBUTES_SCRUBBED_KEY] = json.dumps(already_scrubbed + span_scrubber.scrubbed)
+        return result
+
 
 class SpanScrubber:
     """Does the actual scrubbing work.
@@ -212,9 +346,12 @@ class SpanScrubber:
     and hold and mutate state about the span being scrubbed, specifically the scrubbed notes.
     """
 
-    def __init__(self, parent: Scrubber):
-        self._pattern = parent._pattern  # type: ignore
+    def __init__(self, parent: Scrubber, encode_objects: bool = False):
+        self._search = parent._search  # type: ignore
         self._callback = parent._callback  # type: ignore
+        self._key_decision = parent._key_decision  # type: ignore
+        # When scrubbing at source, values can be arbitrary Python objects rather than JSON-compatible values.
+        self._encode_objects = encode_objects
         self.scrubbed: list[ScrubbedNote] = []
         self.did_scrub = False
 
@@ -229,40 +366,77 @@ class SpanScrubber:
         if self.did_scrub:
             span['attributes'] = BoundedAttributes(attributes=new_attributes)
 
-        span['events'] = [
-            Event(
-                # We don't scrub the event name because in theory it should be a low-cardinality general description,
-                # not containing actual data. The same applies to the span name, which just isn't mentioned here.
-                name=event.name,
-                attributes=BoundedAttributes(attributes=self.scrub_event_attributes(event, i)),
-                timestamp=event.timestamp,
-            )
-            for i, event in enumerate(span['events'])
-        ]
-        span['links'] = [
-            Link(
-                context=link.context,
-                attributes=BoundedAttributes(attributes=self.scrub(('links', i, 'attributes'), link.attributes)),
-            )
-            for i, link in enumerate(span['links'])
-        ]
+        # Only replace events and links if something in them was scrubbed,
+        # so that unchanged spans can be recognized and passed on without being copied.
+        if span['events']:
+            self.did_scrub = False
+            new_events = [
+                Event(
+                    # We don't scrub the event name because in theory it should be a low-cardinality general description,
+                    # not containing actual data. The same applies to the span name, which just isn't mentioned here.
+                    name=event.name,
+                    attributes=BoundedAttributes(attributes=self.scrub_event_attributes(event, i)),
+                    timestamp=event.timestamp,
+                )
+                for i, event in enumerate(span['events'])
+            ]
+            if self.did_scrub:
+                span['events'] = new_events
+        if span['links']:
+            self.did_scrub = False
+            new_links = [
+                Link(
+                    context=link.context,
+                    attributes=BoundedAttributes(attributes=self.scrub(('links', i, 'attributes'), link.attributes)),
+                )
+                for i, link in enumerate(span['links'])
+            ]
+            if self.did_scrub:
+                span['links'] = new_links
 
     def scrub_log(self, log: LogRecord) -> LogRecord:
-        new_attributes: dict[str, Any] | None = self.scrub(('attributes',), log.attributes)
+        new_attributes: Mapping[str, Any] | None = self.scrub(('attributes',), log.attributes)
         new_body = self.scrub(('log_body',), log.body)
 
         if not self.did_scrub:
             return log
 
         if self.scrubbed:
-            new_attributes = new_attributes or {}
-            new_attributes[ATTRIBUTES_SCRUBBED_KEY] = json.dumps(self.scrubbed)
+            new_attributes = {**(new_attributes or {}), ATTRIBUTES_SCRUBBED_KEY: json.dumps(self.scrubbed)}
 
         result = copy.copy(log)
         result.attributes = BoundedAttributes(attributes=new_attributes)
         result.body = new_body
         return result
 
+    def scrub_attribute_at_source(
+        self, key: str, value: Any, prepare: Callable[[Any], AttributeValue]
+    ) -> AttributeValue:
+        """Scrub a single attribute of a span being created and convert it to an OTEL value with `prepare`.
+
+        If `value` gets serialized to JSON, then the original objects are scrubbed and only serialized again
+        if something was redacted, instead of parsing the JSON as `scrub` would.
+        """
+        decision = self._key_decision(key)
+        if decision is True:
+            return prepare(value)
+        path = ('attributes', key)
+        if decision is not False:
+            return prepare(self._redact(ScrubMatch(path, value, decision)))
+        otlp_value = prepare(value)
+        if not isinstance(otlp_value, str):
+            # Numbers and booleans can only be sensitive because of their key.
+            return otlp_value
+        if otlp_value is value:
+            return self.scrub(path, value)
+        # `value` was serialized to JSON, which can be searched quickly to skip the common case of nothing to scrub.
+        if not self._search(otlp_value):
+            return otlp_value
+        scrubbed = self.scrub(path, value)
+        if scrubbed is value:
+            return otlp_value
+        return logfire_json_dumps(scrubbed)
+
     def scrub_event_attributes(self, event: Event, index: int):
         attributes = event.attributes or {}
         path = ('otel_events', index, 'attributes')
@@ -275,41 +449,78 @@ class SpanScrubber:
 
         `path` is a list of keys and indices leading to `value` in the span.
         Similar to the truncation code, it should use the field names in the frontend, e.g. `otel_events`.
+
+        Returns `value` itself if nothing within it was redacted, so that callers can cheaply check
+        whether anything changed and avoid allocating new containers.
         """
+        if self._encode_objects and value.__class__ not in _JSON_TYPES:
+            # Scrub the same JSON-compatible value that the object would be serialized as.
+            json_value = to_json_value(value, set())
+            scrubbed = self.scrub(path, json_value)
+            return value if scrubbed is json_value else scrubbed
         if isinstance(value, str):
-            if match := self._pattern.search(value):
+            if match := self._search(value):
                 if match.span() == (0, len(value)):
                     # If the *whole* string matches, e.g. the value is literally 'password' and nothing more,
                     # it's considered safe.
                     return value
                 try:
-                    value = json.loads(value)
+                    parsed = json.loads(value)
                 except json.JSONDecodeError:
                     return self._redact(ScrubMatch(path, value, match))
                 else:
-                    return json.dumps(self.scrub(path, value))
+                    new_parsed = self.scrub(path, parsed)
+                    if new_parsed is parsed:
+                        # The match was somewhere harmless, e.g. a whole string value inside the JSON.
+                        return value
+                    return json.dumps(new_parsed)
         elif isinstance(value, Sequence):
-            return [self.scrub(path + (i,), x) for i, x in enumerate(cast('Sequence[Any]', value))]
+            value = cast('Sequence[Any]', value)
+            new_list: list[Any] | None = None
+            for i, x in enumerate(value):
+                new_x = self.scrub(path + (i,), x)
+                if new_list is not None:
+                    new_list.append(new_x)
+                elif new_x is not x:
+                    new_list = [*value[:i], new_x]
+            return value if new_list is None else new_list
         elif isinstance(value, Mapping):
-            result: dict[str, Any] = {}
-            for k, v in cast('Mapping[str, Any]', value).items():
-                if k in BaseScrubber.SAFE_KEYS:
-                    result[k] = v
-                elif match := self._pattern.search(k):
-                    redacted = self._redact(ScrubMatch(path + (k,), v, match))
-                    if isinstance(redacted, str) and isinstance(v, Sequence) and not isinstance(v, str):
-                        redacted = [redacted]
-                    result[k] = redacted
+            value = cast('Mapping[str, Any]', value)
+            result: dict[str, Any] | None = None
+            for k, v in value.items():
+                if v.__class__ is SourceScrubbedStr or v.__class__ is DeferredJson:
+                    # Deferred values are scrubbed when they're serialized by `serialize_deferred_attributes`.
+                    continue
+                key = k if isinstance(k, str) else safe_repr(k)
+                decision = self._key_decision(key)
+                if decision is True:
+                    continue
+                if decision is False:
+                    new_v = self.scrub(path + (key,), v)
                 else:
-                    result[k] = self.scrub(path + (k,), v)
-            return result
+                    new_v = self._redact(ScrubMatch(path + (key,), v, decision))
+                    if isinstance(new_v, str) and isinstance(v, Sequence) and not isinstance(v, str):
+                        new_v = [new_v]
+                if new_v is not v:
+                    if result is None:
+                        result = dict(value)
+                    result[k] = new_v
+            return value if result is None else result
         return value
 
     def _redact(self, match: ScrubMatch) -> Any:
         if self._callback and (result := self._callback(match)) is not None:
-            self.did_scrub = self.did_scrub or result is not match.value
+            if result is not match.value:
+                self.did_scrub = True
+                _record_scrubbed_bytes(match.value)
             return result
         self.did_scrub = True
+        _record_scrubbed_bytes(match.value)
         matched_substring = match.pattern_match.group(0)
         self.scrubbed.append(ScrubbedNote(path=match.path, matched_substring=matched_substring))
         return f'[Scrubbed due to {matched_substring!r}]'
+
+
+def _record_scrubbed_bytes(value: Any) -> None:
+    text = value if isinstance(value, str) else str(value)
+    EXPORT_STATS.add(scrubbed_bytes=len(text.encode()))
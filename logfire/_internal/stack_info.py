@@ -80,10 +80,27 @@ def get_user_stack_info() -> StackInfo:
 
     See is_user_code for details.
     Returns an empty dict if no such frame is found.
+
+    The result is cached for each calling instruction in user code, so it must not be modified.
     """
-    frame, _stacklevel = get_user_frame_and_stacklevel()
-    if frame:
-        return get_stack_info_from_frame(frame)
+    frame = sys._getframe(1)  # pyright: ignore[reportPrivateUsage]
+    for _ in range(10_000):  # see the safety check in get_user_frame_and_stacklevel
+        if is_user_frame(frame):
+            code = frame.f_code
+            # The instruction offset identifies the line and is quicker to get than `f_lineno`.
+            key = (id(code), frame.f_lasti)
+            try:
+                return _USER_STACK_INFOS[key][1]
+            except KeyError:
+                if len(_USER_STACK_INFOS) >= MAX_CACHED_CODE_OBJECTS:
+                    # Unexpectedly many places create spans/logs, start over rather than growing forever.
+                    _USER_STACK_INFOS.clear()
+                result = get_stack_info_from_frame(frame)
+                _USER_STACK_INFOS[key] = code, result
+                return result
+        frame = frame.f_back
+        if frame is None:
+            break
     return {}
 
 
@@ -96,7 +113,7 @@ def get_user_frame_and_stacklevel() -> tuple[FrameType | None, int]:
     frame = inspect.currentframe()
     stacklevel = 0
     while frame:
-        if is_user_code(frame.f_code):
+        if is_user_frame(frame):
             return frame, stacklevel
         frame = frame.f_back
         stacklevel += 1
@@ -108,6 +125,29 @@ def get_user_frame_and_stacklevel() -> tuple[FrameType | None, int]:
     return None, 0
 
 
+# Code objects are hashed by value (bytecode, constants, names, etc.) which is slow for large functions,
+# so these caches are keyed by `id(code)` for checking every frame of every span/log quickly.
+# The code objects are stored in the values to keep them alive so that their IDs can't be reused.
+_USER_CODE_BY_ID: dict[int, tuple[CodeType, bool]] = {}
+_USER_STACK_INFOS: dict[tuple[int, int], tuple[CodeType, StackInfo]] = {}
+
+MAX_CACHED_CODE_OBJECTS = 8192
+
+
+def is_user_frame(frame: FrameType) -> bool:
+    """Like `is_user_code(frame.f_code)`, but faster."""
+    code = frame.f_code
+    try:
+        return _USER_CODE_BY_ID[id(code)][1]
+    except KeyError:
+        if len(_USER_CODE_BY_ID) >= MAX_CACHED_CODE_OBJECTS:
+            # Unexpectedly many code objects, start over rather than growing forever.
+            _USER_CODE_BY_ID.clear()
+        result = is_user_code(code)
+        _USER_CODE_BY_ID[id(code)] = code, result
+        return result
+
+
 @lru_cache(maxsize=8192)
 def is_user_code(code: CodeType) -> bool:
     """Check if the code object is from user code.
@@ -3,12 +3,11 @@ from __future__ import annotations
 import json
 import sys
 import traceback
-from collections import defaultdict
 from collections.abc import Mapping, Sequence
 from dataclasses import dataclass, field
 from threading import Lock
 from typing import TYPE_CHECKING, Any, Callable, cast
-from weakref import WeakKeyDictionary, WeakValueDictionary
+from weakref import WeakKeyDictionary, ref
 
 import opentelemetry.trace as trace_api
 from opentelemetry import context as context_api
@@ -39,6 +38,7 @@ from .utils import canonicalize_exception_traceback, handle_internal_errors, sha
 
 if TYPE_CHECKING:
     from .config import LogfireConfig
+    from .exporters.processor_wrapper import MainSpanProcessorWrapper
 
 try:
     from pydantic import ValidationError
@@ -46,7 +46,49 @@ except ImportError:  # pragma: no cover
     ValidationError = None
 
 
-OPEN_SPANS: WeakValueDictionary[tuple[int, int], _LogfireWrappedSpan] = WeakValueDictionary()
+class _OpenSpans:
+    """Weakly references the spans that haven't ended yet, by trace and span ID.
+
+    Used to close open spans when the program exits and to find the parent span when collecting metrics.
+
+    This is a plain dict of weak references without callbacks, which is several times cheaper
+    than a `WeakValueDictionary` for spans that only live for a moment.
+    The cost is that spans garbage collected without ending (e.g. in abandoned generators) leave dead references,
+    so those are pruned whenever the dict has grown to twice its size after the previous pruning.
+    """
+
+    MIN_PRUNE_SIZE = 1024
+
+    def __init__(self) -> None:
+        self._refs: dict[tuple[int, int], ref[_LogfireWrappedSpan]] = {}
+        self._prune_size = self.MIN_PRUNE_SIZE
+
+    def add(self, key: tuple[int, int], span: _LogfireWrappedSpan) -> None:
+        refs = self._refs
+        refs[key] = ref(span)
+        if len(refs) >= self._prune_size:
+            self._prune()
+
+    def discard(self, key: tuple[int, int]) -> None:
+        self._refs.pop(key, None)
+
+    def get(self, key: tuple[int, int]) -> _LogfireWrappedSpan | None:
+        span_ref = self._refs.get(key)
+        return span_ref and span_ref()
+
+    def values(self) -> list[_LogfireWrappedSpan]:
+        return [span for span_ref in list(self._refs.values()) if (span := span_ref()) is not None]
+
+    def _prune(self) -> None:
+        refs = self._refs
+        # Copy the items atomically since other threads may be adding and removing spans.
+        for key, span_ref in list(refs.items()):
+            if span_ref() is None:
+                refs.pop(key, None)
+        self._prune_size = max(self.MIN_PRUNE_SIZE, len(refs) * 2)
+
+
+OPEN_SPANS = _OpenSpans()
 
 
 @dataclass
@@ -115,24 +157,67 @@ class ProxyTracerProvider(TracerProvider):
             return True  # pragma: no cover
 
 
-@dataclass
-class SpanMetric:
-    details: dict[tuple[tuple[str, otel_types.AttributeValue], ...], float] = field(
-        default_factory=lambda: defaultdict(int)
-    )
+class SpanMetricSeries:
+    """A metric name and set of attributes whose values are summed in spans with `collect_in_spans`.
+
+    Instances are interned by `span_metric_series` and hashed by identity,
+    so adding to a span's totals is a single cheap dict operation.
+    Handles from `logfire.bind_metric` look up their series once instead of on every call.
+    """
+
+    __slots__ = ('name', 'attributes', 'key')
+
+    def __init__(self, name: str, key: tuple[tuple[str, otel_types.AttributeValue], ...]) -> None:
+        self.name = name
+        self.key = key
+        self.attributes = dict(key)
 
-    def dump(self):
-        return {
-            'details': [{'attributes': dict(attributes), 'total': total} for attributes, total in self.details.items()],
-            'total': sum(total for total in self.details.values()),
-        }
 
-    def increment(self, attributes: Mapping[str, otel_types.AttributeValue], value: float):
-        key = tuple(sorted(attributes.items()))
-        self.details[key] += value
+_SPAN_METRIC_SERIES: dict[tuple[str, tuple[tuple[str, otel_types.AttributeValue], ...]], SpanMetricSeries] = {}
+_SPAN_METRIC_SERIES_MAX_SIZE = 10_000
+
+
+def span_metric_series(name: str, attributes: Mapping[str, otel_types.AttributeValue]) -> SpanMetricSeries:
+    """Returns the interned series for the metric name and attributes.
+
+    The cache is cleared when it's full so that metrics with high cardinality attributes don't leak memory.
+    Spans may then hold two series objects for the same name and attributes, which `dump_span_metrics` merges.
+    """
+    key = tuple(sorted(attributes.items()))
+    try:
+        return _SPAN_METRIC_SERIES[(name, key)]
+    except KeyError:
+        pass
+    except TypeError:
+        # Sequence attribute values can be lists, which aren't hashable.
+        key = cast(
+            'tuple[tuple[str, otel_types.AttributeValue], ...]',
+            tuple((k, tuple(v) if isinstance(v, list) else v) for k, v in key),
+        )
+        if series := _SPAN_METRIC_SERIES.get((name, key)):
+            return series
+    if len(_SPAN_METRIC_SERIES) >= _SPAN_METRIC_SERIES_MAX_SIZE:
+        _SPAN_METRIC_SERIES.clear()
+    return _SPAN_METRIC_SERIES.setdefault((name, key), SpanMetricSeries(name, key))
+
+
+def dump_span_metrics(totals: dict[SpanMetricSeries, float]) -> str:
+    """Returns the JSON for the `logfire.metrics` attribute, grouping the totals by metric name."""
+    metrics: dict[str, dict[tuple[tuple[str, otel_types.AttributeValue], ...], dict[str, Any]]] = {}
+    for series, total in totals.items():
+        details = metrics.setdefault(series.name, {})
+        if detail := details.get(series.key):
+            detail['total'] += total
+        else:
+            details[series.key] = {'attributes': series.attributes, 'total': total}
+    return json.dumps(
+        {
+            name: {'details': list(details.values()), 'total': sum(detail['total'] for detail in details.values())}
+            for name, details in metrics.items()
+        }
+    )
 
 
-@dataclass(eq=False)
 class _LogfireWrappedSpan(trace_api.Span, ReadableSpan):
     """A span that wraps another span and overrides some behaviors in a logfire-specific way.
 
@@ -142,26 +227,35 @@ class _LogfireWrappedSpan(trace_api.Span, ReadableSpan):
     * Overrides end() to use a timestamp generator if one was provided
     """
 
-    span: Span
-    ns_timestamp_generator: Callable[[], int]
-    record_metrics: bool
-    metrics: dict[str, SpanMetric] = field(default_factory=lambda: defaultdict(SpanMetric))
-
-    def __post_init__(self):
-        OPEN_SPANS[self._open_spans_key()] = self
+    # The OpenTelemetry base classes don't define `__slots__`, so instances still have a `__dict__`,
+    # but it's never populated unless something sets other attributes.
+    __slots__ = ('span', 'ns_timestamp_generator', 'record_metrics', 'metrics', '_metrics_parent', '_open_spans_key')
+
+    def __init__(self, span: Span, ns_timestamp_generator: Callable[[], int], record_metrics: bool) -> None:
+        self.span = span
+        self.ns_timestamp_generator = ns_timestamp_generator
+        # Checked once here rather than on every increment, since spans are only recorded or not from the start.
+        self.record_metrics = record_metrics and span.is_recording()
+        # The totals of metrics incremented in this span and its descendants while this span was open,
+        # in the order first incremented. Only created when a metric is first incremented, since most spans never have any.
+        self.metrics: dict[SpanMetricSeries, float] | None = None
+        # Looked up once here so that increments can be added to every open ancestor without searching `OPEN_SPANS`.
+        self._metrics_parent: _LogfireWrappedSpan | None = None
+        if self.record_metrics and self.parent:
+            self._metrics_parent = OPEN_SPANS.get(_open_spans_key(self.parent))
+        self._open_spans_key = _open_spans_key(span.get_span_context())
+        OPEN_SPANS.add(self._open_spans_key, self)
 
     def end(self, end_time: int | None = None) -> None:
         with handle_internal_errors:
-            OPEN_SPANS.pop(self._open_spans_key(), None)
+            OPEN_SPANS.discard(self._open_spans_key)
+            # Descendants that are still open stop adding to the totals of this span and its ancestors.
+            self.record_metrics = False
+            self._metrics_parent = None
             if self.metrics:
-                self.span.set_attribute(
-                    'logfire.metrics', json.dumps({name: metric.dump() for name, metric in self.metrics.items()})
-                )
+                self.span.set_attribute('logfire.metrics', dump_span_metrics(self.metrics))
         self.span.end(end_time or self.ns_timestamp_generator())
 
-    def _open_spans_key(self):
-        return _open_spans_key(self.span.get_span_context())
-
     def get_span_context(self) -> SpanContext:
         return self.span.get_span_context()
 
@@ -206,12 +300,17 @@ class _LogfireWrappedSpan(trace_api.Span, ReadableSpan):
         record_exception(self.span, exception, attributes=attributes, timestamp=timestamp, escaped=escaped)
 
     def increment_metric(self, name: str, attributes: Mapping[str, otel_types.AttributeValue], value: float) -> None:
-        if not self.is_recording() or not self.record_metrics:
-            return
-
-        self.metrics[name].increment(attributes, value)
-        if self.parent and (parent := OPEN_SPANS.get(_open_spans_key(self.parent))):
-            parent.increment_metric(name, attributes, value)
+        if self.record_metrics:
+            self.increment_metric_series(span_metric_series(name, attributes), value)
+
+    def increment_metric_series(self, series: SpanMetricSeries, value: float) -> None:
+        span = self
+        while span is not None and span.record_metrics:
+            metrics = span.metrics
+            if metrics is None:
+                metrics = span.metrics = {}
+            metrics[series] = metrics.get(series, 0) + value
+            span = span._metrics_parent
 
     def __exit__(self, exc_type: type[BaseException] | None, exc_value: BaseException | None, traceback: Any) -> None:
         if self.is_recording():
@@ -274,17 +373,7 @@ class _ProxyTracer(Tracer):
         span = self.tracer.start_span(
             name, context, kind, attributes, links, start_time, record_exception, set_status_on_exception
         )
-        if not should_sample(span.get_span_context(), attributes):  # pragma: no cover
-            span = trace_api.NonRecordingSpan(
-                SpanContext(
-                    trace_id=span.get_span_context().trace_id,
-                    span_id=span.get_span_context().span_id,
-                    is_remote=False,
-                    trace_flags=trace_api.TraceFlags(
-                        span.get_span_context().trace_flags & ~trace_api.TraceFlags.SAMPLED
-                    ),
-                )
-            )
+        span = _apply_sample_rate(span, attributes)
         return _LogfireWrappedSpan(
             span,
             ns_timestamp_generator=ns_timestamp_generator,
@@ -295,6 +384,16 @@ class _ProxyTracer(Tracer):
     # is roughly equivalent to `with use_span(start_span(...)):`
     start_as_current_span = SDKTracer.start_as_current_span
 
+    def start_log_span(self, name: str, attributes: dict[str, otel_types.AttributeValue], start_time: int) -> Span:
+        """A faster version of `start_span` for logs created by `Logfire.log`, which end as soon as they start.
+
+        `attributes` must already contain the message and span type, and is used without copying.
+        The span isn't wrapped in a `_LogfireWrappedSpan` since it's never open long enough to need it:
+        it can't have children, collect metrics, or be left open when the program exits.
+        """
+        span = self.tracer.start_span(name, attributes=attributes, start_time=start_time)
+        return _apply_sample_rate(span, attributes)
+
 
 class SuppressedTracer(Tracer):
     def start_span(self, name: str, context: Context | None = None, *args: Any, **kwargs: Any) -> Span:
@@ -319,7 +418,16 @@ class PendingSpanProcessor(SpanProcessor):
     """
 
     id_generator: IdGenerator
-    processor: SpanProcessor
+    processor: SpanProcessor | None
+    """Receives the pending span as soon as the span starts, e.g. to print it to the console."""
+
+    lazy_processor: MainSpanProcessorWrapper | None = None
+    """Receives a `LazyPendingSpan` instead, bypassing the wrapper.
+
+    This is for batch processors whose exporter calls `LazyPendingSpan.materialize`,
+    so that the pending span (including the processing done by the wrapper) is only built
+    if the span is still open when the batch is exported.
+    """
 
     def on_start(
         self,
@@ -335,14 +443,22 @@ class PendingSpanProcessor(SpanProcessor):
         if not attributes or attributes.get(ATTRIBUTES_SPAN_TYPE_KEY) not in (None, 'span'):
             return
 
-        real_span_context = span.get_span_context()
-        if not should_sample(real_span_context, attributes):  # pragma: no cover
+        if not should_sample(span.get_span_context(), attributes):  # pragma: no cover
             # Currently our own sampling is only checked after the span has started,
             # so we have to repeat that check here.
             # This might change in the future, see
             # https://linear.app/pydantic/issue/PYD-552/sampling-behaves-very-differently-depending-on-how-its-configured
             return
 
+        if self.lazy_processor is not None:
+            self.lazy_processor.processor.on_end(LazyPendingSpan(span, self))
+        if self.processor is not None:
+            self.processor.on_end(self.pending_span(span))
+
+    def pending_span(self, span: ReadableSpan) -> ReadableSpan:
+        """Build the pending span for `span` from its current state."""
+        real_span_context = span.context
+        assert real_span_context is not None
         span_context = SpanContext(
             trace_id=real_span_context.trace_id,
             span_id=self.id_generator.generate_span_id(),
@@ -350,7 +466,7 @@ class PendingSpanProcessor(SpanProcessor):
             trace_flags=real_span_context.trace_flags,
         )
         attributes = {
-            **attributes,
+            **(span.attributes or {}),
             ATTRIBUTES_SPAN_TYPE_KEY: 'pending_span',
             # use str here since protobuf can't encode ints above 2^64,
             # see https://github.com/pydantic/platform/pull/388
@@ -359,7 +475,7 @@ class PendingSpanProcessor(SpanProcessor):
             ),
         }
         start_and_end_time = span.start_time
-        pending_span = ReadableSpan(
+        return ReadableSpan(
             name=span.name,
             context=span_context,
             parent=real_span_context,
@@ -373,7 +489,33 @@ class PendingSpanProcessor(SpanProcessor):
             end_time=start_and_end_time,
             instrumentation_scope=span.instrumentation_scope,
         )
-        self.processor.on_end(pending_span)
+
+
+class LazyPendingSpan(ReadableSpan):
+    """Placeholder for the pending span of `span` in the queue of a batch processor.
+
+    Only the name, context and attributes of the real span are available, e.g. for `_make_room` in
+    `DynamicBatchSpanProcessor`, and the exporter must call `materialize` to get the actual pending span.
+    """
+
+    def __init__(self, span: ReadableSpan, pending_span_processor: PendingSpanProcessor) -> None:
+        super().__init__(name=span.name, context=span.context, resource=span.resource, attributes=span.attributes)
+        self.span = span
+        self.pending_span_processor = pending_span_processor
+
+    def materialize(self) -> ReadableSpan | None:
+        """Build and process the pending span, or return `None` if the span has ended by now.
+
+        Spans that have ended are skipped because their final span will be exported instead.
+        The SDK sets `end_time` just before calling `on_end`, so the final span is in the same batch or a later one.
+        If the queue is full, a policy like `drop_oldest` may drop the final span, and then neither is exported.
+        Attributes set on the span since it started are included.
+        """
+        if self.span.end_time is not None:
+            return None
+        processor = self.pending_span_processor
+        assert processor.lazy_processor is not None
+        return processor.lazy_processor.process(processor.pending_span(self.span))
 
 
 def should_sample(span_context: SpanContext, attributes: Mapping[str, otel_types.AttributeValue]) -> bool:
@@ -385,6 +527,21 @@ def should_sample(span_context: SpanContext, attributes: Mapping[str, otel_types
     return sample_rate is None or span_context.span_id <= round(sample_rate * 2**64)
 
 
+def _apply_sample_rate(span: Span, attributes: Mapping[str, otel_types.AttributeValue]) -> Span:
+    """Returns a non-recording span with the same context as `span` if `should_sample` rejects it, else `span`."""
+    span_context = span.get_span_context()
+    if should_sample(span_context, attributes):
+        return span
+    return trace_api.NonRecordingSpan(
+        SpanContext(
+            trace_id=span_context.trace_id,
+            span_id=span_context.span_id,
+            is_remote=False,
+            trace_flags=trace_api.TraceFlags(span_context.trace_flags & ~trace_api.TraceFlags.SAMPLED),
+        )
+    )
+
+
 def get_sample_rate_from_attributes(attributes: otel_types.Attributes) -> float | None:
     if not attributes:  # pragma: no cover
         return None
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from functools import cached_property
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from functools import cache, cached_property
 from threading import Lock
 from typing import Callable, Literal
+from weakref import WeakSet
 
 from opentelemetry import context
+from opentelemetry.metrics import CallbackOptions, Observation
 from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
 from opentelemetry.sdk.trace.sampling import Sampler, TraceIdRatioBased
 from typing_extensions import Self
@@ -18,6 +22,7 @@ from logfire._internal.constants import (
     LevelName,
 )
 from logfire._internal.exporters.wrapper import WrapperSpanProcessor
+from logfire._internal.metrics import register_internal_callback_metric
 
 
 @dataclass
@@ -75,6 +80,14 @@ class TraceBuffer:
     started: list[tuple[Span, context.Context | None]]
     ended: list[ReadableSpan]
 
+    finished: bool = False
+    """Whether the buffer has been taken out of the tail sampling processor to be pushed or discarded.
+
+    This happens when a thread decides to include the trace, or when the buffer is evicted because of a limit.
+    """
+
+    created_at: float = field(default_factory=time.monotonic)
+
     @cached_property
     def first_span(self) -> Span:
         return self.started[0][0]
@@ -154,6 +167,40 @@ class SamplingOptions:
 
     Every span in a trace will be stored in memory until either the trace is included by tail sampling
     or it's completed and discarded, so large traces may consume a lot of memory.
+    Use the `max_buffered_*` options below to limit this.
+    """
+
+    max_buffered_traces: int | None = None
+    """
+    Approximate maximum number of traces to store in memory while waiting for a tail sampling decision.
+
+    When a new trace would exceed this, the oldest buffered traces are evicted according to `buffer_eviction`.
+    `None` means no limit.
+    """
+
+    max_buffered_spans_per_trace: int | None = None
+    """
+    Maximum number of spans of a single trace to store in memory while waiting for a tail sampling decision.
+
+    A trace that exceeds this is evicted according to `buffer_eviction`. `None` means no limit.
+    """
+
+    max_buffer_age: float | None = None
+    """
+    Maximum number of seconds to store the spans of a trace while waiting for a tail sampling decision,
+    e.g. for long-running root spans or traces whose root span never ends in this process.
+
+    Buffers older than this are evicted according to `buffer_eviction` when new traces start.
+    `None` means no limit.
+    """
+
+    buffer_eviction: Literal['drop', 'include'] = 'drop'
+    """
+    What to do with a trace whose spans are evicted from memory because of one of the `max_buffered_*` limits.
+
+    - `'drop'`: discard the spans, as if the trace wasn't included by tail sampling.
+      Remaining spans of the trace that are started or ended later in this process are also discarded.
+    - `'include'`: include the whole trace, as if tail sampling returned 1.0.
     """
 
     @classmethod
@@ -164,6 +211,10 @@ class SamplingOptions:
         level_threshold: LevelName | None = 'notice',
         duration_threshold: float | None = 5.0,
         background_rate: float = 0.0,
+        max_buffered_traces: int | None = None,
+        max_buffered_spans_per_trace: int | None = None,
+        max_buffer_age: float | None = None,
+        buffer_eviction: Literal['drop', 'include'] = 'drop',
     ) -> Self:
         """Returns a `SamplingOptions` instance that tail samples traces based on their log level and duration.
 
@@ -172,7 +223,8 @@ class SamplingOptions:
         then the whole trace will be included.
         Otherwise, the probability is `background_rate`.
 
-        The `head` parameter is the same as in the `SamplingOptions` constructor.
+        The `head` parameter and the `max_buffered_*`, `max_buffer_age` and `buffer_eviction` parameters
+        are the same as in the `SamplingOptions` constructor.
         """
         head_sample_rate = head if isinstance(head, (float, int)) else 1.0
 
@@ -188,7 +240,14 @@ class SamplingOptions:
 
             return background_rate
 
-        return cls(head=head, tail=get_tail_sample_rate)
+        return cls(
+            head=head,
+            tail=get_tail_sample_rate,
+            max_buffered_traces=max_buffered_traces,
+            max_buffered_spans_per_trace=max_buffered_spans_per_trace,
+            max_buffer_age=max_buffer_age,
+            buffer_eviction=buffer_eviction,
+        )
 
 
 def check_trace_id_ratio(trace_id: int, rate: float) -> bool:
@@ -196,10 +255,40 @@ def check_trace_id_ratio(trace_id: int, rate: float) -> bool:
     return (trace_id & TraceIdRatioBased.TRACE_ID_LIMIT) < TraceIdRatioBased.get_bound_for_rate(rate)
 
 
+@dataclass(eq=False)
+class TraceShard:
+    """Buffers for the subset of traces whose IDs map to this shard, see `TailSamplingProcessor`."""
+
+    traces: dict[int, TraceBuffer] = field(default_factory=dict[int, TraceBuffer])
+
+    # Buffers of included traces that a thread is currently passing to the wrapped processor, by trace ID.
+    # Spans of these traces that start or end in the meantime are appended to the buffer and passed on
+    # by the same thread, so that the wrapped processor sees them after the buffered spans, see `push_buffer`.
+    pushing: dict[int, TraceBuffer] = field(default_factory=dict[int, TraceBuffer])
+
+    # IDs of traces that were evicted and dropped, so that their remaining spans are also dropped.
+    # This is used as an ordered set so that the oldest IDs can be forgotten if it grows too large.
+    dropped_trace_ids: dict[int, None] = field(default_factory=dict[int, None])
+
+    # Code that touches self.traces and its contents should be protected by this lock.
+    lock: Lock = field(default_factory=Lock)
+
+
 class TailSamplingProcessor(WrapperSpanProcessor):
     """Passes spans to the wrapped processor if any span in a trace meets the sampling criteria."""
 
-    def __init__(self, processor: SpanProcessor, get_tail_sample_rate: Callable[[TailSamplingSpanInfo], float]) -> None:
+    MAX_DROPPED_TRACE_IDS_PER_SHARD = 1000
+
+    def __init__(
+        self,
+        processor: SpanProcessor,
+        get_tail_sample_rate: Callable[[TailSamplingSpanInfo], float],
+        num_shards: int = 16,
+        max_traces: int | None = None,
+        max_spans_per_trace: int | None = None,
+        max_age: float | None = None,
+        eviction: Literal['drop', 'include'] = 'drop',
+    ) -> None:
         super().__init__(processor)
         self.get_tail_sample_rate = get_tail_sample_rate
 
@@ -207,74 +296,211 @@ class TailSamplingProcessor(WrapperSpanProcessor):
         # If a span meets the sampling criteria, the buffer is dropped and all spans within are pushed
         # to the wrapped processor.
         # So when more spans arrive and there's no buffer, they get passed through immediately.
-        self.traces: dict[int, TraceBuffer] = {}
-
-        # Code that touches self.traces and its contents should be protected by this lock.
-        self.lock = Lock()
+        # Traces are split into shards by trace ID, each with its own lock,
+        # so that threads handling different traces rarely wait for each other.
+        self.shards = [TraceShard() for _ in range(num_shards)]
+        _SHARDS.update(self.shards)
+        _register_tail_sampling_metrics()
+
+        # See the corresponding SamplingOptions fields.
+        # The limit on the number of traces is applied to each shard separately.
+        self.max_traces_per_shard = None if max_traces is None else max(1, -(-max_traces // num_shards))
+        self.max_spans_per_trace = max_spans_per_trace
+        self.max_age = max_age
+        self.eviction = eviction
+
+    def shard(self, trace_id: int) -> TraceShard:
+        return self.shards[trace_id % len(self.shards)]
 
     def on_start(self, span: Span, parent_context: context.Context | None = None) -> None:
-        dropped = False
         buffer = None
-
-        with self.lock:
-            # span.context could supposedly be None, not sure how.
-            if span.context:  # pragma: no branch
-                trace_id = span.context.trace_id
+        pushing = None
+        evicted: list[TraceBuffer] = []
+
+        # span.context could supposedly be None, not sure how.
+        if span.context:  # pragma: no branch
+            trace_id = span.context.trace_id
+            shard = self.shard(trace_id)
+            with shard.lock:
                 # If span.parent is None, it's the root span of a trace.
                 if span.parent is None:
-                    self.traces[trace_id] = TraceBuffer([], [])
+                    evicted = self.evict_old_buffers(shard)
+                    shard.traces[trace_id] = TraceBuffer([], [])
+                elif trace_id in shard.dropped_trace_ids:
+                    return
 
-                buffer = self.traces.get(trace_id)
+                buffer = shard.traces.get(trace_id)
                 if buffer is not None:
                     # This trace's spans haven't met the criteria yet, so add this span to the buffer.
                     buffer.started.append((span, parent_context))
-                    dropped = self.check_span(TailSamplingSpanInfo(span, parent_context, 'start', buffer))
-                # The opposite case is handled outside the lock since it may take some time.
-
-        # This code may take longer since it calls the wrapped processor which might do anything.
-        # It shouldn't be inside the lock to avoid blocking other threads.
-        # Since it's not in the lock, it shouldn't touch self.traces or its contents.
+                    if self.max_spans_per_trace is not None and len(buffer.started) > self.max_spans_per_trace:
+                        self.evict_buffer(shard, buffer)
+                        evicted.append(buffer)
+                elif (pushing := shard.pushing.get(trace_id)) is not None:
+                    pushing.started.append((span, parent_context))
+
+        # This code may take longer since it calls the user's callback or the wrapped processor,
+        # which might do anything. It shouldn't be inside the lock to avoid blocking other threads.
+        self.push_evicted_buffers(evicted)
+        if pushing is not None:
+            return
         if buffer is None:
             super().on_start(span, parent_context)
-        elif dropped:
+        elif not buffer.finished and self.check_span(TailSamplingSpanInfo(span, parent_context, 'start', buffer)):
             self.push_buffer(buffer)
 
     def on_end(self, span: ReadableSpan) -> None:
         # This has a very similar structure and reasoning to on_start.
 
-        dropped = False
         buffer = None
 
-        with self.lock:
-            if span.context:  # pragma: no branch
-                trace_id = span.context.trace_id
-                buffer = self.traces.get(trace_id)
+        if span.context:  # pragma: no branch
+            trace_id = span.context.trace_id
+            shard = self.shard(trace_id)
+            with shard.lock:
+                if trace_id in shard.dropped_trace_ids:
+                    if span.parent is None:
+                        del shard.dropped_trace_ids[trace_id]
+                    return
+
+                buffer = shard.traces.get(trace_id)
                 if buffer is not None:
                     buffer.ended.append(span)
-                    dropped = self.check_span(TailSamplingSpanInfo(span, None, 'end', buffer))
                     if span.parent is None:
                         # This is the root span, so the trace is hopefully complete.
-                        # Delete the buffer to save memory.
-                        self.traces.pop(trace_id, None)
+                        # Stop buffering to save memory. The trace can still be included below,
+                        # or by another thread that is currently checking a span in this trace.
+                        # Spans that end after this and before that thread starts pushing are passed on
+                        # immediately, possibly before their buffered start.
+                        del shard.traces[trace_id]
+                elif (pushing := shard.pushing.get(trace_id)) is not None:
+                    pushing.ended.append(span)
+                    return
 
         if buffer is None:
             super().on_end(span)
-        elif dropped:
+        elif self.check_span(TailSamplingSpanInfo(span, None, 'end', buffer)):
             self.push_buffer(buffer)
 
     def check_span(self, span_info: TailSamplingSpanInfo) -> bool:
-        """If the span meets the sampling criteria, drop the buffer and return True. Otherwise, return False."""
-        sample_rate = self.get_tail_sample_rate(span_info)
-        if sampled := check_trace_id_ratio(span_info.buffer.trace_id, sample_rate):
-            self.drop_buffer(span_info.buffer)
-
-        return sampled
+        """If the span meets the sampling criteria, drop the buffer and return True. Otherwise, return False.
 
-    def drop_buffer(self, buffer: TraceBuffer) -> None:
-        del self.traces[buffer.trace_id]
+        This is called without holding any lock, so several threads may check spans in the same trace concurrently.
+        Only one of them gets True, and is then responsible for pushing the buffer.
+        """
+        sample_rate = self.get_tail_sample_rate(span_info)
+        if check_trace_id_ratio(span_info.buffer.trace_id, sample_rate):
+            return self.drop_buffer(span_info.buffer)
+        return False
+
+    def drop_buffer(self, buffer: TraceBuffer) -> bool:
+        """Stop buffering spans for this trace, returning False if another thread has already done so."""
+        shard = self.shard(buffer.trace_id)
+        with shard.lock:
+            if buffer.finished:
+                return False
+            buffer.finished = True
+            if shard.traces.get(buffer.trace_id) is buffer:
+                del shard.traces[buffer.trace_id]
+            shard.pushing[buffer.trace_id] = buffer
+        return True
+
+    def evict_old_buffers(self, shard: TraceShard) -> list[TraceBuffer]:
+        """Evict the oldest buffers in the shard that are too old or would exceed the limit on the number of traces.
+
+        Must be called with the shard's lock held, before adding a new buffer.
+        """
+        evicted: list[TraceBuffer] = []
+        if self.max_age is None and self.max_traces_per_shard is None:
+            return evicted
+        now = time.monotonic()
+        # Dicts are ordered by insertion, so the oldest buffers come first.
+        for buffer in shard.traces.values():
+            too_old = self.max_age is not None and now - buffer.created_at > self.max_age
+            too_many = (
+                self.max_traces_per_shard is not None and len(shard.traces) - len(evicted) >= self.max_traces_per_shard
+            )
+            if not (too_old or too_many):
+                break
+            evicted.append(buffer)
+        for buffer in evicted:
+            self.evict_buffer(shard, buffer)
+        return evicted
+
+    def evict_buffer(self, shard: TraceShard, buffer: TraceBuffer) -> None:
+        """Remove a buffer because of a limit. Must be called with the shard's lock held.
+
+        If `eviction` is `'include'`, the buffer must then be pushed with `push_evicted_buffers` outside the lock.
+        """
+        buffer.finished = True
+        del shard.traces[buffer.trace_id]
+        if self.eviction == 'include':
+            shard.pushing[buffer.trace_id] = buffer
+        else:
+            shard.dropped_trace_ids[buffer.trace_id] = None
+            if len(shard.dropped_trace_ids) > self.MAX_DROPPED_TRACE_IDS_PER_SHARD:
+                del shard.dropped_trace_ids[next(iter(shard.dropped_trace_ids))]
+
+    def push_evicted_buffers(self, buffers: list[TraceBuffer]) -> None:
+        if self.eviction == 'include':
+            for buffer in buffers:
+                self.push_buffer(buffer)
 
     def push_buffer(self, buffer: TraceBuffer) -> None:
-        for started in buffer.started:
-            super().on_start(*started)
-        for span in buffer.ended:
-            super().on_end(span)
+        """Pass the spans of an included trace to the wrapped processor, without holding the shard's lock.
+
+        The buffer must have been registered in `TraceShard.pushing` by `drop_buffer` or `evict_buffer`.
+        Spans of the trace that start or end on other threads in the meantime are appended to the buffer,
+        and passed on by this thread as well before the buffer is unregistered.
+        So the wrapped processor never sees the end of a span before its start, as it would if those spans
+        were passed through directly.
+        """
+        shard = self.shard(buffer.trace_id)
+        num_started = num_ended = 0
+        try:
+            while True:
+                with shard.lock:
+                    started = buffer.started[num_started:]
+                    ended = buffer.ended[num_ended:]
+                    if not (started or ended):
+                        break
+                num_started += len(started)
+                num_ended += len(ended)
+                for args in started:
+                    super().on_start(*args)
+                for span in ended:
+                    super().on_end(span)
+        finally:
+            with shard.lock:
+                if shard.pushing.get(buffer.trace_id) is buffer:  # pragma: no branch
+                    del shard.pushing[buffer.trace_id]
+
+
+_SHARDS: WeakSet[TraceShard] = WeakSet()
+
+
+@cache
+def _register_tail_sampling_metrics() -> None:
+    # Only report while something is buffered, to avoid exporting a stream of zeros from idle processes.
+    def buffered_traces_callback(_options: CallbackOptions) -> Iterable[Observation]:
+        if num_traces := sum(len(shard.traces) for shard in list(_SHARDS)):
+            yield Observation(num_traces)
+
+    def buffered_spans_callback(_options: CallbackOptions) -> Iterable[Observation]:
+        if num_spans := sum(len(buffer.started) for shard in list(_SHARDS) for buffer in list(shard.traces.values())):
+            yield Observation(num_spans)
+
+    register_internal_callback_metric(
+        'gauge',
+        'logfire.tail_sampling.buffered_traces',
+        buffered_traces_callback,
+        description='Number of traces stored in memory while waiting for a tail sampling decision.',
+        unit='{trace}',
+    )
+    register_internal_callback_metric(
+        'gauge',
+        'logfire.tail_sampling.buffered_spans',
+        buffered_spans_callback,
+        description='Number of spans stored in memory while waiting for a tail sampling decision.',
+        unit='{span}',
+    )
@@ -1,6 +1,7 @@
 # Import this anyio backend early to prevent weird bug caused by concurrent calls to ast.parse
 from __future__ import annotations
 
+import dataclasses
 import os
 from pathlib import Path
 from typing import Any
@@ -16,9 +17,12 @@ from opentelemetry.sdk.trace.id_generator import IdGenerator
 
 import logfire
 from logfire import configure
+from logfire._internal import export_stats, formatter, metrics
 from logfire._internal.config import METRICS_PREFERRED_TEMPORALITY
+from logfire._internal.exporters import dynamic_batch, otlp
 from logfire._internal.exporters.test import TestLogExporter
 from logfire.integrations.pydantic import set_pydantic_plugin_config
+from logfire.sampling import _tail_sampling  # type: ignore
 from logfire.testing import IncrementalIdGenerator, TestExporter, TimeGenerator
 
 # Emit both new and old semantic convention attribute names
@@ -111,6 +115,23 @@ def config(config_kwargs: dict[str, Any], metrics_reader: InMemoryMetricReader)
     assert span is trace.INVALID_SPAN
 
 
+@pytest.fixture(autouse=True)
+def clear_internal_metrics():
+    """Forget internal metrics registered during a test so that they don't appear in the metrics of later tests."""
+    yield
+    metrics._INTERNAL_CALLBACK_INSTRUMENTS.clear()  # type: ignore
+    export_stats.register_export_stats_metrics.cache_clear()
+    for stats_field in dataclasses.fields(export_stats.EXPORT_STATS):
+        if stats_field.init:
+            setattr(export_stats.EXPORT_STATS, stats_field.name, 0)
+    export_stats.EXPORT_STATS._queued_count = export_stats.LockFreeCount()  # type: ignore
+    dynamic_batch._register_tuner_metrics.cache_clear()  # type: ignore
+    otlp._register_retryer_gauges.cache_clear()  # type: ignore
+    _tail_sampling._register_tail_sampling_metrics.cache_clear()  # type: ignore
+    formatter.register_fstring_plan_metrics.cache_clear()
+    formatter.FSTRING_PLAN_CACHE_STATS.hits = formatter.FSTRING_PLAN_CACHE_STATS.misses = 0
+
+
 @pytest.fixture(autouse=True)
 def clear_pydantic_plugins_cache():
     """Clear any existing Pydantic plugins."""
@@ -1,11 +1,25 @@
 from __future__ import annotations
 
-from typing import Any
+import dataclasses
+import threading
+import time
+from collections.abc import Sequence
+from typing import Any, cast
+from unittest.mock import Mock
 
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
+import pytest
+from inline_snapshot import snapshot
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExportResult
+from opentelemetry.trace import SpanContext, TraceFlags
 
 import logfire
+from logfire import ExportStats
+from logfire._internal.constants import ATTRIBUTES_LOG_LEVEL_NUM_KEY, LEVEL_NUMBERS, LevelName
+from logfire._internal.export_stats import LockFreeCount
 from logfire._internal.exporters.dynamic_batch import DynamicBatchSpanProcessor
+from logfire._internal.exporters.remove_pending import RemovePendingSpansExporter
+from logfire._internal.tracer import LazyPendingSpan
 from logfire.testing import TestExporter
 
 
@@ -24,3 +38,196 @@ def test_dynamic_batch_span_processor(exporter: TestExporter, config_kwargs: dic
     assert processor.schedule_delay_millis == 500
     logfire.force_flush()
     assert len(exporter.exported_spans) == 10
+
+
+def test_adaptive_batching(exporter: TestExporter, config_kwargs: dict[str, Any]):
+    processor = DynamicBatchSpanProcessor(exporter, adaptive=True)
+    config_kwargs['additional_span_processors'] = [processor]
+    logfire.configure(**config_kwargs)
+
+    # The exporter is wrapped to measure exports, but that's hidden.
+    assert processor.span_exporter is exporter
+
+    for _ in range(20):
+        logfire.info('test')
+    logfire.force_flush()
+    assert len(exporter.exported_spans) == 20
+    assert processor.tuner
+    assert processor.tuner.span_rate
+    assert processor.tuner.export_latency is not None
+    # No body size measurements without an OTLP exporter.
+    assert processor.tuner.bytes_per_span is None
+
+
+def test_adaptive_batch_tuning(monkeypatch: pytest.MonkeyPatch):
+    now = 0.0
+    monkeypatch.setattr('time.monotonic', lambda: now)
+
+    body_size_exporter = Mock(max_body_size=5 * 1024 * 1024)
+    processor = DynamicBatchSpanProcessor(TestExporter(), adaptive=True, body_size_exporter=body_size_exporter)
+    tuner = processor.tuner
+    assert tuner
+    assert processor.max_queue_size == 2048
+    assert processor.max_export_batch_size == 512
+
+    def export(num_new_spans: int, seconds: float, bytes_per_span: int = 1000):
+        nonlocal now
+        now += seconds
+        processor.num_processed += num_new_spans
+        assert tuner
+        tuner.record_export(num_new_spans, 0.1, num_new_spans * bytes_per_span)
+        return processor.schedule_delay_millis, processor.max_export_batch_size
+
+    # Quiet: wait longer between exports so that requests aren't tiny, but not too long.
+    assert export(100, 10) == (5000, 64)
+    assert tuner.span_rate == 10
+
+    # Burst: export as often as configured, in batches as big as possible without risking a full queue.
+    assert export(100_000, 1) == snapshot((500, 1024))
+
+    # Big spans: keep requests well under the body size limit (measurements are smoothed over several exports).
+    assert export(100_000, 1, bytes_per_span=20_000) == snapshot((500, 391))
+
+    # Moderate steady traffic: batches sized to fit the spans arriving in one cycle.
+    tuner.span_rate = tuner.bytes_per_span = None
+    assert export(200, 1) == snapshot((500, 120))
+    processor.shutdown()
+
+
+class BlockingExporter(TestExporter):
+    """Blocks in `export` until `release` is set, so that the queue fills up."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.release = threading.Event()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        self.release.wait()
+        return super().export(spans)
+
+
+def make_span(span_id: int, level: LevelName = 'info') -> ReadableSpan:
+    return ReadableSpan(
+        name=f'span {span_id}',
+        context=SpanContext(trace_id=1, span_id=span_id, is_remote=False, trace_flags=TraceFlags(TraceFlags.SAMPLED)),
+        attributes={ATTRIBUTES_LOG_LEVEL_NUM_KEY: LEVEL_NUMBERS[level]},
+    )
+
+
+def full_queue_processor(monkeypatch: pytest.MonkeyPatch, **kwargs: Any) -> DynamicBatchSpanProcessor:
+    """A processor with a queue of 3 spans, which is full, and a span stuck being exported."""
+    monkeypatch.setenv('OTEL_BSP_MAX_QUEUE_SIZE', '3')
+    monkeypatch.setenv('OTEL_BSP_MAX_EXPORT_BATCH_SIZE', '1')
+    processor = DynamicBatchSpanProcessor(BlockingExporter(), **kwargs)
+    processor.on_end(make_span(1))
+    while processor.queue:
+        time.sleep(0.001)
+    processor.on_end(make_span(2, 'debug'))
+    processor.on_end(make_span(3, 'error'))
+    processor.on_end(make_span(4, 'debug'))
+    return processor
+
+
+def queued_span_ids(processor: DynamicBatchSpanProcessor) -> list[int]:
+    return [span.context.span_id for span in reversed(processor.queue) if span.context]
+
+
+def stats_diff(before: ExportStats) -> dict[str, int]:
+    after = logfire.export_stats()
+    diff = {f.name: getattr(after, f.name) - getattr(before, f.name) for f in dataclasses.fields(after) if f.init}
+    return {k: v for k, v in diff.items() if v}
+
+
+def test_queue_full_drop_oldest(monkeypatch: pytest.MonkeyPatch):
+    before = logfire.export_stats()
+    processor = full_queue_processor(monkeypatch)
+    processor.on_end(make_span(5))
+    assert queued_span_ids(processor) == [3, 4, 5]
+
+    exporter = cast(BlockingExporter, processor.span_exporter)
+    exporter.release.set()
+    processor.force_flush()
+    assert [span['context']['span_id'] for span in exporter.exported_spans_as_dict()] == [1, 3, 4, 5]
+    assert stats_diff(before) == {'spans_queued': 5, 'spans_exported': 4, 'spans_dropped_queue_full': 1}
+    processor.shutdown()
+
+
+def test_queue_full_drop_lowest_level(monkeypatch: pytest.MonkeyPatch):
+    before = logfire.export_stats()
+    processor = full_queue_processor(monkeypatch, queue_full_policy='drop_lowest_level')
+
+    # The oldest debug span is dropped to make room.
+    processor.on_end(make_span(5))
+    assert queued_span_ids(processor) == [3, 4, 5]
+
+    # The new span is dropped since it has the lowest level.
+    processor.on_end(make_span(6, 'trace'))
+    assert queued_span_ids(processor) == [3, 4, 5]
+
+    processor.on_end(make_span(7, 'error'))
+    assert queued_span_ids(processor) == [3, 5, 7]
+    assert stats_diff(before) == {'spans_queued': 6, 'spans_dropped_queue_full': 3}
+
+    cast(BlockingExporter, processor.span_exporter).release.set()
+    processor.shutdown()
+
+
+def test_queue_full_block(monkeypatch: pytest.MonkeyPatch):
+    before = logfire.export_stats()
+    processor = full_queue_processor(monkeypatch, queue_full_policy='block', block_timeout=0.01)
+    exporter = cast(BlockingExporter, processor.span_exporter)
+
+    # Times out and drops the oldest span.
+    processor.on_end(make_span(5))
+    assert queued_span_ids(processor) == [3, 4, 5]
+    assert stats_diff(before) == {'spans_queued': 5, 'spans_dropped_queue_full': 1}
+
+    # Waits for the export to make room.
+    processor.block_timeout = 10
+    threading.Timer(0.01, exporter.release.set).start()
+    processor.on_end(make_span(6))
+    processor.force_flush()
+    assert [span['context']['span_id'] for span in exporter.exported_spans_as_dict()] == [1, 3, 4, 5, 6]
+    assert stats_diff(before) == {'spans_queued': 6, 'spans_exported': 5, 'spans_dropped_queue_full': 1}
+    processor.shutdown()
+
+
+def test_lazy_pending_spans_not_counted(monkeypatch: pytest.MonkeyPatch):
+    before = logfire.export_stats()
+    exporter = TestExporter()
+    processor = DynamicBatchSpanProcessor(RemovePendingSpansExporter(exporter))
+    span = ReadableSpan(name='span', context=make_span(1).context, end_time=1)
+    # The span has ended by the time it's exported, so its pending span is skipped.
+    processor.on_end(LazyPendingSpan(span, Mock()))
+    processor.on_end(span)
+    processor.force_flush()
+    assert len(exporter.exported_spans) == 1
+    assert stats_diff(before) == {'spans_queued': 1, 'spans_exported': 1}
+    processor.shutdown()
+
+    before = logfire.export_stats()
+    processor = full_queue_processor(monkeypatch, queue_full_policy='drop_lowest_level')
+    processor.on_end(LazyPendingSpan(make_span(5, 'trace'), Mock()))
+    assert queued_span_ids(processor) == [2, 3, 4]
+    assert stats_diff(before) == {'spans_queued': 4}
+    cast(BlockingExporter, processor.span_exporter).release.set()
+    processor.shutdown()
+
+
+def test_lock_free_count():
+    count = LockFreeCount()
+    assert count.value == 0
+
+    def increment():
+        for _ in range(1000):
+            count.increment()
+
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    # Reading while other threads increment doesn't affect the result.
+    values = [count.value for _ in range(10)]
+    for thread in threads:
+        thread.join()
+    assert values == sorted(values)
+    assert count.value == count.value == 4000
@@ -1,3 +1,6 @@
+import gzip
+import threading
+from pathlib import Path
 from typing import Any
 from unittest.mock import Mock
 
@@ -5,13 +8,17 @@ import pytest
 import requests
 import requests.exceptions
 from inline_snapshot import snapshot
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import ExportTraceServiceRequest
 from opentelemetry.sdk.trace.export import SpanExportResult
 from requests.models import PreparedRequest, Response as Response
 from requests.sessions import HTTPAdapter
 
+import logfire
 from logfire._internal.exporters.otlp import (
     BodySizeCheckingOTLPSpanExporter,
     BodyTooLargeError,
+    DiskRetryer,
     OTLPExporterHttpSession,
 )
 from tests.exporters.test_retry_fewer_spans import TEST_SPANS
@@ -81,18 +88,21 @@ def test_connection_error_retries(monkeypatch: pytest.MonkeyPatch, caplog: pytes
 
     # Wait for the retryer to finish.
     # time.sleep has been mocked to return 0 so this shouldn't take long.
-    assert session.retryer.thread
-    session.retryer.thread.join()
+    assert session.retryer.threads
+    wait_for_retryer(session.retryer)
 
     # Check that everything is cleaned up after succeeding.
-    assert not session.retryer.tasks
-    assert not session.retryer.thread
+    assert not session.retryer.spool
+    assert not session.retryer.threads
     assert not list(session.retryer.dir.iterdir())
+    assert session.retryer.num_failed == 10
+    assert session.retryer.num_succeeded == 10
 
     # random.random is mocked to return 0.5 so that the retry delay is always 1.5 * 2 ** n.
     # This means these numbers show the average time slept for each call,
     # e.g. 6.0 means the actual sleep would be between 4 and 8 seconds.
-    assert [call.args for call in sleep_mock.call_args_list] == [
+    sleeps = [call.args for call in sleep_mock.call_args_list]
+    assert sleeps[:11] == [
         (1.5,),
         (3.0,),
         (6.0,),
@@ -105,10 +115,10 @@ def test_connection_error_retries(monkeypatch: pytest.MonkeyPatch, caplog: pytes
         (192.0,),
         (192.0,),
         (192.0,),
-        # The errors stop here and requests succeed, so the sleep time is reset.
-        # There are 10 exports and the first one succeeded after the last 192s wait,
-        # so that leaves 9 more short sleeps.
-    ] + [(1.5,)] * 9
+    ]
+    # The errors stop here and requests succeed, so the remaining exports are retried without waiting.
+    # The only way to get another sleep is if the retryer caught up with the main thread and had to restart.
+    assert set(sleeps[11:]) <= {(1.5,)}
 
     # A message gets logged once per minute when an export fails.
     # time.monotonic is mocked to return a value increasing by 30 each time,
@@ -118,3 +128,172 @@ def test_connection_error_retries(monkeypatch: pytest.MonkeyPatch, caplog: pytes
     # After that the number of failed exports is unpredictable because the main thread is adding to it
     # at the same time as the retryer thread removes from it.
     assert caplog.messages[0] == 'Currently retrying 1 failed export(s)'
+
+
+def test_drain_spool_from_previous_process(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setattr('time.sleep', Mock(return_value=0))
+
+    previous = DiskRetryer({}, tmp_path)
+    previous.spool.append(b'123', {'url': 'http://example.com/'})
+    previous.spool.append(b'456', {'url': 'http://example.com/'})
+    previous.spool.close()
+    assert len(list(tmp_path.iterdir())) == 1
+
+    bodies: list[bytes] = []
+
+    class RecordingAdapter(HTTPAdapter):
+        def send(self, request: PreparedRequest, *args: Any, **kwargs: Any) -> Response:
+            assert request.headers['Authorization'] == 'Bearer 123'
+            bodies.append(request.body)  # type: ignore
+            resp = Response()
+            resp.status_code = 200
+            return resp
+
+    retryer = DiskRetryer({'Authorization': 'Bearer 123'}, tmp_path)
+    retryer.session.mount('http://', RecordingAdapter())
+    retryer.drain_spool()
+    wait_for_retryer(retryer)
+
+    assert bodies == [b'123', b'456']
+    assert not retryer.spool
+    assert not list(tmp_path.iterdir())
+
+
+def test_concurrency_adapts_to_failures(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr('time.sleep', Mock(return_value=0))
+
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight: list[int] = []
+    responses = iter([500] * 3 + [200] * 30 + [500] + [200] * 10)
+
+    class SlowAdapter(HTTPAdapter):
+        def send(self, request: PreparedRequest, *args: Any, **kwargs: Any) -> Response:
+            nonlocal in_flight
+            with lock:
+                in_flight += 1
+                status_code = next(responses)
+                max_in_flight.append(in_flight)
+            # Give other threads a chance to send requests at the same time.
+            threading.Event().wait(0.01)
+            with lock:
+                in_flight -= 1
+            resp = Response()
+            resp.status_code = status_code
+            return resp
+
+    retryer = DiskRetryer({})
+    retryer.session.mount('http://', SlowAdapter())
+    for _ in range(40):
+        retryer.add_task(b'123', {'url': 'http://example.com/'})
+    wait_for_retryer(retryer)
+
+    assert not retryer.spool
+    assert retryer.num_failed == 4
+    assert retryer.num_succeeded == 40
+    # While the backend is failing, only one request is made at a time.
+    assert max_in_flight[:4] == [1, 1, 1, 1]
+    # Once requests succeed, concurrency ramps up to the limit.
+    assert max(max_in_flight) == DiskRetryer.MAX_CONCURRENCY
+
+
+def wait_for_retryer(retryer: DiskRetryer) -> None:
+    while retryer.threads:
+        # Threads are only started after being added to the set, both while holding the lock.
+        with retryer.lock:
+            threads = list(retryer.threads)
+        for thread in threads:
+            thread.join()
+
+
+def test_merge_spooled_exports(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr('time.sleep', Mock(return_value=0))
+
+    bodies: list[bytes] = []
+
+    class RecordingAdapter(HTTPAdapter):
+        def send(self, request: PreparedRequest, *args: Any, **kwargs: Any) -> Response:
+            bodies.append(request.body)  # type: ignore
+            resp = Response()
+            resp.status_code = 200
+            return resp
+
+    body = encode_spans(TEST_SPANS[:2]).SerializeToString()
+    retryer = DiskRetryer({'Content-Encoding': 'gzip'})
+    retryer.session.mount('http://', RecordingAdapter())
+    # Only allow two exports per request.
+    monkeypatch.setattr(retryer, 'MAX_BATCH_BODY_SIZE', len(body) * 2)
+
+    # Decompressing happens without holding the lock, otherwise acquiring it here would time out.
+    unlocked: list[bool] = []
+    decompress = retryer._decompress  # type: ignore
+
+    def checked_decompress(data: bytes) -> bytes:
+        acquired = retryer.lock.acquire(timeout=1)
+        if acquired:  # pragma: no branch
+            retryer.lock.release()
+        unlocked.append(acquired)
+        return decompress(data)
+
+    monkeypatch.setattr(retryer, '_decompress', checked_decompress)
+    with retryer.lock:
+        # Spool everything before the thread starts so that it sees them all at once.
+        for _ in range(5):
+            retryer.spool.append(gzip.compress(body), {'url': 'http://example.com/v1/traces'})
+        retryer.spool.append(b'other', {'url': 'http://example.com/other'})
+        retryer.spool.append(gzip.compress(body), {'url': 'http://example.com/v1/traces'})
+    retryer.add_task(gzip.compress(body), {'url': 'http://example.com/v1/traces', 'timeout': 1})
+    wait_for_retryer(retryer)
+
+    def num_spans(data: bytes) -> int:
+        request = ExportTraceServiceRequest.FromString(gzip.decompress(data))
+        return sum(len(scope.spans) for resource in request.resource_spans for scope in resource.scope_spans)
+
+    # Requests may complete out of order since the retryer uses several threads once requests succeed.
+    assert sorted((b'other' if b == b'other' else num_spans(b) for b in bodies), key=str) == [2, 2, 2, 4, 4, b'other']
+    assert retryer.num_succeeded == 8
+    assert not retryer.spool
+    assert unlocked and all(unlocked)
+
+
+def test_rejected_merged_exports_sent_separately(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr('time.sleep', Mock(return_value=0))
+
+    good_body = encode_spans(TEST_SPANS[:2]).SerializeToString()
+    bad_body = encode_spans(TEST_SPANS[2:3]).SerializeToString()
+    bodies: list[bytes] = []
+
+    class RejectingAdapter(HTTPAdapter):
+        def send(self, request: PreparedRequest, *args: Any, **kwargs: Any) -> Response:
+            body = gzip.decompress(request.body)  # type: ignore
+            bodies.append(body)
+            resp = Response()
+            resp.status_code = 400 if bad_body in body else 200
+            return resp
+
+    retryer = DiskRetryer({'Content-Encoding': 'gzip'})
+    retryer.session.mount('http://', RejectingAdapter())
+    with retryer.lock:
+        for body in [good_body, bad_body, good_body]:
+            retryer.spool.append(gzip.compress(body), {'url': 'http://example.com/v1/traces'})
+    retryer.add_task(gzip.compress(good_body), {'url': 'http://example.com/v1/traces'})
+    wait_for_retryer(retryer)
+
+    # The merged request is rejected because of the bad export, so each export is then sent on its own,
+    # and only the bad one is dropped.
+    assert bodies[0] == good_body + bad_body + good_body * 2
+    assert sorted(bodies[1:]) == sorted([good_body, bad_body, good_body, good_body])
+    assert retryer.num_failed == 1
+    assert retryer.num_succeeded == 4
+    assert not retryer.spool
+
+
+def test_dropped_exports_counted(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(DiskRetryer, 'MAX_BYTES', 100)
+    monkeypatch.setattr(DiskRetryer, 'MAX_MEMORY_BYTES', 0)
+    before = logfire.export_stats().exports_dropped_retry_limit
+    retryer = DiskRetryer({})
+    retryer.add_task(b'x' * 100, {'url': 'http://example.com/'})
+    assert not retryer.spool
+    assert not retryer.threads
+    assert logfire.export_stats().exports_dropped_retry_limit - before == 1
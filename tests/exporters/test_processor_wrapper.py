@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from inline_snapshot import snapshot
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+
+from logfire._internal.exporters.processor_wrapper import MainSpanProcessorWrapper
+from logfire._internal.scrubbing import Scrubber
+from logfire.testing import TestExporter
+
+
+def make_processor() -> MainSpanProcessorWrapper:
+    return MainSpanProcessorWrapper(SimpleSpanProcessor(TestExporter()), Scrubber(None))
+
+
+def test_unchanged_span_not_copied():
+    span = ReadableSpan(name='span', attributes={'logfire.msg': 'span', 'count': 1})
+    assert make_processor().process(span) is span
+
+
+def test_key_gated_transforms():
+    span = ReadableSpan(
+        name='SELECT',
+        attributes={'db.statement': 'SELECT id FROM users WHERE id = 1', 'gen_ai.request.model': 'gpt-4o'},
+    )
+    processed = make_processor().process(span)
+
+    # The db statement summary changes the attributes, and the gen_ai transform still runs on the new attributes.
+    assert processed is not span
+    assert dict(processed.attributes or {}) == snapshot(
+        {
+            'db.statement': 'SELECT id FROM users WHERE id = 1',
+            'gen_ai.request.model': 'gpt-4o',
+            'logfire.msg': 'SELECT id FROM users WHERE id = 1',
+            'gen_ai.response.model': 'gpt-4o',
+        }
+    )
+    # The original span is left alone.
+    assert dict(span.attributes or {}) == snapshot(
+        {'db.statement': 'SELECT id FROM users WHERE id = 1', 'gen_ai.request.model': 'gpt-4o'}
+    )
+
+
+def test_changed_attributes_copy_span():
+    span = ReadableSpan(name='span', attributes={'gen_ai.request.model': 'gpt-4o'})
+    processed = make_processor().process(span)
+    assert processed is not span
+    assert dict(processed.attributes or {}) == snapshot(
+        {'gen_ai.request.model': 'gpt-4o', 'gen_ai.response.model': 'gpt-4o'}
+    )
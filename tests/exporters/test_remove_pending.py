@@ -1,4 +1,7 @@
+from typing import Any
+
 from inline_snapshot import snapshot
+from opentelemetry.sdk.trace.export import BatchSpanProcessor
 
 import logfire
 from logfire._internal.exporters.remove_pending import RemovePendingSpansExporter
@@ -43,3 +46,30 @@ def test_remove_pending_spans(exporter: TestExporter):
     assert [
         (span.name, (span.attributes or {}).get('logfire.span_type')) for span in inner_exporter.exported_spans
     ] == snapshot([('log3', 'log'), ('log4', 'log'), ('span2', 'span'), ('span3', 'span')])
+
+
+def test_lazy_pending_spans(config_kwargs: dict[str, Any]):
+    exporter = TestExporter()
+    processor = BatchSpanProcessor(RemovePendingSpansExporter(exporter), schedule_delay_millis=60_000)
+    config_kwargs['additional_span_processors'] = [processor]
+    logfire.configure(**config_kwargs)
+
+    with logfire.span('short'):
+        pass
+    with logfire.span('long') as span:
+        # The pending span is only built now that the batch is exported, because the span is still open.
+        # The short span already ended, so it doesn't get a pending span at all.
+        span.set_attribute('password', 'hunter2')
+        processor.force_flush()
+        batch1 = exporter.exported_spans_as_dict(_include_pending_spans=True)
+        exporter.clear()
+    processor.force_flush()
+    batch2 = exporter.exported_spans_as_dict(_include_pending_spans=True)
+
+    assert [(span['name'], span['attributes']['logfire.span_type']) for span in batch1] == snapshot(
+        [('short', 'span'), ('long', 'pending_span')]
+    )
+    # Attributes set since the span started are included, and scrubbed like other spans.
+    assert batch1[1]['attributes']['password'] == "[Scrubbed due to 'password']"
+    assert batch1[1]['parent'] == {'trace_id': 2, 'span_id': 2, 'is_remote': False}
+    assert [(span['name'], span['attributes']['logfire.span_type']) for span in batch2] == snapshot([('long', 'span')])
@@ -0,0 +1,152 @@
+from pathlib import Path
+
+from inline_snapshot import snapshot
+
+from logfire._internal.exporters.spool import RECORD_HEADER, ExportSpool
+
+
+def record_size(data: bytes, kwargs: str = '{"url": "x"}') -> int:
+    return RECORD_HEADER.size + len(kwargs) + len(data)
+
+
+def drain(spool: ExportSpool) -> list[bytes]:
+    result: list[bytes] = []
+    while (export := spool.pop()) is not None:
+        result.append(export.data)
+        spool.ack(export)
+    return result
+
+
+def test_memory_then_disk_in_order(tmp_path: Path) -> None:
+    spool = ExportSpool(tmp_path, max_bytes=10_000, segment_bytes=100, max_memory_bytes=10)
+    for i in range(10):
+        assert spool.append(f'data{i}'.encode(), {'url': 'x'})
+
+    # The first two exports fit in memory, the rest are written to segments of ~100 bytes.
+    assert len(spool.memory) == 2
+    assert len(spool) == 10
+    assert sorted(p.name.split('-')[1] for p in tmp_path.iterdir()) == snapshot(['0000000000.seg', '0000000001.seg'])
+
+    assert drain(spool) == [f'data{i}'.encode() for i in range(10)]
+    assert not spool
+    assert not list(tmp_path.iterdir())
+
+    # Once everything has been drained, memory is used again.
+    assert spool.append(b'new', {'url': 'x'})
+    assert len(spool.memory) == 1
+
+
+def test_segment_kept_until_acked(tmp_path: Path) -> None:
+    spool = ExportSpool(tmp_path, max_bytes=10_000, segment_bytes=1)
+    spool.append(b'a', {'url': 'x'})
+    spool.append(b'b', {'url': 'x'})
+
+    a = spool.pop()
+    b = spool.pop()
+    assert a and b
+    assert spool.pop() is None
+    assert len(spool) == 2
+
+    # Acknowledging the second segment first doesn't delete anything because segments are deleted in order.
+    spool.ack(b)
+    assert len(list(tmp_path.iterdir())) == 2
+    spool.ack(a)
+    assert not list(tmp_path.iterdir())
+    assert not spool
+
+
+def test_requeue(tmp_path: Path) -> None:
+    spool = ExportSpool(tmp_path, max_bytes=10_000, segment_bytes=10_000, max_memory_bytes=1)
+    for data in [b'a', b'b', b'c']:
+        spool.append(data, {'url': 'x'})
+
+    a = spool.pop()
+    b = spool.pop()
+    assert a and b
+    assert a.segment is None
+    assert b.segment is not None
+    # Popped exports are still counted until they're acknowledged, whether they were in memory or on disk.
+    assert len(spool) == 3
+    assert spool.num_unread == 1
+    spool.requeue(b)
+    spool.requeue(a)
+
+    # Requeued exports are counted once, and only the export that was never on disk uses the memory budget.
+    assert len(spool) == 3
+    assert spool.num_unread == 3
+    assert spool.memory_bytes == 1
+    assert drain(spool) == [b'a', b'b', b'c']
+    assert not spool
+    assert not list(tmp_path.iterdir())
+
+
+def test_evicts_oldest_segments(tmp_path: Path) -> None:
+    data = b'x' * 100
+    size = record_size(data)
+    spool = ExportSpool(tmp_path, max_bytes=size * 3, segment_bytes=size)
+    for i in range(5):
+        assert spool.append(bytes([i]) * 100, {'url': 'x'})
+
+    assert spool.num_dropped == 2
+    assert spool.disk_bytes == size * 3
+    assert [d[0] for d in drain(spool)] == [2, 3, 4]
+
+    # Too big to ever fit.
+    assert not spool.append(b'x' * size * 3, {'url': 'x'})
+    assert spool.num_dropped == 3
+
+
+def test_corrupt_segment(tmp_path: Path) -> None:
+    spool = ExportSpool(tmp_path, max_bytes=10_000, segment_bytes=10_000)
+    spool.append(b'good', {'url': 'x'})
+    spool.append(b'bad', {'url': 'x'})
+    spool.append(b'lost', {'url': 'x'})
+
+    [path] = tmp_path.iterdir()
+    contents = bytearray(path.read_bytes())
+    contents[record_size(b'good') + RECORD_HEADER.size + 5] ^= 0xFF
+    path.write_bytes(contents)
+
+    assert drain(spool) == [b'good']
+    assert spool.num_dropped == 2
+    assert not spool
+    assert not list(tmp_path.iterdir())
+
+
+def test_adopt_orphaned_segments(tmp_path: Path) -> None:
+    previous = ExportSpool(tmp_path, max_bytes=10_000, segment_bytes=50)
+    for i in range(4):
+        previous.append(f'data{i}'.encode(), {'url': 'x'})
+    # Simulate the process being killed in the middle of writing a record.
+    previous.segments[-1].file.write(b'partial')
+    previous.segments[-1].file.flush()
+
+    current = ExportSpool(tmp_path, max_bytes=10_000, segment_bytes=50)
+    current.append(b'current', {'url': 'x'})
+
+    # The segments are locked while the previous spool is still alive.
+    assert current.adopt_orphaned_segments() == 0
+    assert len(current) == 1
+
+    previous.close()
+    assert current.adopt_orphaned_segments() == 4
+    assert len(current) == 5
+
+    # A third process doesn't get anything since the segments have been adopted.
+    assert ExportSpool(tmp_path, max_bytes=10_000, segment_bytes=50).adopt_orphaned_segments() == 0
+
+    # Older exports come first.
+    assert drain(current) == [b'data0', b'data1', b'data2', b'data3', b'current']
+    assert not list(tmp_path.iterdir())
+
+
+def test_skips_locked_segment_names(tmp_path: Path) -> None:
+    # e.g. a forked process whose spool has the same owner and segment numbers as its parent.
+    parent = ExportSpool(tmp_path, max_bytes=10_000, segment_bytes=10_000, owner='owner')
+    child = ExportSpool(tmp_path, max_bytes=10_000, segment_bytes=10_000, owner='owner')
+    parent.append(b'parent', {'url': 'x'})
+    child.append(b'child', {'url': 'x'})
+
+    assert [segment.path.name for segment in child.segments] == ['owner-0000000001.seg']
+    assert drain(parent) == [b'parent']
+    assert drain(child) == [b'child']
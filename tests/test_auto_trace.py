@@ -1,11 +1,14 @@
 import ast
 import asyncio
+import importlib
 import importlib.resources
 import runpy
 import sys
-from contextlib import AbstractContextManager
+from contextlib import AbstractContextManager, contextmanager
 from importlib.machinery import SourceFileLoader
+from pathlib import Path
 from typing import Any, Callable
+from unittest.mock import patch
 
 import pytest
 from inline_snapshot import snapshot
@@ -17,8 +20,16 @@ from logfire._internal.auto_trace import (
     AutoTraceModuleAlreadyImportedWarning,
     LogfireFinder,
 )
+from logfire._internal.auto_trace.adaptive import (
+    AdaptiveAutoTracingOptions,
+    AutoTracedFunction,
+    AutoTracedFunctionState,
+    adaptive_context_factory,
+)
 from logfire._internal.auto_trace.import_hook import LogfireLoader
+from logfire._internal.auto_trace.precompile import precompile_auto_tracing
 from logfire._internal.auto_trace.rewrite_ast import rewrite_ast
+from logfire._internal.constants import ONE_SECOND_IN_NANOSECONDS
 from logfire.testing import TestExporter
 
 
@@ -561,3 +572,226 @@ def test_min_duration(exporter: TestExporter):
 def test_wrong_type_modules():
     with pytest.raises(TypeError, match='modules must be a list of strings or a callable'):
         logfire.install_auto_tracing(123, min_duration=0)  # type: ignore
+
+
+def test_code_cache(exporter: TestExporter, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(sys, 'dont_write_bytecode', False)
+    monkeypatch.setattr(sys, 'path', [str(tmp_path), *sys.path])
+    module_path = tmp_path / 'auto_trace_cached.py'
+    module_path.write_text('def func():\n    return 1\n')
+
+    def import_module():
+        sys.modules.pop('auto_trace_cached', None)
+        module = importlib.import_module('auto_trace_cached')
+        assert module.func() == 1
+        sys.modules.pop('auto_trace_cached')
+
+    meta_path = sys.meta_path.copy()
+    try:
+        logfire.install_auto_tracing('auto_trace_cached', min_duration=0)
+        import_module()
+
+        (cache_file,) = (tmp_path / '__pycache__').glob('auto_trace_cached.*.opt-logfire.pyc')
+        cache_bytes = cache_file.read_bytes()
+
+        # A fresh finder with different settings uses the cached code without rewriting the AST.
+        sys.meta_path = meta_path.copy()
+        logfire.with_tags('cached').install_auto_tracing('auto_trace_cached', min_duration=0)
+        with patch('logfire._internal.auto_trace.import_hook.compile_source', side_effect=AssertionError):
+            import_module()
+        assert cache_file.read_bytes() == cache_bytes
+
+        # Changing the source invalidates the cache.
+        module_path.write_text('def func():\n    x = 1\n    return x\n')
+        import_module()
+        assert cache_file.read_bytes() != cache_bytes
+    finally:
+        sys.meta_path = meta_path
+
+    assert [
+        (span['attributes']['code.function'], span['attributes'].get('logfire.tags'))
+        for span in exporter.exported_spans_as_dict()
+    ] == [
+        ('func', None),
+        ('func', ('cached',)),
+        ('func', ('cached',)),
+    ]
+
+
+def test_code_cache_dont_write_bytecode(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(sys, 'dont_write_bytecode', True)
+    monkeypatch.setattr(sys, 'path', [str(tmp_path), *sys.path])
+    (tmp_path / 'auto_trace_not_cached.py').write_text('def func():\n    return 1\n')
+
+    meta_path = sys.meta_path.copy()
+    try:
+        logfire.install_auto_tracing('auto_trace_not_cached', min_duration=0)
+        importlib.import_module('auto_trace_not_cached')
+    finally:
+        sys.meta_path = meta_path
+        sys.modules.pop('auto_trace_not_cached', None)
+
+    assert not (tmp_path / '__pycache__').exists()
+
+
+def test_lazy_auto_tracing(exporter: TestExporter, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(sys, 'path', [str(tmp_path), *sys.path])
+    (tmp_path / 'auto_trace_lazy.py').write_text('def called():\n    return 1\n\ndef not_called():\n    return 2\n')
+
+    meta_path = sys.meta_path.copy()
+    try:
+        logfire.install_auto_tracing('auto_trace_lazy', min_duration=0, lazy=True)
+        module = importlib.import_module('auto_trace_lazy')
+    finally:
+        sys.meta_path = meta_path
+        sys.modules.pop('auto_trace_lazy', None)
+
+    # Nothing is prepared for tracing a function until it's called.
+    assert not [f for f in logfire.auto_traced_functions() if f.module == 'auto_trace_lazy']
+    assert module.called() == 1
+    assert module.called() == 1
+    assert [(f.qualname, f.traced) for f in logfire.auto_traced_functions() if f.module == 'auto_trace_lazy'] == [
+        ('called', True)
+    ]
+    assert [span['attributes']['code.function'] for span in exporter.exported_spans_as_dict()] == [
+        'called',
+        'called',
+    ]
+
+
+def test_precompile_auto_tracing(exporter: TestExporter, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(sys, 'dont_write_bytecode', True)
+    monkeypatch.setattr(sys, 'path', [str(tmp_path), *sys.path])
+    package = tmp_path / 'auto_trace_precompiled'
+    package.mkdir()
+    (package / '__init__.py').write_text('')
+    (package / 'module.py').write_text('def func():\n    return 1\n')
+    (package / 'invalid.py').write_text('def func(:\n')
+
+    # Precompiling ignores `sys.dont_write_bytecode` since that's what it's for.
+    assert precompile_auto_tracing([package], max_workers=1) == 2
+    assert sorted(path.name.split('.')[0] for path in (package / '__pycache__').glob('*.opt-logfire.pyc')) == [
+        '__init__',
+        'module',
+    ]
+
+    meta_path = sys.meta_path.copy()
+    try:
+        logfire.install_auto_tracing('auto_trace_precompiled', min_duration=0)
+        with patch('logfire._internal.auto_trace.import_hook.compile_source', side_effect=AssertionError):
+            module = importlib.import_module('auto_trace_precompiled.module')
+        assert module.func() == 1
+    finally:
+        sys.meta_path = meta_path
+        sys.modules.pop('auto_trace_precompiled', None)
+        sys.modules.pop('auto_trace_precompiled.module', None)
+
+    assert [span['attributes']['code.function'] for span in exporter.exported_spans_as_dict()] == ['func']
+
+
+def test_adaptive_context_factory():
+    now = 0
+    spans: list[int] = []
+
+    @contextmanager
+    def span_factory():
+        spans.append(now)
+        yield
+
+    def make_call(options: AdaptiveAutoTracingOptions):
+        state = AutoTracedFunctionState('module', 'adaptive_func', 1, traced=False)
+        context_factories: list[Callable[[], AbstractContextManager[Any]]] = []
+        context_factories.append(
+            adaptive_context_factory(state, context_factories, 0, span_factory, lambda: now, 100, options)
+        )
+
+        def call(duration: int):
+            nonlocal now
+            with context_factories[0]():
+                now += duration
+
+        return state, call
+
+    options = AdaptiveAutoTracingOptions(window=10, percentile=80, max_spans_per_second=None)
+    assert options.slow_calls_threshold == 3
+    state, call = make_call(options)
+
+    # Two slow outliers in a window of ten calls are not enough to start tracing.
+    for duration in [100, 1, 1, 1, 100, 1, 1, 1, 1, 1]:
+        call(duration)
+    assert not state.info.traced
+    assert spans == []
+
+    # Three slow calls within the next window are.
+    for duration in [100, 1, 100, 100]:
+        call(duration)
+    assert state.info.traced
+    call(1)
+    assert spans == [now - 1]
+
+    # A window of mostly fast calls stops tracing again.
+    for _ in range(9):
+        call(1)
+    assert state.info == AutoTracedFunction('module', 'adaptive_func', 1, traced=False, promotions=1, demotions=1)
+    assert len(spans) == 10
+    call(1)
+    assert len(spans) == 10
+
+    # Creating max_spans_per_second spans within one second stops tracing until the second is over,
+    # even though the function is still slow.
+    spans.clear()
+    state, call = make_call(AdaptiveAutoTracingOptions(window=10, percentile=80, max_spans_per_second=5))
+    for _ in range(3 + 5):
+        call(100)
+    assert state.info == AutoTracedFunction('module', 'adaptive_func', 1, traced=False, promotions=1, demotions=1)
+    assert len(spans) == 5
+    for _ in range(6):
+        call(100)
+    assert not state.info.traced
+    now += ONE_SECOND_IN_NANOSECONDS
+    for _ in range(3):
+        call(100)
+    assert state.info.traced
+    assert state.info.promotions == 2
+
+
+def test_adaptive_auto_tracing(exporter: TestExporter, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(sys, 'path', [str(tmp_path), *sys.path])
+    (tmp_path / 'auto_trace_adaptive.py').write_text('def func():\n    return 1\n\ndef other():\n    return 2\n')
+
+    meta_path = sys.meta_path.copy()
+    try:
+        # The test timestamp generator makes every call take 1 second, so every call is slow.
+        logfire.install_auto_tracing(
+            'auto_trace_adaptive',
+            min_duration=0.5,
+            adaptive=logfire.AdaptiveAutoTracingOptions(window=5, percentile=50),
+        )
+        import auto_trace_adaptive  # type: ignore
+
+        for _ in range(2):
+            auto_trace_adaptive.func()  # type: ignore
+        assert exporter.exported_spans == []
+        auto_trace_adaptive.func()  # type: ignore
+        auto_trace_adaptive.func()  # type: ignore
+    finally:
+        sys.meta_path = meta_path
+        sys.modules.pop('auto_trace_adaptive', None)
+
+    assert [span['name'] for span in exporter.exported_spans_as_dict()] == ['Calling auto_trace_adaptive.func']
+    assert [f for f in logfire.auto_traced_functions() if f.module == 'auto_trace_adaptive'] == [
+        AutoTracedFunction('auto_trace_adaptive', 'func', 1, traced=True, promotions=1, demotions=0),
+        AutoTracedFunction('auto_trace_adaptive', 'other', 4, traced=False, promotions=0, demotions=0),
+    ]
+
+
+def test_adaptive_options_validation():
+    with pytest.raises(ValueError, match='adaptive requires min_duration to be greater than 0'):
+        logfire.install_auto_tracing('foo', min_duration=0, adaptive=logfire.AdaptiveAutoTracingOptions())
+    with pytest.raises(ValueError, match='window must be at least 1'):
+        logfire.AdaptiveAutoTracingOptions(window=0)
+    with pytest.raises(ValueError, match='percentile must be greater than 0 and at most 100'):
+        logfire.AdaptiveAutoTracingOptions(percentile=0)
+    with pytest.raises(ValueError, match='max_spans_per_second must be at least 1 or None'):
+        logfire.AdaptiveAutoTracingOptions(max_spans_per_second=0)
+    assert logfire.AdaptiveAutoTracingOptions(percentile=100).slow_calls_threshold == 1
@@ -19,8 +19,10 @@ import requests_mock
 from dirty_equals import IsStr
 from inline_snapshot import snapshot
 
+import logfire
 import logfire._internal.cli
 from logfire import VERSION
+from logfire._internal import overhead
 from logfire._internal.auth import UserToken
 from logfire._internal.cli import OrgProjectAction, SplitArgs, main
 from logfire._internal.cli.run import (
@@ -1680,3 +1682,29 @@ def test_parse_run_module(
     assert configure_mock.call_count == 1
     assert capsys.readouterr().out == snapshot('hi from run_script_test.py\n')
     assert instrument_package_mock.call_args_list == [(('openai',),)]
+
+
+def test_parse_run_script_profile_overhead(monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]) -> None:
+    monkeypatch.setattr('logfire.configure', Mock())
+    monkeypatch.setattr('logfire._internal.cli.run.instrument_package', Mock())
+    monkeypatch.setattr('logfire._internal.overhead.ENABLED', False)
+    monkeypatch.setattr('logfire._internal.overhead.FUNCTION_OVERHEADS', {})
+
+    main(['run', '--no-summary', '--profile-overhead', run_script_test.__file__, '-x', 'foo'])
+
+    assert overhead.ENABLED
+    out, err = capsys.readouterr()
+    assert out == 'hi from run_script_test.py\n'
+    assert 'Logfire overhead per instrumented function:\nFunction | Instrumented by | Calls' in err
+
+
+def test_precompile_auto_tracing(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    # The config is copied to the worker processes, so it mustn't contain e.g. the test exporter.
+    logfire.configure(send_to_logfire=False, console=False)
+    for i in range(3):
+        (tmp_path / f'module_{i}.py').write_text(f'def func():\n    return {i}\n')
+
+    main(['precompile-auto-tracing', str(tmp_path), '-j', '2'])
+
+    assert capsys.readouterr().err == 'Precompiled 3 files for auto-tracing.\n'
+    assert len(list((tmp_path / '__pycache__').glob('*.opt-logfire.pyc'))) == 3
@@ -57,7 +57,7 @@ from logfire._internal.config import (
 from logfire._internal.exporters.console import ConsoleLogExporter, ShowParentsConsoleSpanExporter
 from logfire._internal.exporters.dynamic_batch import DynamicBatchSpanProcessor
 from logfire._internal.exporters.logs import CheckSuppressInstrumentationLogProcessorWrapper, MainLogProcessorWrapper
-from logfire._internal.exporters.otlp import QuietLogExporter, QuietSpanExporter
+from logfire._internal.exporters.otlp import DiskRetryer, QuietLogExporter, QuietSpanExporter
 from logfire._internal.exporters.processor_wrapper import (
     CheckSuppressInstrumentationProcessorWrapper,
     MainSpanProcessorWrapper,
@@ -1339,6 +1339,37 @@ def test_send_to_logfire_if_token_present_empty_via_arg() -> None:
         assert len(requests_mocker.request_history) == 0
 
 
+def test_retry_spool_dir_drained_on_startup(tmp_path: Path) -> None:
+    previous = DiskRetryer({}, tmp_path)
+    previous.spool.append(b'leftover', {'url': 'https://logfire-us.pydantic.dev/v1/traces'})
+    previous.spool.close()
+
+    with requests_mock.Mocker() as request_mocker:
+        request_mocker.get(
+            'https://logfire-us.pydantic.dev/v1/info',
+            json={'project_name': 'myproject', 'project_url': 'fake_project_url'},
+        )
+        request_mocker.post(requests_mock.ANY)
+        with mock.patch('time.sleep'):
+            configure(
+                token='abc1',
+                send_to_logfire=True,
+                console=False,
+                advanced=logfire.AdvancedOptions(retry_spool_dir=tmp_path),
+            )
+            wait_for_check_token_thread()
+            while retryer_threads := [t for t in threading.enumerate() if t.name == 'logfire_retryer']:
+                for thread in retryer_threads:
+                    thread.join()
+            # Export the retryer's own metrics while requests are still mocked.
+            logfire.force_flush()
+
+        [request] = [r for r in request_mocker.request_history if r.url.endswith('/v1/traces')]
+        assert request.body == b'leftover'
+        assert request.headers['Authorization'] == 'abc1'
+    assert not list(tmp_path.iterdir())
+
+
 def wait_for_check_token_thread():
     for thread in threading.enumerate():
         if thread.name == 'check_logfire_token':  # pragma: no cover
@@ -1508,8 +1539,11 @@ def test_default_exporters(monkeypatch: pytest.MonkeyPatch):
     assert isinstance(pending_span_processor, PendingSpanProcessor)
     assert isinstance(pending_span_processor.processor, MainSpanProcessorWrapper)
     assert isinstance(pending_span_processor.processor.processor, SynchronousMultiSpanProcessor)
-    assert pending_span_processor.processor.processor._span_processors == (  # type: ignore
-        console_span_processor,
+    assert pending_span_processor.processor.processor._span_processors == (console_span_processor,)  # type: ignore
+    # Pending spans for Logfire are only materialized when exported.
+    assert isinstance(pending_span_processor.lazy_processor, MainSpanProcessorWrapper)
+    assert isinstance(pending_span_processor.lazy_processor.processor, SynchronousMultiSpanProcessor)
+    assert pending_span_processor.lazy_processor.processor._span_processors == (  # type: ignore
         send_to_logfire_processor,
     )
 
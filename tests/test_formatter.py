@@ -170,6 +170,20 @@ def test_numbered_fields():
         logfire_format('{2.3}', {'2': 'a'}, NOOP_SCRUBBER)
 
 
+def test_parse_template_cache():
+    from logfire._internal.formatter import parse_template
+
+    parse_template.cache_clear()
+    assert logfire_format(
+        '{a} and {b.c:{width}} {d=}', {'a': 1, 'b': SimpleNamespace(c=2), 'width': 3, 'd': 4}, NOOP_SCRUBBER
+    ) == snapshot('1 and   2 d=4')
+    assert logfire_format(
+        '{a} and {b.c:{width}} {d=}', {'a': 5, 'b': SimpleNamespace(c=6), 'width': 2, 'd': 7}, NOOP_SCRUBBER
+    ) == snapshot('5 and  6 d=7')
+    # The second call reuses the parsed outer template and format spec.
+    assert parse_template.cache_info().hits == 2
+
+
 class BadScrubber(Scrubber):
     def scrub_value(self, path: JsonPath, value: Any):
         raise ValueError('bad scrubber')
@@ -1418,3 +1418,54 @@ def test_mock(exporter: TestExporter):
             }
         ]
     )
+
+
+def test_encoder_cache_follows_registry():
+    from logfire._internal.json_encoder import encoder_by_type, to_json_value
+
+    class Point:
+        def __repr__(self) -> str:
+            return 'Point()'
+
+    seen: set[int] = set()
+    assert to_json_value([Point()], seen) == ['Point()']
+    # Only the ancestors of the current value are tracked, so nothing is left once the conversion is done.
+    assert seen == set()
+
+    encoder_by_type()[Point] = lambda o, seen: 'custom point'
+    try:
+        assert to_json_value([Point()], seen) == ['custom point']
+    finally:
+        del encoder_by_type()[Point]
+    assert to_json_value([Point()], seen) == ['Point()']
+
+
+def test_attributes_json_schema_cache():
+    from logfire._internal.json_schema import attributes_json_schema_with_properties
+
+    class Color(Enum):
+        RED = 'red'
+        BLUE = 'blue'
+
+    properties, json_schema = attributes_json_schema_with_properties({'a': 1, 'color': Color.RED, 'b': None})
+    assert json_schema == snapshot(
+        '{"type":"object","properties":{"a":{},"color":{"type":"string","title":"Color","x-python-datatype":"Enum","enum":["red","blue"]},"b":{"type":"null"}}}'
+    )
+    # The result is cached, but callers can modify the properties.
+    properties['c'] = {}
+    properties2, json_schema2 = attributes_json_schema_with_properties({'a': 2, 'color': Color.BLUE, 'b': None})
+    assert json_schema2 == json_schema
+    assert properties2 == {'a': {}, 'color': properties['color'], 'b': {'type': 'null'}}
+
+    # Schemas of lists depend on their items, so they're not cached.
+    assert attributes_json_schema_with_properties({'a': [1]}) == ({'a': {'type': 'array'}}, IsJson())
+    assert attributes_json_schema_with_properties({'a': [Color.RED]})[0] == snapshot(
+        {
+            'a': {
+                'type': 'array',
+                'items': {'type': 'string', 'title': 'Color', 'x-python-datatype': 'Enum', 'enum': ['red', 'blue']},
+            }
+        }
+    )
+
+    assert attributes_json_schema_with_properties({}) == ({}, None)
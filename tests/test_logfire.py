@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import inspect
+import json
 import re
 import sys
 from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
@@ -19,7 +20,14 @@ from opentelemetry.proto.common.v1.common_pb2 import AnyValue
 from opentelemetry.sdk.metrics.export import InMemoryMetricReader
 from opentelemetry.sdk.trace import ReadableSpan
 from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
-from opentelemetry.trace import INVALID_SPAN, StatusCode, get_current_span, get_tracer
+from opentelemetry.trace import (
+    INVALID_SPAN,
+    NonRecordingSpan,
+    SpanContext,
+    StatusCode,
+    get_current_span,
+    get_tracer,
+)
 from pydantic import BaseModel, __version__ as pydantic_version
 from pydantic_core import ValidationError
 
@@ -29,16 +37,21 @@ from logfire._internal.config import LogfireConfig, LogfireNotConfiguredWarning,
 from logfire._internal.constants import (
     ATTRIBUTES_MESSAGE_KEY,
     ATTRIBUTES_MESSAGE_TEMPLATE_KEY,
+    ATTRIBUTES_SAMPLE_RATE_KEY,
     ATTRIBUTES_SPAN_TYPE_KEY,
     ATTRIBUTES_TAGS_KEY,
     LEVEL_NUMBERS,
     LevelName,
 )
+from logfire._internal.exporters.deferred import SerializeDeferredAttributesExporter
 from logfire._internal.formatter import FormattingFailedWarning, InspectArgumentsFailedWarning
-from logfire._internal.main import NoopSpan
-from logfire._internal.tracer import record_exception
+from logfire._internal.json_encoder import DeferredJson
+from logfire._internal.main import NoopSpan, prepare_otlp_attributes
+from logfire._internal.scrubbing import Scrubber
+from logfire._internal.tracer import _LogfireWrappedSpan, _OpenSpans, record_exception  # type: ignore
 from logfire._internal.utils import SeededRandomIdGenerator, is_instrumentation_suppressed
 from logfire.integrations.logging import LogfireLoggingHandler
+from logfire.sampling import TailSamplingSpanInfo
 from logfire.testing import TestExporter
 from tests.test_metrics import get_collected_metrics
 
@@ -2165,6 +2178,29 @@ def test_exc_info(exporter: TestExporter):
         assert span.status.description == 'ValueError: an error'
 
 
+def test_log_exc_info_timestamps(exporter: TestExporter):
+    try:
+        raise ValueError('an error')
+    except ValueError:
+        logfire.exception('exc')
+
+    # The log starts and ends at the same time, and the exception event gets the next timestamp.
+    [span] = exporter.exported_spans_as_dict()
+    assert (span['start_time'], span['end_time'], [event['timestamp'] for event in span['events']]) == snapshot(
+        (1000000000, 1000000000, [2000000000])
+    )
+
+
+def test_sampled_out_log(exporter: TestExporter):
+    sampled_out: dict[str, Any] = {ATTRIBUTES_SAMPLE_RATE_KEY: 0}
+    sampled_in: dict[str, Any] = {ATTRIBUTES_SAMPLE_RATE_KEY: 1}
+    logfire.info('sampled out', **sampled_out)
+    logfire.info('sampled in', **sampled_in)
+    logfire.info('not sampled')
+
+    assert [span['name'] for span in exporter.exported_spans_as_dict()] == snapshot(['sampled in', 'not sampled'])
+
+
 def test_span_level(exporter: TestExporter):
     with logfire.span('foo', _level='debug') as span:
         span.set_level('warn')
@@ -2968,6 +3004,63 @@ def test_wrong_fstring_source_segment(exporter: TestExporter):
     )
 
 
+def test_inspect_arguments_call_site_cache(exporter: TestExporter, metrics_reader: InMemoryMetricReader):
+    from logfire._internal.formatter import FSTRING_PLAN_CACHE_STATS, register_fstring_plan_metrics
+
+    assert (FSTRING_PLAN_CACHE_STATS.hits, FSTRING_PLAN_CACHE_STATS.misses) == (0, 0)
+    for number in range(3):
+        logfire.info(f'fstring {number}')
+        logfire.info('template {number}', number=number)
+    # Each call site is only analyzed once, including the one that doesn't use an f-string.
+    assert (FSTRING_PLAN_CACHE_STATS.hits, FSTRING_PLAN_CACHE_STATS.misses) == (4, 2)
+    assert [
+        (span['attributes']['logfire.msg_template'], span['attributes']['logfire.msg'])
+        for span in exporter.exported_spans_as_dict()
+    ] == snapshot(
+        [
+            ('fstring {number}', 'fstring 0'),
+            ('template {number}', 'template 0'),
+            ('fstring {number}', 'fstring 1'),
+            ('template {number}', 'template 1'),
+            ('fstring {number}', 'fstring 2'),
+            ('template {number}', 'template 2'),
+        ]
+    )
+
+    register_fstring_plan_metrics()
+    [metric] = [
+        metric
+        for metric in get_collected_metrics(metrics_reader)
+        if metric['name'] == 'logfire.inspect_arguments.call_site_cache'
+    ]
+    assert [(point['attributes'], point['value']) for point in metric['data']['data_points']] == snapshot(
+        [({'result': 'hit'}, 4), ({'result': 'miss'}, 2)]
+    )
+
+
+def test_stack_info_cached_per_call_site(exporter: TestExporter):
+    def log(n: int):
+        logfire.info('first {n}', n=n)
+        with logfire.span('second {n}', n=n):
+            pass
+
+    lineno = log.__code__.co_firstlineno
+    for n in range(2):
+        log(n)
+    logfire.info('third')
+
+    assert [
+        (span['attributes']['logfire.msg'], span['attributes']['code.function'], span['attributes']['code.lineno'])
+        for span in exporter.exported_spans_as_dict(fixed_line_number=None)
+    ] == [
+        ('first 0', 'log', lineno + 1),
+        ('second 0', 'log', lineno + 2),
+        ('first 1', 'log', lineno + 1),
+        ('second 1', 'log', lineno + 2),
+        ('third', 'test_stack_info_cached_per_call_site', lineno + 8),
+    ]
+
+
 def test_suppress_instrumentation(exporter: TestExporter):
     logfire.info('log1')
     assert not is_instrumentation_suppressed()
@@ -3440,3 +3533,111 @@ def test_min_level(exporter: TestExporter, config_kwargs: dict[str, Any]) -> Non
     assert [span['name'] for span in exporter.exported_spans_as_dict()] == snapshot(
         ['warning span', 'notice message', 'warn message', 'default span']
     )
+
+
+def test_defer_attribute_serialization(exporter: TestExporter, config_kwargs: dict[str, Any]) -> None:
+    def log_and_get_attributes() -> list[dict[str, Any]]:
+        exporter.clear()
+        with logfire.span('span {x}', x='hello', user={'name': 'alice', 'api_key': 'abc123'}, count=3):
+            logfire.info('log {rows}', rows=[{'secret': 1}, 'safe'], password={'a': 1}, n=1.5)
+        return [
+            {k: v for k, v in span.attributes.items() if not k.startswith('code.')}
+            for span in exporter.exported_spans
+            if span.attributes
+        ]
+
+    eager = log_and_get_attributes()
+    config_kwargs['advanced'].defer_attribute_serialization = True
+    logfire.configure(**config_kwargs)
+    deferred = log_and_get_attributes()
+
+    def parse(attributes: dict[str, Any]) -> dict[str, Any]:
+        return {k: json.loads(v) if k in ('user', 'rows', 'logfire.scrubbed') else v for k, v in attributes.items()}
+
+    # Processors other than the one exporting to Logfire get the same values as usual when spans end,
+    # except that scrubbed JSON is serialized again compactly like when scrubbing at source.
+    assert [parse(attributes) for attributes in deferred] == [parse(attributes) for attributes in eager]
+    assert all(type(value) is not DeferredJson for attributes in deferred for value in attributes.values())
+    assert deferred[1] == snapshot(
+        {
+            'logfire.span_type': 'log',
+            'logfire.level_num': 9,
+            'logfire.msg_template': 'log {rows}',
+            'logfire.msg': "log [Scrubbed due to 'secret']",
+            'rows': '[{"secret":"[Scrubbed due to \'secret\']"},"safe"]',
+            'password': "[Scrubbed due to 'password']",
+            'n': 1.5,
+            'logfire.json_schema': IsJson(),
+            'logfire.scrubbed': IsJson(),
+        }
+    )
+
+
+def test_defer_attribute_serialization_tail_sampling(exporter: TestExporter, config_kwargs: dict[str, Any]) -> None:
+    seen_attributes: list[dict[str, Any]] = []
+
+    def tail(span_info: TailSamplingSpanInfo) -> float:
+        seen_attributes.append(dict(span_info.span.attributes or {}))
+        return 1
+
+    config_kwargs['advanced'].defer_attribute_serialization = True
+    logfire.configure(**config_kwargs, sampling=logfire.SamplingOptions(tail=tail))
+    logfire.info('log {user}', user={'name': 'alice'}, n=1)
+
+    # The tail sampling callback sees the placeholder for deferred values, while other processors see the JSON.
+    [seen] = seen_attributes
+    assert seen['user'] == '[Not serialized yet]'
+    assert seen['n'] == 1
+    assert seen['logfire.level_num'] == 9
+    [span] = exporter.exported_spans
+    assert span.attributes and span.attributes['user'] == '{"name":"alice"}'
+
+
+def test_deferred_attributes_serialized_when_exported() -> None:
+    exporter = TestExporter()
+    serializing_exporter = SerializeDeferredAttributesExporter(exporter, Scrubber(None))
+    data: dict[str, Any] = {'items': [1]}
+    otlp_attributes = prepare_otlp_attributes({'data': data, 'name': 'x'}, defer=True)
+    assert type(otlp_attributes['data']) is DeferredJson
+    assert otlp_attributes['name'] == 'x'
+
+    # The value is referenced rather than copied, so changes before the span is exported are included.
+    data['items'].append(2)
+    data['secret'] = 'hunter2'
+    span = ReadableSpan(name='test', attributes=otlp_attributes)
+    serializing_exporter.export([span])
+    assert exporter.exported_spans[0].attributes == snapshot(
+        {
+            'data': '{"items":[1,2],"secret":"[Scrubbed due to \'secret\']"}',
+            'name': 'x',
+            'logfire.scrubbed': '[{"path": ["attributes", "data", "secret"], "matched_substring": "secret"}]',
+        }
+    )
+    # Spans without deferred values are passed on as they are.
+    serializing_exporter.export([exporter.exported_spans[0]])
+    assert exporter.exported_spans[1] is exporter.exported_spans[0]
+
+
+def test_open_spans(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(_OpenSpans, 'MIN_PRUNE_SIZE', 4)
+    open_spans = _OpenSpans()
+    monkeypatch.setattr('logfire._internal.tracer.OPEN_SPANS', open_spans)
+
+    def make_span(span_id: int) -> _LogfireWrappedSpan:
+        span = NonRecordingSpan(SpanContext(trace_id=1, span_id=span_id, is_remote=False))
+        return _LogfireWrappedSpan(span, ns_timestamp_generator=lambda: 0, record_metrics=False)
+
+    ended = make_span(1)
+    kept = make_span(2)
+    make_span(3)  # Garbage collected without ending, e.g. in an abandoned generator.
+    ended.end()
+    assert open_spans.values() == [kept]
+    assert open_spans.get((1, 2)) is kept
+    assert open_spans.get((1, 3)) is None
+    assert len(open_spans._refs) == 2  # type: ignore[reportPrivateUsage]
+
+    more = [make_span(span_id) for span_id in range(4, 6)]
+    # Reaching the prune size removed the dead reference, and the next pruning happens at twice the remaining size.
+    assert len(open_spans._refs) == 3  # type: ignore[reportPrivateUsage]
+    assert open_spans._prune_size == 6  # type: ignore[reportPrivateUsage]
+    assert open_spans.values() == [kept, *more]
@@ -219,6 +219,17 @@ def test_runtime(logfire_api_factory: Callable[[], ModuleType], module_name: str
     logfire_api.AutoTraceModule(name='test', filename='test')
     logfire__all__.remove('AutoTraceModule')
 
+    assert hasattr(logfire_api, 'AdaptiveAutoTracingOptions')
+    logfire_api.AdaptiveAutoTracingOptions()
+    logfire__all__.remove('AdaptiveAutoTracingOptions')
+
+    assert hasattr(logfire_api, 'auto_traced_functions')
+    assert isinstance(logfire_api.auto_traced_functions(), list)
+    logfire__all__.remove('auto_traced_functions')
+
+    assert hasattr(logfire_api, 'AutoTracedFunction')
+    logfire__all__.remove('AutoTracedFunction')
+
     assert hasattr(logfire_api, 'LogfireLoggingHandler')
     logfire_api.LogfireLoggingHandler()
     logfire__all__.remove('LogfireLoggingHandler')
@@ -264,6 +275,39 @@ def test_runtime(logfire_api_factory: Callable[[], ModuleType], module_name: str
         pass
     logfire__all__.remove('set_baggage')
 
+    assert hasattr(logfire_api, 'export_stats')
+    assert logfire_api.export_stats().spans_dropped_queue_full == 0
+    logfire__all__.remove('export_stats')
+
+    assert hasattr(logfire_api, 'ExportStats')
+    logfire__all__.remove('ExportStats')
+
+    assert hasattr(logfire_api, 'overhead_profile')
+    assert isinstance(logfire_api.overhead_profile().functions, list)
+    logfire__all__.remove('overhead_profile')
+
+    assert hasattr(logfire_api, 'enable_overhead_profiling')
+    logfire__all__.remove('enable_overhead_profiling')
+
+    assert hasattr(logfire_api, 'OverheadProfile')
+    logfire__all__.remove('OverheadProfile')
+
+    assert hasattr(logfire_api, 'FunctionOverhead')
+    logfire__all__.remove('FunctionOverhead')
+
+    assert hasattr(logfire_api, 'bind_metric')
+    logfire_api.bind_metric(logfire_api.DEFAULT_LOGFIRE_INSTANCE.metric_counter('counter'), {'key': 'value'}).add(1)
+    logfire_api.bind_metric(
+        logfire_api.DEFAULT_LOGFIRE_INSTANCE.metric_histogram('histogram'), {'key': 'value'}
+    ).record(1)
+    logfire__all__.remove('bind_metric')
+
+    assert hasattr(logfire_api, 'BoundCounter')
+    logfire__all__.remove('BoundCounter')
+
+    assert hasattr(logfire_api, 'BoundHistogram')
+    logfire__all__.remove('BoundHistogram')
+
     # If it's not empty, it means that some of the __all__ members are not tested.
     assert logfire__all__ == set(), logfire__all__
 
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import contextvars
 from typing import Any
 
 import pytest
@@ -18,6 +19,7 @@ from opentelemetry.sdk.metrics.export import (
 
 import logfire
 import logfire._internal.metrics
+import logfire._internal.tracer
 from logfire._internal.config import METRICS_PREFERRED_TEMPORALITY
 from logfire._internal.exporters.quiet_metrics import QuietMetricExporter
 from logfire._internal.exporters.test import TestExporter
@@ -450,6 +452,26 @@ def test_metrics_in_spans(exporter: TestExporter):
     )
 
 
+def test_metrics_in_span_outliving_parent(exporter: TestExporter):
+    tokens = logfire.metric_counter('tokens')
+
+    with logfire.span('grandparent'):
+        with logfire.span('parent'):
+            # Like a background task started in the parent, the child stays current in its own context.
+            child_context = contextvars.copy_context()
+            child = child_context.run(logfire.span('child').__enter__)
+            child_context.run(tokens.add, 1)
+        # The parent has ended, so increments in the child no longer count in the parent or any ancestor.
+        child_context.run(tokens.add, 20)
+        child_context.run(child.__exit__, None, None, None)
+        tokens.add(300)
+
+    assert {
+        span['name']: span['attributes']['logfire.metrics']['tokens']['total']
+        for span in exporter.exported_spans_as_dict(parse_json_attributes=True)
+    } == snapshot({'parent': 1, 'child': 21, 'grandparent': 301})
+
+
 def test_metrics_in_non_recording_spans(exporter: TestExporter, config_kwargs: dict[str, Any]):
     metrics_reader = InMemoryMetricReader(preferred_temporality=METRICS_PREFERRED_TEMPORALITY)
     logfire.configure(
@@ -490,6 +512,93 @@ def test_metrics_in_non_recording_spans(exporter: TestExporter, config_kwargs: d
     )
 
 
+def test_bound_metrics(exporter: TestExporter, metrics_reader: InMemoryMetricReader):
+    tokens = logfire.metric_counter('bound_tokens')
+    gpt4_tokens = logfire.bind_metric(tokens, {'model': 'gpt4'})
+    gpt4_durations = logfire.bind_metric(logfire.metric_histogram('bound_durations'), {'model': 'gpt4'})
+    active = logfire.bind_metric(logfire.metric_up_down_counter('bound_active'))
+
+    gpt4_tokens.add(1)
+    with logfire.span('span'):
+        gpt4_tokens.add(10)
+        with logfire.span('nested_span'):
+            gpt4_tokens.add(200)
+            # Passing the same attributes to the instrument counts in the same details.
+            tokens.add(3000, {'model': 'gpt4'})
+            gpt4_durations.record(5)
+            # Up-down counters aren't collected in spans, bound or not.
+            active.add(1)
+
+    assert {
+        span['name']: span['attributes']['logfire.metrics']
+        for span in exporter.exported_spans_as_dict(parse_json_attributes=True)
+    } == snapshot(
+        {
+            'nested_span': {
+                'bound_tokens': {'details': [{'attributes': {'model': 'gpt4'}, 'total': 3200}], 'total': 3200},
+                'bound_durations': {'details': [{'attributes': {'model': 'gpt4'}, 'total': 5}], 'total': 5},
+            },
+            'span': {
+                'bound_tokens': {'details': [{'attributes': {'model': 'gpt4'}, 'total': 3210}], 'total': 3210},
+                'bound_durations': {'details': [{'attributes': {'model': 'gpt4'}, 'total': 5}], 'total': 5},
+            },
+        }
+    )
+
+    assert [
+        (
+            metric['name'],
+            [(point['attributes'], point.get('value', point.get('sum'))) for point in metric['data']['data_points']],
+        )
+        for metric in get_collected_metrics(metrics_reader)
+    ] == snapshot(
+        [
+            ('bound_tokens', [({'model': 'gpt4'}, 3211)]),
+            ('bound_durations', [({'model': 'gpt4'}, 5)]),
+            ('bound_active', [({}, 1)]),
+        ]
+    )
+
+
+def test_span_metric_series_cache_cleared(exporter: TestExporter, monkeypatch: pytest.MonkeyPatch):
+    tokens = logfire.metric_counter('tokens')
+    bound_tokens = logfire.bind_metric(tokens, {'model': 'gpt4'})
+    # After the cache is cleared, a new series object is created for the same name and attributes.
+    monkeypatch.setattr(logfire._internal.tracer, '_SPAN_METRIC_SERIES', {})
+
+    with logfire.span('span'):
+        bound_tokens.add(1)
+        tokens.add(20, {'model': 'gpt4'})
+
+    [span] = exporter.exported_spans_as_dict(parse_json_attributes=True)
+    assert span['attributes']['logfire.metrics'] == snapshot(
+        {'tokens': {'details': [{'attributes': {'model': 'gpt4'}, 'total': 21}], 'total': 21}}
+    )
+
+
+def test_bound_metric_sequence_attributes(exporter: TestExporter, metrics_reader: InMemoryMetricReader):
+    tokens = logfire.metric_counter('sequence_tokens')
+    bound_tokens = logfire.bind_metric(tokens, {'tags': ['a', 'b']})
+
+    with logfire.span('span'):
+        bound_tokens.add(1)
+        tokens.add(20, {'tags': ('a', 'b')})
+
+    [span] = exporter.exported_spans_as_dict(parse_json_attributes=True)
+    assert span['attributes']['logfire.metrics'] == snapshot(
+        {'sequence_tokens': {'details': [{'attributes': {'tags': ['a', 'b']}, 'total': 21}], 'total': 21}}
+    )
+    assert [
+        [(point['attributes'], point['value']) for point in metric['data']['data_points']]
+        for metric in get_collected_metrics(metrics_reader)
+    ] == snapshot([[({'tags': ['a', 'b']}, 21)]])
+
+    # Unbound measurements with list values, which the SDK doesn't accept, still share the series in spans.
+    series = logfire._internal.tracer.span_metric_series('sequence_tokens', {'tags': ['a', 'b']})
+    assert series is logfire._internal.tracer.span_metric_series('sequence_tokens', {'tags': ['a', 'b']})
+    assert series is logfire._internal.tracer.span_metric_series('sequence_tokens', {'tags': ('a', 'b')})
+
+
 def test_reconfigure(caplog: pytest.LogCaptureFixture):
     for _ in range(3):
         logfire.configure(send_to_logfire=False, console=False)
@@ -500,3 +609,20 @@ def test_reconfigure(caplog: pytest.LogCaptureFixture):
     # For comparison, this logs a warning because the advisory is different (unset)
     meter.create_histogram('foo', unit='x', description='bar')
     assert caplog.messages
+
+
+def test_gauge_callback_before_configure(config_kwargs: dict[str, Any]) -> None:
+    def observable_gauge(options: CallbackOptions):
+        yield Observation(123)
+
+    # Keeping a reference to the gauge means that it isn't lost when the meter provider is set.
+    gauge = logfire.metric_gauge_callback('gauge_callback_before_configure', callbacks=[observable_gauge])
+
+    metrics_reader = InMemoryMetricReader(preferred_temporality=METRICS_PREFERRED_TEMPORALITY)
+    logfire.configure(**config_kwargs, metrics=logfire.MetricsOptions(additional_readers=[metrics_reader]))
+    assert [
+        metric['data']['data_points'][0]['value']
+        for metric in get_collected_metrics(metrics_reader)
+        if metric['name'] == 'gauge_callback_before_configure'
+    ] == [123]
+    assert gauge
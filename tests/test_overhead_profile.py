@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+from inline_snapshot import snapshot
+
+import logfire
+from logfire._internal import overhead
+from logfire._internal.overhead import FunctionOverhead, OverheadProfile
+from logfire.testing import TestExporter
+
+
+@pytest.fixture
+def profiling(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(overhead, 'ENABLED', False)
+    monkeypatch.setattr(overhead, 'FUNCTION_OVERHEADS', {})
+    logfire.enable_overhead_profiling()
+
+
+def test_instrument_overhead(profiling: None, exporter: TestExporter) -> None:
+    @logfire.instrument(record_return=True)
+    def double(x: int) -> int:
+        return x * 2
+
+    assert [double(i) for i in range(3)] == [0, 2, 4]
+
+    (function,) = logfire.overhead_profile().functions
+    assert function.function == 'tests.test_overhead_profile.test_instrument_overhead.<locals>.double'
+    assert function.instrumented_by == 'instrument'
+    assert (function.calls, function.spans) == (3, 3)
+    assert function.overhead_time > 0
+    assert 0 < function.overhead_fraction < 1
+    assert function.overhead_per_call == function.overhead_time / 3
+
+    # Profiling doesn't change the spans, including using the span returned by entering the context manager.
+    assert [span['attributes']['return'] for span in exporter.exported_spans_as_dict()] == [0, 2, 4]
+
+
+def test_instrument_not_profiled_when_disabled(exporter: TestExporter) -> None:
+    @logfire.instrument()
+    def func() -> None:
+        pass
+
+    func()
+    assert not any(f.function.endswith('.func') for f in logfire.overhead_profile().functions)
+
+
+def test_auto_trace_overhead(
+    profiling: None, exporter: TestExporter, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(sys, 'path', [str(tmp_path), *sys.path])
+    (tmp_path / 'auto_trace_overhead.py').write_text('def func():\n    return 1\n')
+
+    meta_path = sys.meta_path.copy()
+    try:
+        # Every call takes 1 second with the test timestamp generator, so the first call promotes the function.
+        logfire.install_auto_tracing('auto_trace_overhead', min_duration=0.5)
+        import auto_trace_overhead  # type: ignore
+
+        for _ in range(3):
+            assert auto_trace_overhead.func() == 1  # type: ignore
+    finally:
+        sys.meta_path = meta_path
+        sys.modules.pop('auto_trace_overhead', None)
+
+    (function,) = logfire.overhead_profile().functions
+    assert (function.function, function.instrumented_by) == ('auto_trace_overhead.func', 'auto_tracing')
+    assert (function.calls, function.spans) == (3, 2)
+    assert len(exporter.exported_spans_as_dict()) == 2
+
+
+def test_overhead_profile_table() -> None:
+    profile = OverheadProfile(
+        [
+            FunctionOverhead('app.handler', 'instrument', 10, 10, 0.5, 0.0002),
+            FunctionOverhead('app.helpers.tiny', 'auto_tracing', 2000, 0, 0.001, 0.0001),
+            FunctionOverhead('app.unused', 'auto_tracing'),
+        ]
+    )
+    assert str(profile) == snapshot("""\
+Function         | Instrumented by | Calls | Spans | Function time | Overhead | Per call |    %
+-----------------+-----------------+-------+-------+---------------+----------+----------+-----
+app.handler      | instrument      |    10 |    10 |     500.000ms |  0.200ms |   20.0µs | 0.0%
+app.helpers.tiny | auto_tracing    |  2000 |     0 |       1.000ms |  0.100ms |    0.1µs | 9.1%
+app.unused       | auto_tracing    |     0 |     0 |       0.000ms |  0.000ms |    0.0µs | 0.0%\
+""")
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import json
 import os
+import re
 from typing import Any
 
 import pytest
-from dirty_equals import IsJson, IsPartialDict
+from dirty_equals import IsInstance, IsJson, IsPartialDict
 from inline_snapshot import snapshot
 from opentelemetry._events import Event, get_event_logger
 from opentelemetry.sdk._logs.export import SimpleLogRecordProcessor
@@ -12,7 +14,7 @@ from opentelemetry.sdk.environment_variables import OTEL_RESOURCE_ATTRIBUTES
 from opentelemetry.trace.propagation import get_current_span
 
 import logfire
-from logfire._internal.scrubbing import NoopScrubber
+from logfire._internal.scrubbing import NoopScrubber, Scrubber, SourceScrubbedStr
 from logfire.testing import TestExporter, TestLogExporter
 
 
@@ -551,3 +553,124 @@ def test_word_boundaries(exporter: TestExporter):
             }
         ]
     )
+
+
+def test_scrubbed_bytes_stats(exporter: TestExporter):
+    before = logfire.export_stats().scrubbed_bytes
+    logfire.info('hi', password='hunter2', nested={'secret': [1, 2]}, safe='ok')
+    # 'hunter2' is 7 bytes, and the list is counted by its repr '[1, 2]' which is 6 bytes.
+    assert logfire.export_stats().scrubbed_bytes - before == 13
+
+
+def test_scrub_value_unchanged_is_not_copied():
+    scrubber = Scrubber(None)
+    value = {'a': [1, 'x', {'b': 'c'}], 'json': '{"note": "session"}', 'logfire.msg': 'password: 123'}
+    result, scrubbed = scrubber.scrub_value(('attributes',), value)
+    # Nothing sensitive, so the same objects are returned, including the JSON string which is not re-serialized.
+    assert result is value
+    assert scrubbed == []
+
+    value['password'] = 'hunter2'
+    result, scrubbed = scrubber.scrub_value(('attributes',), value)
+    assert result == {**value, 'password': "[Scrubbed due to 'password']"}
+    assert result['a'] is value['a']
+    assert scrubbed == [{'path': ('attributes', 'password'), 'matched_substring': 'password'}]
+
+    assert scrubber._key_decisions == snapshot(  # type: ignore[reportPrivateUsage]
+        {
+            'a': False,
+            'b': False,
+            'json': False,
+            'note': False,
+            'logfire.msg': True,
+            'password': IsInstance(re.Match),
+        }
+    )
+
+
+def test_scrub_at_source(exporter: TestExporter, config_kwargs: dict[str, Any]):
+    def log_and_get_attributes() -> dict[str, Any]:
+        exporter.clear()
+        with logfire.span(
+            'span {x}',
+            x='hello',
+            user={'name': 'alice', 'api_key': 'abc123', 'note': 'session'},
+            rows=[{'secret': 1}, 'safe'],
+            token_count=3,
+            password=123,
+            text='{"cookie": "yum"}',
+        ) as span:
+            span.set_attribute('later_secret', 'set later')
+        exported = exporter.exported_spans[-1]
+        assert exported.attributes
+        return {k: v for k, v in exported.attributes.items() if not k.startswith('code.')}
+
+    at_export = log_and_get_attributes()
+    logfire.configure(scrubbing=logfire.ScrubbingOptions(at_source=True), **config_kwargs)
+    at_source = log_and_get_attributes()
+
+    # Scrubbing at source re-serializes scrubbed JSON compactly, but otherwise the results are the same.
+    assert {k: v for k, v in at_source.items() if k not in ('user', 'rows', 'logfire.scrubbed')} == {
+        k: v for k, v in at_export.items() if k not in ('user', 'rows', 'logfire.scrubbed')
+    }
+    assert json.loads(at_source['user']) == json.loads(at_export['user'])
+    assert json.loads(at_source['rows']) == json.loads(at_export['rows'])
+    # Values scrubbed at source are skipped when the span is exported, but values set later are still scrubbed.
+    assert type(at_source['user']) is SourceScrubbedStr
+    assert type(at_source['later_secret']) is str
+    assert at_source == snapshot(
+        {
+            'x': 'hello',
+            'user': '{"name":"alice","api_key":"[Scrubbed due to \'api_key\']","note":"session"}',
+            'rows': '[{"secret":"[Scrubbed due to \'secret\']"},"safe"]',
+            'token_count': 3,
+            'password': "[Scrubbed due to 'password']",
+            'text': '{"cookie": "[Scrubbed due to \'cookie\']"}',
+            'logfire.msg_template': 'span {x}',
+            'logfire.msg': 'span hello',
+            'logfire.json_schema': IsJson(),
+            'logfire.span_type': 'span',
+            'later_secret': "[Scrubbed due to 'secret']",
+            'logfire.scrubbed': IsJson(),
+        }
+    )
+    assert sorted(json.loads(at_source['logfire.scrubbed']), key=str) == sorted(
+        json.loads(at_export['logfire.scrubbed']), key=str
+    )
+
+
+@pytest.mark.parametrize(
+    'text',
+    [
+        'nothing to see here',
+        'My PassWord',
+        'PASSWD',
+        'MYSQL_PWD=1',
+        'top Secret',
+        'Authorization: Bearer',
+        'the authors',
+        'credentials',
+        'PRIVATE-KEY',
+        'api key',
+        'apikey',
+        'SessionId',
+        'cookies',
+        'social security',
+        'Credit_Card',
+        'x_csrf_token',
+        'xsrf',
+        'a JWT here',
+        'ssn',
+        'lessness',
+        'my_pattern and password',
+        'non-ascii café password',
+        'non-ascii café',
+        '{"Key": "Sécret"}',
+    ],
+)
+@pytest.mark.parametrize('extra_patterns', [None, ['my_pattern', 'café']])
+def test_search_matches_pattern(text: str, extra_patterns: list[str] | None):
+    scrubber = Scrubber(extra_patterns)
+    expected = scrubber._pattern.search(text)  # type: ignore[reportPrivateUsage]
+    result = scrubber._search(text)  # type: ignore[reportPrivateUsage]
+    assert (result and (result.span(), result.group(0))) == (expected and (expected.span(), expected.group(0)))
@@ -1,17 +1,23 @@
 from __future__ import annotations
 
-from typing import Any
+import threading
+from typing import Any, Callable, Literal
 
 import inline_snapshot.extra
 import pytest
 from inline_snapshot import snapshot
+from opentelemetry import trace as trace_api
 from opentelemetry.context import Context
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor, TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
 from opentelemetry.sdk.trace.sampling import ALWAYS_OFF, ALWAYS_ON, Sampler, SamplingResult
 
 import logfire
 from logfire._internal.constants import LEVEL_NUMBERS
-from logfire.sampling import SpanLevel, TailSamplingSpanInfo
-from logfire.testing import SeededRandomIdGenerator, TestExporter, TimeGenerator
+from logfire.sampling import SamplingOptions, SpanLevel, TailSamplingSpanInfo
+from logfire.sampling._tail_sampling import TailSamplingProcessor
+from logfire.testing import SeededRandomIdGenerator, TestExporter, TimeGenerator, get_collected_metrics
 
 
 def test_level_threshold(config_kwargs: dict[str, Any], exporter: TestExporter):
@@ -496,6 +502,19 @@ def test_invalid_rates():
         logfire.SamplingOptions.level_or_duration(head=2)
 
 
+def test_level_or_duration_buffer_limits():
+    options = logfire.SamplingOptions.level_or_duration(
+        max_buffered_traces=10, max_buffered_spans_per_trace=100, max_buffer_age=60, buffer_eviction='include'
+    )
+    assert (
+        options.max_buffered_traces,
+        options.max_buffered_spans_per_trace,
+        options.max_buffer_age,
+        options.buffer_eviction,
+    ) == (10, 100, 60, 'include')
+    assert options.tail
+
+
 def test_trace_sample_rate(config_kwargs: dict[str, Any]):
     with pytest.warns(UserWarning) as warnings:
         logfire.configure(trace_sample_rate=0.123, **config_kwargs)  # type: ignore
@@ -514,3 +533,165 @@ def test_both_trace_and_head():
         )
     ):
         logfire.configure(trace_sample_rate=0.5, sampling=logfire.SamplingOptions())  # type: ignore
+
+
+def test_spans_ending_while_pushing_keep_order():
+    events: list[tuple[str, str]] = []
+    on_first_start: list[Callable[[], None]] = []
+
+    class RecordingProcessor(SpanProcessor):
+        def on_start(self, span: Span, parent_context: Context | None = None) -> None:
+            events.append(('start', span.name))
+            if on_first_start:
+                on_first_start.pop()()
+
+        def on_end(self, span: ReadableSpan) -> None:
+            events.append(('end', span.name))
+
+    get_tail_sample_rate = SamplingOptions.level_or_duration(duration_threshold=None).tail
+    assert get_tail_sample_rate
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(TailSamplingProcessor(RecordingProcessor(), get_tail_sample_rate))
+    tracer = tracer_provider.get_tracer(__name__)
+
+    with tracer.start_as_current_span('root'):
+        child = tracer.start_span('child')
+        # Simulate another thread ending the buffered child while the buffer is being pushed.
+        on_first_start.append(child.end)
+        tracer.start_span('error', attributes={'logfire.level_num': LEVEL_NUMBERS['error']}).end()
+
+    assert events == snapshot(
+        [
+            ('start', 'root'),
+            ('start', 'child'),
+            ('start', 'error'),
+            ('end', 'child'),
+            ('end', 'error'),
+            ('end', 'root'),
+        ]
+    )
+
+
+def test_concurrent_traces():
+    exporter = TestExporter()
+    get_tail_sample_rate = SamplingOptions.level_or_duration(duration_threshold=None).tail
+    assert get_tail_sample_rate
+    processor = TailSamplingProcessor(SimpleSpanProcessor(exporter), get_tail_sample_rate, num_shards=4)
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(processor)
+    tracer = tracer_provider.get_tracer(__name__)
+    barrier = threading.Barrier(8)
+
+    def make_traces(thread_index: int):
+        barrier.wait()
+        for i in range(50):
+            with tracer.start_as_current_span(f'root {thread_index} {i}'):
+                for j in range(3):
+                    level = 'error' if i % 5 == 0 and j == 2 else 'info'
+                    with tracer.start_as_current_span('child', attributes={'logfire.level_num': LEVEL_NUMBERS[level]}):
+                        pass
+
+    threads = [threading.Thread(target=make_traces, args=(t,)) for t in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Every span in the traces containing an error is exported exactly once, and nothing else.
+    roots = [span.name for span in exporter.exported_spans if span.parent is None]
+    assert sorted(roots) == sorted(f'root {t} {i}' for t in range(8) for i in range(0, 50, 5))
+    assert len(exporter.exported_spans) == len(roots) * 4
+    assert not any(shard.traces for shard in processor.shards)
+
+
+def make_tail_sampler(**kwargs: Any) -> tuple[TailSamplingProcessor, trace_api.Tracer, TestExporter]:
+    exporter = TestExporter()
+    get_tail_sample_rate = SamplingOptions.level_or_duration(duration_threshold=None).tail
+    assert get_tail_sample_rate
+    processor = TailSamplingProcessor(SimpleSpanProcessor(exporter), get_tail_sample_rate, **kwargs)
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(processor)
+    return processor, tracer_provider.get_tracer(__name__), exporter
+
+
+def make_trace(tracer: trace_api.Tracer, name: str, num_children: int, error: bool = False):
+    with tracer.start_as_current_span(name):
+        for i in range(num_children):
+            level = 'error' if error and i == num_children - 1 else 'info'
+            with tracer.start_as_current_span(
+                f'{name} child {i}', attributes={'logfire.level_num': LEVEL_NUMBERS[level]}
+            ):
+                pass
+
+
+def exported_names(exporter: TestExporter) -> list[str]:
+    return sorted(span.name for span in exporter.exported_spans)
+
+
+def test_max_spans_per_trace_drop():
+    processor, tracer, exporter = make_tail_sampler(max_spans_per_trace=3, eviction='drop')
+    # The error comes after the trace has been evicted, so the trace is still dropped.
+    make_trace(tracer, 'big', 4, error=True)
+    make_trace(tracer, 'small', 2, error=True)
+    assert exported_names(exporter) == ['small', 'small child 0', 'small child 1']
+    assert not any(shard.traces or shard.dropped_trace_ids for shard in processor.shards)
+
+
+def test_max_spans_per_trace_include():
+    processor, tracer, exporter = make_tail_sampler(max_spans_per_trace=3, eviction='include')
+    make_trace(tracer, 'big', 4)
+    make_trace(tracer, 'small', 2)
+    assert exported_names(exporter) == ['big', 'big child 0', 'big child 1', 'big child 2', 'big child 3']
+    assert not any(shard.traces for shard in processor.shards)
+
+
+@pytest.mark.parametrize('eviction', ['drop', 'include'])
+def test_max_traces(eviction: Literal['drop', 'include']):
+    processor, tracer, exporter = make_tail_sampler(num_shards=1, max_traces=2, eviction=eviction)
+    roots = [tracer.start_span(f'root {i}') for i in range(3)]
+    [shard] = processor.shards
+    assert [buffer.first_span.name for buffer in shard.traces.values()] == ['root 1', 'root 2']
+    # The remaining spans of the evicted trace are handled the same way as the buffered ones.
+    with trace_api.use_span(roots[0]):
+        tracer.start_span('child 0').end()
+    for root in roots:
+        root.end()
+    assert exported_names(exporter) == (['child 0', 'root 0'] if eviction == 'include' else [])
+
+
+def test_max_age():
+    processor, tracer, exporter = make_tail_sampler(num_shards=1, max_age=60, eviction='include')
+    roots = [tracer.start_span('old'), tracer.start_span('new')]
+    [shard] = processor.shards
+    assert len(shard.traces) == 2
+    next(iter(shard.traces.values())).created_at -= 61
+    roots.append(tracer.start_span('newer'))
+    assert [buffer.first_span.name for buffer in shard.traces.values()] == ['new', 'newer']
+    assert exported_names(exporter) == []  # the root span hasn't ended yet
+    for root in roots:
+        root.end()
+    assert exported_names(exporter) == ['old']
+
+
+def test_buffer_gauges(metrics_reader: InMemoryMetricReader):
+    def gauges() -> dict[str, int]:
+        # The gauges only report anything while spans are buffered, otherwise there may be no metrics at all.
+        if not metrics_reader.get_metrics_data():  # type: ignore
+            return {}
+        return {
+            metric['name']: metric['data']['data_points'][0]['value']
+            for metric in get_collected_metrics(metrics_reader)
+            if metric['name'].startswith('logfire.tail_sampling.')
+        }
+
+    _, tracer, _ = make_tail_sampler()
+    roots = [tracer.start_span('root'), tracer.start_span('other root')]
+    with trace_api.use_span(roots[0]):
+        child = tracer.start_span('child')
+    assert gauges() == {
+        'logfire.tail_sampling.buffered_traces': 2,
+        'logfire.tail_sampling.buffered_spans': 3,
+    }
+    for span in [child, *roots]:
+        span.end()
+    assert gauges() == {}